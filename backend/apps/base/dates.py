@@ -0,0 +1,50 @@
+"""
+Date filtering helpers.
+
+Filtering a datetime column with ``__date`` wraps the column in a cast, so
+the database cannot use an index on it. These helpers turn local calendar
+dates into half-open aware datetime ranges on the raw column instead.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+
+def day_bounds(day):
+    """Return the half-open aware datetime range covering ``day``"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+def _parse(name, value):
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValidationError({name: f"Invalid date '{value}', expected YYYY-MM-DD."})
+    return day
+
+
+def date_range_q(field, start_date=None, end_date=None):
+    """
+    Return a Q selecting rows whose ``field`` falls on the local dates
+    ``start_date`` to ``end_date`` inclusive.
+
+    Both bounds are optional ``YYYY-MM-DD`` strings or dates; an invalid
+    string raises a ValidationError naming the query parameter.
+    """
+    q = Q()
+    if start_date:
+        if isinstance(start_date, str):
+            start_date = _parse('start_date', start_date)
+        q &= Q(**{f"{field}__gte": day_bounds(start_date)[0]})
+    if end_date:
+        if isinstance(end_date, str):
+            end_date = _parse('end_date', end_date)
+        q &= Q(**{f"{field}__lt": day_bounds(end_date)[1]})
+    return q
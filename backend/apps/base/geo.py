@@ -0,0 +1,114 @@
+"""
+Geographic helpers: great-circle distances and geohashes.
+
+A geohash interleaves the bits of longitude and latitude into a base32
+string. Points whose hashes share a prefix lie in the same cell, and the
+cell shrinks with every character (about 4.9 km at 5 characters, 153 m at
+7, 4.8 m at 9), so an indexed geohash column turns "points in this area"
+into a few string range lookups.
+"""
+import math
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+GEOHASH_PRECISION = 9
+
+
+def haversine_matrix(points, others=None):
+    """
+    Great-circle distances in km between ``points`` and ``others``.
+
+    Both are sequences of ``(lat, lng)`` in degrees; ``others`` defaults to
+    ``points``. Returns a ``len(points) x len(others)`` array.
+    """
+    a = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    b = a if others is None else np.radians(np.asarray(others, dtype=float).reshape(-1, 2))
+    lat1, lng1 = a[:, 0:1], a[:, 1:2]
+    lat2, lng2 = b[:, 0], b[:, 1]
+    h = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def haversine(lat, lng, lats, lngs):
+    """Distances in km from one point to arrays of latitudes and longitudes"""
+    lat, lng = math.radians(lat), math.radians(lng)
+    lats, lngs = np.radians(lats), np.radians(lngs)
+    h = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lngs - lng) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(h, 0, 1)))
+
+
+def bounding_box(lat, lng, radius_km):
+    """``(min_lat, min_lng, max_lat, max_lng)`` of a circle around a point"""
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    cos_lat = math.cos(math.radians(lat))
+    if radius_km >= EARTH_RADIUS_KM * math.pi / 2 or cos_lat < 1e-9 or abs(lat) + dlat >= 90:
+        return max(lat - dlat, -90.0), -180.0, min(lat + dlat, 90.0), 180.0
+    dlng = math.degrees(math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / cos_lat)))
+    return lat - dlat, max(lng - dlng, -180.0), lat + dlat, min(lng + dlng, 180.0)
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # Even bits split longitude, odd bits latitude
+        span, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (span[0] + span[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            span[0] = middle
+        else:
+            value = value * 2
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def geohash_cell_size(precision):
+    """``(lat_degrees, lng_degrees)`` covered by a geohash of ``precision``"""
+    lng_bits = (precision * 5 + 1) // 2
+    lat_bits = precision * 5 // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def geohash_cover(min_lat, min_lng, max_lat, max_lng, max_cells=16):
+    """
+    Geohash prefixes whose cells together cover a bounding box.
+
+    Uses the longest prefixes that need at most ``max_cells`` cells, so the
+    cover is tight for small boxes and stays short for large ones.
+    """
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        lat_size, lng_size = geohash_cell_size(precision)
+        rows = math.floor(max_lat / lat_size) - math.floor(min_lat / lat_size) + 1
+        cols = math.floor(max_lng / lng_size) - math.floor(min_lng / lng_size) + 1
+        if rows * cols <= max_cells:
+            break
+    else:
+        return ['']
+
+    cells = set()
+    for row in range(rows):
+        lat = min(min_lat + row * lat_size, max_lat)
+        for col in range(cols):
+            lng = min(min_lng + col * lng_size, max_lng)
+            cells.add(geohash_encode(lat, lng, precision))
+        cells.add(geohash_encode(lat, max_lng, precision))
+    for col in range(cols):
+        cells.add(geohash_encode(max_lat, min(min_lng + col * lng_size, max_lng), precision))
+    cells.add(geohash_encode(max_lat, max_lng, precision))
+    return sorted(cells)
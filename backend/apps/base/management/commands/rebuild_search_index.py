@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apps.base.search import get_search_index, search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search indexes, e.g. after bulk imports that skip signals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('indexes', nargs='*', help='Indexes to rebuild (products, stores), defaults to all')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows inserted per statement batch')
+
+    def handle(self, *args, **options):
+        try:
+            indexes = [get_search_index(name) for name in options['indexes']] or search_indexes()
+        except KeyError as e:
+            raise CommandError(f"Unknown search index {e}")
+
+        for index in indexes:
+            if index.backend() is None:
+                self.stdout.write(self.style.WARNING(f'No full-text search on this database, skipping {index.name}'))
+                continue
+            with transaction.atomic():
+                index.create()
+                count = index.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Indexed {count} rows into {index.name}'))
@@ -0,0 +1,225 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+Pages are selected with a ``WHERE (a, b, pk) < (x, y, z)`` style condition
+on the view's ordering instead of an OFFSET, so deep pages cost the same as
+the first one when the ordering is backed by an index. The primary key is
+appended to every ordering as a tie-breaker, which keeps pages stable when
+rows share a timestamp or a name.
+
+Pagination is opt-in per request so existing clients that expect a plain
+list keep working: a request is paginated when it sends ``cursor`` or
+``page_size``. Paginated responses look like
+``{"next": url, "previous": url, "results": [...]}``.
+
+Orderings a keyset cannot follow, such as the rank expression of a search
+or a nullable field, are paged by position instead: the cursor holds an
+OFFSET into the queryset's own order. Deep pages then cost more, which is
+acceptable for the bounded result lists (searches) that order this way.
+"""
+import base64
+import json
+from urllib import parse
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+DEFAULT_PAGE_SIZE = 50
+DEFAULT_MAX_PAGE_SIZE = 500
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the view's ordering plus a primary key tie-breaker.
+
+    The ordering is taken from the view's ``pagination_ordering`` when set,
+    then from the queryset's explicit ordering and finally from the model's
+    ``Meta.ordering``. Only concrete, non-null fields of the model itself
+    can be used; other orderings are paged by offset.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.page_size = getattr(settings, 'PAGINATION_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+        self.max_page_size = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', DEFAULT_MAX_PAGE_SIZE)
+
+    def is_requested(self, request):
+        """Return whether the client asked for a paginated response"""
+        params = request.query_params
+        return self.cursor_query_param in params or self.page_size_query_param in params
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset, view):
+        """Return the ordering as field names, or None when it holds expressions"""
+        ordering = (
+            getattr(view, 'pagination_ordering', None)
+            or queryset.query.order_by
+            or queryset.model._meta.ordering
+        )
+        if not all(isinstance(field, str) for field in ordering):
+            return None
+        ordering = list(ordering)
+        if not any(field.lstrip('-') in ('pk', queryset.model._meta.pk.name) for field in ordering):
+            descending = bool(ordering) and ordering[0].startswith('-')
+            ordering.append('-pk' if descending else 'pk')
+        return ordering
+
+    def _resolve_fields(self, model, ordering):
+        """Return [(field, descending)] for the ordering, or None when a field cannot be paged on"""
+        fields = []
+        for name in ordering:
+            descending = name.startswith('-')
+            name = name.lstrip('-')
+            try:
+                field = model._meta.pk if name == 'pk' else model._meta.get_field(name)
+            except FieldDoesNotExist:
+                field = None
+            if field is None or not field.concrete or field.null:
+                return None
+            fields.append((field, descending))
+        return fields
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        ordering = self.get_ordering(queryset, view)
+        self.fields = ordering and self._resolve_fields(queryset.model, ordering)
+        self.offset = None
+        if not self.fields:
+            return self._paginate_by_offset(queryset, cursor)
+        if cursor and 'p' not in cursor:
+            raise NotFound(self.invalid_cursor_message)
+
+        reverse = bool(cursor and cursor['r'])
+        if cursor:
+            queryset = queryset.filter(self._after(cursor['p'], reverse))
+
+        order_by = [
+            f"{'-' if descending != reverse else ''}{field.attname}"
+            for field, descending in self.fields
+        ]
+        results = list(queryset.order_by(*order_by)[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = cursor is not None if not reverse else has_more
+        return results
+
+    def _paginate_by_offset(self, queryset, cursor):
+        """Page in the queryset's own order for orderings a keyset cannot follow"""
+        if cursor and 'o' not in cursor:
+            raise NotFound(self.invalid_cursor_message)
+        self.offset = cursor['o'] if cursor else 0
+        results = list(queryset[self.offset:self.offset + self.page_size + 1])
+        self.page = results[:self.page_size]
+        self.has_next = len(results) > self.page_size
+        self.has_previous = self.offset > 0
+        return self.page
+
+    def _after(self, position, reverse):
+        """Build the condition selecting rows after ``position`` in the walk direction"""
+        if len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [field.to_python(value) for (field, _), value in zip(self.fields, position)]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.fields, position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f"{field.attname}__{lookup}": value})
+            equal &= Q(**{field.attname: value})
+
+        # The redundant inclusive bound on the leading field gives the
+        # database an index range to seek into instead of scanning the OR
+        (field, descending), value = self.fields[0], position[0]
+        bound = 'lte' if descending != reverse else 'gte'
+        return Q(**{f"{field.attname}__{bound}": value}) & condition
+
+    def _position(self, instance):
+        return [field.value_to_string(instance) for field, _ in self.fields]
+
+    def encode_cursor(self, position, reverse):
+        return self._cursor_url({'p': position, 'r': int(reverse)})
+
+    def _cursor_url(self, cursor):
+        payload = json.dumps(cursor, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(parse.unquote(encoded).encode()).decode())
+            if 'o' in cursor:
+                if type(cursor['o']) is not int or cursor['o'] < 0:
+                    raise ValueError
+            elif not isinstance(cursor.get('p'), list):
+                raise ValueError
+            cursor['r'] = bool(cursor.get('r'))
+        except (TypeError, ValueError, UnicodeDecodeError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        if self.offset is not None:
+            return self._cursor_url({'o': self.offset + self.page_size})
+        return self.encode_cursor(self._position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.offset is not None and self.offset > self.page_size:
+            return self._cursor_url({'o': self.offset - self.page_size})
+        if not self.page or self.offset is not None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self._position(self.page[0]), reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
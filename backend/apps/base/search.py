@@ -0,0 +1,456 @@
+"""
+Full-text search indexes over model fields.
+
+A ``SearchIndex`` keeps a side table with the text of some fields of a
+model, one row per instance keyed by its primary key:
+
+* on SQLite an FTS5 virtual table;
+* on PostgreSQL a table with a weighted ``tsvector`` column and a GIN
+  index.
+
+Every query word must match. Whole words are tried first, then the last
+word may also be the start of a longer one, so results appear while a
+name is still being typed. Results are ranked in tiers: matches in the
+most heavily weighted fields come before matches that need the lighter
+ones, and whole words before prefixes; within a tier newer rows come
+first. Each tier is one index scan in row order that stops at the result
+limit. ``bm25`` and ``ts_rank`` were not used because they weigh every
+term by walking its whole posting list, which costs tens of milliseconds
+for a word found in most of a million rows.
+
+Only when that finds nothing do the other words match as prefixes too,
+and then, for each word that no indexed word starts with, the indexed
+words within one or two edits of it, which catches most typos. The
+candidates come from a small table of the alphabetic words in the index.
+
+Databases other than SQLite with FTS5 and PostgreSQL fall back to
+``icontains`` over the same fields.
+
+The owning app keeps its index in sync from ``post_save`` and
+``post_delete``. Bulk inserts and ``QuerySet.update`` skip those signals;
+run ``manage.py rebuild_search_index`` after them.
+"""
+import re
+import unicodedata
+from functools import reduce
+from operator import and_, or_
+
+from django.conf import settings
+from django.db import connection as default_connection, transaction
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework import filters
+
+DEFAULT_MAX_RESULTS = 200
+
+# Words are runs of letters and digits, as for the FTS5 unicode61 tokenizer
+TOKEN_RE = re.compile(r'[^\W_]+')
+
+MAX_QUERY_TOKENS = 8
+MIN_PREFIX_LENGTH = 2
+MIN_TERM_LENGTH = 4
+MAX_TERM_LENGTH = 64
+MAX_CORRECTIONS = 3
+
+# Upper bound for "starts with" ranges over the terms table
+MAX_CHAR = '\U0010ffff'
+
+_registry = {}
+
+
+def tokenize(text):
+    """Lower-cased words of ``text`` with accents removed"""
+    text = unicodedata.normalize('NFKD', str(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return TOKEN_RE.findall(text.lower())
+
+
+def edit_distance(a, b, limit):
+    """
+    Optimal string alignment distance between ``a`` and ``b``.
+
+    Stops early and returns ``limit + 1`` once the distance is known to
+    exceed ``limit``.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before = None
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if before is not None and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                value = min(value, before[j - 2] + 1)
+            current.append(value)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def allowed_edits(token):
+    if len(token) < MIN_TERM_LENGTH or not token.isalpha():
+        return 0
+    return 1 if len(token) < 8 else 2
+
+
+def index_terms(values):
+    """The words of ``values`` that typo correction can suggest"""
+    return {
+        token for value in values for token in tokenize(value)
+        if token.isalpha() and MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH
+    }
+
+
+class BaseBackend:
+    """Index table plus the terms table shared by both backends"""
+
+    def __init__(self, index):
+        self.index = index
+        self.table = index.table
+        self.terms = f"{index.table}_terms"
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {self.terms}")
+        cursor.execute(f"DROP TABLE IF EXISTS {self.table}")
+
+    def clear(self, cursor):
+        cursor.execute(f"DELETE FROM {self.table}")
+        cursor.execute(f"DELETE FROM {self.terms}")
+
+    def add_terms(self, cursor, terms):
+        # Terms of deleted rows are left behind until the next rebuild;
+        # suggesting one of them costs a query that finds nothing
+        cursor.executemany(
+            f"INSERT INTO {self.terms} (term) VALUES (%s) ON CONFLICT DO NOTHING",
+            [(term,) for term in sorted(terms)]
+        )
+
+    def has_prefix(self, cursor, token):
+        cursor.execute(
+            f"SELECT 1 FROM {self.terms} WHERE term >= %s AND term < %s LIMIT 1",
+            [token, token + MAX_CHAR]
+        )
+        return cursor.fetchone() is not None
+
+    def similar_terms(self, cursor, token, edits):
+        """Indexed terms within ``edits`` of ``token``, closest first"""
+        # Typos rarely hit the first letter, which keeps the scan to one term range
+        cursor.execute(
+            f"SELECT term FROM {self.terms} "
+            f"WHERE term >= %s AND term < %s AND length(term) BETWEEN %s AND %s",
+            [token[0], token[0] + MAX_CHAR, len(token) - edits, len(token) + edits]
+        )
+        scored = []
+        for term, in cursor.fetchall():
+            distance = edit_distance(token, term, edits)
+            if distance <= edits:
+                scored.append((distance, abs(len(term) - len(token)), term))
+        return [term for _, _, term in sorted(scored)[:MAX_CORRECTIONS]]
+
+
+class SQLiteBackend(BaseBackend):
+    """FTS5 virtual table with one column per field"""
+
+    def create(self, cursor):
+        columns = ', '.join(self.index.columns)
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.table} USING fts5("
+            f"{columns}, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {self.terms} (term TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def delete(self, cursor, pks):
+        cursor.executemany(f"DELETE FROM {self.table} WHERE rowid = %s", [(pk,) for pk in pks])
+
+    def insert(self, cursor, rows):
+        placeholders = ', '.join(['%s'] * (len(self.index.columns) + 1))
+        columns = ', '.join(self.index.columns)
+        cursor.executemany(
+            f"INSERT INTO {self.table} (rowid, {columns}) VALUES ({placeholders})",
+            [(pk, *('' if value is None else str(value) for value in values)) for pk, *values in rows]
+        )
+
+    def match(self, cursor, groups, columns, limit):
+        expression = ' AND '.join(
+            '(' + ' OR '.join(f'"{term}"*' if prefix else f'"{term}"' for term, prefix in group) + ')'
+            for group in groups
+        )
+        if columns != self.index.columns:
+            expression = '{' + ' '.join(columns) + '} : (' + expression + ')'
+        cursor.execute(
+            f"SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s ORDER BY rowid DESC LIMIT %s",
+            [expression, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresBackend(BaseBackend):
+    """Table of weighted ``tsvector`` documents with a GIN index"""
+
+    def __init__(self, index):
+        super().__init__(index)
+        # A tsvector knows four weights, A to D; the heaviest fields get A
+        letters = {}
+        for weight in sorted(set(index.weights), reverse=True):
+            letters[weight] = 'ABCD'[min(len(letters), 3)]
+        self.letters = dict(zip(index.columns, (letters[weight] for weight in index.weights)))
+
+    def create(self, cursor):
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {self.table} (id bigint PRIMARY KEY, document tsvector NOT NULL)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {self.table}_document_idx ON {self.table} USING gin (document)")
+        # Byte order so the "starts with" ranges work under any database collation
+        cursor.execute(f'CREATE TABLE IF NOT EXISTS {self.terms} (term text COLLATE "C" PRIMARY KEY)')
+
+    def delete(self, cursor, pks):
+        cursor.execute(f"DELETE FROM {self.table} WHERE id = ANY(%s)", [list(pks)])
+
+    def insert(self, cursor, rows):
+        document = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{self.letters[column]}')" for column in self.index.columns
+        )
+        cursor.executemany(
+            f"INSERT INTO {self.table} (id, document) VALUES (%s, {document}) "
+            f"ON CONFLICT (id) DO UPDATE SET document = EXCLUDED.document",
+            [(pk, *(' '.join(tokenize(value)) for value in values)) for pk, *values in rows]
+        )
+
+    def _term(self, term, prefix, labels):
+        suffix = ('*' if prefix else '') + labels
+        return f"{term}:{suffix}" if suffix else term
+
+    def match(self, cursor, groups, columns, limit):
+        labels = '' if columns == self.index.columns else ''.join(sorted({self.letters[column] for column in columns}))
+        # Terms are letters and digits only, so they are safe in tsquery syntax
+        expression = ' & '.join(
+            '(' + ' | '.join(
+                self._term(term, prefix, labels) for term, prefix in group
+            ) + ')'
+            for group in groups
+        )
+        cursor.execute(
+            f"SELECT id FROM {self.table} WHERE document @@ to_tsquery('simple', %s) ORDER BY id DESC LIMIT %s",
+            [expression, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+_fts5_available = {}
+
+
+def _has_fts5(connection):
+    if connection.alias not in _fts5_available:
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA compile_options')
+            options = {row[0] for row in cursor.fetchall()}
+        _fts5_available[connection.alias] = 'ENABLE_FTS5' in options
+    return _fts5_available[connection.alias]
+
+
+class SearchIndex:
+    """
+    Full-text index over ``fields`` of ``model``.
+
+    ``fields`` maps field names to weights. Only their order matters: the
+    ranking tiers add the fields one weight at a time, heaviest first.
+    Migrations build unregistered indexes over their historical models so
+    later changes to the app's index do not rewrite them.
+    """
+
+    def __init__(self, name, model, fields, register=True):
+        self.name = name
+        self.model = model
+        self.columns = sorted(fields, key=lambda column: -fields[column])
+        self.weights = [fields[column] for column in self.columns]
+        self.tiers = [
+            [column for column in self.columns if fields[column] >= weight]
+            for weight in sorted(set(self.weights), reverse=True)
+        ]
+        self.table = f"search_{name}"
+        if register:
+            _registry[name] = self
+
+    def __repr__(self):
+        return f"<SearchIndex {self.name}>"
+
+    def backend(self, connection=None):
+        """The backend for ``connection``, or None when it has no full-text search"""
+        connection = connection or default_connection
+        if connection.vendor == 'sqlite' and _has_fts5(connection):
+            return SQLiteBackend(self)
+        if connection.vendor == 'postgresql':
+            return PostgresBackend(self)
+        return None
+
+    def create(self, connection=None):
+        """Create the index tables; a no-op without a backend"""
+        connection = connection or default_connection
+        backend = self.backend(connection)
+        if backend is not None:
+            with connection.cursor() as cursor:
+                backend.create(cursor)
+
+    def drop(self, connection=None):
+        connection = connection or default_connection
+        backend = self.backend(connection)
+        if backend is not None:
+            with connection.cursor() as cursor:
+                backend.drop(cursor)
+
+    def _rows(self, instances):
+        return [(instance.pk, *(getattr(instance, column) for column in self.columns)) for instance in instances]
+
+    def rebuild(self, queryset=None, connection=None, batch_size=1000):
+        """
+        Reindex every row of ``queryset`` (all instances by default).
+
+        Runs in one transaction, which is also far faster than committing
+        every batch. Returns the number of rows indexed.
+        """
+        connection = connection or default_connection
+        backend = self.backend(connection)
+        if backend is None:
+            return 0
+        queryset = self.model._default_manager.all() if queryset is None else queryset
+        rows = queryset.order_by().values_list('pk', *self.columns).iterator(chunk_size=batch_size)
+
+        count = 0
+        with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+            backend.clear(cursor)
+            batch = []
+            terms = set()
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_size:
+                    backend.insert(cursor, batch)
+                    terms |= index_terms(value for row in batch for value in row[1:])
+                    count += len(batch)
+                    batch = []
+            backend.insert(cursor, batch)
+            terms |= index_terms(value for row in batch for value in row[1:])
+            count += len(batch)
+            backend.add_terms(cursor, terms)
+        return count
+
+    def update(self, instances):
+        """Reindex ``instances``"""
+        backend = self.backend()
+        if backend is None:
+            return
+        rows = self._rows(instances)
+        with default_connection.cursor() as cursor:
+            backend.delete(cursor, [row[0] for row in rows])
+            backend.insert(cursor, rows)
+            backend.add_terms(cursor, index_terms(value for row in rows for value in row[1:]))
+
+    def remove(self, pks):
+        """Drop the rows of the given primary keys from the index"""
+        backend = self.backend()
+        if backend is None:
+            return
+        with default_connection.cursor() as cursor:
+            backend.delete(cursor, list(pks))
+
+    def _ranked(self, backend, cursor, passes, limit):
+        """Collect matches pass by pass and tier by tier until ``limit`` are found"""
+        found = {}
+        for groups in passes:
+            for columns in self.tiers:
+                # Earlier tiers can repeat at most len(found) rows, so asking
+                # for ``limit`` rows always yields enough new ones
+                for pk in backend.match(cursor, groups, columns, limit):
+                    found.setdefault(pk, None)
+                if len(found) >= limit:
+                    return list(found)[:limit]
+        return list(found)
+
+    def search(self, query, limit=None):
+        """
+        Primary keys matching ``query``, best match first.
+
+        Returns None when the database has no full-text backend.
+        """
+        backend = self.backend()
+        if backend is None:
+            return None
+        tokens = tokenize(query)[:MAX_QUERY_TOKENS]
+        if not tokens:
+            return []
+        limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', DEFAULT_MAX_RESULTS)
+
+        def groups(prefixed):
+            return [[(token, len(token) >= MIN_PREFIX_LENGTH and prefixed(i))] for i, token in enumerate(tokens)]
+
+        exact = groups(lambda i: False)
+        prefix_last = groups(lambda i: i == len(tokens) - 1)
+        prefix_all = groups(lambda i: True)
+
+        with default_connection.cursor() as cursor:
+            pks = self._ranked(backend, cursor, [exact] + ([prefix_last] if prefix_last != exact else []), limit)
+            if pks:
+                return pks
+            # Prefixing a common word is a slow scan, so only when needed
+            if prefix_all != prefix_last:
+                pks = self._ranked(backend, cursor, [prefix_all], limit)
+                if pks:
+                    return pks
+
+            # Still nothing: let the words no indexed word starts with
+            # also match the words a typo or two away from them
+            corrected = False
+            for group in prefix_all:
+                token = group[0][0]
+                edits = allowed_edits(token)
+                if edits and not backend.has_prefix(cursor, token):
+                    terms = backend.similar_terms(cursor, token, edits)
+                    group.extend((term, False) for term in terms)
+                    corrected = corrected or bool(terms)
+            return self._ranked(backend, cursor, [prefix_all], limit) if corrected else []
+
+    def filter(self, queryset, query, limit=None):
+        """
+        Narrow ``queryset`` to the instances matching ``query``, ordered by rank.
+
+        Without a full-text backend every word of ``query`` must instead
+        appear in one of the fields, in model order.
+        """
+        pks = self.search(query, limit)
+        if pks is None:
+            words = query.split()
+            if not words:
+                return queryset
+            return queryset.filter(reduce(and_, (
+                reduce(or_, (Q(**{f"{column}__icontains": word}) for column in self.columns))
+                for word in words
+            )))
+        if not pks:
+            return queryset.none()
+        ranking = Case(
+            *(When(pk=pk, then=Value(position)) for position, pk in enumerate(pks)),
+            output_field=IntegerField()
+        )
+        return queryset.filter(pk__in=pks).order_by(ranking)
+
+
+def get_search_index(name):
+    return _registry[name]
+
+
+def search_indexes():
+    return list(_registry.values())
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ``SearchFilter`` that goes through the view's ``search_index``.
+
+    Views without a ``search_index`` keep the plain ``search_fields``
+    behaviour.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        index = getattr(view, 'search_index', None)
+        query = request.query_params.get(self.search_param, '')
+        if index is None or not query.strip():
+            return super().filter_queryset(request, queryset, view)
+        return index.filter(queryset, query)
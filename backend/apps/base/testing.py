@@ -0,0 +1,95 @@
+"""
+Test helpers shared by the app test suites.
+"""
+import re
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+# Plan lines that mean a table is read in full, per database vendor. SQLite
+# reports walking a whole index in order as "SCAN t USING INDEX", which
+# still visits every row, so any SCAN of the table counts.
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?P<table>\w+)\b'),
+    'postgresql': re.compile(r'Seq Scan on (?P<table>\w+)'),
+}
+
+
+class QueryCountTestMixin:
+    """
+    Mixin for API test cases that checks an endpoint's query count does not
+    grow with the number of rows it returns.
+
+    The test case must provide ``self.client``. Typical use::
+
+        self.assertConstantQueries(
+            lambda: self.client.get('/api/orders/orders/'),
+            lambda count: create_orders(count),
+        )
+    """
+
+    def count_queries(self, request):
+        """Return (response, query count) for ``request()``"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = request()
+        return response, len(ctx.captured_queries)
+
+    def assertConstantQueries(self, request, create, sizes=(1, 10), max_queries=None):
+        """
+        Assert ``request()`` costs the same queries whatever the fixture size.
+
+        ``create(count)`` adds ``count`` more rows between requests, so the
+        request is made once after ``sizes[0]`` rows and again after
+        ``sizes[1]``. When ``max_queries`` is set the count must also stay
+        within it.
+        """
+        small, large = sizes
+        create(small)
+        response, small_queries = self.count_queries(request)
+        self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+
+        create(large - small)
+        response, large_queries = self.count_queries(request)
+        self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+
+        self.assertEqual(
+            small_queries, large_queries,
+            f"Query count grew from {small_queries} to {large_queries} "
+            f"going from {small} to {large} rows"
+        )
+        if max_queries is not None:
+            self.assertLessEqual(large_queries, max_queries)
+        return response
+
+
+class QueryPlanTestMixin:
+    """
+    Mixin that fails a test when a hot query's plan reads a table in full.
+
+    Plans are read with ``EXPLAIN``. Test tables are tiny, so on PostgreSQL
+    sequential scans are disabled for the check; the planner then only
+    picks one when no usable index exists.
+    """
+
+    def get_query_plan(self, queryset):
+        if connection.vendor not in FULL_SCAN_PATTERNS:
+            self.skipTest(f"No query plan check for {connection.vendor}")
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            return queryset.explain()
+
+    def assertNoFullScan(self, queryset, tables=None):
+        """Assert the plan of ``queryset`` does not fully scan ``tables``"""
+        tables = tables or [queryset.model._meta.db_table]
+        plan = self.get_query_plan(queryset)
+        scanned = {
+            match.group('table')
+            for match in FULL_SCAN_PATTERNS[connection.vendor].finditer(plan)
+        }
+        self.assertFalse(
+            scanned & set(tables),
+            f"Full scan of {sorted(scanned & set(tables))} in plan:\n{plan}"
+        )
+        return plan
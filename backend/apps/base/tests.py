@@ -1,3 +1,165 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.orders.models import Order
+from .dates import date_range_q
+from apps.stores.models import Store
+
+User = get_user_model()
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        # Every store shares a name so the pk tie-breaker decides the order
+        Store.objects.bulk_create([
+            Store(
+                name='Same Name',
+                location=f'Location {i}',
+                lat=14.5995,
+                lng=120.9842,
+                owner_name='Owner',
+                number='09123456789',
+                day='Monday'
+            )
+            for i in range(25)
+        ])
+
+    def walk(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+            pages += 1
+        return ids, pages
+
+    def test_unpaginated_requests_return_a_list(self):
+        """Test that clients not asking for pages still get a plain list"""
+        response = self.client.get('/api/stores/stores/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 25)
+
+    def test_pages_cover_every_row_once_despite_ties(self):
+        """Test that walking the pages returns every row exactly once"""
+        ids, pages = self.walk('/api/stores/stores/?page_size=10')
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(ids, sorted(Store.objects.values_list('id', flat=True)))
+
+    def test_previous_link_returns_the_previous_page(self):
+        """Test that the previous cursor walks back to the same rows"""
+        first = self.client.get('/api/stores/stores/?page_size=10').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+
+        self.assertEqual(
+            [row['id'] for row in back['results']],
+            [row['id'] for row in first['results']]
+        )
+        self.assertEqual(
+            [row['id'] for row in self.client.get(back['next']).data['results']],
+            [row['id'] for row in second['results']]
+        )
+
+    def test_descending_timestamps_page_without_offset(self):
+        """Test that orders sharing a timestamp page by keyset, not OFFSET"""
+        store = Store.objects.first()
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(order_id=f'ORD-{i:03d}', store=store, delivery_day='Monday')
+            for i in range(15)
+        ])
+        Order.objects.update(created_at=now)
+
+        first = self.client.get('/api/orders/orders/?page_size=10').data
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get(first['next']).data
+
+        self.assertNotIn('OFFSET', ' '.join(q['sql'] for q in ctx.captured_queries).upper())
+        self.assertIsNone(second['next'])
+        self.assertEqual(
+            [row['id'] for row in first['results'] + second['results']],
+            sorted((order.pk for order in orders), reverse=True)
+        )
+
+    @override_settings(PAGINATION_MAX_PAGE_SIZE=5)
+    def test_page_size_is_capped(self):
+        """Test that clients cannot ask for more than the maximum page size"""
+        response = self.client.get('/api/stores/stores/?page_size=1000')
+
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_ranked_search_pages_in_rank_order(self):
+        """Test that a search asking for pages is paged in rank order instead of by pk"""
+        for name, location in (('Corner Store', 'Quezon City'), ('Quezon Mini Mart', 'Pasig')):
+            Store.objects.create(
+                name=name, location=location, lat=14.6, lng=121.0,
+                owner_name='Owner', number='09123456789', day='Monday'
+            )
+
+        first = self.client.get('/api/stores/stores/', {'search': 'quezon', 'page_size': 1}).data
+        self.assertEqual([store['name'] for store in first['results']], ['Quezon Mini Mart'])
+        self.assertIsNone(first['previous'])
+
+        second = self.client.get(first['next']).data
+        self.assertEqual([store['name'] for store in second['results']], ['Corner Store'])
+        self.assertIsNone(second['next'])
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+
+        # A keyset cursor does not fit an offset-paged ordering
+        keyset = self.client.get('/api/stores/stores/?page_size=10').data['next']
+        response = self.client.get(f'{keyset}&search=quezon')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_cursor_is_rejected(self):
+        """Test that a malformed cursor returns 404"""
+        response = self.client.get('/api/stores/stores/?cursor=not-a-cursor')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class DateRangeTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        for day in (1, 7, 8):
+            order = Order.objects.create(order_id=f'ORD-{day:03d}', store=store, delivery_day='Monday')
+            Order.objects.filter(pk=order.pk).update(
+                created_at=timezone.make_aware(timezone.datetime(2025, 4, day, 23, 30))
+            )
+
+    def test_end_date_is_inclusive(self):
+        """Test that the range covers the whole local end date"""
+        orders = Order.objects.filter(date_range_q('created_at', '2025-04-01', '2025-04-07'))
+
+        self.assertEqual(sorted(orders.values_list('order_id', flat=True)), ['ORD-001', 'ORD-007'])
+
+    def test_invalid_date_is_a_bad_request(self):
+        """Test that a malformed date parameter returns 400 instead of failing"""
+        response = self.client.get('/api/orders/orders/?start_date=2025-13-01')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('start_date', response.data)
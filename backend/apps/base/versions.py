@@ -0,0 +1,30 @@
+"""
+Version counters kept in a Django cache.
+
+Process-local caches (store index, barcode lookups) and cache keys
+(dashboard responses) embed a counter that is bumped whenever their source
+data changes, which invalidates every copy at once without tracking keys.
+The counter lives in a cache shared by the processes when one is
+configured; a missing counter starts again at 1.
+"""
+from django.core.cache import cache as default_cache
+
+
+def get_version(key, cache=None):
+    """Current value of the counter at ``key``, creating it when missing"""
+    cache = cache or default_cache
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, timeout=None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump_version(key, cache=None):
+    """Increment the counter at ``key``; returns the new value, or None when it had to be recreated"""
+    cache = cache or default_cache
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, timeout=None)
+        return None
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import DashboardStat, RecentActivity
+from .models import DailyStoreSalesRollup, DashboardStat, RecentActivity
 
 
 @admin.register(DashboardStat)
@@ -16,3 +16,12 @@ class RecentActivityAdmin(admin.ModelAdmin):
     search_fields = ('title', 'description', 'reference_id')
     readonly_fields = ('created_at',)
 
+
+
+@admin.register(DailyStoreSalesRollup)
+class DailyStoreSalesRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'store', 'status', 'order_count', 'item_count', 'total')
+    list_filter = ('status', 'date')
+    search_fields = ('store__name',)
+    date_hierarchy = 'date'
+    readonly_fields = ('date', 'store', 'status', 'order_count', 'item_count', 'subtotal', 'tax', 'total')
@@ -7,4 +7,11 @@ class DashboardConfig(AppConfig):
 
     def ready(self):
         import apps.dashboard.signals  # noqa
+        from django.conf import settings
+        from django.core.signals import request_started
+        from .stats import start_stats_refresher
+
+        # Refresh the precomputed stats in-process once the server handles requests
+        if getattr(settings, 'DASHBOARD_STATS_REFRESH_INTERVAL', 0):
+            request_started.connect(start_stats_refresher, dispatch_uid='dashboard_stats_refresher')
 
@@ -0,0 +1,87 @@
+"""
+Per-user response cache for the dashboard endpoints.
+
+Cached bodies live in the cache named by DASHBOARD_CACHE_ALIAS. Every key
+embeds a global dashboard version which is bumped, after commit, whenever
+the dashboard's source data changes (see signals.py). A bump therefore
+invalidates every cached response at once without tracking keys.
+
+Responses carry an ETag derived from the same key, so a client sending a
+matching If-None-Match gets a 304 without the view doing any queries, as
+long as the body is still cached.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from rest_framework import status
+from rest_framework.response import Response
+
+from apps.base import versions
+
+VERSION_KEY = 'dashboard:version'
+
+# Seconds a cached dashboard body is kept
+DEFAULT_TIMEOUT = 60
+
+
+def get_cache():
+    return caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', 'default')]
+
+
+def get_version():
+    return versions.get_version(VERSION_KEY, get_cache())
+
+
+def bump_version():
+    """Invalidate every cached dashboard response"""
+    versions.bump_version(VERSION_KEY, get_cache())
+
+
+def invalidate_dashboard_cache():
+    """Invalidate cached dashboard responses once the current transaction commits"""
+    transaction.on_commit(bump_version)
+
+
+class DashboardCacheMixin:
+    """
+    View mixin that serves ``cached_response`` bodies from the dashboard cache
+    """
+
+    def get_cache_key(self, request):
+        user_id = request.user.pk if request.user and request.user.is_authenticated else 'anonymous'
+        params = '&'.join(f"{key}={value}" for key, value in sorted(request.query_params.items()))
+        raw = f"{self.__class__.__name__}:{user_id}:{params}:{timezone.localdate()}:{get_version()}"
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def cached_response(self, request, compute):
+        """Return a 304, the cached body, or the body built by ``compute()``"""
+        key = self.get_cache_key(request)
+        etag = f'"{key}"'
+        cache = get_cache()
+        cache_key = f"dashboard:response:{key}"
+        data = cache.get(cache_key)
+
+        # Only a body still in the cache vouches for the ETag: a version
+        # counter that was evicted or lives in another process's local
+        # cache can repeat a key whose data has changed since
+        if data is None:
+            response = compute()
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(cache_key, response.data, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+        elif etag in self._if_none_match(request):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def _if_none_match(self, request):
+        header = request.headers.get('If-None-Match', '')
+        return {tag.strip() for tag in header.split(',') if tag.strip()}
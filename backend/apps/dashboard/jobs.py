@@ -0,0 +1,20 @@
+"""
+Background jobs of the dashboard app, run by ``manage.py run_workers``.
+"""
+from django.utils.dateparse import parse_date
+
+from apps.jobs.queue import register
+from .rollups import rebuild_rollups
+
+
+@register('dashboard.rebuild_rollups', timeout=3600, max_attempts=1)
+def rebuild_rollups_job(job):
+    """Rebuild the daily sales rollups between ``payload['start']`` and ``payload['end']``"""
+    start = job.payload.get('start')
+    end = job.payload.get('end')
+    written = rebuild_rollups(
+        start=parse_date(start) if start else None,
+        end=parse_date(end) if end else None,
+        chunk_days=job.payload.get('chunk_days', 31)
+    )
+    return {'rows': written}
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.dashboard.rollups import rebuild_rollups
+from apps.jobs.queue import enqueue
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the daily store sales rollup table from the orders table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date to rebuild (YYYY-MM-DD), defaults to the first order')
+        parser.add_argument('--end', help='Last date to rebuild (YYYY-MM-DD), defaults to the last order')
+        parser.add_argument('--chunk-days', type=int, default=31, help='Number of days rebuilt per transaction')
+        parser.add_argument('--queue', action='store_true', help='Queue the rebuild for run_workers instead of running it now')
+
+    def handle(self, *args, **options):
+        start = self._parse(options['start'])
+        end = self._parse(options['end'])
+        if start and end and start > end:
+            raise CommandError('--start must not be after --end')
+
+        if options['queue']:
+            job = enqueue('dashboard.rebuild_rollups', {
+                'start': start.isoformat() if start else None,
+                'end': end.isoformat() if end else None,
+                'chunk_days': options['chunk_days'],
+            })
+            self.stdout.write(self.style.SUCCESS(f'Queued rollup rebuild as job {job.pk}'))
+            return
+
+        self.stdout.write('Rebuilding daily sales rollups...')
+        written = rebuild_rollups(start=start, end=end, chunk_days=options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f'Successfully wrote {written} rollup rows'))
+
+    def _parse(self, value):
+        if not value:
+            return None
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"Invalid date '{value}'")
+        return day
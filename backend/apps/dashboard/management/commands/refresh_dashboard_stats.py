@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.dashboard.stats import refresh_dashboard_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes every dashboard statistic and stores it in the DashboardStat table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and refresh every N seconds instead of refreshing once'
+        )
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+
+        while True:
+            started = time.monotonic()
+            rows = refresh_dashboard_stats()
+            elapsed = (time.monotonic() - started) * 1000
+            self.stdout.write(self.style.SUCCESS(f'Refreshed {len(rows)} dashboard stats in {elapsed:.0f} ms'))
+
+            if not interval:
+                break
+            time.sleep(interval)
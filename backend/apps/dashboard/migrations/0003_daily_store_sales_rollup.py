@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_initial'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStoreSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('order_count', models.IntegerField(default=0)),
+                ('item_count', models.IntegerField(default=0)),
+                ('subtotal', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='stores.store')),
+            ],
+            options={
+                'verbose_name': 'Daily Store Sales Rollup',
+                'verbose_name_plural': 'Daily Store Sales Rollups',
+                'ordering': ['-date', 'store'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'store', 'status'), name='unique_daily_store_sales_rollup')],
+            },
+        ),
+    ]
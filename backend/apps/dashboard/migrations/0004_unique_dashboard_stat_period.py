@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0003_daily_store_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='dashboardstat',
+            constraint=models.UniqueConstraint(fields=('stat_type', 'period'), name='unique_dashboard_stat_period'),
+        ),
+    ]
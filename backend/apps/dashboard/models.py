@@ -1,5 +1,7 @@
+from decimal import Decimal
 from django.db import models
 from apps.base.models import TimeStampedModel
+from apps.orders.models import Order
 
 
 class DashboardStat(TimeStampedModel):
@@ -29,20 +31,32 @@ class DashboardStat(TimeStampedModel):
     percentage_change = models.DecimalField(max_digits=8, decimal_places=2)
     is_active = models.BooleanField(default=True)
     
+    # Largest magnitude that fits percentage_change
+    MAX_PERCENTAGE_CHANGE = Decimal('999999.99')
+    
     class Meta:
         verbose_name = 'Dashboard Statistic'
         verbose_name_plural = 'Dashboard Statistics'
         ordering = ['stat_type', 'period']
+        constraints = [
+            models.UniqueConstraint(fields=['stat_type', 'period'], name='unique_dashboard_stat_period'),
+        ]
         
     def __str__(self):
         return f"{self.title} ({self.period})"
     
-    def save(self, *args, **kwargs):
-        # Calculate percentage change
+    def calculate_percentage_change(self):
+        """Calculate percentage change from the previous to the current value"""
         if self.previous_value and self.previous_value != 0:
-            self.percentage_change = ((self.current_value - self.previous_value) / self.previous_value) * 100
+            change = ((Decimal(self.current_value) - Decimal(self.previous_value)) / Decimal(self.previous_value)) * 100
+            change = max(-self.MAX_PERCENTAGE_CHANGE, min(self.MAX_PERCENTAGE_CHANGE, change))
+            self.percentage_change = change.quantize(Decimal('0.01'))
         else:
             self.percentage_change = 0
+        return self.percentage_change
+    
+    def save(self, *args, **kwargs):
+        self.calculate_percentage_change()
         super().save(*args, **kwargs)
 
 
@@ -73,3 +87,28 @@ class RecentActivity(TimeStampedModel):
     def __str__(self):
         return f"{self.activity_type}: {self.title}"
 
+
+
+class DailyStoreSalesRollup(TimeStampedModel):
+    """
+    Materialized daily order totals per store and order status
+    """
+    date = models.DateField()
+    store = models.ForeignKey('stores.Store', on_delete=models.CASCADE, related_name='sales_rollups')
+    status = models.CharField(max_length=20, choices=Order.STATUS_CHOICES)
+    order_count = models.IntegerField(default=0)
+    item_count = models.IntegerField(default=0)
+    subtotal = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    class Meta:
+        verbose_name = 'Daily Store Sales Rollup'
+        verbose_name_plural = 'Daily Store Sales Rollups'
+        ordering = ['-date', 'store']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'store', 'status'], name='unique_daily_store_sales_rollup'),
+        ]
+        
+    def __str__(self):
+        return f"{self.date} - {self.store_id} ({self.status})"
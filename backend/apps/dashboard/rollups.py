@@ -0,0 +1,147 @@
+"""
+Maintenance of the DailyStoreSalesRollup table.
+
+Rows are keyed by (date, store, status). Whenever an order changes, the
+rows for its (date, store) key are recomputed from the orders of that
+store on that day, so the table stays exact without rescanning history.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from apps.base.dates import day_bounds
+from apps.orders.models import Order, OrderItem
+from .cache import invalidate_dashboard_cache
+from .models import DailyStoreSalesRollup
+
+
+def order_rollup_key(order):
+    """Return the (date, store_id) rollup key of an order"""
+    return timezone.localdate(order.created_at), order.store_id
+
+
+def _grouped_rows(orders):
+    """Aggregate ``orders`` into rollup rows, one per (date, store, status)"""
+    item_count = Subquery(
+        OrderItem.objects
+        .filter(order=OuterRef('pk'))
+        .values('order')
+        .annotate(quantity=Sum('quantity'))
+        .values('quantity'),
+        output_field=IntegerField()
+    )
+    rows = (
+        orders
+        .annotate(day=TruncDate('created_at'), item_quantity=Coalesce(item_count, 0))
+        .values('day', 'store_id', 'status')
+        .annotate(
+            order_count=Count('id'),
+            item_count=Sum('item_quantity'),
+            subtotal=Sum('subtotal'),
+            tax=Sum('tax'),
+            total=Sum('total'),
+        )
+        .order_by()
+    )
+    return [
+        DailyStoreSalesRollup(
+            date=row['day'],
+            store_id=row['store_id'],
+            status=row['status'],
+            order_count=row['order_count'],
+            item_count=row['item_count'] or 0,
+            subtotal=row['subtotal'] or 0,
+            tax=row['tax'] or 0,
+            total=row['total'] or 0,
+        )
+        for row in rows
+    ]
+
+
+ROLLUP_FIELDS = ['order_count', 'item_count', 'subtotal', 'tax', 'total', 'updated_at']
+
+
+def _write_rollups(existing, rows, batch_size=None):
+    """
+    Replace the ``existing`` rollup rows with ``rows``.
+
+    Runs inside the caller's transaction. Rows are upserted, so a
+    concurrent refresh of the same key that inserts first is overwritten
+    instead of failing the order write with a unique constraint error.
+    """
+    existing.delete()
+    DailyStoreSalesRollup.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['date', 'store', 'status'],
+        update_fields=ROLLUP_FIELDS,
+    )
+
+
+def refresh_daily_rollups(keys, chunk_size=500):
+    """Recompute the rollup rows for the given (date, store_id) keys"""
+    stores_by_day = defaultdict(set)
+    for day, store_id in keys:
+        if day is not None and store_id is not None:
+            stores_by_day[day].add(store_id)
+
+    # One date range and a store id list per query, so bulk inserts that
+    # share a day refresh in a handful of queries
+    for day, store_ids in sorted(stores_by_day.items()):
+        start, end = day_bounds(day)
+        store_ids = sorted(store_ids)
+        for offset in range(0, len(store_ids), chunk_size):
+            chunk = store_ids[offset:offset + chunk_size]
+            with transaction.atomic():
+                rows = _grouped_rows(
+                    Order.objects.filter(store_id__in=chunk, created_at__gte=start, created_at__lt=end)
+                )
+                _write_rollups(DailyStoreSalesRollup.objects.filter(date=day, store_id__in=chunk), rows)
+
+
+def rebuild_rollups(start=None, end=None, chunk_days=31, batch_size=1000):
+    """
+    Rebuild the rollup table from the orders table.
+
+    ``start`` and ``end`` are inclusive dates; when omitted they default to
+    the first and last order dates, and a rebuild without either also drops
+    rows outside that range. Work is done in chunks of ``chunk_days``
+    so memory stays bounded on large histories. Returns the number of rows
+    written.
+    """
+    full_rebuild = start is None and end is None
+    if start is None or end is None:
+        first = Order.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        last = Order.objects.order_by('-created_at').values_list('created_at', flat=True).first()
+        if first is None:
+            if full_rebuild:
+                DailyStoreSalesRollup.objects.all().delete()
+            return 0
+        start = start or timezone.localdate(first)
+        end = end or timezone.localdate(last)
+
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        range_start = day_bounds(chunk_start)[0]
+        range_end = day_bounds(chunk_end)[1]
+
+        with transaction.atomic():
+            rows = _grouped_rows(Order.objects.filter(created_at__gte=range_start, created_at__lt=range_end))
+            _write_rollups(
+                DailyStoreSalesRollup.objects.filter(date__gte=chunk_start, date__lte=chunk_end), rows, batch_size
+            )
+        written += len(rows)
+        chunk_start = chunk_end + timedelta(days=1)
+
+    if full_rebuild:
+        # Drop rows for days that no longer have any orders
+        DailyStoreSalesRollup.objects.exclude(date__gte=start, date__lte=end).delete()
+    invalidate_dashboard_cache()
+    return written
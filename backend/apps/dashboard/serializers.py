@@ -2,9 +2,9 @@
 from rest_framework import serializers
 from apps.orders.models import Order
 from apps.deliveries.models import Delivery
-from apps.products.models import Product
 from apps.inventory.models import Inventory
-from django.db.models import Sum, Count, Case, When, IntegerField, F
+from .models import DailyStoreSalesRollup
+from django.db.models import Sum, Count, Q
 from django.utils import timezone
 from datetime import timedelta
 
@@ -35,92 +35,56 @@ class DashboardSummarySerializer(serializers.Serializer):
     def to_representation(self, instance):
         # Get current date and time
         now = timezone.now()
-        today = now.date()
+        today = timezone.localdate(now)
         yesterday = today - timedelta(days=1)
-        
-        # Calculate today's deliveries
-        today_deliveries = Delivery.objects.filter(delivery_date=today).count()
-        yesterday_deliveries = Delivery.objects.filter(delivery_date=yesterday).count()
-        today_deliveries_change = 0
-        if yesterday_deliveries > 0:
-            today_deliveries_change = ((today_deliveries - yesterday_deliveries) / yesterday_deliveries) * 100
-        
-        # Calculate monthly deliveries
         current_month_start = today.replace(day=1)
         last_month_end = current_month_start - timedelta(days=1)
         last_month_start = last_month_end.replace(day=1)
         
-        monthly_deliveries = Delivery.objects.filter(delivery_date__gte=current_month_start).count()
-        last_month_deliveries = Delivery.objects.filter(
-            delivery_date__gte=last_month_start,
-            delivery_date__lte=last_month_end
-        ).count()
-        monthly_deliveries_change = 0
-        if last_month_deliveries > 0:
-            monthly_deliveries_change = ((monthly_deliveries - last_month_deliveries) / last_month_deliveries) * 100
-        
-        # Calculate total sales
-        total_sales = Order.objects.filter(
-            created_at__gte=current_month_start
+        # Delivery counts in a single conditional-aggregate query
+        this_month = Q(delivery_date__gte=current_month_start)
+        deliveries = Delivery.objects.filter(
+            delivery_date__gte=last_month_start
         ).aggregate(
-            total=Sum(
-                F('items__quantity') * F('items__unit_price'),
-                output_field=serializers.DecimalField(max_digits=10, decimal_places=2)
-            )
-        )['total'] or 0
+            today=Count('id', filter=Q(delivery_date=today)),
+            yesterday=Count('id', filter=Q(delivery_date=yesterday)),
+            this_month=Count('id', filter=this_month),
+            last_month=Count('id', filter=Q(delivery_date__lte=last_month_end)),
+            finished=Count('id', filter=this_month & Q(status__in=['delivered', 'cancelled'])),
+            delivered=Count('id', filter=this_month & Q(status='delivered')),
+            cancelled=Count('id', filter=this_month & Q(status='cancelled')),
+        )
         
-        last_month_sales = Order.objects.filter(
-            created_at__gte=last_month_start,
-            created_at__lte=last_month_end
+        # Sales for this and last month from the daily rollups
+        sales = DailyStoreSalesRollup.objects.filter(
+            date__gte=last_month_start
         ).aggregate(
-            total=Sum(
-                F('items__quantity') * F('items__unit_price'),
-                output_field=serializers.DecimalField(max_digits=10, decimal_places=2)
-            )
-        )['total'] or 0
-        
-        total_sales_change = 0
-        if last_month_sales > 0:
-            total_sales_change = ((total_sales - last_month_sales) / last_month_sales) * 100
+            this_month=Sum('subtotal', filter=Q(date__gte=current_month_start)),
+            last_month=Sum('subtotal', filter=Q(date__lte=last_month_end)),
+        )
+        total_sales = sales['this_month'] or 0
+        last_month_sales = sales['last_month'] or 0
         
         # Calculate low stock items
-        low_stock_count = Inventory.objects.filter(
-            current_stock__lte=F('product__reorder_level')
-        ).count()
+        low_stock_count = Inventory.objects.filter(is_low_stock=True).count()
         
         # Calculate delivery performance
-        total_deliveries = Delivery.objects.filter(
-            status__in=['delivered', 'cancelled'],
-            delivery_date__gte=current_month_start
-        ).count()
-        
-        on_time_deliveries = Delivery.objects.filter(
-            status='delivered',
-            delivery_date__gte=current_month_start
-        ).count()
-        
-        cancelled_deliveries = Delivery.objects.filter(
-            status='cancelled',
-            delivery_date__gte=current_month_start
-        ).count()
-        
         on_time_delivery_percentage = 0
         delayed_delivery_percentage = 0
         failed_delivery_percentage = 0
         
-        if total_deliveries > 0:
-            on_time_delivery_percentage = (on_time_deliveries / total_deliveries) * 100
-            failed_delivery_percentage = (cancelled_deliveries / total_deliveries) * 100
+        if deliveries['finished'] > 0:
+            on_time_delivery_percentage = (deliveries['delivered'] / deliveries['finished']) * 100
+            failed_delivery_percentage = (deliveries['cancelled'] / deliveries['finished']) * 100
             delayed_delivery_percentage = 100 - on_time_delivery_percentage - failed_delivery_percentage
         
         # Get recent orders
         recent_orders = Order.objects.filter(
             created_at__gte=now - timedelta(days=1)
-        ).order_by('-created_at')[:5]
+        ).select_related('store').order_by('-created_at')[:5]
         
-        recent_orders_data = []
-        for order in recent_orders:
-            recent_orders_data.append({
+        recent_orders_data = [
+            {
                 'id': order.id,
                 'order_id': order.order_id,
                 'store': {
@@ -128,19 +92,27 @@ class DashboardSummarySerializer(serializers.Serializer):
                     'name': order.store.name
                 },
                 'status': order.status,
-                'total_amount': order.total_amount
-            })
+                'total_amount': order.total
+            }
+            for order in recent_orders
+        ]
         
         return {
-            'today_deliveries': today_deliveries,
-            'today_deliveries_change': today_deliveries_change,
-            'monthly_deliveries': monthly_deliveries,
-            'monthly_deliveries_change': monthly_deliveries_change,
+            'today_deliveries': deliveries['today'],
+            'today_deliveries_change': self._percentage_change(deliveries['today'], deliveries['yesterday']),
+            'monthly_deliveries': deliveries['this_month'],
+            'monthly_deliveries_change': self._percentage_change(deliveries['this_month'], deliveries['last_month']),
             'total_sales': total_sales,
-            'total_sales_change': total_sales_change,
+            'total_sales_change': self._percentage_change(total_sales, last_month_sales),
             'low_stock_count': low_stock_count,
             'on_time_delivery_percentage': on_time_delivery_percentage,
             'delayed_delivery_percentage': delayed_delivery_percentage,
             'failed_delivery_percentage': failed_delivery_percentage,
             'recent_orders': recent_orders_data
-        }
\ No newline at end of file
+        }
+    
+    def _percentage_change(self, current, previous):
+        """Calculate percentage change between two values"""
+        if previous > 0:
+            return ((current - previous) / previous) * 100
+        return 0
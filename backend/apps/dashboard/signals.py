@@ -1,14 +1,18 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
-from apps.orders.models import Order
+from apps.orders.models import Order, OrderItem
+from apps.orders.signals import order_items_bulk_created, order_totals_updated, orders_bulk_created
 from apps.deliveries.models import Delivery
 from apps.inventory.models import InventoryTransaction
+from .cache import invalidate_dashboard_cache
 from .models import RecentActivity
+from .rollups import order_rollup_key, refresh_daily_rollups
 
 
 @receiver(post_save, sender=Order)
 def create_order_activity(sender, instance, created, **kwargs):
     """Create activity record when an order is created or updated"""
+    invalidate_dashboard_cache()
     if created:
         RecentActivity.objects.create(
             activity_type='order',
@@ -30,6 +34,7 @@ def create_order_activity(sender, instance, created, **kwargs):
 @receiver(post_save, sender=Delivery)
 def create_delivery_activity(sender, instance, created, **kwargs):
     """Create activity record when a delivery is created or updated"""
+    invalidate_dashboard_cache()
     if created:
         RecentActivity.objects.create(
             activity_type='delivery',
@@ -51,6 +56,7 @@ def create_delivery_activity(sender, instance, created, **kwargs):
 @receiver(post_save, sender=InventoryTransaction)
 def create_inventory_activity(sender, instance, created, **kwargs):
     """Create activity record when an inventory transaction is created"""
+    invalidate_dashboard_cache()
     if created:
         action = "added to" if instance.quantity > 0 else "removed from"
         RecentActivity.objects.create(
@@ -61,3 +67,76 @@ def create_inventory_activity(sender, instance, created, **kwargs):
             user=instance.user
         )
 
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_rollup_key(sender, instance, **kwargs):
+    """Remember the store an existing order belonged to before it is saved"""
+    instance._previous_rollup_key = None
+    if instance.pk:
+        previous = Order.objects.filter(pk=instance.pk).values('created_at', 'store_id').first()
+        if previous and previous['store_id'] != instance.store_id:
+            instance._previous_rollup_key = order_rollup_key(Order(**previous))
+
+
+@receiver(post_save, sender=Order)
+def update_order_rollups(sender, instance, **kwargs):
+    """Refresh the daily sales rollup rows touched by an order"""
+    keys = [order_rollup_key(instance)]
+    if getattr(instance, '_previous_rollup_key', None):
+        keys.append(instance._previous_rollup_key)
+    refresh_daily_rollups(keys)
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_rollups(sender, instance, **kwargs):
+    """Refresh the daily sales rollup rows after an order is deleted"""
+    refresh_daily_rollups([order_rollup_key(instance)])
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_order_item_rollups(sender, instance, **kwargs):
+    """Refresh the item counts of the order's rollup row after an item is deleted"""
+    order = Order.objects.filter(pk=instance.order_id).values('created_at', 'store_id').first()
+    if order:
+        refresh_daily_rollups([order_rollup_key(Order(**order))])
+
+
+@receiver(order_items_bulk_created)
+def handle_bulk_order_items(sender, order, items, inventory_transactions, **kwargs):
+    """Bring the dashboard up to date after order items were inserted in bulk"""
+    refresh_daily_rollups([order_rollup_key(order)])
+    RecentActivity.objects.bulk_create([
+        RecentActivity(
+            activity_type='inventory',
+            title=f"Inventory {txn.transaction_type}",
+            description=f"{abs(txn.quantity)} units of {txn.product.name} removed from inventory",
+            reference_id=str(txn.id) if txn.id else txn.reference,
+            user=txn.user
+        )
+        for txn in inventory_transactions
+    ])
+    invalidate_dashboard_cache()
+
+
+@receiver(order_totals_updated)
+def update_order_totals_rollups(sender, order, **kwargs):
+    """Refresh the daily sales rollup row after an order's totals changed"""
+    refresh_daily_rollups([order_rollup_key(order)])
+    invalidate_dashboard_cache()
+
+
+@receiver(orders_bulk_created)
+def handle_bulk_orders(sender, orders, **kwargs):
+    """Bring the dashboard up to date after orders were inserted in bulk"""
+    if not orders:
+        return
+    refresh_daily_rollups([order_rollup_key(order) for order in orders])
+    RecentActivity.objects.create(
+        activity_type='order',
+        title=f"{len(orders)} orders scheduled",
+        description=f"Draft orders created for {len({order.store_id for order in orders})} stores",
+        reference_id=orders[0].order_id,
+        user=orders[0].user
+    )
+    invalidate_dashboard_cache()
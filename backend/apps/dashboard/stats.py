@@ -0,0 +1,226 @@
+"""
+Precomputed dashboard statistics.
+
+Every STAT_TYPES x PERIOD_TYPES combination is computed with three
+batched conditional-aggregate queries (rollups, deliveries and stock
+receipts) and upserted into DashboardStat in one statement. The summary
+endpoint reads that table and falls back to computing the same values
+live when the rows are missing or older than DASHBOARD_STATS_MAX_AGE.
+"""
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.deliveries.models import Delivery
+from apps.inventory.models import InventoryTransaction
+from .cache import invalidate_dashboard_cache
+from .models import DailyStoreSalesRollup, DashboardStat
+from .rollups import day_bounds
+
+logger = logging.getLogger(__name__)
+
+# Seconds after which precomputed stats are considered stale
+DEFAULT_MAX_AGE = 300
+
+
+def period_windows(today):
+    """
+    Return {period: ((current_start, current_end), (previous_start, previous_end))}.
+
+    Ranges are half-open date ranges. Current periods run from the start of
+    the calendar period up to and including ``today``.
+    """
+    tomorrow = today + timedelta(days=1)
+
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+    previous_month_start = (month_start - timedelta(days=1)).replace(day=1)
+    year_start = today.replace(month=1, day=1)
+    previous_year_start = year_start.replace(year=year_start.year - 1)
+
+    return {
+        'daily': ((today, tomorrow), (today - timedelta(days=1), today)),
+        'weekly': ((week_start, tomorrow), (week_start - timedelta(days=7), week_start)),
+        'monthly': ((month_start, tomorrow), (previous_month_start, month_start)),
+        'yearly': ((year_start, tomorrow), (previous_year_start, year_start)),
+    }
+
+
+def _windows(today):
+    """Yield (alias, period, side, start, end) for every period window"""
+    for period, windows in period_windows(today).items():
+        for side, (start, end) in zip(('current', 'previous'), windows):
+            yield f"{period}_{side}", period, side, start, end
+
+
+def compute_dashboard_stats(today=None):
+    """
+    Compute every stat for every period.
+
+    Returns {(stat_type, period): {'current': value, 'previous': value}}.
+    """
+    today = today or timezone.localdate()
+    windows = list(_windows(today))
+    earliest = min(window[3] for window in windows)
+    tomorrow = today + timedelta(days=1)
+
+    rollup_aggregates = {}
+    delivery_aggregates = {}
+    inventory_aggregates = {}
+    for alias, period, side, start, end in windows:
+        in_range = Q(date__gte=start, date__lt=end)
+        rollup_aggregates[f"sales_{alias}"] = Sum('total', filter=in_range)
+        rollup_aggregates[f"orders_{alias}"] = Sum('order_count', filter=in_range)
+        rollup_aggregates[f"products_{alias}"] = Sum('item_count', filter=in_range)
+        rollup_aggregates[f"customers_{alias}"] = Count('store', distinct=True, filter=in_range)
+        delivery_aggregates[f"deliveries_{alias}"] = Count(
+            'id', filter=Q(delivery_date__gte=start, delivery_date__lt=end)
+        )
+        inventory_aggregates[f"inventory_{alias}"] = Sum(
+            'quantity',
+            filter=Q(created_at__gte=day_bounds(start)[0], created_at__lt=day_bounds(end)[0])
+        )
+
+    values = {}
+    values.update(
+        DailyStoreSalesRollup.objects
+        .filter(date__gte=earliest, date__lt=tomorrow)
+        .aggregate(**rollup_aggregates)
+    )
+    values.update(
+        Delivery.objects
+        .filter(delivery_date__gte=earliest, delivery_date__lt=tomorrow)
+        .aggregate(**delivery_aggregates)
+    )
+    values.update(
+        InventoryTransaction.objects
+        .filter(
+            transaction_type='in',
+            created_at__gte=day_bounds(earliest)[0],
+            created_at__lt=day_bounds(tomorrow)[0]
+        )
+        .aggregate(**inventory_aggregates)
+    )
+
+    stats = {}
+    for stat_type, _ in DashboardStat.STAT_TYPES:
+        for period, _ in DashboardStat.PERIOD_TYPES:
+            stats[(stat_type, period)] = {
+                'current': values[f"{stat_type}_{period}_current"] or 0,
+                'previous': values[f"{stat_type}_{period}_previous"] or 0,
+            }
+    return stats
+
+
+def build_stat_rows(stats):
+    """Build unsaved DashboardStat rows for computed stats"""
+    titles = dict(DashboardStat.STAT_TYPES)
+    rows = []
+    for (stat_type, period), value in stats.items():
+        stat = DashboardStat(
+            title=titles[stat_type],
+            stat_type=stat_type,
+            period=period,
+            current_value=value['current'],
+            previous_value=value['previous'],
+        )
+        stat.calculate_percentage_change()
+        rows.append(stat)
+    return rows
+
+
+def refresh_dashboard_stats(today=None):
+    """Recompute and upsert every DashboardStat row atomically"""
+    rows = build_stat_rows(compute_dashboard_stats(today))
+    with transaction.atomic():
+        DashboardStat.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['stat_type', 'period'],
+            update_fields=['title', 'current_value', 'previous_value', 'percentage_change', 'updated_at'],
+        )
+        invalidate_dashboard_cache()
+    return rows
+
+
+def get_max_age():
+    return getattr(settings, 'DASHBOARD_STATS_MAX_AGE', DEFAULT_MAX_AGE)
+
+
+def load_dashboard_stats(max_age=None):
+    """
+    Return (stats, updated_at, source) for the summary endpoint.
+
+    Active DashboardStat rows are used when they are all younger than
+    ``max_age`` seconds; otherwise the stats are computed live.
+    """
+    max_age = get_max_age() if max_age is None else max_age
+    rows = list(DashboardStat.objects.filter(is_active=True))
+
+    if rows:
+        oldest = min(row.updated_at for row in rows)
+        if timezone.now() - oldest <= timedelta(seconds=max_age):
+            return rows, oldest, 'precomputed'
+
+    return build_stat_rows(compute_dashboard_stats()), timezone.now(), 'live'
+
+
+class StatsRefresher:
+    """
+    Background thread that refreshes the dashboard stats every ``interval`` seconds
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self.run, name='dashboard-stats-refresher', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                refresh_dashboard_stats()
+            except Exception:
+                logger.exception('Failed to refresh dashboard stats')
+            finally:
+                close_old_connections()
+            self._stop.wait(self.interval)
+
+
+_refresher = None
+_refresher_lock = threading.Lock()
+
+
+def start_stats_refresher(**kwargs):
+    """Start the process-wide refresher if DASHBOARD_STATS_REFRESH_INTERVAL is set"""
+    global _refresher
+    interval = getattr(settings, 'DASHBOARD_STATS_REFRESH_INTERVAL', 0)
+    if not interval:
+        return None
+    with _refresher_lock:
+        if _refresher is None:
+            _refresher = StatsRefresher(interval)
+    _refresher.start()
+    return _refresher
@@ -1,3 +1,496 @@
-from django.test import TestCase
+from datetime import datetime, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.base.testing import QueryCountTestMixin
+from apps.deliveries.models import Delivery
+from apps.inventory.models import InventoryTransaction
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Category, Product
+from apps.stores.models import Store
+from .cache import get_cache
+from .models import DailyStoreSalesRollup, DashboardStat
+from .serializers import DashboardSummarySerializer
+from .rollups import order_rollup_key, rebuild_rollups, refresh_daily_rollups
+from .stats import compute_dashboard_stats, refresh_dashboard_stats
+from .timeseries import sales_series
+
+User = get_user_model()
+
+
+def aware(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class SalesSeriesTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+
+    def create_order(self, created_at, total):
+        order = Order.objects.create(store=self.store, delivery_day='Monday', total=total)
+        Order.objects.filter(pk=order.pk).update(created_at=created_at)
+        rebuild_rollups()
+        return order
+
+    def test_daily_buckets_use_one_query(self):
+        """Test that a month of daily buckets is computed with a single query"""
+        self.create_order(aware(2025, 4, 1, 9), Decimal('100.00'))
+        self.create_order(aware(2025, 4, 1, 17), Decimal('50.00'))
+        self.create_order(aware(2025, 4, 3, 12), Decimal('25.00'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            series = sales_series(aware(2025, 4, 1), aware(2025, 5, 1), 'day')
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertEqual(len(series), 30)
+        self.assertEqual(series[0]['label'], '2025-04-01')
+        self.assertEqual(series[0]['sales'], Decimal('150.00'))
+        self.assertEqual(series[0]['orders'], 2)
+        self.assertEqual(series[1]['sales'], Decimal('0'))
+        self.assertEqual(series[1]['orders'], 0)
+        self.assertEqual(series[2]['sales'], Decimal('25.00'))
+
+    def test_rollups_match_raw_orders(self):
+        """Test that day-aligned series read from the rollups agree with the orders table"""
+        self.create_order(aware(2025, 4, 1, 9), Decimal('100.00'))
+        self.create_order(aware(2025, 4, 20, 9), Decimal('40.00'))
+
+        from_rollups = sales_series(aware(2025, 3, 31), aware(2025, 5, 5), 'week')
+        from_orders = sales_series(aware(2025, 3, 31), aware(2025, 5, 5), 'week', queryset=Order.objects.all())
+
+        self.assertEqual(from_rollups, from_orders)
+
+    def test_range_is_half_open(self):
+        """Test that orders at the end bound are excluded"""
+        self.create_order(aware(2025, 4, 2), Decimal('10.00'))
+
+        series = sales_series(aware(2025, 4, 1), aware(2025, 4, 2), 'day')
+
+        self.assertEqual(len(series), 1)
+        self.assertEqual(series[0]['orders'], 0)
+
+    def test_hourly_weekly_and_monthly_buckets(self):
+        """Test bucket labels and filling for the other granularities"""
+        self.create_order(aware(2025, 4, 2, 10, 30), Decimal('10.00'))
+        self.create_order(aware(2025, 6, 15, 8), Decimal('20.00'))
+
+        hourly = sales_series(aware(2025, 4, 2, 9), aware(2025, 4, 2, 12), 'hour')
+        self.assertEqual([b['label'] for b in hourly], ['2025-04-02T09:00', '2025-04-02T10:00', '2025-04-02T11:00'])
+        self.assertEqual([b['orders'] for b in hourly], [0, 1, 0])
+
+        weekly = sales_series(aware(2025, 3, 31), aware(2025, 4, 14), 'week')
+        self.assertEqual([b['label'] for b in weekly], ['2025-03-31', '2025-04-07'])
+        self.assertEqual([b['orders'] for b in weekly], [1, 0])
+
+        monthly = sales_series(aware(2025, 1, 1), aware(2026, 1, 1), 'month')
+        self.assertEqual(len(monthly), 12)
+        self.assertEqual(monthly[3]['sales'], Decimal('10.00'))
+        self.assertEqual(monthly[5]['sales'], Decimal('20.00'))
+
+    def test_invalid_granularity(self):
+        """Test that an unknown granularity is rejected"""
+        with self.assertRaises(ValueError):
+            sales_series(aware(2025, 4, 1), aware(2025, 4, 2), 'minute')
+
+
+class DailyStoreSalesRollupTests(TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        self.category = Category.objects.create(name='Soft Drinks')
+        self.product = Product.objects.create(
+            product_id='P-001',
+            name='Cola',
+            category=self.category,
+            price=Decimal('20.00'),
+            stock_quantity=100
+        )
+
+    def rollup(self, status='pending'):
+        return DailyStoreSalesRollup.objects.get(date=timezone.localdate(), store=self.store, status=status)
+
+    def test_order_items_update_rollup(self):
+        """Test that saving orders and items keeps the rollup row exact"""
+        order = Order.objects.create(store=self.store, delivery_day='Monday')
+        OrderItem.objects.create(order=order, product=self.product, quantity=3, unit_price=Decimal('20.00'))
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, unit_price=Decimal('10.00'))
+
+        rollup = self.rollup()
+        self.assertEqual(rollup.order_count, 1)
+        self.assertEqual(rollup.item_count, 5)
+        self.assertEqual(rollup.subtotal, Decimal('80.00'))
+        self.assertEqual(rollup.tax, Decimal('1.60'))
+        self.assertEqual(rollup.total, Decimal('81.60'))
+
+    def test_status_change_moves_order(self):
+        """Test that a status change moves the order to another rollup row"""
+        order = Order.objects.create(store=self.store, delivery_day='Monday')
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, unit_price=Decimal('20.00'))
+
+        order.status = 'completed'
+        order.save()
+
+        self.assertFalse(DailyStoreSalesRollup.objects.filter(status='pending').exists())
+        self.assertEqual(self.rollup('completed').order_count, 1)
+
+    def test_deletes_update_rollup(self):
+        """Test that deleting items and orders is reflected in the rollup"""
+        order = Order.objects.create(store=self.store, delivery_day='Monday')
+        item = OrderItem.objects.create(order=order, product=self.product, quantity=4, unit_price=Decimal('5.00'))
+        OrderItem.objects.create(order=order, product=self.product, quantity=1, unit_price=Decimal('5.00'))
+
+        item.delete()
+        self.assertEqual(self.rollup().item_count, 1)
+
+        order.delete()
+        self.assertFalse(DailyStoreSalesRollup.objects.exists())
+
+    def test_refresh_overwrites_concurrently_inserted_row(self):
+        """Test that a rollup row inserted by a concurrent refresh is updated instead of failing the write"""
+        order = Order.objects.create(store=self.store, delivery_day='Monday')
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, unit_price=Decimal('20.00'))
+        delete = QuerySet.delete
+
+        def delete_then_race(queryset):
+            # Another refresh of the same key inserts right after our delete
+            result = delete(queryset)
+            DailyStoreSalesRollup.objects.create(date=timezone.localdate(), store=self.store, status='pending', order_count=99)
+            return result
+
+        with mock.patch.object(QuerySet, 'delete', delete_then_race):
+            refresh_daily_rollups([order_rollup_key(order)])
+
+        rollup = self.rollup()
+        self.assertEqual((rollup.order_count, rollup.item_count), (1, 2))
+
+    def test_rebuild_rollups_command(self):
+        """Test that the backfill command restores a wiped rollup table"""
+        order = Order.objects.create(store=self.store, delivery_day='Monday')
+        OrderItem.objects.create(order=order, product=self.product, quantity=2, unit_price=Decimal('20.00'))
+        expected = list(DailyStoreSalesRollup.objects.values('date', 'store', 'status', 'order_count', 'item_count', 'total'))
+
+        DailyStoreSalesRollup.objects.all().delete()
+        call_command('rebuild_rollups', stdout=StringIO())
+
+        actual = list(DailyStoreSalesRollup.objects.values('date', 'store', 'status', 'order_count', 'item_count', 'total'))
+        self.assertEqual(actual, expected)
+
+
+class DashboardStatTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='manager', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        self.category = Category.objects.create(name='Soft Drinks')
+        self.product = Product.objects.create(
+            product_id='P-001',
+            name='Cola',
+            category=self.category,
+            price=Decimal('20.00'),
+            stock_quantity=100
+        )
+        self.today = timezone.localdate()
+
+        order = Order.objects.create(store=self.store, delivery_day='Monday')
+        OrderItem.objects.create(order=order, product=self.product, quantity=5, unit_price=Decimal('20.00'))
+        Delivery.objects.create(order=order, delivery_date=self.today, delivery_time='10:00')
+        InventoryTransaction.objects.create(product=self.product, quantity=24, transaction_type='in')
+
+    def test_compute_stats_in_batched_queries(self):
+        """Test that every stat and period is computed with three queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            stats = compute_dashboard_stats()
+
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertEqual(len(stats), len(DashboardStat.STAT_TYPES) * len(DashboardStat.PERIOD_TYPES))
+        self.assertEqual(stats[('sales', 'daily')]['current'], Decimal('102.00'))
+        self.assertEqual(stats[('orders', 'daily')]['current'], 1)
+        self.assertEqual(stats[('products', 'daily')]['current'], 5)
+        self.assertEqual(stats[('customers', 'monthly')]['current'], 1)
+        self.assertEqual(stats[('deliveries', 'yearly')]['current'], 1)
+        self.assertEqual(stats[('inventory', 'weekly')]['current'], 24)
+        self.assertEqual(stats[('orders', 'daily')]['previous'], 0)
+
+    def test_refresh_upserts_rows(self):
+        """Test that refreshing twice updates rows in place"""
+        refresh_dashboard_stats()
+        Order.objects.create(store=self.store, delivery_day='Monday')
+        refresh_dashboard_stats()
+
+        self.assertEqual(DashboardStat.objects.count(), 24)
+        stat = DashboardStat.objects.get(stat_type='orders', period='daily')
+        self.assertEqual(stat.current_value, 2)
+        self.assertEqual(stat.previous_value, 0)
+        self.assertEqual(stat.percentage_change, 0)
+
+    def test_command_populates_table(self):
+        """Test the refresh_dashboard_stats management command"""
+        call_command('refresh_dashboard_stats', stdout=StringIO())
+
+        self.assertEqual(DashboardStat.objects.count(), 24)
+
+    def test_summary_served_from_precomputed_stats(self):
+        """Test that fresh stats are served from the table"""
+        refresh_dashboard_stats()
+
+        response = self.client.get('/api/dashboard/summary/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['stats_source'], 'precomputed')
+        self.assertEqual(response.data['summary']['orders']['today'], 1)
+        self.assertEqual(response.data['summary']['sales']['monthly']['current'], Decimal('102.00'))
+        self.assertEqual(response.data['summary']['deliveries']['pending'], 1)
+
+    @override_settings(DASHBOARD_STATS_MAX_AGE=0)
+    def test_summary_falls_back_to_live_stats(self):
+        """Test that missing or stale stats are computed live"""
+        response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.data['stats_source'], 'live')
+        self.assertEqual(response.data['summary']['orders']['today'], 1)
+
+        refresh_dashboard_stats()
+        response = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(response.data['stats_source'], 'live')
+
+
+class DashboardSummarySerializerTests(TestCase):
+    def setUp(self):
+        self.category = Category.objects.create(name='Soft Drinks')
+        self.product = Product.objects.create(
+            product_id='P-001',
+            name='Cola',
+            category=self.category,
+            price=Decimal('20.00'),
+            stock_quantity=100
+        )
+
+    def create_orders(self, count):
+        today = timezone.localdate()
+        for i in range(count):
+            store = Store.objects.create(
+                name=f'Store {i}',
+                location='Test Location',
+                lat=14.5995,
+                lng=120.9842,
+                owner_name='Owner',
+                number='09123456789',
+                day='Monday'
+            )
+            order = Order.objects.create(store=store, delivery_day='Monday')
+            OrderItem.objects.create(order=order, product=self.product, quantity=1, unit_price=Decimal('10.00'))
+            Delivery.objects.create(
+                order=order,
+                delivery_date=today,
+                delivery_time='10:00',
+                status='delivered' if i % 2 else 'cancelled'
+            )
+
+    def test_query_count_upper_bound(self):
+        """Test that the summary uses a constant, small number of queries"""
+        self.create_orders(8)
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = DashboardSummarySerializer(instance={}).data
+
+        self.assertLessEqual(len(ctx.captured_queries), 4)
+        self.assertEqual(data['today_deliveries'], 8)
+        self.assertEqual(data['monthly_deliveries'], 8)
+        self.assertEqual(data['total_sales'], Decimal('80.00'))
+        self.assertEqual(data['on_time_delivery_percentage'], 50)
+        self.assertEqual(data['failed_delivery_percentage'], 50)
+        self.assertEqual(len(data['recent_orders']), 5)
+        self.assertEqual(data['recent_orders'][0]['store']['name'], 'Store 7')
+        self.assertEqual(data['recent_orders'][0]['total_amount'], Decimal('10.20'))
+
+
+class SalesDataViewTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='manager', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_preset_periods(self):
+        """Test the week, month and year presets"""
+        for period, length, key in (('week', 7, 'date'), ('month', 30, 'date'), ('year', 12, 'month')):
+            response = self.client.get('/api/dashboard/sales/', {'period': period})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['data']), length)
+            self.assertIn(key, response.data['data'][0])
+
+        today = timezone.localdate().strftime('%Y-%m-%d')
+        response = self.client.get('/api/dashboard/sales/', {'period': 'week'})
+        self.assertEqual(response.data['data'][-1]['date'], today)
+
+    def test_custom_range(self):
+        """Test an explicit start/end/granularity range with an inclusive end date"""
+        response = self.client.get('/api/dashboard/sales/', {
+            'start': '2025-04-01',
+            'end': '2025-04-07',
+            'granularity': 'day',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['data']), 7)
+        self.assertEqual(response.data['data'][-1]['date'], '2025-04-07')
+
+    def test_invalid_params(self):
+        """Test that invalid periods and ranges return 400"""
+        response = self.client.get('/api/dashboard/sales/', {'period': 'decade'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/dashboard/sales/', {'start': '2025-04-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/dashboard/sales/', {
+            'start': '2020-01-01',
+            'end': '2025-01-01',
+            'granularity': 'hour',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='manager', password='testpassword123')
+        self.other_user = User.objects.create_user(username='employee', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+
+    def test_repeat_requests_are_served_from_cache(self):
+        """Test that an unchanged dashboard is served without queries"""
+        first = self.client.get('/api/dashboard/summary/')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', first)
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/dashboard/summary/')
+
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_if_none_match_returns_304(self):
+        """Test conditional requests with a matching ETag"""
+        first = self.client.get('/api/dashboard/sales/', {'period': 'week'})
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                '/api/dashboard/sales/',
+                {'period': 'week'},
+                HTTP_IF_NONE_MATCH=first['ETag']
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+    def test_if_none_match_needs_a_cached_body(self):
+        """Test that a matching ETag is answered with the body once the cache lost its entry"""
+        first = self.client.get('/api/dashboard/sales/', {'period': 'week'})
+        Order.objects.create(store=self.store, delivery_day='Monday', total=Decimal('10.00'))
+        # Evicting the version as well restarts it at 1, so the key and ETag repeat
+        get_cache().clear()
+
+        response = self.client.get(
+            '/api/dashboard/sales/',
+            {'period': 'week'},
+            HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['data'][-1]['orders'], 1)
+
+    def test_cache_is_per_user_and_per_query(self):
+        """Test that users and query params get separate cache entries"""
+        week = self.client.get('/api/dashboard/sales/', {'period': 'week'})
+        month = self.client.get('/api/dashboard/sales/', {'period': 'month'})
+        self.client.force_authenticate(user=self.other_user)
+        other = self.client.get('/api/dashboard/sales/', {'period': 'week'})
+
+        self.assertNotEqual(week['ETag'], month['ETag'])
+        self.assertNotEqual(week['ETag'], other['ETag'])
+
+    def test_order_save_invalidates_cache(self):
+        """Test that the order post_save receiver invalidates cached responses"""
+        first = self.client.get('/api/dashboard/sales/', {'period': 'week'})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(store=self.store, delivery_day='Monday', total=Decimal('10.00'))
+
+        response = self.client.get(
+            '/api/dashboard/sales/',
+            {'period': 'week'},
+            HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['data'][-1]['orders'], 1)
+
+
+class DashboardQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='manager', password='testpassword123', first_name='Ana')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store', location='Test Location', lat=14.5995, lng=120.9842,
+            owner_name='Owner', number='09123456789', day='Monday'
+        )
+
+    def create_orders(self, count):
+        for _ in range(count):
+            Order.objects.create(store=self.store, user=self.user, delivery_day='Monday', total=Decimal('10.00'))
+        # Measure the views, not the response cache
+        get_cache().clear()
+
+    def test_queries_do_not_grow_with_orders(self):
+        """Test that the summary and sales endpoints cost constant queries"""
+        for url in ('/api/dashboard/summary/', '/api/dashboard/sales/?period=week'):
+            with self.subTest(url=url):
+                self.assertConstantQueries(lambda: self.client.get(url), self.create_orders)
@@ -0,0 +1,141 @@
+"""
+Bucketed time-series aggregation for dashboard charts.
+
+Every bucket of a series is computed with a single grouped query and the
+buckets that have no rows are filled in Python, so the number of queries
+does not depend on the length of the requested range. Day-aligned ranges
+are read from the DailyStoreSalesRollup table instead of the orders table.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DateField, DateTimeField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+from apps.orders.models import Order
+from .models import DailyStoreSalesRollup
+
+GRANULARITIES = ('hour', 'day', 'week', 'month')
+
+# Upper bound on the number of buckets a single series may contain
+MAX_BUCKETS = 1000
+
+LABEL_FORMATS = {
+    'hour': '%Y-%m-%dT%H:00',
+    'day': '%Y-%m-%d',
+    'week': '%Y-%m-%d',
+    'month': '%Y-%m',
+}
+
+
+def bucket_start(value, granularity):
+    """Return the start of the bucket containing ``value`` in the current timezone"""
+    value = timezone.localtime(value)
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+
+    day = value.date()
+    if granularity == 'week':
+        day -= timedelta(days=day.weekday())
+    elif granularity == 'month':
+        day = day.replace(day=1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def next_bucket(start, granularity):
+    """Return the start of the bucket following ``start``"""
+    if granularity == 'hour':
+        return timezone.localtime(start + timedelta(hours=1))
+
+    day = timezone.localtime(start).date()
+    if granularity == 'day':
+        day += timedelta(days=1)
+    elif granularity == 'week':
+        day += timedelta(days=7)
+    elif day.month == 12:
+        day = day.replace(year=day.year + 1, month=1)
+    else:
+        day = day.replace(month=day.month + 1)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def iter_buckets(start, end, granularity):
+    """Yield the start of every bucket overlapping the half-open range [start, end)"""
+    current = bucket_start(start, granularity)
+    while current < end:
+        yield current
+        current = next_bucket(current, granularity)
+
+
+def sales_series(start, end, granularity='day', queryset=None):
+    """
+    Return order totals and counts per bucket for the range [start, end).
+
+    The result is a list of dicts with ``start``, ``label``, ``sales`` and
+    ``orders`` keys in chronological order, including empty buckets.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Invalid granularity '{granularity}'")
+    if start >= end:
+        raise ValueError('start must be before end')
+
+    buckets = list(iter_buckets(start, end, granularity))
+    if len(buckets) > MAX_BUCKETS:
+        raise ValueError(f'Range too large: at most {MAX_BUCKETS} {granularity} buckets allowed')
+
+    if queryset is None and granularity != 'hour' and _is_midnight(start) and _is_midnight(end):
+        totals = _rollup_totals(start, end, granularity)
+    else:
+        totals = _order_totals(queryset, start, end, granularity)
+
+    label_format = LABEL_FORMATS[granularity]
+    series = []
+    for bucket in buckets:
+        sales, orders = totals.get(bucket, (None, 0))
+        series.append({
+            'start': bucket,
+            'label': bucket.strftime(label_format),
+            'sales': sales or Decimal('0'),
+            'orders': orders,
+        })
+    return series
+
+
+def _is_midnight(value):
+    return timezone.localtime(value).time() == time.min
+
+
+def _order_totals(queryset, start, end, granularity):
+    """Group raw orders into buckets"""
+    if queryset is None:
+        queryset = Order.objects.all()
+
+    rows = (
+        queryset
+        .filter(created_at__gte=start, created_at__lt=end)
+        .annotate(bucket=Trunc('created_at', granularity, output_field=DateTimeField()))
+        .values('bucket')
+        .annotate(sales=Sum('total'), orders=Count('id'))
+        .order_by()
+    )
+    return {
+        timezone.localtime(row['bucket']): (row['sales'], row['orders'])
+        for row in rows
+    }
+
+
+def _rollup_totals(start, end, granularity):
+    """Group daily rollup rows into buckets"""
+    rows = (
+        DailyStoreSalesRollup.objects
+        .filter(date__gte=timezone.localdate(start), date__lt=timezone.localdate(end))
+        .annotate(bucket=Trunc('date', granularity, output_field=DateField()))
+        .values('bucket')
+        .annotate(sales=Sum('total'), orders=Sum('order_count'))
+        .order_by()
+    )
+    return {
+        timezone.make_aware(datetime.combine(row['bucket'], time.min)): (row['sales'], row['orders'])
+        for row in rows
+    }
@@ -1,87 +1,53 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
-from django.db.models import Sum, Count
 from django.utils import timezone
-from datetime import timedelta
-from apps.orders.models import Order
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time, timedelta
 from apps.deliveries.models import Delivery
-from apps.products.models import Product
-from apps.inventory.models import InventoryTransaction
+from apps.inventory.models import Inventory
+from .cache import DashboardCacheMixin
 from .models import DashboardStat, RecentActivity
-from django.db.models import F
+from .stats import load_dashboard_stats
+from .timeseries import bucket_start, next_bucket, sales_series
 
 
-class DashboardSummaryView(generics.GenericAPIView):
+class DashboardSummaryView(DashboardCacheMixin, generics.GenericAPIView):
     """
     API view to get dashboard summary data
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        # Get current date and time
-        now = timezone.now()
-        today = now.date()
-        
-        # Get stats from the database if available
-        stats = DashboardStat.objects.filter(is_active=True)
+        return self.cached_response(request, self._get_summary)
+    
+    def _get_summary(self):
+        # Precomputed stats, or live ones when the table is missing or stale
+        stats, stats_updated_at, stats_source = load_dashboard_stats()
         
-        # Calculate summary data if no stats are available
-        if not stats.exists():
-            # Orders summary
-            today_orders = Order.objects.filter(created_at__date=today).count()
-            yesterday_orders = Order.objects.filter(created_at__date=today - timedelta(days=1)).count()
-            
-            # Deliveries summary
-            today_deliveries = Delivery.objects.filter(delivery_date=today).count()
-            pending_deliveries = Delivery.objects.filter(status='pending').count()
-            
-            # Products summary
-            low_stock_products = Product.objects.filter(stock_quantity__lte=F('reorder_level')).count()
-            
-            # Sales summary
-            today_sales = Order.objects.filter(created_at__date=today).aggregate(total=Sum('total_amount'))['total'] or 0
-            yesterday_sales = Order.objects.filter(created_at__date=today - timedelta(days=1)).aggregate(total=Sum('total_amount'))['total'] or 0
-            
-            summary_data = {
-                'orders': {
-                    'today': today_orders,
-                    'yesterday': yesterday_orders,
-                    'percentage_change': self._calculate_percentage_change(today_orders, yesterday_orders),
-                },
-                'deliveries': {
-                    'today': today_deliveries,
-                    'pending': pending_deliveries,
-                },
-                'products': {
-                    'low_stock': low_stock_products,
-                },
-                'sales': {
-                    'today': today_sales,
-                    'yesterday': yesterday_sales,
-                    'percentage_change': self._calculate_percentage_change(today_sales, yesterday_sales),
-                }
-            }
-        else:
-            # Use pre-calculated stats
-            summary_data = {
-                'orders': {},
-                'deliveries': {},
-                'products': {},
-                'sales': {},
+        summary_data = {stat_type: {} for stat_type, _ in DashboardStat.STAT_TYPES}
+        for stat in stats:
+            summary_data[stat.stat_type][stat.period] = {
+                'current': stat.current_value,
+                'previous': stat.previous_value,
+                'percentage_change': stat.percentage_change,
             }
-            
-            for stat in stats:
-                if stat.stat_type == 'orders':
-                    summary_data['orders'][stat.period] = stat.value
-                elif stat.stat_type == 'deliveries':
-                    summary_data['deliveries'][stat.period] = stat.value
-                elif stat.stat_type == 'products':
-                    summary_data['products'][stat.period] = stat.value
-                elif stat.stat_type == 'sales':
-                    summary_data['sales'][stat.period] = stat.value
+        
+        # Shortcuts kept for existing clients
+        for stat_type in ('orders', 'sales', 'deliveries'):
+            daily = summary_data[stat_type].get('daily')
+            if daily:
+                summary_data[stat_type].update({
+                    'today': daily['current'],
+                    'yesterday': daily['previous'],
+                    'percentage_change': daily['percentage_change'],
+                })
+        
+        # Point-in-time counters
+        summary_data['deliveries']['pending'] = Delivery.objects.filter(status='pending').count()
+        summary_data['products']['low_stock'] = Inventory.objects.filter(is_low_stock=True).count()
         
         # Get recent activities
-        recent_activities = RecentActivity.objects.all()[:10]
+        recent_activities = RecentActivity.objects.select_related('user')[:10]
         activities_data = [
             {
                 'id': activity.id,
@@ -90,115 +56,98 @@ class DashboardSummaryView(generics.GenericAPIView):
                 'description': activity.description,
                 'reference_id': activity.reference_id,
                 'user': activity.user.get_full_name() if activity.user else None,
-                'created_at': activity.created,
+                'created_at': activity.created_at,
             }
             for activity in recent_activities
         ]
         
         return Response({
             'summary': summary_data,
+            'stats_source': stats_source,
+            'stats_updated_at': stats_updated_at,
             'recent_activities': activities_data,
         })
-    
-    def _calculate_percentage_change(self, current, previous):
-        """Calculate percentage change between two values"""
-        if previous == 0:
-            return 0
-        return ((current - previous) / previous) * 100
 
 
-class SalesDataView(generics.GenericAPIView):
+class SalesDataView(DashboardCacheMixin, generics.GenericAPIView):
     """
     API view to get sales data for charts
+
+    Accepts either a preset ``period`` (week, month, year) or an explicit
+    ``start``/``end``/``granularity`` (hour, day, week, month) range.
     """
     permission_classes = [permissions.IsAuthenticated]
     
+    PERIODS = {
+        'week': ('day', 7),
+        'month': ('day', 30),
+        'year': ('month', 12),
+    }
+    
     def get(self, request):
-        period = request.query_params.get('period', 'week')
+        return self.cached_response(request, lambda: self._get_sales(request))
+    
+    def _get_sales(self, request):
+        if 'start' in request.query_params or 'end' in request.query_params:
+            return self._get_range_data(request)
         
-        if period == 'week':
-            return self._get_weekly_data()
-        elif period == 'month':
-            return self._get_monthly_data()
-        elif period == 'year':
-            return self._get_yearly_data()
-        else:
+        period = request.query_params.get('period', 'week')
+        if period not in self.PERIODS:
             return Response({'error': 'Invalid period'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    def _get_weekly_data(self):
-        """Get sales data for the past week"""
-        now = timezone.now()
-        start_date = now - timedelta(days=7)
         
-        # Get daily sales for the past week
-        sales_data = []
-        for i in range(7):
-            date = start_date + timedelta(days=i)
-            sales = Order.objects.filter(created_at__date=date.date()).aggregate(total=Sum('total_amount'))['total'] or 0
-            sales_data.append({
-                'date': date.date().strftime('%Y-%m-%d'),
-                'sales': sales,
-            })
+        granularity, count = self.PERIODS[period]
+        end = next_bucket(bucket_start(timezone.now(), granularity), granularity)
+        start = end
+        for _ in range(count):
+            start = bucket_start(start - timedelta(microseconds=1), granularity)
         
         return Response({
-            'period': 'week',
-            'data': sales_data,
+            'period': period,
+            'data': self._serialize(sales_series(start, end, granularity), granularity),
         })
     
-    def _get_monthly_data(self):
-        """Get sales data for the past month"""
-        now = timezone.now()
-        start_date = now - timedelta(days=30)
-        
-        # Group sales by day for the past month
-        sales_data = []
-        for i in range(30):
-            date = start_date + timedelta(days=i)
-            sales = Order.objects.filter(created_at__date=date.date()).aggregate(total=Sum('total_amount'))['total'] or 0
-            sales_data.append({
-                'date': date.date().strftime('%Y-%m-%d'),
-                'sales': sales,
-            })
+    def _get_range_data(self, request):
+        """Get sales data for an arbitrary [start, end) range"""
+        granularity = request.query_params.get('granularity', 'day')
+        try:
+            start = self._parse_bound(request.query_params.get('start'))
+            end = self._parse_bound(request.query_params.get('end'), inclusive_date=True)
+            if start is None or end is None:
+                raise ValueError('Both start and end are required')
+            series = sales_series(start, end, granularity)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
-            'period': 'month',
-            'data': sales_data,
+            'period': 'custom',
+            'granularity': granularity,
+            'start': start,
+            'end': end,
+            'data': self._serialize(series, granularity),
         })
     
-    def _get_yearly_data(self):
-        """Get sales data for the past year"""
-        now = timezone.now()
+    def _parse_bound(self, value, inclusive_date=False):
+        """Parse a date or datetime query param into an aware datetime"""
+        if not value:
+            return None
         
-        # Group sales by month for the past year
-        sales_data = []
-        for i in range(12):
-            month = now.month - i
-            year = now.year
-            if month <= 0:
-                month += 12
-                year -= 1
-            
-            start_date = timezone.datetime(year, month, 1)
-            if month == 12:
-                end_date = timezone.datetime(year + 1, 1, 1) - timedelta(days=1)
-            else:
-                end_date = timezone.datetime(year, month + 1, 1) - timedelta(days=1)
-            
-            sales = Order.objects.filter(
-                created_at__date__gte=start_date.date(),
-                created_at__date__lte=end_date.date()
-            ).aggregate(total=Sum('total_amount'))['total'] or 0
-            
-            sales_data.append({
-                'month': start_date.strftime('%Y-%m'),
-                'sales': sales,
-            })
+        day = parse_date(value)
+        if day is not None:
+            # A bare end date includes the whole day
+            if inclusive_date:
+                day += timedelta(days=1)
+            return timezone.make_aware(datetime.combine(day, time.min))
         
-        # Reverse to get chronological order
-        sales_data.reverse()
-        
-        return Response({
-            'period': 'year',
-            'data': sales_data,
-        })
-
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid date '{value}'")
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+    
+    def _serialize(self, series, granularity):
+        key = 'month' if granularity == 'month' else 'date'
+        return [
+            {key: bucket['label'], 'sales': bucket['sales'], 'orders': bucket['orders']}
+            for bucket in series
+        ]
@@ -0,0 +1,143 @@
+"""
+Automatic driver assignment for a delivery day.
+
+The pending deliveries of a day are split between the active delivery
+drivers with capacitated k-means over the store locations, so every
+driver gets a compact area and at most ``max_stops`` stops. Each area is
+then routed with ``routing.plan_route``; stops that cannot be finished
+within the driver's shift are left unassigned. Clusters go to the driver
+who already holds most of their stops, so re-running the planner after a
+few changes moves as few deliveries as possible.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Delivery
+from .planning import delivery_stop, plan_stops
+from .routing import cluster_stops
+
+DEFAULT_MAX_STOPS = 40
+DEFAULT_SHIFT_MINUTES = 480
+
+
+def available_drivers():
+    return get_user_model().objects.filter(role='delivery_driver', status='active', is_active=True).order_by('pk')
+
+
+def _match_clusters(labels, deliveries, driver_ids):
+    """Map cluster labels to driver ids, keeping current assignments where possible"""
+    overlap = {}
+    for label, delivery in zip(labels, deliveries):
+        if label >= 0 and delivery.employee_id in driver_ids:
+            key = (int(label), delivery.employee_id)
+            overlap[key] = overlap.get(key, 0) + 1
+
+    mapping = {}
+    taken = set()
+    for (label, driver_id), _ in sorted(overlap.items(), key=lambda item: -item[1]):
+        if label not in mapping and driver_id not in taken:
+            mapping[label] = driver_id
+            taken.add(driver_id)
+
+    free = iter(driver_id for driver_id in driver_ids if driver_id not in taken)
+    for label in sorted(set(int(label) for label in labels if label >= 0)):
+        if label not in mapping:
+            mapping[label] = next(free)
+    return mapping
+
+
+def plan_assignment(delivery_date, drivers=None, only_unassigned=False, max_stops=None,
+                    shift_minutes=None, start=None, start_time=None):
+    """
+    Work out which driver delivers which pending delivery on ``delivery_date``.
+
+    Returns a dict with a route per driver, the ``unassigned`` stops (with
+    the ``reason`` they were left out) and ``assignments``, a mapping of
+    delivery id to driver id. Unassigned stops are planned without a
+    driver. Nothing is written; see ``apply_assignment``.
+    """
+    drivers = list(available_drivers() if drivers is None else drivers)
+    max_stops = max_stops or getattr(settings, 'DELIVERY_DRIVER_MAX_STOPS', DEFAULT_MAX_STOPS)
+    shift_minutes = shift_minutes or getattr(settings, 'DELIVERY_SHIFT_MINUTES', DEFAULT_SHIFT_MINUTES)
+
+    queryset = Delivery.objects.filter(delivery_date=delivery_date, status='pending').select_related('order__store')
+    if only_unassigned:
+        queryset = queryset.filter(employee__isnull=True)
+
+    current = {}
+    deliveries = []
+    unassigned = []
+    for delivery in queryset.order_by('pk'):
+        current[delivery.pk] = delivery.employee_id
+        store = delivery.order.store
+        if store.lat is not None and store.lng is not None:
+            deliveries.append(delivery)
+        else:
+            unassigned.append({**delivery_stop(delivery), 'reason': 'no_location'})
+
+    labels = cluster_stops(
+        [(delivery.order.store.lat, delivery.order.store.lng) for delivery in deliveries],
+        len(drivers),
+        capacity=max_stops
+    )
+    drivers_by_id = {driver.pk: driver for driver in drivers}
+    mapping = _match_clusters(labels, deliveries, list(drivers_by_id))
+
+    clusters = {}
+    for label, delivery in zip(labels, deliveries):
+        if label < 0:
+            unassigned.append({**delivery_stop(delivery), 'reason': 'capacity' if drivers else 'no_driver'})
+        else:
+            clusters.setdefault(mapping[int(label)], []).append(delivery_stop(delivery))
+
+    routes = []
+    assignments = {}
+    for driver_id, stops in clusters.items():
+        route = plan_stops(stops, delivery_date, start=start, start_time=start_time, max_minutes=shift_minutes)
+        unassigned.extend({**stop, 'reason': 'shift'} for stop in route.pop('unscheduled'))
+        if not route['stops']:
+            continue
+        driver = drivers_by_id[driver_id]
+        routes.append({
+            'employee_id': driver_id,
+            'employee_name': driver.get_full_name() or driver.username,
+            **route,
+        })
+        assignments.update((stop['id'], driver_id) for stop in route['stops'])
+    routes.sort(key=lambda route: route['employee_id'])
+
+    # Planned stops left without a driver lose the one they had
+    planned = {**{stop['id']: None for stop in unassigned}, **assignments}
+    return {
+        'delivery_date': delivery_date,
+        'drivers': len(drivers),
+        'deliveries': len(current),
+        'max_stops': max_stops,
+        'shift_minutes': shift_minutes,
+        'changed': sum(1 for pk, driver_id in planned.items() if current[pk] != driver_id),
+        'routes': routes,
+        'unassigned': unassigned,
+        'assignments': assignments,
+    }
+
+
+def apply_assignment(plan):
+    """
+    Write the driver of every planned delivery that changed, clearing it
+    for the stops the plan left unassigned; returns how many changed.
+    """
+    assignments = {**{stop['id']: None for stop in plan['unassigned']}, **plan['assignments']}
+    with transaction.atomic():
+        deliveries = [
+            delivery
+            for delivery in Delivery.objects.select_for_update().filter(pk__in=list(assignments), status='pending')
+            if delivery.employee_id != assignments[delivery.pk]
+        ]
+        now = timezone.now()
+        for delivery in deliveries:
+            delivery.employee_id = assignments[delivery.pk]
+            delivery.updated_at = now
+        Delivery.objects.bulk_update(deliveries, ['employee', 'updated_at'], batch_size=500)
+    return len(deliveries)
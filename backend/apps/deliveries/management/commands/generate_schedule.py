@@ -0,0 +1,46 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_time
+
+from apps.deliveries.scheduling import schedule_days
+
+
+class Command(BaseCommand):
+    help = 'Creates the draft orders and deliveries of the standing weekly store schedule'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='First date to schedule (YYYY-MM-DD), defaults to tomorrow')
+        parser.add_argument('--days', type=int, default=7, help='Number of consecutive days to schedule')
+        parser.add_argument('--time', help='Delivery time of the scheduled deliveries (HH:MM), defaults to 08:00')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be created')
+
+    def handle(self, *args, **options):
+        start = timezone.localdate() + timedelta(days=1)
+        if options['start']:
+            start = self._parse(parse_date, options['start'], 'date')
+        delivery_time = self._parse(parse_time, options['time'], 'time') if options['time'] else None
+        if options['days'] < 1:
+            raise CommandError('--days must be at least 1')
+
+        results = schedule_days(start, options['days'], delivery_time=delivery_time, dry_run=options['dry_run'])
+        verb = 'Would create' if options['dry_run'] else 'Created'
+        for result in results:
+            self.stdout.write(
+                f"{result['date']:%Y-%m-%d} {result['day']:<9} {result['stores']:>6} stores due, "
+                f"{verb.lower()} {result['orders']} orders and {result['deliveries']} deliveries"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {sum(r['orders'] for r in results)} orders and "
+            f"{sum(r['deliveries'] for r in results)} deliveries"
+        ))
+
+    def _parse(self, parser, value, kind):
+        try:
+            parsed = parser(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            raise CommandError(f"Invalid {kind} '{value}'")
+        return parsed
@@ -0,0 +1,59 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('orders', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Delivery',
+            fields=[
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('id', models.CharField(editable=False, max_length=50, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in-transit', 'In Transit'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('delivery_date', models.DateField()),
+                ('delivery_time', models.TimeField()),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('has_signature', models.BooleanField(default=False)),
+                ('signature_image', models.ImageField(blank=True, null=True, upload_to='signatures/')),
+                ('lat', models.FloatField(blank=True, null=True, verbose_name='Latitude')),
+                ('lng', models.FloatField(blank=True, null=True, verbose_name='Longitude')),
+                ('employee', models.ForeignKey(blank=True, limit_choices_to={'role': 'delivery_driver'}, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='deliveries', to=settings.AUTH_USER_MODEL)),
+                ('order', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='delivery', to='orders.order')),
+            ],
+            options={
+                'verbose_name': 'Delivery',
+                'verbose_name_plural': 'Deliveries',
+                'ordering': ['-delivery_date', '-delivery_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='DeliveryStatusUpdate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('in-transit', 'In Transit'), ('delivered', 'Delivered'), ('cancelled', 'Cancelled')], max_length=20)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('update_time', models.DateTimeField()),
+                ('delivery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='status_updates', to='deliveries.delivery')),
+                ('updated_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Delivery Status Update',
+                'verbose_name_plural': 'Delivery Status Updates',
+                'ordering': ['-update_time'],
+            },
+        ),
+    ]
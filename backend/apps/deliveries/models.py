@@ -39,6 +39,17 @@ class Delivery(TimeStampedModel):
         verbose_name = 'Delivery'
         verbose_name_plural = 'Deliveries'
         ordering = ['-delivery_date', '-delivery_time']
+        indexes = [
+            models.Index(fields=['delivery_date', 'delivery_time'], name='delivery_date_time_idx'),
+            models.Index(fields=['status', 'delivery_date'], name='delivery_status_date_idx'),
+            models.Index(fields=['employee', 'delivery_date'], name='delivery_employee_date_idx'),
+            # Open work is a small slice of the table; keep it in its own index
+            models.Index(
+                fields=['delivery_date'],
+                condition=models.Q(status='pending'),
+                name='delivery_pending_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.id
@@ -0,0 +1,120 @@
+"""
+Route planning for deliveries: turns Delivery rows into stops for
+``routing.plan_route`` and formats the planned routes for the API.
+"""
+from datetime import datetime
+
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_time
+
+from .routing import plan_route
+
+DEFAULT_SPEED_KMH = 30
+DEFAULT_STOP_MINUTES = 10
+
+
+def parse_route_params(params):
+    """
+    Read ``delivery_date``, ``start_lat``/``start_lng`` and ``start_time``
+    from query parameters. Raises ValueError with a readable message.
+    """
+    try:
+        delivery_date = parse_date(params.get('delivery_date', ''))
+    except ValueError:
+        delivery_date = None
+    if delivery_date is None:
+        raise ValueError('delivery_date must be a date (YYYY-MM-DD).')
+
+    start = None
+    # 0 is a real coordinate, so only a missing or empty value means no start
+    if params.get('start_lat') not in (None, '') or params.get('start_lng') not in (None, ''):
+        try:
+            start = (float(params['start_lat']), float(params['start_lng']))
+        except (KeyError, ValueError):
+            raise ValueError('start_lat and start_lng must both be numbers.')
+
+    start_time = None
+    if params.get('start_time'):
+        try:
+            start_time = parse_time(params['start_time'])
+        except ValueError:
+            start_time = None
+        if start_time is None:
+            raise ValueError('start_time must be a time (HH:MM).')
+
+    return delivery_date, start, start_time
+
+
+def delivery_stop(delivery):
+    """Route stop for a delivery loaded with ``select_related('order__store')``"""
+    store = delivery.order.store
+    return {
+        'id': delivery.id,
+        'order_id': delivery.order.order_id,
+        'store_name': store.name,
+        'address': store.location,
+        'lat': store.lat,
+        'lng': store.lng,
+        'status': delivery.status,
+        'delivery_time': delivery.delivery_time.strftime('%H:%M'),
+    }
+
+
+def plan_stops(stops, delivery_date, start=None, start_time=None, max_minutes=None):
+    """
+    Plan one driver's route through ``stops`` on ``delivery_date``.
+
+    The route starts at ``start_time``, or at the earliest scheduled
+    ``delivery_time`` of the stops. Without a start point it is driven from
+    the end scheduled first. Stops that would finish more than
+    ``max_minutes`` after the start are returned as ``unscheduled``.
+    """
+    if start_time is None:
+        start_time = min(datetime.strptime(stop['delivery_time'], '%H:%M').time() for stop in stops)
+    route = plan_route(
+        stops,
+        start=start,
+        start_time=datetime.combine(delivery_date, start_time),
+        speed_kmh=getattr(settings, 'DELIVERY_ROUTE_SPEED_KMH', DEFAULT_SPEED_KMH),
+        stop_minutes=getattr(settings, 'DELIVERY_STOP_MINUTES', DEFAULT_STOP_MINUTES),
+        key=lambda stop: stop['delivery_time'],
+        max_minutes=max_minutes
+    )
+    for stop in route['stops']:
+        stop['eta'] = stop['eta'].strftime('%H:%M')
+    route['start_time'] = start_time.strftime('%H:%M')
+    return route
+
+
+def plan_delivery_routes(deliveries, start=None, start_time=None):
+    """
+    Group ``deliveries`` by driver and plan a route for each group.
+
+    Deliveries must share one ``delivery_date`` and be loaded with
+    ``select_related('order__store', 'employee')``. Stores without
+    coordinates are left out. Unassigned deliveries form a route with
+    ``employee_id`` None.
+    """
+    groups = {}
+    delivery_date = None
+    for delivery in deliveries:
+        store = delivery.order.store
+        if store.lat is None or store.lng is None:
+            continue
+        delivery_date = delivery.delivery_date
+        group = groups.setdefault(delivery.employee_id, {'employee': delivery.employee, 'stops': []})
+        group['stops'].append(delivery_stop(delivery))
+
+    routes = []
+    for employee_id, group in groups.items():
+        employee = group['employee']
+        routes.append({
+            'employee_id': employee_id,
+            'employee_name': (employee.get_full_name() or employee.username) if employee else None,
+            **plan_stops(group['stops'], delivery_date, start=start, start_time=start_time),
+        })
+        # Without a shift limit every stop is scheduled
+        del routes[-1]['unscheduled']
+    # Assigned drivers first, in a stable order
+    routes.sort(key=lambda route: (route['employee_id'] is None, route['employee_id'] or 0))
+    return routes
@@ -0,0 +1,285 @@
+"""
+Delivery route planning.
+
+A route is an open path: the driver leaves an optional start point, visits
+every stop once and does not return. Stops are ordered with a
+nearest-neighbour seed, then improved with 2-opt (reversing a stretch of
+the route) and Or-opt (moving a run of one to three stops elsewhere, in
+either direction) until neither finds a shorter route. All moves are
+evaluated against a haversine distance matrix with NumPy, one vectorised
+pass per position.
+
+Stops for several drivers are first split with capacitated k-means
+(``cluster_stops``) and each cluster is then routed on its own.
+
+Internally the route is framed by two fixed nodes: the start (or a dummy
+node at distance 0 from every stop when there is no start, so the route
+may begin anywhere) and an end node at distance 0 from every stop, which
+makes the last leg free. This lets the closed-tour moves handle an open
+path without special cases.
+
+Nothing here touches the database.
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from apps.base.geo import EARTH_RADIUS_KM, haversine_matrix
+
+# Improvement passes give up after this many rounds even if still improving
+MAX_ROUNDS = 50
+# Ignore improvements smaller than this (km) to avoid floating point loops
+EPSILON = 1e-9
+
+
+def _framed_matrix(points, start=None):
+    """Distance matrix of the stops followed by the start node and the end node"""
+    n = len(points)
+    dist = np.zeros((n + 2, n + 2))
+    dist[:n, :n] = haversine_matrix(points)
+    if start is not None:
+        leg = haversine_matrix([start], points)[0]
+        dist[n, :n] = leg
+        dist[:n, n] = leg
+    return dist
+
+
+def path_length(route, dist):
+    route = np.asarray(route)
+    return float(dist[route[:-1], route[1:]].sum())
+
+
+def nearest_neighbour(dist, start, stops):
+    """Greedy route from ``start`` through ``stops`` (node indices of ``dist``)"""
+    remaining = np.array(stops)
+    route = [start]
+    current = start
+    while len(remaining):
+        nearest = int(np.argmin(dist[current, remaining]))
+        current = int(remaining[nearest])
+        route.append(current)
+        remaining = np.delete(remaining, nearest)
+    return route
+
+
+def two_opt(route, dist):
+    """Reverse stretches of the route while that shortens it; endpoints stay fixed"""
+    route = np.array(route)
+    size = len(route)
+    for _ in range(MAX_ROUNDS):
+        improved = False
+        for i in range(1, size - 2):
+            # Reverse route[i:j + 1] for every j at once
+            j = np.arange(i + 1, size - 1)
+            a, b = route[i - 1], route[i]
+            c, d = route[j], route[j + 1]
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            best = int(np.argmin(delta))
+            if delta[best] < -EPSILON:
+                end = j[best]
+                route[i:end + 1] = route[i:end + 1][::-1]
+                improved = True
+        if not improved:
+            break
+    return route.tolist()
+
+
+def or_opt(route, dist, max_segment=3):
+    """Move runs of up to ``max_segment`` stops, possibly reversed, while that shortens the route"""
+    route = list(route)
+    for _ in range(MAX_ROUNDS):
+        improved = False
+        for length in range(1, max_segment + 1):
+            i = 1
+            while i + length < len(route):
+                nodes = np.array(route)
+                first, last = nodes[i], nodes[i + length - 1]
+                before, after = nodes[i - 1], nodes[i + length]
+                gain = dist[before, first] + dist[last, after] - dist[before, after]
+
+                # Edges (k, k + 1) of the route left after removing the run
+                rest = np.concatenate([nodes[:i], nodes[i + length:]])
+                left, right = rest[:-1], rest[1:]
+                forward = dist[left, first] + dist[last, right] - dist[left, right]
+                backward = dist[left, last] + dist[first, right] - dist[left, right]
+                # Re-inserting where the run came from changes nothing
+                forward[i - 1] = backward[i - 1] = np.inf
+
+                k_forward, k_backward = int(np.argmin(forward)), int(np.argmin(backward))
+                if min(forward[k_forward], backward[k_backward]) < gain - EPSILON:
+                    segment = route[i:i + length]
+                    if backward[k_backward] < forward[k_forward]:
+                        k, segment = k_backward, segment[::-1]
+                    else:
+                        k = k_forward
+                    rest = rest.tolist()
+                    route = rest[:k + 1] + segment + rest[k + 1:]
+                    improved = True
+                else:
+                    i += 1
+        if not improved:
+            break
+    return route
+
+
+def optimise_route(points, start=None):
+    """
+    Return ``(order, distances)`` for visiting ``points``.
+
+    ``points`` are ``(lat, lng)`` pairs and ``start`` an optional ``(lat,
+    lng)`` the driver leaves from. ``order`` lists indices into ``points``
+    in visiting order and ``distances[k]`` is the distance in km driven
+    to reach stop ``order[k]`` (0 for the first stop without a start).
+    """
+    n = len(points)
+    if n == 0:
+        return [], []
+
+    dist = _framed_matrix(points, start)
+    start_node, end_node = n, n + 1
+    route = nearest_neighbour(dist, start_node, range(n)) + [end_node]
+
+    if n > 2:
+        # Alternate the two neighbourhoods until neither improves the route
+        length = path_length(route, dist)
+        for _ in range(MAX_ROUNDS):
+            route = or_opt(two_opt(route, dist), dist)
+            new_length = path_length(route, dist)
+            if new_length > length - EPSILON:
+                break
+            length = new_length
+
+    stops = route[1:-1]
+    distances = dist[route[:-2], stops].tolist()
+    return stops, distances
+
+
+def _project(points):
+    """Project ``(lat, lng)`` degrees onto a local plane in km"""
+    radians = np.radians(np.asarray(points, dtype=float).reshape(-1, 2))
+    scale = np.cos(radians[:, 0].mean())
+    return np.column_stack([radians[:, 0], radians[:, 1] * scale]) * EARTH_RADIUS_KM
+
+
+def _capacitated_assign(distances, capacity):
+    """Give each point its nearest centre that still has room; -1 when none has"""
+    n, k = distances.shape
+    labels = np.full(n, -1)
+    load = np.zeros(k, dtype=int)
+    assigned, limit = 0, min(n, k * capacity)
+    # Closest (point, centre) pairs first
+    for flat in np.argsort(distances, axis=None, kind='stable'):
+        point, centre = divmod(int(flat), k)
+        if labels[point] == -1 and load[centre] < capacity:
+            labels[point] = centre
+            load[centre] += 1
+            assigned += 1
+            if assigned == limit:
+                break
+    return labels
+
+
+def cluster_stops(points, k, capacity=None, max_iterations=25, seed=0):
+    """
+    Split ``points`` into at most ``k`` geographic clusters of at most
+    ``capacity`` points each.
+
+    Capacitated k-means: centres start from k-means++ and every iteration
+    assigns points to their nearest centre with room left. Returns an
+    array with a cluster label per point, -1 for points that did not fit.
+    """
+    n = len(points)
+    k = min(k, n)
+    if k == 0:
+        return np.full(n, -1)
+    capacity = capacity or n
+    xy = _project(points)
+    rng = np.random.default_rng(seed)
+
+    centres = [xy[rng.integers(n)]]
+    nearest = ((xy - centres[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = nearest.sum()
+        index = rng.choice(n, p=nearest / total) if total > 0 else rng.integers(n)
+        centres.append(xy[index])
+        nearest = np.minimum(nearest, ((xy - xy[index]) ** 2).sum(axis=1))
+    centres = np.array(centres)
+
+    labels = None
+    for _ in range(max_iterations):
+        distances = np.sqrt(((xy[:, None, :] - centres[None, :, :]) ** 2).sum(axis=2))
+        new_labels = _capacitated_assign(distances, capacity)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        for centre in range(k):
+            members = xy[labels == centre]
+            if len(members):
+                centres[centre] = members.mean(axis=0)
+    return labels
+
+
+def schedule(distances, start_time, speed_kmh, stop_minutes):
+    """
+    Arrival times for stops reached after driving ``distances`` km each.
+
+    The first stop is reached ``distances[0]`` km after ``start_time`` and
+    every stop takes ``stop_minutes`` before driving on.
+    """
+    etas = []
+    current = start_time
+    for index, distance in enumerate(distances):
+        if index:
+            current += timedelta(minutes=stop_minutes)
+        current += timedelta(hours=distance / speed_kmh)
+        etas.append(current)
+    return etas
+
+
+def plan_route(stops, start=None, start_time=None, speed_kmh=30, stop_minutes=10, key=None, max_minutes=None):
+    """
+    Order ``stops`` and work out distances and arrival times.
+
+    ``stops`` are dicts with at least ``lat`` and ``lng``; ``start_time``
+    is a datetime (default: midnight today). Without a ``start`` a route
+    is as long in either direction; it is then driven from the end whose
+    stop has the smaller ``key(stop)``, if given. Returns a dict with the
+    ordered stops, each extended with ``sequence``, ``distance_km``,
+    ``cumulative_distance_km`` and ``eta``, plus ``total_distance_km`` and
+    ``total_duration_minutes``. With ``max_minutes`` the route ends with
+    the last stop finished in time and the rest are returned, in route
+    order, as ``unscheduled``.
+    """
+    start_time = start_time or datetime.combine(datetime.today(), datetime.min.time())
+    order, distances = optimise_route([(stop['lat'], stop['lng']) for stop in stops], start)
+    if start is None and key is not None and len(order) > 1 and key(stops[order[-1]]) < key(stops[order[0]]):
+        order = order[::-1]
+        distances = [0.0] + distances[:0:-1]
+    etas = schedule(distances, start_time, speed_kmh, stop_minutes)
+
+    unscheduled = []
+    if max_minutes is not None:
+        deadline = start_time + timedelta(minutes=max_minutes - stop_minutes)
+        fits = sum(1 for eta in etas if eta <= deadline)
+        unscheduled = [stops[index] for index in order[fits:]]
+        order, distances, etas = order[:fits], distances[:fits], etas[:fits]
+
+    planned = []
+    cumulative = 0.0
+    for sequence, (index, distance, eta) in enumerate(zip(order, distances, etas), start=1):
+        cumulative += distance
+        planned.append({
+            **stops[index],
+            'sequence': sequence,
+            'distance_km': round(distance, 3),
+            'cumulative_distance_km': round(cumulative, 3),
+            'eta': eta,
+        })
+
+    finished = etas[-1] + timedelta(minutes=stop_minutes) if etas else start_time
+    return {
+        'stops': planned,
+        'total_distance_km': round(cumulative, 3),
+        'total_duration_minutes': round((finished - start_time).total_seconds() / 60, 1),
+        'unscheduled': unscheduled,
+    }
@@ -0,0 +1,134 @@
+"""
+Standing weekly schedule: draft orders and deliveries for every store due
+on a date.
+
+Every non-archived store whose ``day`` falls on the date gets a pending
+order and a pending delivery. Rows are inserted with ``bulk_create`` and
+their ids are derived from the date and the store, so running the
+scheduler again for the same date skips what already exists instead of
+duplicating it. Stores that already have a delivery on the date, for
+example one created by hand, are left alone.
+"""
+from datetime import time, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.orders.models import Order
+from apps.orders.signals import orders_bulk_created
+from apps.stores.models import Store
+from .models import Delivery, DeliveryStatusUpdate
+
+WEEKDAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+DEFAULT_DELIVERY_TIME = time(8, 0)
+
+
+def order_id_prefix(delivery_date):
+    return f"SCH-{delivery_date:%Y%m%d}-"
+
+
+def _scheduled_orders(delivery_date):
+    # A range rather than startswith so the unique order_id index is used
+    prefix = order_id_prefix(delivery_date)
+    return Order.objects.filter(order_id__gte=prefix, order_id__lt=prefix + '~')
+
+
+def due_stores(delivery_date):
+    """Ids of the stores that still need a delivery on ``delivery_date``"""
+    return list(
+        Store.objects
+        .filter(day=WEEKDAYS[delivery_date.weekday()], is_archived=False)
+        .exclude(orders__delivery__delivery_date=delivery_date)
+        .order_by('pk')
+        .values_list('pk', flat=True)
+    )
+
+
+def schedule_day(delivery_date, delivery_time=None, user=None, dry_run=False, batch_size=1000):
+    """
+    Create the draft orders and deliveries of ``delivery_date``.
+
+    Returns a dict with the number of ``stores`` due and the ``orders``
+    and ``deliveries`` created (or that would be, with ``dry_run``).
+    """
+    day = WEEKDAYS[delivery_date.weekday()]
+    prefix = order_id_prefix(delivery_date)
+    store_ids = due_stores(delivery_date)
+    scheduled = set(_scheduled_orders(delivery_date).values_list('store_id', flat=True))
+    orders = [
+        Order(
+            order_id=f"{prefix}{store_id}",
+            store_id=store_id,
+            user=user,
+            status='pending',
+            delivery_day=day,
+            notes=f"Scheduled {day} delivery for {delivery_date:%Y-%m-%d}"
+        )
+        for store_id in store_ids
+        if store_id not in scheduled
+    ]
+    result = {
+        'date': delivery_date,
+        'day': day,
+        'stores': len(store_ids),
+        'orders': len(orders),
+        'deliveries': len(store_ids),
+    }
+    if dry_run or not store_ids:
+        return result
+
+    with transaction.atomic():
+        # ignore_conflicts keeps a concurrent run from failing the batch
+        Order.objects.bulk_create(orders, batch_size=batch_size, ignore_conflicts=True)
+        order_pks = dict(
+            _scheduled_orders(delivery_date)
+            .filter(delivery__isnull=True)
+            .values_list('store_id', 'pk')
+        )
+        deliveries = [
+            Delivery(
+                id=f"DEL-{prefix}{store_id}",
+                order_id=order_pks[store_id],
+                status='pending',
+                delivery_date=delivery_date,
+                delivery_time=delivery_time or DEFAULT_DELIVERY_TIME
+            )
+            for store_id in store_ids
+            if store_id in order_pks
+        ]
+        Delivery.objects.bulk_create(deliveries, batch_size=batch_size, ignore_conflicts=True)
+        # ignore_conflicts drops the rows a concurrent run inserted first, so
+        # the history, the counts and the signal follow what this run wrote:
+        # its deliveries are the ones without a status history yet
+        created = dict(
+            Delivery.objects
+            .filter(id__in=[delivery.id for delivery in deliveries], status_updates__isnull=True)
+            .values_list('id', 'order_id')
+        )
+        # The status history normally started by post_save
+        now = timezone.now()
+        DeliveryStatusUpdate.objects.bulk_create([
+            DeliveryStatusUpdate(delivery_id=delivery_id, status='pending', update_time=now)
+            for delivery_id in created
+        ], batch_size=batch_size)
+        # Orders left over from a run whose delivery was removed were not created now
+        created_orders = list(
+            Order.objects
+            .filter(pk__in=list(created.values()))
+            .exclude(store_id__in=scheduled)
+            .order_by('pk')
+        )
+        result['orders'] = len(created_orders)
+        result['deliveries'] = len(created)
+
+        if created_orders:
+            # bulk_create skips post_save; let the dashboard catch up in one go
+            orders_bulk_created.send(sender=Order, orders=created_orders)
+
+    return result
+
+
+def schedule_days(start_date, days=7, **kwargs):
+    """Run ``schedule_day`` for ``days`` consecutive dates from ``start_date``"""
+    return [schedule_day(start_date + timedelta(days=offset), **kwargs) for offset in range(days)]
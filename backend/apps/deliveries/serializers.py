@@ -21,7 +21,8 @@ class DeliverySerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
-    has_signature = serializers.SerializerMethodField()
+    # The primary key is the delivery's public id
+    delivery_id = serializers.CharField(source='id', read_only=True)
     
     class Meta:
         model = Delivery
@@ -30,18 +31,7 @@ class DeliverySerializer(serializers.ModelSerializer):
             'status', 'delivery_date', 'delivery_time', 'notes', 'has_signature',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'delivery_id', 'created_at', 'updated_at']
-    
-    def get_has_signature(self, obj):
-        return bool(obj.signature)
-    
-    def create(self, validated_data):
-        # Generate delivery ID
-        import uuid
-        validated_data['delivery_id'] = f"DEL-{uuid.uuid4().hex[:8].upper()}"
-        
-        # Create delivery
-        return super().create(validated_data)
+        read_only_fields = ['id', 'delivery_id', 'has_signature', 'created_at', 'updated_at']
 
 class DeliveryStatusUpdateSerializer(serializers.Serializer):
     status = serializers.ChoiceField(choices=Delivery.STATUS_CHOICES)
@@ -56,4 +46,26 @@ class DeliveryStatusUpdateSerializer(serializers.Serializer):
             instance.notes = validated_data['notes']
         
         instance.save()
-        return instance
\ No newline at end of file
+        return instance
+
+class AutoAssignSerializer(serializers.Serializer):
+    delivery_date = serializers.DateField()
+    dry_run = serializers.BooleanField(default=False)
+    only_unassigned = serializers.BooleanField(default=False)
+    max_stops = serializers.IntegerField(min_value=1, required=False)
+    shift_minutes = serializers.IntegerField(min_value=1, max_value=24 * 60, required=False)
+    start_lat = serializers.FloatField(min_value=-90, max_value=90, required=False)
+    start_lng = serializers.FloatField(min_value=-180, max_value=180, required=False)
+    start_time = serializers.TimeField(required=False)
+    
+    def validate(self, data):
+        if ('start_lat' in data) != ('start_lng' in data):
+            raise serializers.ValidationError('start_lat and start_lng must be given together.')
+        return data
+
+
+class ScheduleSerializer(serializers.Serializer):
+    start_date = serializers.DateField()
+    days = serializers.IntegerField(min_value=1, max_value=14, default=1)
+    delivery_time = serializers.TimeField(required=False)
+    dry_run = serializers.BooleanField(default=False)
@@ -1,3 +1,505 @@
-from django.test import TestCase
+import csv
+import io
+import itertools
+import random
+from datetime import date, time
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.base.testing import QueryCountTestMixin, QueryPlanTestMixin
+from apps.dashboard.models import DailyStoreSalesRollup, RecentActivity
+from apps.orders.ingest import ingest_order
+from apps.orders.models import Order
+from apps.products.models import Category, Product
+from apps.stores.models import Store
+from . import scheduling
+from .models import Delivery, DeliveryStatusUpdate
+from .routing import haversine_matrix, optimise_route
+
+User = get_user_model()
+
+
+class DeliveryQueryPlanTests(QueryPlanTestMixin, TestCase):
+    def test_pending_count_uses_index(self):
+        """Test that counting pending deliveries does not scan the table"""
+        self.assertNoFullScan(Delivery.objects.filter(status='pending'))
+
+    def test_date_and_status_filters_use_index(self):
+        """Test that the delivery list filters do not scan the table"""
+        self.assertNoFullScan(Delivery.objects.filter(delivery_date=date(2025, 4, 7)))
+        self.assertNoFullScan(
+            Delivery.objects.filter(status='in-transit', delivery_date__range=[date(2025, 4, 1), date(2025, 4, 30)])
+        )
+
+    def test_employee_schedule_uses_index(self):
+        """Test that a driver's deliveries for a date range do not scan the table"""
+        employee = User.objects.create_user(username='driver', password='testpassword123')
+        self.assertNoFullScan(
+            Delivery.objects.filter(employee=employee, delivery_date__gte=date(2025, 4, 1))
+        )
+
+
+class DeliveryExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        for day in (7, 8):
+            order = Order.objects.create(order_id=f'ORD-{day:03d}', store=store, delivery_day='Monday')
+            Delivery.objects.create(order=order, delivery_date=date(2025, 4, day), delivery_time=time(9, 30))
+
+    def test_csv_export_honours_date_filter(self):
+        """Test that the delivery export streams only the filtered dates"""
+        response = self.client.get('/api/deliveries/deliveries/export/?delivery_date=2025-04-07')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['order_id'], 'ORD-007')
+        self.assertEqual(rows[0]['store_name'], 'Test Store')
+        self.assertEqual(rows[0]['delivery_time'], '09:30:00')
+
+
+class RoutingTests(SimpleTestCase):
+    def test_haversine_distance(self):
+        """Test the distance matrix against a known great-circle distance"""
+        manila, cebu = (14.5995, 120.9842), (10.3157, 123.8854)
+        distances = haversine_matrix([manila, cebu])
+        self.assertAlmostEqual(distances[0, 1], 571.0, delta=1)
+        self.assertAlmostEqual(distances[1, 0], distances[0, 1])
+        self.assertEqual(distances[0, 0], 0)
+
+    def test_route_is_close_to_optimal(self):
+        """Test that small routes are within a few percent of the brute-force optimum"""
+        rng = random.Random(0)
+        for trial in range(30):
+            points = [(14.5 + rng.random() * 0.2, 120.9 + rng.random() * 0.2) for _ in range(6)]
+            start = (14.6, 121.0) if trial % 2 else None
+            order, distances = optimise_route(points, start)
+            self.assertEqual(sorted(order), list(range(6)))
+
+            matrix = haversine_matrix(points)
+            first = haversine_matrix([start], points)[0] if start else [0] * 6
+
+            def length(route):
+                return first[route[0]] + sum(matrix[a, b] for a, b in zip(route, route[1:]))
+
+            self.assertAlmostEqual(sum(distances), length(order))
+            best = min(length(route) for route in itertools.permutations(range(6)))
+            self.assertLessEqual(sum(distances), best * 1.05)
+
+    def test_collinear_stops_are_visited_in_line(self):
+        """Test that stops on a line are visited end to end from the start"""
+        points = [(14.0 + i * 0.01, 121.0) for i in (3, 0, 4, 1, 2)]
+        order, _ = optimise_route(points, start=(13.99, 121.0))
+        self.assertEqual(order, [1, 3, 4, 0, 2])
+
+
+class DeliveryRouteTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.driver = User.objects.create_user(
+            username='driver', password='testpassword123', role='delivery_driver',
+            first_name='Dan', last_name='Driver'
+        )
+        # Stops due north of each other, 0.01 degrees (about 1.1 km) apart
+        for i, offset in enumerate((3, 0, 2, 1)):
+            store = Store.objects.create(
+                name=f'Store {offset}',
+                location=f'Location {offset}',
+                lat=14.0 + offset * 0.01,
+                lng=121.0,
+                owner_name='Owner',
+                number='09123456789',
+                day='Monday'
+            )
+            order = Order.objects.create(order_id=f'ORD-{i:03d}', store=store, delivery_day='Monday')
+            Delivery.objects.create(
+                order=order,
+                employee=self.driver if offset != 1 else None,
+                delivery_date=date(2025, 4, 7),
+                delivery_time=time(8 + i, 0)
+            )
+
+    def test_routes_are_optimised_per_driver(self):
+        """Test that each driver's stops come back in route order with distances and ETAs"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(
+                '/api/deliveries/deliveries/routes/?delivery_date=2025-04-07&start_time=08:00'
+            )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+        driver_route, unassigned = response.data['routes']
+        self.assertEqual(driver_route['employee_id'], self.driver.pk)
+        self.assertEqual(driver_route['employee_name'], 'Dan Driver')
+        # Store 3 is scheduled before Store 0, so the line is driven from there
+        self.assertEqual([stop['store_name'] for stop in driver_route['stops']], ['Store 3', 'Store 2', 'Store 0'])
+        self.assertEqual([stop['sequence'] for stop in driver_route['stops']], [1, 2, 3])
+        self.assertAlmostEqual(driver_route['total_distance_km'], 3.34, places=2)
+
+        # 30 km/h and 10 minutes per stop: 1.1 km takes 2.2 minutes
+        self.assertEqual([stop['eta'] for stop in driver_route['stops']], ['08:00', '08:12', '08:26'])
+        self.assertEqual(driver_route['start_time'], '08:00')
+
+        self.assertIsNone(unassigned['employee_id'])
+        self.assertEqual([stop['store_name'] for stop in unassigned['stops']], ['Store 1'])
+
+    def test_route_from_start_point(self):
+        """Test that a route with a start point is driven from there"""
+        response = self.client.get(
+            '/api/deliveries/deliveries/routes/',
+            {'delivery_date': '2025-04-07', 'employee_id': self.driver.pk, 'start_lat': 13.95, 'start_lng': 121.0}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        route, = response.data['routes']
+        self.assertEqual([stop['store_name'] for stop in route['stops']], ['Store 0', 'Store 2', 'Store 3'])
+        self.assertAlmostEqual(route['stops'][0]['distance_km'], 5.56, places=2)
+        # Starts at the earliest scheduled delivery time
+        self.assertEqual(route['start_time'], '08:00')
+
+    def test_zero_coordinates_are_real(self):
+        """Test that a store or start point on the equator is routed rather than treated as missing"""
+        Store.objects.filter(name='Store 0').update(lat=0.0)
+
+        response = self.client.get(
+            '/api/deliveries/deliveries/routes/',
+            {'delivery_date': '2025-04-07', 'employee_id': self.driver.pk, 'start_lat': 0, 'start_lng': 121.0}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        route, = response.data['routes']
+        self.assertEqual([stop['store_name'] for stop in route['stops']], ['Store 0', 'Store 2', 'Store 3'])
+        self.assertEqual(route['stops'][0]['distance_km'], 0)
+
+    def test_invalid_parameters(self):
+        """Test that bad route parameters are rejected"""
+        url = '/api/deliveries/deliveries/routes/'
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.get(url, {'delivery_date': 'monday'}).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            self.client.get(url, {'delivery_date': '2025-04-07', 'start_lat': 14}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+        self.assertEqual(
+            self.client.get(url, {'delivery_date': '2025-04-07', 'start_time': '25:00'}).status_code,
+            status.HTTP_400_BAD_REQUEST
+        )
+
+
+class AutoAssignTests(TestCase):
+    url = '/api/deliveries/deliveries/auto-assign/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.drivers = [
+            User.objects.create_user(username=f'driver{i}', password='testpassword123', role='delivery_driver')
+            for i in range(2)
+        ]
+        User.objects.create_user(username='away', password='testpassword123', role='delivery_driver', status='inactive')
+
+        # Two groups of three stores, about 50 km apart
+        self.deliveries = {}
+        for area, lat in (('north', 14.9), ('south', 14.45)):
+            for i in range(3):
+                store = Store.objects.create(
+                    name=f'{area} {i}',
+                    location=area,
+                    lat=lat + i * 0.005,
+                    lng=121.0,
+                    owner_name='Owner',
+                    number='09123456789',
+                    day='Monday'
+                )
+                order = Order.objects.create(order_id=f'ORD-{area}-{i}', store=store, delivery_day='Monday')
+                self.deliveries[store.name] = Delivery.objects.create(
+                    order=order, delivery_date=date(2025, 4, 7), delivery_time=time(8, 0)
+                )
+        delivered = self.deliveries['north 2']
+        delivered.status = 'delivered'
+        delivered.save()
+
+    def areas(self, route):
+        return {stop['store_name'].split()[0] for stop in route['stops']}
+
+    def test_dry_run_splits_areas_without_writing(self):
+        """Test that the preview gives each driver one area and changes nothing"""
+        response = self.client.post(self.url, {'delivery_date': '2025-04-07', 'dry_run': True}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['drivers'], 2)
+        self.assertEqual(response.data['deliveries'], 5)
+        self.assertEqual(response.data['changed'], 5)
+        self.assertEqual(response.data['updated'], 0)
+        routes = response.data['routes']
+        self.assertEqual([route['employee_id'] for route in routes], [driver.pk for driver in self.drivers])
+        self.assertEqual(sorted(len(route['stops']) for route in routes), [2, 3])
+        self.assertTrue(all(len(self.areas(route)) == 1 for route in routes))
+        self.assertFalse(Delivery.objects.filter(employee__isnull=False).exists())
+
+    def test_store_on_the_equator_is_assigned(self):
+        """Test that a store at latitude 0 is planned like any other"""
+        Store.objects.filter(name='south 0').update(lat=0.0)
+
+        response = self.client.post(self.url, {'delivery_date': '2025-04-07', 'dry_run': True}, format='json')
+
+        self.assertEqual(response.data['unassigned'], [])
+        self.assertIn(
+            self.deliveries['south 0'].pk,
+            [stop['id'] for route in response.data['routes'] for stop in route['stops']]
+        )
+
+    def test_assignment_is_written_in_one_update(self):
+        """Test that applying the plan writes every driver with a single bulk update"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'delivery_date': '2025-04-07'}, format='json')
+
+        self.assertEqual(response.data['updated'], 5)
+        updates = [query for query in ctx.captured_queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        for route in response.data['routes']:
+            ids = [stop['id'] for stop in route['stops']]
+            self.assertEqual(
+                set(Delivery.objects.filter(pk__in=ids).values_list('employee_id', flat=True)),
+                {route['employee_id']}
+            )
+        self.assertIsNone(Delivery.objects.get(pk=self.deliveries['north 2'].pk).employee_id)
+
+        # Planning again keeps everyone where they are
+        response = self.client.post(self.url, {'delivery_date': '2025-04-07'}, format='json')
+        self.assertEqual(response.data['changed'], 0)
+        self.assertEqual(response.data['updated'], 0)
+
+    def test_capacity_and_shift_limits(self):
+        """Test that stops over the per-driver limit or past the shift stay unassigned"""
+        response = self.client.post(
+            self.url, {'delivery_date': '2025-04-07', 'dry_run': True, 'max_stops': 2}, format='json'
+        )
+        self.assertEqual(sum(len(route['stops']) for route in response.data['routes']), 4)
+        self.assertEqual([stop['reason'] for stop in response.data['unassigned']], ['capacity'])
+
+        # 10 minutes per stop: only two stops fit in 25 minutes
+        response = self.client.post(
+            self.url, {'delivery_date': '2025-04-07', 'dry_run': True, 'shift_minutes': 25}, format='json'
+        )
+        self.assertTrue(all(len(route['stops']) <= 2 for route in response.data['routes']))
+        self.assertEqual([stop['reason'] for stop in response.data['unassigned']], ['shift'])
+
+    def test_unassigned_stops_lose_their_driver(self):
+        """Test that applying a plan clears the driver of the stops it could not assign"""
+        Delivery.objects.filter(status='pending').update(employee=self.drivers[0])
+
+        response = self.client.post(self.url, {'delivery_date': '2025-04-07', 'max_stops': 2}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        left_out = [stop['id'] for stop in response.data['unassigned']]
+        self.assertEqual(len(left_out), 1)
+        self.assertIsNone(Delivery.objects.get(pk=left_out[0]).employee_id)
+        self.assertEqual(
+            Delivery.objects.filter(status='pending', employee__isnull=False).count(),
+            sum(len(route['stops']) for route in response.data['routes'])
+        )
+
+        # The applied state matches the plan, so planning again changes nothing
+        response = self.client.post(self.url, {'delivery_date': '2025-04-07', 'max_stops': 2}, format='json')
+        self.assertEqual((response.data['changed'], response.data['updated']), (0, 0))
+
+    def test_only_unassigned(self):
+        """Test that only_unassigned leaves existing assignments alone"""
+        kept = self.deliveries['south 0']
+        kept.employee = self.drivers[1]
+        kept.save()
+
+        response = self.client.post(
+            self.url, {'delivery_date': '2025-04-07', 'only_unassigned': True}, format='json'
+        )
+        self.assertEqual(response.data['deliveries'], 4)
+        self.assertEqual(Delivery.objects.get(pk=kept.pk).employee, self.drivers[1])
+
+    def test_invalid_request(self):
+        """Test that a missing date or half a start point is rejected"""
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'delivery_date': '2025-04-07', 'start_lat': 14.5}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ScheduleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.monday = date(2025, 4, 7)
+
+        self.stores = {}
+        for name, day, archived in (
+            ('due 1', 'Monday', False),
+            ('due 2', 'Monday', False),
+            ('archived', 'Monday', True),
+            ('manual', 'Monday', False),
+            ('tuesday', 'Tuesday', False),
+        ):
+            self.stores[name] = self.create_store(name, day, archived)
+
+        order = Order.objects.create(order_id='ORD-MANUAL', store=self.stores['manual'], delivery_day='Monday')
+        Delivery.objects.create(order=order, delivery_date=self.monday, delivery_time=time(10, 0))
+
+    def create_store(self, name, day, archived=False):
+        return Store.objects.create(
+            name=name,
+            location='Location',
+            lat=14.6,
+            lng=121.0,
+            owner_name='Owner',
+            number='09123456789',
+            day=day,
+            is_archived=archived
+        )
+
+    def scheduled_stores(self, delivery_date):
+        return sorted(
+            Delivery.objects
+            .filter(delivery_date=delivery_date, order__order_id__startswith='SCH-')
+            .values_list('order__store__name', flat=True)
+        )
+
+    def test_schedule_is_idempotent(self):
+        """Test that a day is scheduled once for each due store, however often it runs"""
+        response = self.client.post(
+            '/api/deliveries/deliveries/schedule/',
+            {'start_date': '2025-04-07', 'delivery_time': '09:00'},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['orders'], 2)
+        self.assertEqual(response.data['deliveries'], 2)
+        self.assertEqual(self.scheduled_stores(self.monday), ['due 1', 'due 2'])
+
+        delivery = Delivery.objects.get(order__order_id=f"SCH-20250407-{self.stores['due 1'].pk}")
+        self.assertEqual(delivery.status, 'pending')
+        self.assertEqual(delivery.delivery_time, time(9, 0))
+        self.assertEqual(delivery.order.user, self.user)
+        self.assertEqual(delivery.order.delivery_day, 'Monday')
+        self.assertTrue(DeliveryStatusUpdate.objects.filter(delivery=delivery, status='pending').exists())
+        self.assertEqual(
+            sum(DailyStoreSalesRollup.objects.values_list('order_count', flat=True)),
+            Order.objects.count()
+        )
+
+        response = self.client.post('/api/deliveries/deliveries/schedule/', {'start_date': '2025-04-07'}, format='json')
+        self.assertEqual(response.data['orders'], 0)
+        self.assertEqual(response.data['deliveries'], 0)
+        self.assertEqual(Order.objects.filter(order_id__startswith='SCH-').count(), 2)
+
+    def test_concurrent_run_is_not_counted_twice(self):
+        """Test that rows another run inserted first are left out of the counts, history and signal"""
+        bulk_create = QuerySet.bulk_create
+        races = [True]
+
+        def racing(queryset, objs, *args, **kwargs):
+            if races and queryset.model is Order:
+                # Another run schedules the day just before this one inserts
+                races.pop()
+                scheduling.schedule_day(self.monday)
+            return bulk_create(queryset, objs, *args, **kwargs)
+
+        with mock.patch.object(QuerySet, 'bulk_create', autospec=True, side_effect=racing):
+            result = scheduling.schedule_day(self.monday)
+
+        self.assertEqual((result['stores'], result['orders'], result['deliveries']), (2, 0, 0))
+        self.assertEqual(self.scheduled_stores(self.monday), ['due 1', 'due 2'])
+        self.assertEqual(
+            DeliveryStatusUpdate.objects.filter(delivery__order__order_id__startswith='SCH-').count(), 2
+        )
+        self.assertEqual(RecentActivity.objects.filter(title__endswith='orders scheduled').count(), 1)
+
+    def test_dry_run(self):
+        """Test that a dry run reports the work without writing anything"""
+        response = self.client.post(
+            '/api/deliveries/deliveries/schedule/',
+            {'start_date': '2025-04-07', 'days': 2, 'dry_run': True},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([day['stores'] for day in response.data['days']], [2, 1])
+        self.assertEqual(response.data['orders'], 3)
+        self.assertFalse(Order.objects.filter(order_id__startswith='SCH-').exists())
+
+    def test_query_count_does_not_grow_with_stores(self):
+        """Test that scheduling more stores uses the same number of queries"""
+        with CaptureQueriesContext(connection) as small:
+            call_command('generate_schedule', '--start', '2025-04-07', '--days', '1', stdout=StringIO())
+
+        for i in range(20):
+            self.create_store(f'more {i}', 'Monday')
+        with CaptureQueriesContext(connection) as large:
+            call_command('generate_schedule', '--start', '2025-04-14', '--days', '1', stdout=StringIO())
+
+        self.assertEqual(len(self.scheduled_stores(date(2025, 4, 14))), 23)
+        self.assertEqual(len(large.captured_queries), len(small.captured_queries))
+
+    def test_week_command(self):
+        """Test that the command schedules every day of the week"""
+        out = StringIO()
+        call_command('generate_schedule', '--start', '2025-04-07', stdout=out)
+
+        self.assertIn('Created 3 orders and 3 deliveries', out.getvalue())
+        self.assertEqual(self.scheduled_stores(date(2025, 4, 8)), ['tuesday'])
+
+
+class DeliveryQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.driver = User.objects.create_user(username='driver', password='testpassword123', role='delivery_driver')
+        self.store = Store.objects.create(
+            name='Store', location='Location', lat=14.6, lng=121.0,
+            owner_name='Owner', number='09123456789', day='Monday'
+        )
+        category = Category.objects.create(name='Soft Drinks')
+        self.products = [
+            Product.objects.create(product_id=f'P-{i:03d}', name=f'Product {i}', category=category, price=10)
+            for i in range(3)
+        ]
+
+    def create_deliveries(self, count):
+        items = [{'product': product, 'quantity': 1} for product in self.products]
+        for _ in range(count):
+            order = ingest_order(self.store, items, user=self.user)
+            Delivery.objects.create(
+                order=order, employee=self.driver, delivery_date=date(2025, 4, 7), delivery_time=time(8, 0)
+            )
+
+    def test_list_queries_do_not_grow_with_deliveries(self):
+        """Test that listing deliveries with their nested orders costs constant queries"""
+        response = self.assertConstantQueries(
+            lambda: self.client.get('/api/deliveries/deliveries/'), self.create_deliveries, max_queries=4
+        )
+
+        self.assertEqual(response.data[0]['employee'], str(self.driver))
+        self.assertEqual(len(response.data[0]['order']['items']), 3)
@@ -3,19 +3,47 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db.models import Prefetch
+from apps.base.exports import ExportMixin
+from .assignment import apply_assignment, plan_assignment
+from apps.orders.models import OrderItem
 from .models import Delivery
-from .serializers import DeliverySerializer, DeliveryStatusUpdateSerializer
+from .planning import parse_route_params, plan_delivery_routes
+from .scheduling import schedule_days
+from .serializers import AutoAssignSerializer, DeliverySerializer, DeliveryStatusUpdateSerializer, ScheduleSerializer
 from django.core.files.base import ContentFile
 import base64
 import uuid
 
-class DeliveryViewSet(viewsets.ModelViewSet):
+class DeliveryViewSet(ExportMixin, viewsets.ModelViewSet):
     queryset = Delivery.objects.all()
     serializer_class = DeliverySerializer
     permission_classes = [IsAuthenticated]
+    export_filename = 'deliveries'
+    export_fields = [
+        ('id', 'id'),
+        ('order_id', 'order__order_id'),
+        ('store_name', 'order__store__name'),
+        ('employee', 'employee__username'),
+        ('status', 'status'),
+        ('delivery_date', 'delivery_date'),
+        ('delivery_time', 'delivery_time'),
+        ('has_signature', 'has_signature'),
+        ('lat', 'lat'),
+        ('lng', 'lng'),
+    ]
     
     def get_queryset(self):
-        queryset = Delivery.objects.all()
+        # Load the nested order with its store, items and product graph up
+        # front so the serializer does not query per delivery or per item
+        queryset = Delivery.objects.select_related('order__store', 'order__user', 'employee').prefetch_related(
+            Prefetch(
+                'order__items',
+                queryset=OrderItem.objects.select_related(
+                    'product__category', 'product__supplier', 'product__inventory'
+                )
+            )
+        )
         
         # Filter by status
         status = self.request.query_params.get('status')
@@ -104,7 +132,7 @@ class DeliveryViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def routes(self, request):
-        """Get delivery routes for a specific date and employee."""
+        """Get optimised delivery routes per driver for a specific date."""
         delivery_date = request.query_params.get('delivery_date')
         employee_id = request.query_params.get('employee_id')
         
@@ -114,26 +142,66 @@ class DeliveryViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        queryset = self.get_queryset().filter(delivery_date=delivery_date)
+        try:
+            delivery_date, start, start_time = parse_route_params(request.query_params)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # One query for every stop with its order, store and driver; routes
+        # do not read the order items the list prefetches
+        queryset = self.get_queryset().prefetch_related(None).filter(delivery_date=delivery_date)
         
         if employee_id:
             queryset = queryset.filter(employee_id=employee_id)
         
-        # Get store locations for route planning
-        routes = []
-        for delivery in queryset:
-            store = delivery.order.store
-            if store.lat and store.lng:
-                routes.append({
-                    'id': delivery.id,
-                    'delivery_id': delivery.delivery_id,
-                    'order_id': delivery.order.order_id,
-                    'store_name': store.name,
-                    'address': store.location,
-                    'lat': store.lat,
-                    'lng': store.lng,
-                    'status': delivery.status,
-                    'delivery_time': delivery.delivery_time.strftime('%H:%M')
-                })
-        
-        return Response(routes)
\ No newline at end of file
+        return Response({
+            'delivery_date': delivery_date,
+            'routes': plan_delivery_routes(queryset, start=start, start_time=start_time)
+        })
+    
+    @action(detail=False, methods=['post'], url_path='auto-assign')
+    def auto_assign(self, request):
+        """Split a day's pending deliveries between the active drivers, or preview it with dry_run."""
+        serializer = AutoAssignSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        start = (data['start_lat'], data['start_lng']) if 'start_lat' in data else None
+        plan = plan_assignment(
+            data['delivery_date'],
+            only_unassigned=data['only_unassigned'],
+            max_stops=data.get('max_stops'),
+            shift_minutes=data.get('shift_minutes'),
+            start=start,
+            start_time=data.get('start_time')
+        )
+        
+        updated = 0 if data['dry_run'] else apply_assignment(plan)
+        plan.pop('assignments')
+        
+        return Response({**plan, 'dry_run': data['dry_run'], 'updated': updated})
+    
+    @action(detail=False, methods=['post'])
+    def schedule(self, request):
+        """Create draft orders and deliveries for every store due on the given days."""
+        serializer = ScheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        results = schedule_days(
+            data['start_date'],
+            data['days'],
+            delivery_time=data.get('delivery_time'),
+            user=request.user,
+            dry_run=data['dry_run']
+        )
+        
+        return Response(
+            {
+                'dry_run': data['dry_run'],
+                'orders': sum(result['orders'] for result in results),
+                'deliveries': sum(result['deliveries'] for result in results),
+                'days': results
+            },
+            status=status.HTTP_200_OK if data['dry_run'] else status.HTTP_201_CREATED
+        )
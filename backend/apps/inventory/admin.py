@@ -1,13 +1,13 @@
 from django.contrib import admin
-from .models import Inventory, InventoryTransaction, ProductExpiry
+from .models import BatchAllocation, DemandForecast, Inventory, InventoryTransaction, LowStockEvent, ProductExpiry, StockSnapshot
 
 
 @admin.register(Inventory)
 class InventoryAdmin(admin.ModelAdmin):
     list_display = ('product', 'quantity', 'reorder_level', 'is_low_stock', 'last_checked')
-    list_filter = ('reorder_level',)  # Changed from 'is_low_stock' to an actual field
+    list_filter = ('is_low_stock', 'reorder_level')
     search_fields = ('product__name',)
-    readonly_fields = ('last_checked', 'is_low_stock')  # Added 'is_low_stock' to readonly_fields
+    readonly_fields = ('last_checked', 'is_low_stock')
 
 
 @admin.register(InventoryTransaction)
@@ -18,6 +18,23 @@ class InventoryTransactionAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(LowStockEvent)
+class LowStockEventAdmin(admin.ModelAdmin):
+    list_display = ('product', 'kind', 'quantity', 'reorder_level', 'created_at')
+    list_filter = ('kind', 'created_at')
+    search_fields = ('product__name',)
+    date_hierarchy = 'created_at'
+    raw_id_fields = ('product',)
+
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('product', 'date', 'quantity')
+    search_fields = ('product__name',)
+    date_hierarchy = 'date'
+    raw_id_fields = ('product',)
+
+
 @admin.register(ProductExpiry)
 class ProductExpiryAdmin(admin.ModelAdmin):
     list_display = ('product', 'batch_number', 'quantity', 'expiry_date', 'is_active')
@@ -25,3 +42,16 @@ class ProductExpiryAdmin(admin.ModelAdmin):
     search_fields = ('product__name', 'batch_number')
     date_hierarchy = 'expiry_date'
 
+
+@admin.register(BatchAllocation)
+class BatchAllocationAdmin(admin.ModelAdmin):
+    list_display = ('batch', 'transaction', 'quantity', 'created_at')
+    search_fields = ('batch__batch_number', 'transaction__reference')
+    raw_id_fields = ('batch', 'transaction')
+
+
+@admin.register(DemandForecast)
+class DemandForecastAdmin(admin.ModelAdmin):
+    list_display = ('product', 'store', 'daily_demand', 'reorder_point', 'reorder_quantity', 'computed_on')
+    search_fields = ('product__name', 'store__name')
+    raw_id_fields = ('product', 'store')
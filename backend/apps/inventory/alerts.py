@@ -0,0 +1,75 @@
+"""
+Low-stock flag and transition events.
+
+``Inventory.is_low_stock`` is stored rather than computed so low stock can
+be listed and counted from a partial index. It is kept equal to
+``quantity <= reorder_level`` by ``Inventory.save`` and, for the counters
+moved with queryset updates, by ``refresh_low_stock``, which
+``apply_stock_deltas`` and the reconciliation run on the products they
+touch.
+
+Every flip of the flag appends a LowStockEvent and, once the transaction
+commits, sends ``low_stock_changed`` with the new events.
+
+Low stock is read from inventory rows only. Products created through the
+API get their row with the product, and stock movements create any row
+still missing, so a product that has never been stocked is counted too.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.lookups import LessThanOrEqual
+
+from .models import Inventory, LowStockEvent
+from .signals import low_stock_changed
+
+# Rows whose stored flag no longer matches their quantity
+STALE_FLAG = (
+    Q(is_low_stock=True, quantity__gt=F('reorder_level'))
+    | Q(is_low_stock=False, quantity__lte=F('reorder_level'))
+)
+
+
+def low_stock_expression():
+    return LessThanOrEqual(F('quantity'), F('reorder_level'))
+
+
+def record_transitions(changes):
+    """
+    Record a LowStockEvent for each ``(product_id, quantity, reorder_level,
+    was_low)`` whose new quantity puts it on the other side of its reorder
+    level. Returns the events.
+    """
+    events = []
+    for product_id, quantity, reorder_level, was_low in changes:
+        is_low = quantity <= reorder_level
+        if is_low != was_low:
+            events.append(LowStockEvent(
+                product_id=product_id,
+                kind=LowStockEvent.KIND_BELOW if is_low else LowStockEvent.KIND_RECOVERED,
+                quantity=quantity,
+                reorder_level=reorder_level
+            ))
+    if events:
+        LowStockEvent.objects.bulk_create(events)
+        transaction.on_commit(lambda: low_stock_changed.send(sender=LowStockEvent, events=events))
+    return events
+
+
+def refresh_low_stock(product_ids=None):
+    """
+    Bring the low-stock flag of the given products', or every product's,
+    inventory in line with its quantity and record the transitions.
+
+    Only the rows whose flag is stale are read and written, so after a
+    stock change that leaves every product on the same side of its
+    reorder level this is a single SELECT returning nothing.
+    """
+    stale = Inventory.objects.filter(STALE_FLAG)
+    if product_ids is not None:
+        stale = stale.filter(product_id__in=product_ids)
+    rows = list(stale.values_list('pk', 'product_id', 'quantity', 'reorder_level', 'is_low_stock'))
+    if not rows:
+        return []
+    with transaction.atomic():
+        Inventory.objects.filter(pk__in=[row[0] for row in rows]).update(is_low_stock=low_stock_expression())
+        return record_transitions(row[1:] for row in rows)
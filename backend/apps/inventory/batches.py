@@ -0,0 +1,148 @@
+"""
+First-expiry-first-out batch allocation.
+
+Stock-out transactions are spread over the product's ProductExpiry
+batches, soonest expiry first. Only active batches that have not expired
+yet are used; a batch that runs out is deactivated, so later allocations
+never walk past exhausted batches. Stock that no batch covers is simply
+left unallocated; the stock counters are moved by the transaction either
+way.
+
+However many transactions and products are allocated together, the work
+is a constant number of queries. One query reads just the batches needed,
+using a running total of batch quantities per product, in the order of
+the (product, is_active, expiry_date) index, and a second locks and
+rereads them where the database supports it. One UPDATE decrements those
+batches and one INSERT records the BatchAllocation rows. Allocation is
+meant to run in the transaction that recorded the stock-out, which holds
+the product locks taken by ``apply_stock_deltas``. When a concurrent
+allocation emptied some of the chosen batches before they were locked,
+the next batches are read and locked the same way until the quantity is
+covered or no batches are left.
+"""
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When, Window
+from django.utils import timezone
+
+from .models import BatchAllocation, ProductExpiry
+
+
+def _needed_expression(needed):
+    return Case(
+        *[When(product_id=product_id, then=Value(quantity)) for product_id, quantity in needed.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def sellable_batches(product_ids, day=None):
+    """Active, unexpired batches of ``product_ids`` with stock left, by product in FEFO order"""
+    return (
+        ProductExpiry.objects
+        .filter(
+            product_id__in=product_ids,
+            is_active=True,
+            expiry_date__gte=day or timezone.localdate(),
+            quantity__gt=0
+        )
+        .order_by('product_id', 'expiry_date', 'pk')
+    )
+
+
+def _candidates(needed, day, exclude=()):
+    """``(pk, product_id, quantity)`` of the batches, in FEFO order, up to the ones that cover ``needed``"""
+    return list(
+        sellable_batches(needed, day)
+        .exclude(pk__in=exclude)
+        .annotate(taken_before=Window(
+            Sum('quantity'),
+            partition_by=[F('product_id')],
+            order_by=[F('expiry_date').asc(), F('pk').asc()]
+        ) - F('quantity'))
+        .filter(taken_before__lt=_needed_expression(needed))
+        .values_list('pk', 'product_id', 'quantity')
+    )
+
+
+def allocate_batches(transactions, day=None):
+    """
+    Allocate saved stock-out ``transactions`` to batches, first expiry first.
+
+    Transactions of the same product are served in the order given.
+    Returns the BatchAllocation rows created.
+    """
+    transactions = [txn for txn in transactions if txn.transaction_type == 'out' and txn.quantity > 0]
+    needed = {}
+    for txn in transactions:
+        needed[txn.product_id] = needed.get(txn.product_id, 0) + txn.quantity
+    if not needed:
+        return []
+
+    with transaction.atomic():
+        left = {}
+        queues = {}
+        short = dict(needed)
+        while short:
+            # Window queries cannot lock rows; lock and reread the chosen batches
+            rows = _candidates(short, day, exclude=list(left))
+            locked = dict(
+                ProductExpiry.objects.select_for_update()
+                .filter(pk__in=[pk for pk, _, _ in rows], is_active=True)
+                .order_by('pk')
+                .values_list('pk', 'quantity')
+            ) if rows else {}
+            shrunk = False
+            for pk, product_id, quantity in rows:
+                left[pk] = locked.get(pk, 0)
+                queues.setdefault(product_id, []).append(pk)
+                short[product_id] -= left[pk]
+                shrunk = shrunk or left[pk] < quantity
+            # Batches taken by a concurrent allocation since the read leave
+            # the quantity short; the next batches may still cover it
+            if not shrunk:
+                break
+            short = {product_id: quantity for product_id, quantity in short.items() if quantity > 0}
+
+        allocations = []
+        taken = {}
+        for txn in transactions:
+            remaining = txn.quantity
+            queue = queues.get(txn.product_id, [])
+            while remaining and queue:
+                pk = queue[0]
+                quantity = min(remaining, left[pk])
+                if quantity:
+                    allocations.append(BatchAllocation(transaction=txn, batch_id=pk, quantity=quantity))
+                    taken[pk] = taken.get(pk, 0) + quantity
+                    left[pk] -= quantity
+                    remaining -= quantity
+                if not left[pk]:
+                    queue.pop(0)
+        if not taken:
+            return []
+
+        exhausted = [pk for pk in taken if not left[pk]]
+        ProductExpiry.objects.filter(pk__in=taken).update(
+            quantity=F('quantity') - Case(
+                *[When(pk=pk, then=Value(quantity)) for pk, quantity in taken.items()],
+                default=Value(0),
+                output_field=IntegerField()
+            ),
+            is_active=Case(
+                When(pk__in=exhausted, then=Value(False)),
+                default=F('is_active')
+            )
+        )
+        return BatchAllocation.objects.bulk_create(allocations)
+
+
+def near_expiry(days, day=None):
+    """Active batches with stock left expiring within ``days`` days, expired ones included, soonest first"""
+    day = day or timezone.localdate()
+    return (
+        ProductExpiry.objects
+        .filter(is_active=True, expiry_date__lte=day + timedelta(days=days), quantity__gt=0)
+        .order_by('expiry_date', 'pk')
+    )
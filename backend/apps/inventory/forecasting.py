@@ -0,0 +1,261 @@
+"""
+Demand forecasting and reorder recommendations.
+
+Demand is read from order items on the delivery date of their order, the
+first day on or after the order was placed that falls on its delivery_day,
+so it follows the stores' weekly ``Store.day`` cycle. Cancelled orders are
+left out. The history is the whole weeks before today, so every weekday is
+seen equally often, and since an order is placed at most six days before
+its delivery date no order for a day in the history is still to come.
+
+Every product, over all stores and for each store it sells to, is a series
+of daily demand, and all series are forecast at once as the rows of a
+NumPy matrix:
+
+- a series' weekday factors are the average demand of each weekday over
+  the average daily demand;
+- the deseasonalised demand is smoothed exponentially, starting from the
+  first week's average; days whose weekday never sees demand say nothing
+  about the level and leave it as it is;
+- ``demand_std`` is the standard deviation of the one-day-ahead errors.
+
+The reorder point covers the demand forecast over the lead time plus a
+safety stock of ``z * demand_std * sqrt(lead time)`` for the service
+level; the reorder quantity covers the reorder cycle after it.
+
+The orders' delivery dates are worked out once, then their items are
+streamed in product order and forecast a chunk of products at a time, so
+memory is bounded by the chunk size and the number of orders rather than
+the order items.
+"""
+import math
+from collections import namedtuple
+from datetime import timedelta
+from itertools import groupby
+from operator import itemgetter
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.base.dates import day_bounds
+from apps.orders.models import Order, OrderItem
+from apps.products.barcodes import invalidate_barcodes
+from apps.stores.models import Store
+from .alerts import refresh_low_stock
+from .models import DemandForecast, Inventory
+
+# Store.day choices run Monday to Sunday, like date.weekday()
+WEEKDAYS = {day: index for index, (day, _) in enumerate(Store._meta.get_field('day').choices)}
+
+Forecast = namedtuple('Forecast', [
+    'daily_demand', 'demand_std', 'weekday_factors', 'lead_time_demand', 'reorder_point', 'reorder_quantity'
+])
+
+ForecastRun = namedtuple('ForecastRun', ['computed_on', 'products', 'store_series', 'applied'])
+
+
+def history_window(today, weeks):
+    """``[start, end)`` dates of the ``weeks`` whole weeks before ``today``"""
+    return today - timedelta(weeks=weeks), today
+
+
+def _placed_q(start, end, field='created_at'):
+    """Orders placed early enough to be delivered in ``[start, end)``, on the raw ``field`` column"""
+    placed_from, _ = day_bounds(start - timedelta(days=6))
+    placed_to, _ = day_bounds(end)
+    return Q(**{f'{field}__gte': placed_from, f'{field}__lt': placed_to})
+
+
+def delivery_offsets(start, end):
+    """
+    ``(order_ids, store_ids, offsets)`` arrays of the orders delivered in
+    ``[start, end)``, sorted by order id, with their delivery date as days
+    from ``start``.
+    """
+    orders = list(
+        Order.objects
+        .filter(_placed_q(start, end))
+        .exclude(status='cancelled')
+        .order_by('pk')
+        .values_list('pk', 'store_id', 'delivery_day', 'created_at')
+    )
+    if not orders:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    order_ids, store_ids, delivery_days, created = zip(*orders)
+    placed = [timezone.localdate(value) for value in created]
+    offsets = np.array([
+        (day - start).days + (WEEKDAYS.get(delivery_day, day.weekday()) - day.weekday()) % 7
+        for day, delivery_day in zip(placed, delivery_days)
+    ])
+    delivered = (offsets >= 0) & (offsets < (end - start).days)
+    return np.array(order_ids)[delivered], np.array(store_ids)[delivered], offsets[delivered]
+
+
+def demand_rows(start, end):
+    """``(product_id, order_id, quantity)`` of the items of the orders delivered in ``[start, end)``, by product"""
+    return (
+        OrderItem.objects
+        .filter(_placed_q(start, end, 'order__created_at'))
+        .exclude(order__status='cancelled')
+        .order_by('product_id')
+        .values_list('product_id', 'order_id', 'quantity')
+    )
+
+
+def _chunks(rows, chunk_size):
+    """Lists of at least ``chunk_size`` rows (bar the last) that never split a product"""
+    chunk = []
+    for _, product_rows in groupby(rows, key=itemgetter(0)):
+        chunk.extend(product_rows)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def demand_matrix(rows, orders, days):
+    """
+    Daily demand of each ``(product_id, store_id)`` in ``rows`` over the
+    ``days`` delivery dates of ``orders``, as returned by
+    ``delivery_offsets``. Returns the keys, sorted, and a matrix with a row
+    per key.
+    """
+    order_ids, store_ids, offsets = orders
+    items = np.array(rows, dtype=np.int64)
+    if len(order_ids):
+        # Items of orders outside the window, or placed since it was read, are dropped
+        found = np.searchsorted(order_ids, items[:, 1]).clip(max=len(order_ids) - 1)
+        delivered = order_ids[found] == items[:, 1]
+        items, found = items[delivered], found[delivered]
+    if not len(order_ids) or not len(items):
+        return np.empty((0, 2), dtype=np.int64), np.empty((0, days))
+
+    keys, series = np.unique(np.column_stack([items[:, 0], store_ids[found]]), axis=0, return_inverse=True)
+    cells = series.reshape(-1) * days + offsets[found]
+    demand = np.bincount(cells, weights=items[:, 2].astype(float), minlength=len(keys) * days)
+    return keys, demand.reshape(len(keys), days)
+
+
+def forecast(demand, first_weekday, alpha, lead_time, cycle, service_level):
+    """
+    Forecast every row of the ``demand`` matrix, whose columns are whole
+    weeks of days starting on ``first_weekday``, for the days after it.
+    """
+    series, days = demand.shape
+    if days < 14 or days % 7:
+        raise ValueError('Demand history must be at least two whole weeks')
+    weekdays = (first_weekday + np.arange(days)) % 7
+
+    daily = demand.mean(axis=1, keepdims=True)
+    by_weekday = np.stack([demand[:, weekdays == weekday].mean(axis=1) for weekday in range(7)], axis=1)
+    factors = np.divide(by_weekday, daily, out=np.ones_like(by_weekday), where=daily > 0)
+
+    level = demand[:, :7].mean(axis=1)
+    squared_error = np.zeros(series)
+    for day in range(7, days):
+        season = factors[:, weekdays[day]]
+        squared_error += (demand[:, day] - level * season) ** 2
+        seen = season > 0
+        deseasonalised = demand[:, day] / np.where(seen, season, 1)
+        level = np.where(seen, alpha * deseasonalised + (1 - alpha) * level, level)
+    std = np.sqrt(squared_error / (days - 7))
+
+    ahead = (first_weekday + days + np.arange(lead_time + cycle)) % 7
+    lead_time_demand = level * factors[:, ahead[:lead_time]].sum(axis=1)
+    cycle_demand = level * factors[:, ahead[lead_time:]].sum(axis=1)
+    z = NormalDist().inv_cdf(service_level)
+    # Rounded first so float noise does not add a unit
+    reorder_point = np.ceil(np.round(lead_time_demand + z * std * math.sqrt(lead_time), 6))
+    reorder_quantity = np.ceil(np.round(cycle_demand, 6))
+    return Forecast(
+        level, std, factors, lead_time_demand,
+        np.maximum(reorder_point, 0).astype(int), reorder_quantity.astype(int)
+    )
+
+
+def forecast_demand(today=None, weeks=None, alpha=None, lead_time=None, cycle=None, service_level=None,
+                    apply=False, chunk_size=20000):
+    """
+    Rebuild the DemandForecast table from the order history before
+    ``today``, with the settings' parameters unless given. With ``apply``
+    the inventory reorder levels are set to the catalogue reorder points.
+    """
+    today = today or timezone.localdate()
+    weeks = weeks or settings.INVENTORY_FORECAST_WEEKS
+    alpha = settings.INVENTORY_FORECAST_ALPHA if alpha is None else alpha
+    lead_time = settings.INVENTORY_LEAD_TIME_DAYS if lead_time is None else lead_time
+    cycle = settings.INVENTORY_REORDER_CYCLE_DAYS if cycle is None else cycle
+    service_level = service_level or settings.INVENTORY_SERVICE_LEVEL
+    if weeks < 2:
+        raise ValueError('weeks must be at least 2')
+    if not 0 < alpha <= 1:
+        raise ValueError('alpha must be in (0, 1]')
+    if not 0 < service_level < 1:
+        raise ValueError('service_level must be in (0, 1)')
+
+    start, end = history_window(today, weeks)
+    days = (end - start).days
+    parameters = dict(first_weekday=start.weekday(), alpha=alpha, lead_time=lead_time, cycle=cycle,
+                      service_level=service_level)
+    products = store_series = applied = 0
+    with transaction.atomic():
+        DemandForecast.objects.all().delete()
+        orders = delivery_offsets(start, end)
+        for rows in _chunks(demand_rows(start, end).iterator(), chunk_size):
+            keys, demand = demand_matrix(rows, orders, days)
+            if not len(keys):
+                continue
+            # Keys are sorted by product, so each product's stores are one run of rows
+            product_ids, first_rows = np.unique(keys[:, 0], return_index=True)
+            totals = np.add.reduceat(demand, first_rows, axis=0)
+
+            forecasts = []
+            for ids, stores, result in (
+                (product_ids, [None] * len(product_ids), forecast(totals, **parameters)),
+                (keys[:, 0], keys[:, 1], forecast(demand, **parameters)),
+            ):
+                forecasts.extend(
+                    DemandForecast(
+                        product_id=int(product_id),
+                        store_id=None if store_id is None else int(store_id),
+                        computed_on=today,
+                        history_days=days,
+                        daily_demand=float(result.daily_demand[i]),
+                        demand_std=float(result.demand_std[i]),
+                        weekday_factors=[round(float(factor), 4) for factor in result.weekday_factors[i]],
+                        lead_time_demand=float(result.lead_time_demand[i]),
+                        reorder_point=int(result.reorder_point[i]),
+                        reorder_quantity=int(result.reorder_quantity[i]),
+                    )
+                    for i, (product_id, store_id) in enumerate(zip(ids, stores))
+                )
+            DemandForecast.objects.bulk_create(forecasts, batch_size=1000)
+            products += len(product_ids)
+            store_series += len(keys)
+            if apply:
+                applied += apply_reorder_points(forecasts[:len(product_ids)])
+    return ForecastRun(today, products, store_series, applied)
+
+
+def apply_reorder_points(forecasts):
+    """Set the inventory reorder level of the catalogue ``forecasts``' products to their reorder point"""
+    reorder_points = {row.product_id: row.reorder_point for row in forecasts if row.store_id is None}
+    inventory = [
+        item for item in Inventory.objects.filter(product_id__in=reorder_points).only('product_id', 'reorder_level')
+        if item.reorder_level != reorder_points[item.product_id]
+    ]
+    if not inventory:
+        return 0
+    for item in inventory:
+        item.reorder_level = reorder_points[item.product_id]
+    product_ids = [item.product_id for item in inventory]
+    Inventory.objects.bulk_update(inventory, ['reorder_level'], batch_size=500)
+    refresh_low_stock(product_ids)
+    # Barcode lookups embed the inventory row
+    invalidate_barcodes(product_ids)
+    return len(inventory)
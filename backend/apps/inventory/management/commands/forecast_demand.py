@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory.forecasting import forecast_demand
+
+
+class Command(BaseCommand):
+    help = 'Forecasts the demand of every product from the order history and recommends reorder points and quantities'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, help='Weeks of order history to fit on')
+        parser.add_argument('--alpha', type=float, help='Exponential smoothing weight of the latest day')
+        parser.add_argument('--lead-time', type=int, help='Days between placing a reorder and receiving it')
+        parser.add_argument('--cycle', type=int, help='Days of demand a reorder covers')
+        parser.add_argument('--service-level', type=float, help='Chance of not running out during the lead time')
+        parser.add_argument(
+            '--apply', action='store_true',
+            help='Set the inventory reorder levels to the recommended reorder points'
+        )
+        parser.add_argument('--chunk-size', type=int, default=20000, help='Order item groups forecast at a time')
+
+    def handle(self, *args, **options):
+        for option in ('lead_time', 'cycle'):
+            if options[option] is not None and options[option] < 1:
+                raise CommandError(f"--{option.replace('_', '-')} must be at least 1")
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+
+        started = time.perf_counter()
+        try:
+            run = forecast_demand(
+                weeks=options['weeks'],
+                alpha=options['alpha'],
+                lead_time=options['lead_time'],
+                cycle=options['cycle'],
+                service_level=options['service_level'],
+                apply=options['apply'],
+                chunk_size=options['chunk_size'],
+            )
+        except ValueError as error:
+            raise CommandError(str(error))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Forecast {run.products} products and {run.store_series} product-store series "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
+        if options['apply']:
+            self.stdout.write(self.style.SUCCESS(f"Updated the reorder level of {run.applied} inventory items"))
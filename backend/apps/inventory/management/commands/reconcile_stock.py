@@ -0,0 +1,65 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.inventory.alerts import STALE_FLAG, refresh_low_stock
+from apps.inventory.models import Inventory
+from apps.inventory.reconcile import find_drift, fix_drift
+
+
+class Command(BaseCommand):
+    help = 'Compares the product and inventory stock counters with the transaction ledger and repairs drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Reset drifted counters to the ledger balance')
+        parser.add_argument(
+            '--from-snapshots', action='store_true',
+            help='Start from the latest stock snapshots instead of summing the whole ledger'
+        )
+        parser.add_argument('--limit', type=int, default=50, help='Number of drifted products to list')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of products fixed per transaction')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        drifted = self._report_drift(options)
+        if drifted and options['fix']:
+            batch_size = options['batch_size']
+            for offset in range(0, len(drifted), batch_size):
+                fix_drift(drifted[offset:offset + batch_size], from_snapshots=options['from_snapshots'])
+            self.stdout.write(self.style.SUCCESS(f'Reset the stock counters of {len(drifted)} products'))
+
+        # Flags left stale by quantities or reorder levels updated directly
+        stale = Inventory.objects.filter(STALE_FLAG).count()
+        if stale and options['fix']:
+            events = refresh_low_stock()
+            self.stdout.write(self.style.SUCCESS(
+                f'Refreshed {stale} low-stock flags, recording {len(events)} low-stock events'
+            ))
+        elif stale:
+            self.stdout.write(f'{stale} low-stock flags do not match their inventory quantity')
+
+        if (drifted or stale) and not options['fix']:
+            self.stdout.write(self.style.ERROR('Stock counters do not match the ledger, rerun with --fix'))
+
+    def _report_drift(self, options):
+        drifted = []
+        product_drift = inventory_drift = 0
+        for drift in find_drift(from_snapshots=options['from_snapshots']):
+            drifted.append(drift.product_id)
+            product_drift += drift.stock_quantity != drift.balance
+            inventory_drift += (drift.inventory_quantity or 0) != drift.balance
+            if len(drifted) <= options['limit']:
+                inventory = 'none' if drift.inventory_quantity is None else drift.inventory_quantity
+                self.stdout.write(
+                    f"product {drift.product_id}: ledger {drift.balance}, "
+                    f"product {drift.stock_quantity}, inventory {inventory}"
+                )
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('All stock counters match the ledger'))
+            return drifted
+        if len(drifted) > options['limit']:
+            self.stdout.write(f"... and {len(drifted) - options['limit']} more")
+        self.stdout.write(
+            f"{len(drifted)} products drifted: {product_drift} product counters, {inventory_drift} inventory counters"
+        )
+        return drifted
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from apps.inventory.snapshots import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Writes the daily stock ledger snapshots of every completed day not snapshotted yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--until', help='Last date to snapshot (YYYY-MM-DD), defaults to yesterday')
+
+    def handle(self, *args, **options):
+        until = self._parse(options['until']) if options['until'] else None
+
+        result = take_snapshots(until=until)
+        if not result['snapshots']:
+            self.stdout.write('No new stock movements to snapshot')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Successfully wrote {result['snapshots']} stock snapshots "
+            f"for {result['start']:%Y-%m-%d} to {result['until']:%Y-%m-%d}"
+        ))
+
+    def _parse(self, value):
+        try:
+            day = parse_date(value)
+        except ValueError:
+            day = None
+        if day is None:
+            raise CommandError(f"Invalid date '{value}'")
+        return day
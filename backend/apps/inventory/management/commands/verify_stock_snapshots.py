@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from apps.inventory.snapshots import verify_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Verifies the stock ledger snapshots against the inventory transactions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Correct wrong snapshots and create missing ones')
+        parser.add_argument('--limit', type=int, default=50, help='Number of problems to list')
+
+    def handle(self, *args, **options):
+        issues = verify_snapshots(fix=options['fix'])
+        if not issues:
+            self.stdout.write(self.style.SUCCESS('All stock snapshots match the ledger'))
+            return
+
+        for issue in issues[:options['limit']]:
+            recorded = 'missing' if issue.recorded is None else issue.recorded
+            self.stdout.write(
+                f"product {issue.product_id} on {issue.date:%Y-%m-%d}: snapshot {recorded}, ledger {issue.expected}"
+            )
+        if len(issues) > options['limit']:
+            self.stdout.write(f"... and {len(issues) - options['limit']} more")
+        if options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'Fixed {len(issues)} stock snapshots'))
+        else:
+            self.stdout.write(self.style.ERROR(f'{len(issues)} stock snapshots do not match the ledger, rerun with --fix'))
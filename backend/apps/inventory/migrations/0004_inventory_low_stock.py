@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_low_stock(apps, schema_editor):
+    # Flag every inventory row at or below its reorder level and record the
+    # transitions, as the stock engine does from now on
+    from apps.inventory.alerts import refresh_low_stock
+
+    refresh_low_stock()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stock_snapshot'),
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventory',
+            name='is_low_stock',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='inventory',
+            index=models.Index(condition=models.Q(('is_low_stock', True)), fields=['quantity', 'product'], name='inv_low_stock_idx'),
+        ),
+        migrations.CreateModel(
+            name='LowStockEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('kind', models.CharField(choices=[('below', 'Crossed below reorder level'), ('recovered', 'Recovered')], max_length=20)),
+                ('quantity', models.IntegerField()),
+                ('reorder_level', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='low_stock_events', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Low Stock Event',
+                'verbose_name_plural': 'Low Stock Events',
+                'ordering': ['id'],
+            },
+        ),
+        migrations.RunPython(backfill_low_stock, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_inventory_low_stock'),
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productexpiry',
+            index=models.Index(fields=['product', 'is_active', 'expiry_date'], name='inv_expiry_fefo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productexpiry',
+            index=models.Index(fields=['is_active', 'expiry_date'], name='inv_expiry_active_date_idx'),
+        ),
+        migrations.CreateModel(
+            name='BatchAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('quantity', models.IntegerField()),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batch_allocations', to='inventory.inventorytransaction')),
+                ('batch', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='inventory.productexpiry')),
+            ],
+            options={
+                'verbose_name': 'Batch Allocation',
+                'verbose_name_plural': 'Batch Allocations',
+            },
+        ),
+    ]
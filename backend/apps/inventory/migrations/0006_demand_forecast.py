@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_batch_allocation'),
+        ('products', '0001_initial'),
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DemandForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('computed_on', models.DateField()),
+                ('history_days', models.IntegerField()),
+                ('daily_demand', models.FloatField()),
+                ('demand_std', models.FloatField()),
+                ('weekday_factors', models.JSONField(default=list)),
+                ('lead_time_demand', models.FloatField()),
+                ('reorder_point', models.IntegerField()),
+                ('reorder_quantity', models.IntegerField()),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='products.product')),
+                ('store', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='demand_forecasts', to='stores.store')),
+            ],
+            options={
+                'verbose_name': 'Demand Forecast',
+                'verbose_name_plural': 'Demand Forecasts',
+                'ordering': ['product_id', 'store_id'],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('store__isnull', True)), fields=('product',), name='inv_forecast_product_uniq'), models.UniqueConstraint(condition=models.Q(('store__isnull', False)), fields=('product', 'store'), name='inv_forecast_product_store_uniq')],
+            },
+        ),
+    ]
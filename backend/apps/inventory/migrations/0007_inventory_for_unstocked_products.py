@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:10
+
+from django.db import migrations
+
+
+def create_missing_inventory(apps, schema_editor):
+    # Products that never had stock recorded have no inventory row, so the
+    # low-stock flag, list and counts missed them. Give them one from the
+    # product's own counters; a row created low records a "below" event,
+    # as Inventory.save does
+    Product = apps.get_model('products', 'Product')
+    Inventory = apps.get_model('inventory', 'Inventory')
+    LowStockEvent = apps.get_model('inventory', 'LowStockEvent')
+
+    products = list(
+        Product.objects.filter(inventory__isnull=True).values_list('pk', 'stock_quantity', 'reorder_level')
+    )
+    Inventory.objects.bulk_create([
+        Inventory(product_id=pk, quantity=quantity, reorder_level=reorder_level, is_low_stock=quantity <= reorder_level)
+        for pk, quantity, reorder_level in products
+    ], batch_size=1000)
+    LowStockEvent.objects.bulk_create([
+        LowStockEvent(product_id=pk, kind='below', quantity=quantity, reorder_level=reorder_level)
+        for pk, quantity, reorder_level in products
+        if quantity <= reorder_level
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_demand_forecast'),
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_inventory, migrations.RunPython.noop),
+    ]
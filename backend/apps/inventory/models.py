@@ -1,7 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from apps.base.models import TimeStampedModel
 from apps.products.models import Product
+from apps.stores.models import Store
 
 
 class Inventory(TimeStampedModel):
@@ -11,18 +12,36 @@ class Inventory(TimeStampedModel):
     product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='inventory')
     quantity = models.IntegerField(default=0)
     reorder_level = models.IntegerField(default=10)
+    # quantity <= reorder_level, kept up to date on every stock change so
+    # low stock can be filtered on an index; see apps.inventory.alerts
+    is_low_stock = models.BooleanField(default=False, editable=False)
     last_checked = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Inventory'
         verbose_name_plural = 'Inventory'
+        indexes = [
+            models.Index(
+                fields=['quantity', 'product'],
+                name='inv_low_stock_idx',
+                condition=models.Q(is_low_stock=True)
+            ),
+        ]
         
     def __str__(self):
         return f"{self.product.name} - {self.quantity} units"
-    
-    @property
-    def is_low_stock(self):
-        return self.quantity <= self.reorder_level
+
+    def save(self, *args, **kwargs):
+        from .alerts import record_transitions
+
+        # A new row starts out as not low, so creating it low is a transition
+        was_low = False if self._state.adding else self.is_low_stock
+        self.is_low_stock = self.quantity <= self.reorder_level
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = {*kwargs['update_fields'], 'is_low_stock'}
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            record_transitions([(self.product_id, self.quantity, self.reorder_level, was_low)])
 
 
 class InventoryTransaction(TimeStampedModel):
@@ -46,33 +65,90 @@ class InventoryTransaction(TimeStampedModel):
         verbose_name = 'Inventory Transaction'
         verbose_name_plural = 'Inventory Transactions'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='inv_txn_created_idx'),
+            models.Index(fields=['product', 'transaction_type', 'created_at'], name='inv_txn_product_type_idx'),
+            models.Index(fields=['transaction_type', 'created_at'], name='inv_txn_type_created_idx'),
+            models.Index(fields=['product', 'created_at'], name='inv_txn_product_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.transaction_type} - {self.product.name} ({self.quantity})"
 
+    @property
+    def stock_delta(self):
+        """Signed change this transaction applies to the stock counters"""
+        if self.transaction_type == 'out':
+            return -self.quantity
+        # Stock in and adjustments (which can be negative) are added as-is
+        return self.quantity
+
     def save(self, *args, **kwargs):
-        # Update product stock quantity
-        if self.transaction_type == 'in':
-            self.product.stock_quantity += self.quantity
-        elif self.transaction_type == 'out':
-            self.product.stock_quantity -= self.quantity
-        else:  # adjustment
-            self.product.stock_quantity += self.quantity  # Can be negative for reduction
-
-        self.product.save()
-        
-        # Update inventory record
-        inventory, created = Inventory.objects.get_or_create(product=self.product)
-        if self.transaction_type == 'in':
-            inventory.quantity += self.quantity
-        elif self.transaction_type == 'out':
-            inventory.quantity -= self.quantity
-        else:  # adjustment
-            inventory.quantity += self.quantity
-        
-        inventory.save()
-        
-        super().save(*args, **kwargs)
+        from .stock import apply_stock_deltas
+
+        with transaction.atomic():
+            # Stock only moves when the transaction is first recorded
+            if self._state.adding:
+                apply_stock_deltas({self.product_id: self.stock_delta})
+                # Keep an already loaded product in step with the database
+                if InventoryTransaction.product.is_cached(self):
+                    self.product.stock_quantity += self.stock_delta
+            super().save(*args, **kwargs)
+
+
+class StockSnapshot(TimeStampedModel):
+    """
+    Ledger balance of a product at the end of a day.
+
+    Snapshots are sparse: a row is only written for the days a product had
+    transactions, for every completed day up to the latest snapshot date.
+    See ``apps.inventory.snapshots``.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='stock_snapshots')
+    date = models.DateField()
+    quantity = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Stock Snapshot'
+        verbose_name_plural = 'Stock Snapshots'
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'date'], name='inv_snapshot_product_date_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='inv_snapshot_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} - {self.quantity} units on {self.date}"
+
+
+class LowStockEvent(TimeStampedModel):
+    """
+    A product crossing its reorder level, in either direction.
+
+    Rows are only ever appended, so alerting can follow the stream by id
+    instead of polling the whole catalogue.
+    """
+    KIND_BELOW = 'below'
+    KIND_RECOVERED = 'recovered'
+    KINDS = (
+        (KIND_BELOW, 'Crossed below reorder level'),
+        (KIND_RECOVERED, 'Recovered'),
+    )
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='low_stock_events')
+    kind = models.CharField(max_length=20, choices=KINDS)
+    quantity = models.IntegerField()
+    reorder_level = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Low Stock Event'
+        verbose_name_plural = 'Low Stock Events'
+        ordering = ['id']
+
+    def __str__(self):
+        return f"{self.product.name} {self.get_kind_display().lower()} ({self.quantity}/{self.reorder_level})"
 
 
 class ProductExpiry(TimeStampedModel):
@@ -89,7 +165,68 @@ class ProductExpiry(TimeStampedModel):
         verbose_name = 'Product Expiry'
         verbose_name_plural = 'Product Expiries'
         ordering = ['expiry_date']
+        indexes = [
+            # A product's sellable batches in first-expiry-first-out order
+            models.Index(fields=['product', 'is_active', 'expiry_date'], name='inv_expiry_fefo_idx'),
+            models.Index(fields=['is_active', 'expiry_date'], name='inv_expiry_active_date_idx'),
+        ]
 
     def __str__(self):
         return f"{self.product.name} - {self.batch_number} (Expires: {self.expiry_date})"
 
+
+class BatchAllocation(TimeStampedModel):
+    """
+    Part of a stock-out transaction taken from a product batch.
+    See ``apps.inventory.batches``.
+    """
+    transaction = models.ForeignKey(InventoryTransaction, on_delete=models.CASCADE, related_name='batch_allocations')
+    batch = models.ForeignKey(ProductExpiry, on_delete=models.CASCADE, related_name='allocations')
+    quantity = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Batch Allocation'
+        verbose_name_plural = 'Batch Allocations'
+
+    def __str__(self):
+        return f"{self.quantity} x {self.batch.batch_number} for {self.transaction.reference}"
+
+
+
+class DemandForecast(TimeStampedModel):
+    """
+    Forecast demand and recommended reordering of a product, for the whole
+    catalogue (store is null) or for one store's orders.
+
+    The table is rebuilt by the forecast_demand command.
+    See ``apps.inventory.forecasting``.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='demand_forecasts')
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, null=True, blank=True, related_name='demand_forecasts')
+    computed_on = models.DateField()
+    history_days = models.IntegerField()
+    # Smoothed, deseasonalised units per day and the spread of the daily error
+    daily_demand = models.FloatField()
+    demand_std = models.FloatField()
+    # Demand of each weekday relative to an average day, Monday first
+    weekday_factors = models.JSONField(default=list)
+    lead_time_demand = models.FloatField()
+    reorder_point = models.IntegerField()
+    reorder_quantity = models.IntegerField()
+
+    class Meta:
+        verbose_name = 'Demand Forecast'
+        verbose_name_plural = 'Demand Forecasts'
+        ordering = ['product_id', 'store_id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['product'], condition=models.Q(store__isnull=True), name='inv_forecast_product_uniq'
+            ),
+            models.UniqueConstraint(
+                fields=['product', 'store'], condition=models.Q(store__isnull=False), name='inv_forecast_product_store_uniq'
+            ),
+        ]
+
+    def __str__(self):
+        where = self.store.name if self.store_id else 'all stores'
+        return f"{self.product.name} ({where}): {self.daily_demand:.1f}/day, reorder at {self.reorder_point}"
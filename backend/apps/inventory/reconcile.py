@@ -0,0 +1,88 @@
+"""
+Reconcile the stock counters with the transaction ledger.
+
+InventoryTransaction is the authoritative record of stock.
+Product.stock_quantity and Inventory.quantity are counters kept in step
+with it by ``apply_stock_deltas``, but they drift when they are edited
+directly, for example from the product form or the admin. ``find_drift``
+compares both counters of every product with its ledger balance, and
+``fix_drift`` resets the drifted counters to the ledger and refreshes
+their low-stock flags.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+
+from apps.base.dates import day_bounds
+from apps.products.barcodes import invalidate_barcodes
+from apps.products.models import Product
+from .alerts import refresh_low_stock
+from .models import Inventory
+from .snapshots import latest_snapshot_date, latest_snapshot_quantity, ledger_balances, product_deltas
+from .stock import lock_products
+
+Drift = namedtuple('Drift', ['product_id', 'balance', 'stock_quantity', 'inventory_quantity'])
+
+
+def find_drift(from_snapshots=False, batch_size=5000):
+    """
+    Yield a Drift for every product whose counters differ from its ledger balance.
+
+    The per-product ledger sums (one grouped query) and the counters are
+    both streamed in product order and merged, so memory stays flat however
+    large the catalogue and the ledger are. With ``from_snapshots`` only the
+    transactions after the latest stock snapshot are summed.
+    ``inventory_quantity`` is None for a product without an inventory row.
+    """
+    last = latest_snapshot_date() if from_snapshots else None
+    products = Product.objects.order_by('pk')
+    fields = ['pk', 'stock_quantity', 'inventory__quantity']
+    if last:
+        products = products.annotate(snapshot_quantity=latest_snapshot_quantity(last))
+        fields.append('snapshot_quantity')
+    start = day_bounds(last)[1] if last else None
+
+    deltas = product_deltas(start).iterator(chunk_size=batch_size)
+    delta = next(deltas, None)
+    for row in products.values_list(*fields).iterator(chunk_size=batch_size):
+        pk, stock_quantity, inventory_quantity = row[:3]
+        balance = (row[3] or 0) if last else 0
+        # Products deleted while streaming leave sums without a row
+        while delta and delta[0] < pk:
+            delta = next(deltas, None)
+        if delta and delta[0] == pk:
+            balance += delta[1]
+            delta = next(deltas, None)
+        if stock_quantity != balance or (inventory_quantity or 0) != balance:
+            yield Drift(pk, balance, stock_quantity, inventory_quantity)
+
+
+def fix_drift(product_ids, from_snapshots=False):
+    """
+    Reset both stock counters of ``product_ids`` to their ledger balance.
+
+    The products are locked and their balance summed again first, so
+    transactions recorded since ``find_drift`` read them are not lost.
+    Returns ``{product pk: balance}``.
+    """
+    product_ids = sorted(product_ids)
+    with transaction.atomic():
+        lock_products(product_ids)
+        balances = ledger_balances(product_ids, from_snapshots=from_snapshots)
+        Product.objects.bulk_update(
+            [Product(pk=pk, stock_quantity=balance) for pk, balance in balances.items()],
+            ['stock_quantity']
+        )
+        inventory_ids = dict(Inventory.objects.filter(product_id__in=product_ids).values_list('product_id', 'pk'))
+        Inventory.objects.bulk_update(
+            [Inventory(pk=inventory_ids[pk], quantity=balance) for pk, balance in balances.items() if pk in inventory_ids],
+            ['quantity']
+        )
+        Inventory.objects.bulk_create([
+            Inventory(product_id=pk, quantity=balance)
+            for pk, balance in balances.items()
+            if pk not in inventory_ids
+        ])
+        refresh_low_stock(product_ids)
+        invalidate_barcodes(product_ids)
+    return balances
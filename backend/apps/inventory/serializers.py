@@ -1,8 +1,10 @@
 # apps/inventory/serializers.py
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Inventory, InventoryTransaction
+from .models import BatchAllocation, DemandForecast, Inventory, InventoryTransaction, LowStockEvent, ProductExpiry
 from apps.products.serializers import ProductSerializer
 from apps.products.models import Product
+from apps.stores.models import Store
 
 class InventorySerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -14,8 +16,8 @@ class InventorySerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Inventory
-        fields = ['id', 'product', 'product_id', 'current_stock', 'last_updated']
-        read_only_fields = ['id', 'last_updated']
+        fields = ['id', 'product', 'product_id', 'quantity', 'reorder_level', 'is_low_stock', 'last_checked']
+        read_only_fields = ['id', 'quantity', 'last_checked']
 
 class InventoryTransactionSerializer(serializers.ModelSerializer):
     product = ProductSerializer(read_only=True)
@@ -24,50 +26,19 @@ class InventoryTransactionSerializer(serializers.ModelSerializer):
         source='product',
         write_only=True
     )
-    created_by = serializers.StringRelatedField(read_only=True)
+    created_by = serializers.StringRelatedField(source='user', read_only=True)
     
     class Meta:
         model = InventoryTransaction
         fields = [
             'id', 'product', 'product_id', 'transaction_type', 'quantity',
-            'previous_stock', 'new_stock', 'reference', 'reason',
-            'created_by', 'created_at'
+            'reference', 'reason', 'created_by', 'created_at'
         ]
-        read_only_fields = ['id', 'previous_stock', 'new_stock', 'created_by', 'created_at']
+        read_only_fields = ['id', 'created_by', 'created_at']
     
     def create(self, validated_data):
-        # Get the current user from the request
-        user = self.context['request'].user
-        validated_data['created_by'] = user
-        
-        # Get the product and its current inventory
-        product = validated_data['product']
-        try:
-            inventory = Inventory.objects.get(product=product)
-        except Inventory.DoesNotExist:
-            inventory = Inventory.objects.create(product=product, current_stock=0)
-        
-        # Set previous stock
-        validated_data['previous_stock'] = inventory.current_stock
-        
-        # Calculate new stock based on transaction type
-        transaction_type = validated_data['transaction_type']
-        quantity = validated_data['quantity']
-        
-        if transaction_type == InventoryTransaction.TRANSACTION_IN:
-            new_stock = inventory.current_stock + quantity
-        elif transaction_type == InventoryTransaction.TRANSACTION_OUT:
-            new_stock = max(0, inventory.current_stock - quantity)
-        else:  # Adjustment
-            new_stock = max(0, inventory.current_stock + quantity)
-        
-        validated_data['new_stock'] = new_stock
-        
-        # Update inventory
-        inventory.current_stock = new_stock
-        inventory.save()
-        
-        # Create transaction
+        # Saving the transaction moves both stock counters
+        validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
 
 class InventoryAdjustmentSerializer(serializers.Serializer):
@@ -78,30 +49,87 @@ class InventoryAdjustmentSerializer(serializers.Serializer):
     reference = serializers.CharField(required=False, allow_blank=True)
     
     def create(self, validated_data):
-        # Get the current user from the request
-        user = self.context['request'].user
-        
-        # Get the product and its current inventory
-        product = validated_data['product_id']
-        try:
-            inventory = Inventory.objects.get(product=product)
-        except Inventory.DoesNotExist:
-            inventory = Inventory.objects.create(product=product, current_stock=0)
-        
-        # Create transaction
-        transaction = InventoryTransaction.objects.create(
-            product=product,
+        # Saving the transaction moves both stock counters
+        return InventoryTransaction.objects.create(
+            product=validated_data['product_id'],
             transaction_type=validated_data['transaction_type'],
             quantity=validated_data['adjustment_value'],
-            previous_stock=inventory.current_stock,
-            new_stock=max(0, inventory.current_stock + validated_data['adjustment_value']),
             reason=validated_data['reason'],
             reference=validated_data.get('reference', ''),
-            created_by=user
+            user=self.context['request'].user
         )
-        
-        # Update inventory
-        inventory.current_stock = transaction.new_stock
-        inventory.save()
-        
-        return transaction
\ No newline at end of file
+
+
+class LowStockEventSerializer(serializers.ModelSerializer):
+    product_code = serializers.ReadOnlyField(source='product.product_id')
+    product_name = serializers.ReadOnlyField(source='product.name')
+
+    class Meta:
+        model = LowStockEvent
+        fields = ['id', 'product', 'product_code', 'product_name', 'kind', 'quantity', 'reorder_level', 'created_at']
+
+
+class ProductExpirySerializer(serializers.ModelSerializer):
+    product_code = serializers.ReadOnlyField(source='product.product_id')
+    product_name = serializers.ReadOnlyField(source='product.name')
+    days_to_expiry = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ProductExpiry
+        fields = [
+            'id', 'product', 'product_code', 'product_name', 'batch_number',
+            'quantity', 'expiry_date', 'days_to_expiry', 'is_active'
+        ]
+
+    def get_days_to_expiry(self, obj):
+        return (obj.expiry_date - timezone.localdate()).days
+
+
+class BatchAllocationSerializer(serializers.ModelSerializer):
+    batch_number = serializers.ReadOnlyField(source='batch.batch_number')
+    expiry_date = serializers.ReadOnlyField(source='batch.expiry_date')
+
+    class Meta:
+        model = BatchAllocation
+        fields = ['id', 'transaction', 'batch', 'batch_number', 'expiry_date', 'quantity', 'created_at']
+
+
+class NearExpirySerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=0, max_value=365, required=False)
+    product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), required=False)
+
+
+class DemandForecastSerializer(serializers.ModelSerializer):
+    product_code = serializers.ReadOnlyField(source='product.product_id')
+    product_name = serializers.ReadOnlyField(source='product.name')
+    store_name = serializers.ReadOnlyField(source='store.name', default=None)
+
+    class Meta:
+        model = DemandForecast
+        fields = [
+            'id', 'product', 'product_code', 'product_name', 'store', 'store_name', 'computed_on',
+            'history_days', 'daily_demand', 'demand_std', 'weekday_factors', 'lead_time_demand',
+            'reorder_point', 'reorder_quantity'
+        ]
+
+
+class ReorderRecommendationSerializer(DemandForecastSerializer):
+    quantity = serializers.IntegerField(read_only=True)
+    order_quantity = serializers.IntegerField(read_only=True)
+
+    class Meta(DemandForecastSerializer.Meta):
+        fields = DemandForecastSerializer.Meta.fields + ['quantity', 'order_quantity']
+
+
+class ForecastFilterSerializer(serializers.Serializer):
+    product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all(), required=False)
+    store_id = serializers.PrimaryKeyRelatedField(queryset=Store.objects.all(), required=False)
+
+
+class StockAtSerializer(serializers.Serializer):
+    product_id = serializers.PrimaryKeyRelatedField(queryset=Product.objects.all())
+    at = serializers.DateTimeField(required=False)
+
+
+class StockOnSerializer(serializers.Serializer):
+    date = serializers.DateField()
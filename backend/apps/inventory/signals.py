@@ -0,0 +1,5 @@
+from django.dispatch import Signal
+
+# Sent with ``events``, the LowStockEvent rows recorded, once the
+# transaction that moved products across their reorder level commits
+low_stock_changed = Signal()
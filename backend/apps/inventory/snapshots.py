@@ -0,0 +1,242 @@
+"""
+Point-in-time stock from daily ledger snapshots.
+
+The ledger balance of a product is the signed sum of its
+InventoryTransaction rows, which is what Inventory.quantity tracks.
+Summing the whole ledger for a past date gets slower as it grows, so
+``take_snapshots`` checkpoints the closing balance of every product at the
+end of each completed day, and queries read one snapshot row plus the
+transactions recorded after it.
+
+Snapshots are sparse: a row is only written for a product on the days it
+had transactions. Days are always snapshotted in order up to the latest
+snapshot date, so a product with no row on a day before that date had no
+transactions on it. Transactions backdated into an already snapshotted day
+leave later snapshots stale; ``verify_snapshots`` finds and fixes them.
+"""
+from collections import namedtuple
+from datetime import timedelta
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from apps.base.dates import day_bounds
+from apps.products.models import Product
+from .models import InventoryTransaction, StockSnapshot
+from .stock import sum_stock_deltas
+
+SnapshotIssue = namedtuple('SnapshotIssue', ['product_id', 'date', 'recorded', 'expected'])
+
+
+def latest_snapshot_date(on_or_before=None):
+    snapshots = StockSnapshot.objects.all()
+    if on_or_before is not None:
+        snapshots = snapshots.filter(date__lte=on_or_before)
+    return snapshots.aggregate(latest=Max('date'))['latest']
+
+
+def daily_deltas(start=None, end=None):
+    """``(product_id, day, delta)`` of every day with transactions in ``[start, end)``, by product and day"""
+    transactions = InventoryTransaction.objects.all()
+    if start is not None:
+        transactions = transactions.filter(created_at__gte=start)
+    if end is not None:
+        transactions = transactions.filter(created_at__lt=end)
+    return (
+        transactions
+        .annotate(day=TruncDate('created_at'))
+        .order_by()
+        .values('product_id', 'day')
+        .annotate(delta=sum_stock_deltas())
+        .order_by('product_id', 'day')
+        .values_list('product_id', 'day', 'delta')
+    )
+
+
+def product_deltas(start=None, end=None, product_ids=None):
+    """``(product_id, delta)`` of every product with transactions in ``[start, end)``, by product"""
+    transactions = InventoryTransaction.objects.all()
+    if product_ids is not None:
+        transactions = transactions.filter(product_id__in=product_ids)
+    if start is not None:
+        transactions = transactions.filter(created_at__gte=start)
+    if end is not None:
+        transactions = transactions.filter(created_at__lt=end)
+    return (
+        transactions
+        .order_by()
+        .values('product_id')
+        .annotate(delta=sum_stock_deltas())
+        .order_by('product_id')
+        .values_list('product_id', 'delta')
+    )
+
+
+def latest_snapshot_quantity(on_or_before=None):
+    """Subquery of the latest snapshot quantity of the outer product"""
+    snapshots = StockSnapshot.objects.filter(product=OuterRef('pk'))
+    if on_or_before is not None:
+        snapshots = snapshots.filter(date__lte=on_or_before)
+    return Subquery(snapshots.order_by('-date').values('quantity')[:1])
+
+
+def _snapshot_balances(products, on_or_before=None):
+    """``{product pk: quantity}`` of the latest snapshot of each product, 0 without one"""
+    return {
+        pk: quantity or 0
+        for pk, quantity in products.annotate(snapshot_quantity=latest_snapshot_quantity(on_or_before))
+        .values_list('pk', 'snapshot_quantity')
+    }
+
+
+def _balances(product_ids, last, end=None):
+    """Balances at ``end`` starting from the snapshots of ``last``, or from an empty ledger without one"""
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    if last is None:
+        balances = dict.fromkeys(products.values_list('pk', flat=True), 0)
+    else:
+        balances = _snapshot_balances(products, last)
+    start = day_bounds(last)[1] if last else None
+    for product_id, delta in product_deltas(start, end, product_ids):
+        balances[product_id] = balances.get(product_id, 0) + delta
+    return balances
+
+
+def take_snapshots(until=None, batch_size=1000):
+    """
+    Snapshot every day after the latest snapshot date up to ``until``.
+
+    ``until`` defaults to, and is capped at, yesterday: the current day is
+    never snapshotted while it can still change. The ledger is read with
+    one grouped query. Returns a dict with the ``start`` and ``until``
+    dates covered and the number of ``snapshots`` written.
+    """
+    yesterday = timezone.localdate() - timedelta(days=1)
+    until = min(until or yesterday, yesterday)
+    last = latest_snapshot_date()
+    if last is not None:
+        start = last + timedelta(days=1)
+    else:
+        first = InventoryTransaction.objects.order_by('created_at').values_list('created_at', flat=True).first()
+        start = timezone.localdate(first) if first else None
+    result = {'start': start, 'until': until, 'snapshots': 0}
+    if start is None or start > until:
+        return result
+
+    rows = daily_deltas(day_bounds(start)[0], day_bounds(until)[1]).iterator(chunk_size=batch_size)
+    balances = {}
+    with transaction.atomic():
+        while chunk := list(islice(rows, batch_size)):
+            # Products split over two chunks keep their running balance
+            unseen = {product_id for product_id, _, _ in chunk} - balances.keys()
+            if unseen:
+                balances.update(_snapshot_balances(Product.objects.filter(pk__in=unseen)))
+            snapshots = []
+            for product_id, day, delta in chunk:
+                balances[product_id] += delta
+                snapshots.append(StockSnapshot(product_id=product_id, date=day, quantity=balances[product_id]))
+            # A concurrent run writes the same rows
+            StockSnapshot.objects.bulk_create(snapshots, ignore_conflicts=True)
+            result['snapshots'] += len(snapshots)
+    return result
+
+
+def stock_at(product, at=None):
+    """Ledger balance of ``product`` (an instance or pk) at ``at``, defaulting to now"""
+    at = at or timezone.now()
+    snapshot = (
+        StockSnapshot.objects
+        .filter(product=product, date__lt=timezone.localdate(at))
+        .order_by('-date')
+        .values_list('date', 'quantity')
+        .first()
+    )
+    transactions = InventoryTransaction.objects.filter(product=product, created_at__lt=at)
+    balance = 0
+    if snapshot:
+        day, balance = snapshot
+        transactions = transactions.filter(created_at__gte=day_bounds(day)[1])
+    return balance + (transactions.aggregate(delta=sum_stock_deltas())['delta'] or 0)
+
+
+def stock_on(day):
+    """
+    Closing ledger balance of every product at the end of ``day``.
+
+    Returns ``{product pk: quantity}``. Each product starts from its latest
+    snapshot on or before ``day``; because snapshots are sparse and written
+    in order, the transactions left to add are exactly those after the
+    latest snapshot date of any product.
+    """
+    return _balances(None, latest_snapshot_date(on_or_before=day), day_bounds(day)[1])
+
+
+def ledger_balances(product_ids=None, from_snapshots=False):
+    """
+    Current ledger balance ``{product pk: quantity}`` of the given products,
+    or of every product.
+
+    The whole ledger is summed unless ``from_snapshots`` is set, in which
+    case only the transactions after the latest snapshot are.
+    """
+    return _balances(product_ids, latest_snapshot_date() if from_snapshots else None)
+
+
+def verify_snapshots(fix=False, batch_size=2000):
+    """
+    Check every snapshot against the ledger in one pass.
+
+    The ledger's daily deltas and the snapshots are both streamed in
+    product and date order and merged, keeping a running balance per
+    product. Returns a list of SnapshotIssue: ``recorded`` is None for a
+    day with transactions but no snapshot. With ``fix``, wrong snapshots
+    are corrected and missing ones created.
+    """
+    last = latest_snapshot_date()
+    if last is None:
+        return []
+
+    deltas = daily_deltas(end=day_bounds(last)[1]).iterator(chunk_size=batch_size)
+    snapshots = (
+        StockSnapshot.objects
+        .order_by('product_id', 'date')
+        .values_list('pk', 'product_id', 'date', 'quantity')
+        .iterator(chunk_size=batch_size)
+    )
+    issues = []
+    wrong = []
+    current, balance = None, 0
+    delta_row, snapshot = next(deltas, None), next(snapshots, None)
+    while delta_row or snapshot:
+        snapshot_key = snapshot[1:3] if snapshot else None
+        if delta_row and (snapshot_key is None or delta_row[:2] <= snapshot_key):
+            product_id, day, delta = delta_row
+            if product_id != current:
+                current, balance = product_id, 0
+            balance += delta
+            delta_row = next(deltas, None)
+            if (product_id, day) != snapshot_key:
+                issues.append(SnapshotIssue(product_id, day, None, balance))
+                continue
+        else:
+            # A snapshot on a day without transactions must carry the balance over
+            if snapshot_key[0] != current:
+                current, balance = snapshot_key[0], 0
+        pk, product_id, day, quantity = snapshot
+        if quantity != balance:
+            issues.append(SnapshotIssue(product_id, day, quantity, balance))
+            wrong.append(StockSnapshot(pk=pk, quantity=balance))
+        snapshot = next(snapshots, None)
+
+    if fix and issues:
+        with transaction.atomic():
+            StockSnapshot.objects.bulk_update(wrong, ['quantity'], batch_size=batch_size)
+            StockSnapshot.objects.bulk_create([
+                StockSnapshot(product_id=issue.product_id, date=issue.date, quantity=issue.expected)
+                for issue in issues
+                if issue.recorded is None
+            ], batch_size=batch_size)
+    return issues
@@ -0,0 +1,121 @@
+"""
+Atomic stock mutations.
+
+Stock counters (Product.stock_quantity and Inventory.quantity) are only
+ever changed with ``F()`` expressions inside a transaction, so concurrent
+writers never lose updates. Deltas for several products are applied with
+one UPDATE per table using a CASE expression.
+"""
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Sum, Value, When
+
+from apps.products.barcodes import invalidate_barcodes
+from apps.products.models import Product
+from .alerts import refresh_low_stock
+from .models import Inventory, InventoryTransaction
+
+
+def signed_quantity():
+    """SQL counterpart of ``InventoryTransaction.stock_delta``"""
+    return Case(
+        When(transaction_type='out', then=-F('quantity')),
+        default=F('quantity'),
+        output_field=IntegerField()
+    )
+
+
+def sum_stock_deltas():
+    """Aggregate of the signed quantities of the selected transactions"""
+    return Sum(signed_quantity())
+
+
+def _delta_expression(deltas, key):
+    """Build ``CASE key WHEN id THEN delta ... END`` for the given deltas"""
+    if len(deltas) == 1:
+        return Value(next(iter(deltas.values())))
+    return Case(
+        *[When(**{key: pk}, then=Value(delta)) for pk, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField()
+    )
+
+
+def lock_products(product_ids):
+    """
+    Lock the product rows with SELECT ... FOR UPDATE in primary key order,
+    where the database supports it. Must be called inside a transaction.
+    """
+    if connection.features.has_select_for_update:
+        list(
+            Product.objects.select_for_update()
+            .filter(pk__in=product_ids)
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+
+
+def apply_stock_deltas(deltas, lock=True):
+    """
+    Apply ``{product_id: delta}`` to the product and inventory stock counters.
+
+    When ``lock`` is set and the database supports it, the product rows are
+    locked with SELECT ... FOR UPDATE in primary key order first, so
+    multi-product batches cannot deadlock against each other.
+    """
+    deltas = {pk: delta for pk, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    product_ids = sorted(deltas)
+    with transaction.atomic():
+        if lock:
+            lock_products(product_ids)
+
+        Product.objects.filter(pk__in=product_ids).update(
+            stock_quantity=F('stock_quantity') + _delta_expression(deltas, 'pk')
+        )
+
+        updated = Inventory.objects.filter(product_id__in=product_ids).update(
+            quantity=F('quantity') + _delta_expression(deltas, 'product_id')
+        )
+        if updated < len(product_ids):
+            _create_missing_inventory(deltas)
+        refresh_low_stock(product_ids)
+        # Cached scans include the stock counters
+        invalidate_barcodes(product_ids)
+
+
+def _create_missing_inventory(deltas):
+    """Create inventory rows for products that do not have one yet and apply their deltas"""
+    existing = set(
+        Inventory.objects.filter(product_id__in=deltas).values_list('product_id', flat=True)
+    )
+    missing = {product_id: delta for product_id, delta in deltas.items() if product_id not in existing}
+    # Rows are created empty and then moved with F(), so a row another writer
+    # created in the meantime still receives the delta exactly once. They
+    # start out not low, so the first delta records a transition if needed
+    Inventory.objects.bulk_create(
+        [Inventory(product_id=product_id, quantity=0) for product_id in missing],
+        ignore_conflicts=True
+    )
+    Inventory.objects.filter(product_id__in=missing).update(
+        quantity=F('quantity') + _delta_expression(missing, 'product_id')
+    )
+
+
+def record_transactions(transactions):
+    """
+    Insert unsaved InventoryTransaction rows in bulk and apply their stock deltas.
+
+    Deltas are summed per product first, so the counters are touched with a
+    single UPDATE per table however many rows are recorded. Like any bulk
+    insert this bypasses ``save()`` and the post_save signal.
+    """
+    deltas = {}
+    for txn in transactions:
+        deltas[txn.product_id] = deltas.get(txn.product_id, 0) + txn.stock_delta
+
+    with transaction.atomic():
+        created = InventoryTransaction.objects.bulk_create(transactions)
+        apply_stock_deltas(deltas)
+    return created
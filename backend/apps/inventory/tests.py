@@ -1,3 +1,728 @@
-from django.test import TestCase
+import json
+import threading
+from importlib import import_module
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.base.dates import date_range_q
+from apps.base.testing import QueryCountTestMixin, QueryPlanTestMixin
+from apps.orders.models import Order, OrderItem
+from apps.products.models import Category, Product, Supplier
+from apps.stores.models import Store
+from . import batches
+from .batches import allocate_batches
+from .forecasting import forecast, forecast_demand
+from .models import DemandForecast, Inventory, InventoryTransaction, LowStockEvent, ProductExpiry, StockSnapshot
+from .reconcile import find_drift
+from .signals import low_stock_changed
+from .snapshots import stock_at, stock_on, take_snapshots, verify_snapshots
+from .stock import apply_stock_deltas
+
+
+def create_product(product_id='P-001', stock_quantity=0):
+    category, _ = Category.objects.get_or_create(name='Soft Drinks')
+    return Product.objects.create(
+        product_id=product_id,
+        name=f'Product {product_id}',
+        category=category,
+        price=Decimal('20.00'),
+        stock_quantity=stock_quantity
+    )
+
+
+class StockEngineTests(TestCase):
+    def test_transaction_types_update_both_counters(self):
+        """Test that in, out and adjustment transactions move stock atomically"""
+        product = create_product(stock_quantity=10)
+
+        InventoryTransaction.objects.create(product=product, quantity=20, transaction_type='in')
+        InventoryTransaction.objects.create(product=product, quantity=5, transaction_type='out')
+        InventoryTransaction.objects.create(product=product, quantity=-3, transaction_type='adjustment')
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 22)
+        self.assertEqual(Inventory.objects.get(product=product).quantity, 12)
+
+    def test_loaded_product_is_kept_in_step(self):
+        """Test that the in-memory product reflects the applied delta"""
+        product = create_product(stock_quantity=10)
+
+        InventoryTransaction.objects.create(product=product, quantity=4, transaction_type='out')
+
+        self.assertEqual(product.stock_quantity, 6)
+
+    def test_resaving_does_not_move_stock_again(self):
+        """Test that editing a recorded transaction leaves stock untouched"""
+        product = create_product(stock_quantity=10)
+        txn = InventoryTransaction.objects.create(product=product, quantity=4, transaction_type='in')
+
+        txn.reason = 'Corrected note'
+        txn.save()
+
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 14)
+
+    def test_multi_product_deltas_use_one_update_per_table(self):
+        """Test that a batch of deltas is applied with constant queries"""
+        products = [create_product(f'P-{i:03d}', stock_quantity=100) for i in range(10)]
+        for product in products:
+            Inventory.objects.create(product=product, quantity=100)
+
+        with CaptureQueriesContext(connection) as ctx:
+            apply_stock_deltas({product.pk: -i for i, product in enumerate(products)})
+
+        statements = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(
+            list(Product.objects.order_by('product_id').values_list('stock_quantity', flat=True)),
+            [100 - i for i in range(10)]
+        )
+        self.assertEqual(
+            list(Inventory.objects.order_by('product__product_id').values_list('quantity', flat=True)),
+            [100 - i for i in range(10)]
+        )
+
+
+class InventoryTransactionQueryPlanTests(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.in_april = date_range_q('created_at', '2025-04-01', '2025-04-30')
+
+    def test_product_history_uses_index(self):
+        """Test that a product's transaction history does not scan the table"""
+        product = create_product()
+        self.assertNoFullScan(
+            InventoryTransaction.objects.filter(self.in_april, product=product, transaction_type='out')
+        )
+
+    def test_stock_received_totals_use_index(self):
+        """Test that the dashboard's stock received totals do not scan the table"""
+        self.assertNoFullScan(
+            InventoryTransaction.objects.filter(self.in_april, transaction_type='in').order_by()
+        )
+
+
+class InventoryTransactionExportTests(TestCase):
+    def test_ndjson_export_honours_type_filter(self):
+        """Test that the transaction export streams only the filtered type"""
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.create_user(username='testuser', password='testpassword123'))
+        product = create_product(stock_quantity=10)
+        InventoryTransaction.objects.create(product=product, quantity=5, transaction_type='in')
+        InventoryTransaction.objects.create(product=product, quantity=2, transaction_type='out')
+
+        response = client.get('/api/inventory/inventory-transactions/export/?transaction_type=out&export_format=ndjson')
+
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['product_id'], 'P-001')
+        self.assertEqual(rows[0]['quantity'], 2)
+
+
+class StockSnapshotTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.days = [self.today - timedelta(days=offset) for offset in (4, 3, 2)]
+        self.product = create_product('P-001')
+        self.other = create_product('P-002')
+        self.record(self.product, 10, 'in', self.days[0], 9)
+        self.record(self.product, 3, 'out', self.days[0], 15)
+        self.record(self.other, 7, 'adjustment', self.days[1], 10)
+        self.record(self.product, 5, 'in', self.days[2], 11)
+        self.record(self.product, 2, 'in', self.today, 0)
+
+    def at(self, day, hour):
+        return timezone.make_aware(datetime.combine(day, time(hour)))
+
+    def record(self, product, quantity, transaction_type, day, hour):
+        txn = InventoryTransaction.objects.create(product=product, quantity=quantity, transaction_type=transaction_type)
+        InventoryTransaction.objects.filter(pk=txn.pk).update(created_at=self.at(day, hour))
+
+    def test_snapshots_are_sparse_and_stop_before_today(self):
+        """Test that only completed days with transactions are snapshotted, once"""
+        result = take_snapshots()
+
+        self.assertEqual((result['start'], result['snapshots']), (self.days[0], 3))
+        self.assertEqual(
+            list(StockSnapshot.objects.order_by('date').values_list('product__product_id', 'date', 'quantity')),
+            [('P-001', self.days[0], 7), ('P-002', self.days[1], 7), ('P-001', self.days[2], 12)]
+        )
+        self.assertEqual(take_snapshots()['snapshots'], 0)
+
+    def test_point_in_time_stock(self):
+        """Test stock at a time and at the end of a day, with and without snapshots"""
+        expected = [
+            (self.at(self.days[0], 12), 10),
+            (self.at(self.days[1], 12), 7),
+            (self.at(self.days[2], 11), 7),
+            (self.at(self.days[2], 12), 12),
+            (timezone.now(), 14),
+        ]
+        for taken in (False, True):
+            if taken:
+                take_snapshots()
+            for at, quantity in expected:
+                self.assertEqual(stock_at(self.product, at), quantity)
+            self.assertEqual(stock_on(self.days[0] - timedelta(days=1)), {self.product.pk: 0, self.other.pk: 0})
+            self.assertEqual(stock_on(self.days[1]), {self.product.pk: 7, self.other.pk: 7})
+            self.assertEqual(stock_on(self.today), {self.product.pk: 14, self.other.pk: 7})
+
+        self.assertEqual(stock_at(self.product), Inventory.objects.get(product=self.product).quantity)
+        with self.assertNumQueries(2):
+            stock_at(self.product, self.at(self.days[2], 12))
+
+    def test_verify_finds_and_fixes_stale_snapshots(self):
+        """Test that backdated transactions are reported against the snapshots and fixed"""
+        take_snapshots()
+        self.assertEqual(verify_snapshots(), [])
+
+        self.record(self.product, 4, 'out', self.days[1], 12)
+        StockSnapshot.objects.filter(product=self.other).update(quantity=70)
+
+        self.assertEqual(
+            [(issue.product_id, issue.date, issue.recorded, issue.expected) for issue in verify_snapshots()],
+            [
+                (self.product.pk, self.days[1], None, 3),
+                (self.product.pk, self.days[2], 12, 8),
+                (self.other.pk, self.days[1], 70, 7),
+            ]
+        )
+        call_command('verify_stock_snapshots', '--fix', stdout=StringIO())
+        self.assertEqual(verify_snapshots(), [])
+        self.assertEqual(stock_on(self.days[2])[self.product.pk], 8)
+
+    def test_endpoints(self):
+        """Test the stock-at and stock-on endpoints"""
+        take_snapshots()
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.create_user(username='testuser', password='testpassword123'))
+
+        response = client.get('/api/inventory/inventory/stock-at/', {
+            'product_id': self.product.pk, 'at': self.at(self.days[1], 0).isoformat()
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['quantity'], 7)
+
+        response = client.get('/api/inventory/inventory/stock-on/', {'date': self.days[2].isoformat()})
+        self.assertEqual(
+            [(row['product_id'], row['quantity']) for row in response.data],
+            [('P-001', 12), ('P-002', 7)]
+        )
+
+        response = client.get('/api/inventory/inventory/stock-on/', {'date': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+
+class StockReconciliationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=get_user_model().objects.create_user(username='testuser', password='testpassword123'))
+        # Opening stock typed into the product form never reached the ledger
+        self.opening = create_product('P-001', stock_quantity=10)
+        self.edited = create_product('P-002')
+        self.in_step = create_product('P-003')
+        self.untouched = create_product('P-004')
+        for product in (self.opening, self.edited, self.in_step):
+            InventoryTransaction.objects.create(product=product, quantity=6, transaction_type='in')
+        InventoryTransaction.objects.create(product=self.edited, quantity=2, transaction_type='out')
+        Inventory.objects.filter(product=self.edited).update(quantity=50)
+
+    def test_drift_is_reported_and_fixed(self):
+        """Test that both counters are compared with the ledger and reset to it"""
+        self.assertEqual(
+            [(drift.product_id, drift.balance, drift.stock_quantity, drift.inventory_quantity) for drift in find_drift()],
+            [(self.opening.pk, 6, 16, 6), (self.edited.pk, 4, 4, 50)]
+        )
+
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('2 products drifted: 1 product counters, 1 inventory counters', out.getvalue())
+        self.assertEqual(len(list(find_drift())), 2)
+
+        call_command('reconcile_stock', '--fix', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(list(find_drift()), [])
+        self.assertEqual(
+            list(Product.objects.order_by('product_id').values_list('stock_quantity', 'inventory__quantity')),
+            [(6, 6), (4, 4), (6, 6), (0, None)]
+        )
+
+    def test_drift_from_snapshots(self):
+        """Test that reconciling from the snapshots matches summing the whole ledger"""
+        InventoryTransaction.objects.filter(product=self.edited, transaction_type='out').update(
+            created_at=timezone.now() - timedelta(days=1)
+        )
+        take_snapshots()
+
+        self.assertEqual(list(find_drift(from_snapshots=True)), list(find_drift()))
+
+    def test_adjustment_moves_counters_through_the_ledger(self):
+        """Test that the adjust endpoint records a transaction and the inventory list shows its quantity"""
+        response = self.client.post('/api/inventory/inventory/adjust/', {
+            'product_id': self.in_step.pk, 'adjustment_value': 4, 'transaction_type': 'out', 'reason': 'Damaged'
+        })
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created_by'], 'testuser')
+        self.assertNotIn(self.in_step.pk, [drift.product_id for drift in find_drift()])
+        self.in_step.refresh_from_db()
+        self.assertEqual(self.in_step.stock_quantity, 2)
+
+        response = self.client.get('/api/inventory/inventory/', {'product_id': self.in_step.pk})
+        self.assertEqual([row['quantity'] for row in response.data], [2])
+
+
+class LowStockTests(TestCase):
+    def setUp(self):
+        self.product = create_product('P-001')
+        self.received = []
+        low_stock_changed.connect(self.receive)
+        self.addCleanup(low_stock_changed.disconnect, self.receive)
+
+    def receive(self, sender, events, **kwargs):
+        self.received.extend((event.product_id, event.kind) for event in events)
+
+    def move(self, quantity, transaction_type):
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryTransaction.objects.create(product=self.product, quantity=quantity, transaction_type=transaction_type)
+        return Inventory.objects.get(product=self.product)
+
+    def events(self):
+        return list(LowStockEvent.objects.values_list('kind', 'quantity', 'reorder_level'))
+
+    def test_flag_and_transitions_follow_stock_moves(self):
+        """Test that only crossing the reorder level flips the flag and records an event"""
+        self.assertFalse(self.move(20, 'in').is_low_stock)
+        self.assertTrue(self.move(12, 'out').is_low_stock)
+        self.assertTrue(self.move(1, 'out').is_low_stock)
+        self.assertFalse(self.move(5, 'in').is_low_stock)
+
+        self.assertEqual(self.events(), [('below', 8, 10), ('recovered', 12, 10)])
+        self.assertEqual(self.received, [(self.product.pk, 'below'), (self.product.pk, 'recovered')])
+
+    def test_first_stock_below_reorder_level_is_a_transition(self):
+        """Test that a product first stocked below its reorder level records an event"""
+        self.assertTrue(self.move(3, 'in').is_low_stock)
+        self.assertEqual(self.events(), [('below', 3, 10)])
+
+    def test_reorder_level_changes_are_transitions(self):
+        """Test that editing the reorder level updates the flag and records the transition"""
+        inventory = self.move(12, 'in')
+        inventory.reorder_level = 15
+        inventory.save(update_fields=['reorder_level'])
+
+        inventory.refresh_from_db()
+        self.assertTrue(inventory.is_low_stock)
+        self.assertEqual(self.events(), [('below', 12, 15)])
+
+    def test_unchanged_sides_cost_no_writes(self):
+        """Test that a batch of deltas that crosses no reorder level writes nothing else"""
+        products = [create_product(f'P-{i:03d}', stock_quantity=100) for i in range(2, 12)]
+        for product in products:
+            Inventory.objects.create(product=product, quantity=100)
+
+        with CaptureQueriesContext(connection) as ctx:
+            apply_stock_deltas({product.pk: -i for i, product in enumerate(products)})
+        self.assertFalse(any(q['sql'].startswith('INSERT') for q in ctx.captured_queries))
+
+        apply_stock_deltas({products[0].pk: -95, products[1].pk: -5})
+        self.assertEqual(self.events(), [('below', 5, 10)])
+
+    def test_reconcile_refreshes_stale_flags(self):
+        """Test that flags left stale by direct updates are fixed by reconcile_stock"""
+        self.move(20, 'in')
+        Inventory.objects.filter(product=self.product).update(reorder_level=30)
+
+        call_command('reconcile_stock', '--fix', stdout=StringIO())
+
+        self.assertTrue(Inventory.objects.get(product=self.product).is_low_stock)
+        self.assertEqual(self.events(), [('below', 20, 30)])
+
+    @skipUnless(connection.vendor == 'sqlite', 'Checks a SQLite query plan')
+    def test_low_stock_list_uses_partial_index(self):
+        """Test that the low stock list walks the partial index, which only holds low rows"""
+        plan = Inventory.objects.filter(is_low_stock=True).order_by('quantity', 'product_id').explain()
+        self.assertIn('inv_low_stock_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_unstocked_products_count_as_low_stock(self):
+        """Test that products that never had stock get an inventory row and are counted as low"""
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.create_user(username='testuser', password='testpassword123'))
+        # Created through the API: the row is made with the product
+        response = client.post(
+            '/api/products/products/',
+            {'product_id': 'P-002', 'name': 'Royal', 'category': self.product.category_id, 'price': '20.00'},
+            format='json'
+        )
+        self.assertEqual(response.data['inventory']['is_low_stock'], True)
+
+        # Created before the row was made with the product: the migration backfills it
+        self.assertFalse(Inventory.objects.filter(product=self.product).exists())
+        import_module('apps.inventory.migrations.0007_inventory_for_unstocked_products').create_missing_inventory(
+            django_apps, None
+        )
+        self.assertEqual(Inventory.objects.filter(is_low_stock=True).count(), 2)
+        self.assertEqual(self.events(), [('below', 0, 10), ('below', 0, 10)])
+
+        response = client.get('/api/inventory/inventory/low_stock/')
+        self.assertEqual([row['product']['product_id'] for row in response.data], ['P-001', 'P-002'])
+        response = client.get('/api/dashboard/summary/')
+        self.assertEqual(response.data['summary']['products']['low_stock'], 2)
+
+    def test_endpoints(self):
+        """Test the low stock list and following the event stream by id"""
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.create_user(username='testuser', password='testpassword123'))
+        other = create_product('P-002')
+        InventoryTransaction.objects.create(product=other, quantity=4, transaction_type='in')
+        self.move(7, 'in')
+
+        response = client.get('/api/inventory/inventory/low_stock/')
+        self.assertEqual([row['product']['product_id'] for row in response.data], ['P-002', 'P-001'])
+
+        response = client.get('/api/inventory/low-stock-events/')
+        first = response.data[0]['id']
+        self.assertEqual([(row['product_code'], row['kind']) for row in response.data], [('P-002', 'below'), ('P-001', 'below')])
+
+        self.move(10, 'in')
+        response = client.get('/api/inventory/low-stock-events/', {'after': first + 1})
+        self.assertEqual([(row['product_code'], row['kind'], row['quantity']) for row in response.data], [('P-001', 'recovered', 17)])
+
+        response = client.get('/api/inventory/low-stock-events/', {'after': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BatchAllocationTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.product = create_product('P-001', stock_quantity=200)
+        self.batches = {
+            name: ProductExpiry.objects.create(
+                product=self.product,
+                batch_number=name,
+                quantity=quantity,
+                expiry_date=self.today + timedelta(days=days),
+                is_active=active
+            )
+            for name, quantity, days, active in (
+                ('expired', 5, -1, True),
+                ('late', 100, 30, True),
+                ('middle', 3, 10, True),
+                ('soon', 4, 5, True),
+                ('withdrawn', 50, 1, False),
+            )
+        }
+
+    def stock_out(self, quantity, product=None):
+        txn = InventoryTransaction.objects.create(
+            product=product or self.product, quantity=quantity, transaction_type='out'
+        )
+        return txn, [(a.batch.batch_number, a.quantity) for a in allocate_batches([txn])]
+
+    def batch_state(self):
+        return {
+            batch.batch_number: (batch.quantity, batch.is_active)
+            for batch in ProductExpiry.objects.filter(product=self.product)
+        }
+
+    def test_first_expiry_first_out(self):
+        """Test that stock-outs take the soonest sellable batches first and deactivate emptied ones"""
+        self.assertEqual(self.stock_out(6)[1], [('soon', 4), ('middle', 2)])
+        self.assertEqual(self.stock_out(10)[1], [('middle', 1), ('late', 9)])
+
+        self.assertEqual(self.batch_state(), {
+            'expired': (5, True),
+            'late': (91, True),
+            'middle': (0, False),
+            'soon': (0, False),
+            'withdrawn': (50, False),
+        })
+
+    def test_uncovered_quantity_is_left_unallocated(self):
+        """Test that a stock-out larger than the batches takes what there is"""
+        txn, allocations = self.stock_out(150)
+
+        self.assertEqual(allocations, [('soon', 4), ('middle', 3), ('late', 100)])
+        self.assertEqual(sum(a.quantity for a in txn.batch_allocations.all()), 107)
+        self.assertEqual(self.stock_out(1)[1], [])
+
+    def test_batch_emptied_before_it_is_locked(self):
+        """Test that a batch taken by a concurrent allocation after it was chosen is replaced by the next ones"""
+        races = [lambda: ProductExpiry.objects.filter(batch_number='soon').update(quantity=0, is_active=False)]
+
+        def candidates(*args, **kwargs):
+            rows = real_candidates(*args, **kwargs)
+            # The other allocation commits between the read and the lock
+            while races:
+                races.pop()()
+            return rows
+
+        real_candidates = batches._candidates
+        with mock.patch.object(batches, '_candidates', side_effect=candidates):
+            txn, allocations = self.stock_out(6)
+
+        self.assertEqual(allocations, [('middle', 3), ('late', 3)])
+        self.assertEqual(self.batch_state()['late'], (97, True))
+
+    def test_many_products_in_constant_queries(self):
+        """Test that allocating for many products and transactions costs the same queries as for one"""
+        def allocate(count):
+            transactions = []
+            for i in range(count):
+                product = create_product(f'Q-{count}-{i}', stock_quantity=10)
+                ProductExpiry.objects.create(
+                    product=product, batch_number=f'B-{i}', quantity=10, expiry_date=self.today
+                )
+                transactions += [
+                    InventoryTransaction.objects.create(product=product, quantity=3, transaction_type='out')
+                    for _ in range(2)
+                ]
+            with CaptureQueriesContext(connection) as ctx:
+                allocations = allocate_batches(transactions)
+            self.assertEqual(len(allocations), 2 * count)
+            return len(ctx.captured_queries)
+
+        self.assertEqual(allocate(1), allocate(10))
+        self.assertEqual(
+            set(ProductExpiry.objects.filter(batch_number__startswith='B-').values_list('quantity', flat=True)),
+            {4}
+        )
+
+    def test_near_expiry_report(self):
+        """Test that the report lists sellable stock expiring within the window, expired first"""
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.create_user(username='testuser', password='testpassword123'))
+        self.stock_out(4)
+
+        response = client.get('/api/inventory/product-expiries/near-expiry/', {'days': 10})
+        self.assertEqual(
+            [(row['batch_number'], row['days_to_expiry']) for row in response.data],
+            [('expired', -1), ('middle', 10)]
+        )
+        response = client.get('/api/inventory/product-expiries/near-expiry/')
+        self.assertEqual([row['batch_number'] for row in response.data], ['expired', 'middle', 'late'])
+
+        response = client.get(f"/api/inventory/product-expiries/{self.batches['soon'].pk}/allocations/")
+        self.assertEqual([row['quantity'] for row in response.data], [4])
+
+        response = client.get('/api/inventory/product-expiries/near-expiry/', {'days': -1})
+        self.assertEqual(response.status_code, 400)
+
+
+class DemandForecastTests(TestCase):
+    def setUp(self):
+        self.today = timezone.localdate()
+        self.start = self.today - timedelta(weeks=4)
+        self.product = create_product('P-001')
+        Inventory.objects.create(product=self.product, quantity=30, reorder_level=10)
+        self.monday = self.create_store('Monday Store', 'Monday')
+        self.thursday = self.create_store('Thursday Store', 'Thursday')
+        # Every week the Monday store orders 14 units on the Friday before
+        # and the Thursday store 7 units on the day
+        for offset in range(28):
+            day = self.start + timedelta(days=offset)
+            if day.weekday() == 0:
+                self.order(self.monday, day - timedelta(days=3), 14)
+            elif day.weekday() == 3:
+                self.order(self.thursday, day, 7)
+
+    def create_store(self, name, day):
+        return Store.objects.create(
+            name=name, location='Location', lat=14.5995, lng=120.9842, owner_name='Owner', number='0912', day=day
+        )
+
+    def order(self, store, placed, quantity, status='completed', product=None):
+        order = Order.objects.create(
+            order_id=f'ORD-{Order.objects.count():04d}', store=store, delivery_day=store.day, status=status
+        )
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(datetime.combine(placed, time(12))))
+        # bulk_create skips the stock signals, only the demand matters here
+        OrderItem.objects.bulk_create([OrderItem(
+            order=order, product=product or self.product, quantity=quantity,
+            unit_price=Decimal('20.00'), total=Decimal('20.00') * quantity
+        )])
+
+    def run_forecast(self, **kwargs):
+        options = dict(today=self.today, weeks=4, lead_time=7, cycle=7, service_level=0.95)
+        return forecast_demand(**{**options, **kwargs})
+
+    def test_weekly_store_cycles(self):
+        """Test that demand lands on the delivery weekday and steady demand gives exact reorder figures"""
+        run = self.run_forecast()
+        self.assertEqual((run.products, run.store_series), (1, 2))
+
+        overall = DemandForecast.objects.get(product=self.product, store=None)
+        self.assertAlmostEqual(overall.daily_demand, 3)
+        self.assertAlmostEqual(overall.demand_std, 0)
+        self.assertEqual((overall.reorder_point, overall.reorder_quantity), (21, 21))
+        self.assertAlmostEqual(overall.weekday_factors[0], 14 / 3, places=3)
+        self.assertAlmostEqual(overall.weekday_factors[3], 7 / 3, places=3)
+        self.assertEqual(overall.weekday_factors[4], 0)
+
+        monday = DemandForecast.objects.get(product=self.product, store=self.monday)
+        self.assertAlmostEqual(monday.daily_demand, 2)
+        self.assertEqual((monday.reorder_point, monday.reorder_quantity), (14, 14))
+        self.assertEqual([day for day, factor in enumerate(monday.weekday_factors) if factor], [0])
+
+    def test_cancelled_and_undelivered_orders_are_ignored(self):
+        """Test that cancelled orders and orders delivered from today on do not count"""
+        self.order(self.thursday, self.today - timedelta(days=8), 500, status='cancelled')
+        # Placed inside the window but delivered today
+        weekday = [day for day, _ in Store._meta.get_field('day').choices][self.today.weekday()]
+        self.order(self.create_store('Today Store', weekday), self.today - timedelta(days=1), 500)
+        self.run_forecast()
+        self.assertAlmostEqual(DemandForecast.objects.get(store=None).daily_demand, 3)
+
+    def test_rerun_replaces_forecasts_and_applies_reorder_levels(self):
+        """Test that each run rebuilds the table and --apply moves reorder levels and low-stock flags"""
+        gone = create_product('P-002')
+        self.order(self.monday, self.today - timedelta(days=10), 5, product=gone)
+        self.run_forecast()
+        self.assertTrue(DemandForecast.objects.filter(product=gone).exists())
+
+        OrderItem.objects.filter(product=gone).delete()
+        Inventory.objects.filter(product=self.product).update(quantity=20)
+        with self.captureOnCommitCallbacks(execute=True):
+            run = self.run_forecast(apply=True)
+        self.assertFalse(DemandForecast.objects.filter(product=gone).exists())
+        self.assertEqual(run.applied, 1)
+        inventory = Inventory.objects.get(product=self.product)
+        self.assertEqual(inventory.reorder_level, 21)
+        self.assertTrue(inventory.is_low_stock)
+        self.assertEqual(list(LowStockEvent.objects.values_list('kind', 'quantity', 'reorder_level')), [('below', 20, 21)])
+
+    def test_smoothing_follows_recent_demand(self):
+        """Test that the level moves towards recent demand and uncertain demand adds safety stock"""
+        demand = np.zeros((2, 28))
+        demand[0, ::7] = [7, 7, 14, 14]
+        demand[1, ::7] = [0, 14, 0, 14]
+        result = forecast(demand, first_weekday=0, alpha=0.5, lead_time=7, cycle=7, service_level=0.95)
+        self.assertGreater(result.daily_demand[0], demand[0].mean())
+        self.assertLess(result.daily_demand[0], 2)
+        self.assertGreater(result.demand_std[1], 0)
+        self.assertGreater(result.reorder_point[1], result.lead_time_demand[1])
+
+    def test_endpoints_and_command(self):
+        """Test that the forecasts and reorder recommendations are served and the command validates input"""
+        self.order(self.monday, self.today - timedelta(days=10), 5, product=create_product('P-002'))
+        call_command('forecast_demand', '--weeks', '4', stdout=StringIO())
+        client = APIClient()
+        client.force_authenticate(user=get_user_model().objects.create_user(username='testuser', password='testpassword123'))
+
+        response = client.get('/api/inventory/inventory/forecasts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(row['product_code'], row['store']) for row in response.data], [('P-001', None), ('P-002', None)])
+        response = client.get('/api/inventory/inventory/forecasts/', {'store_id': self.thursday.pk})
+        self.assertEqual([row['store_name'] for row in response.data], ['Thursday Store'])
+        response = client.get('/api/inventory/inventory/forecasts/', {'store_id': 0})
+        self.assertEqual(response.status_code, 400)
+        response = client.get('/api/inventory/inventory/forecasts/', {'store_id': self.monday.pk, 'page_size': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['product_code'] for row in response.data['results']], ['P-001'])
+        response = client.get(response.data['next'])
+        self.assertEqual([row['product_code'] for row in response.data['results']], ['P-002'])
+        self.assertIsNone(response.data['next'])
+
+        self.assertEqual(client.get('/api/inventory/inventory/reorder-recommendations/').data, [])
+        Inventory.objects.filter(product=self.product).update(quantity=5)
+        response = client.get('/api/inventory/inventory/reorder-recommendations/')
+        self.assertEqual([(row['quantity'], row['order_quantity']) for row in response.data], [(5, 37)])
+
+        with self.assertRaises(CommandError):
+            call_command('forecast_demand', '--weeks', '1', stdout=StringIO())
+
+
+class StockConcurrencyTests(TransactionTestCase):
+    writers = 8
+    transactions_per_writer = 25
+
+    def test_parallel_writers_do_not_lose_updates(self):
+        """Test that many parallel writers leave the stock counters exact"""
+        product = create_product(stock_quantity=1000)
+        errors = []
+        barrier = threading.Barrier(self.writers)
+
+        def writer(index):
+            try:
+                barrier.wait()
+                for i in range(self.transactions_per_writer):
+                    transaction_type = 'in' if (index + i) % 3 == 0 else 'out'
+                    InventoryTransaction.objects.create(
+                        product_id=product.pk,
+                        quantity=2,
+                        transaction_type=transaction_type
+                    )
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        expected_delta = sum(
+            2 if (index + i) % 3 == 0 else -2
+            for index in range(self.writers)
+            for i in range(self.transactions_per_writer)
+        )
+        product.refresh_from_db()
+        self.assertEqual(product.stock_quantity, 1000 + expected_delta)
+        self.assertEqual(Inventory.objects.get(product=product).quantity, expected_delta)
+        self.assertEqual(
+            InventoryTransaction.objects.filter(product=product).count(),
+            self.writers * self.transactions_per_writer
+        )
+
+
+class InventoryQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.category = Category.objects.create(name='Soft Drinks')
+        self.supplier = Supplier.objects.create(name='Supplier')
+        self.count = 0
+
+    def create_stock(self, count):
+        for _ in range(count):
+            self.count += 1
+            product = Product.objects.create(
+                product_id=f'PRD-{self.count:03d}', name='Cola', category=self.category,
+                supplier=self.supplier, price=20
+            )
+            InventoryTransaction.objects.create(
+                product=product, quantity=5, transaction_type='in', user=self.user
+            )
+            ProductExpiry.objects.create(
+                product=product, batch_number=f'B-{self.count}', quantity=5,
+                expiry_date=timezone.localdate() + timedelta(days=30)
+            )
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        """Test that the inventory, transaction, low-stock and batch lists cost constant queries"""
+        for url in (
+            '/api/inventory/inventory/',
+            '/api/inventory/inventory/low_stock/',
+            '/api/inventory/inventory-transactions/',
+            '/api/inventory/low-stock-events/',
+            '/api/inventory/product-expiries/',
+        ):
+            with self.subTest(url=url):
+                self.assertConstantQueries(lambda: self.client.get(url), self.create_stock, max_queries=2)
@@ -1,14 +1,19 @@
 # apps/inventory/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import InventoryViewSet, InventoryTransactionViewSet, InventoryAdjustmentView
+from .views import (
+    InventoryViewSet, InventoryTransactionViewSet, InventoryAdjustmentView, LowStockEventViewSet, ProductExpiryViewSet
+)
 
 router = DefaultRouter()
 router.register(r'inventory', InventoryViewSet)
 router.register(r'inventory-transactions', InventoryTransactionViewSet)
+router.register(r'low-stock-events', LowStockEventViewSet)
+router.register(r'product-expiries', ProductExpiryViewSet)
 router.register(r'inventory-adjustment', InventoryAdjustmentView, basename='inventory-adjustment')
 
 urlpatterns = [
-    path('', include(router.urls)),
+    # Ahead of the router, whose inventory detail route would match it
     path('inventory/adjust/', InventoryAdjustmentView.as_view({'post': 'adjust'}), name='inventory-adjust'),
+    path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,12 +1,24 @@
 # apps/inventory/views.py
+from django.conf import settings
+from django.db.models import F
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from .models import Inventory, InventoryTransaction
-from .serializers import InventorySerializer, InventoryTransactionSerializer, InventoryAdjustmentSerializer
+from .models import BatchAllocation, DemandForecast, Inventory, InventoryTransaction, LowStockEvent, ProductExpiry
+from .serializers import (
+    InventorySerializer, InventoryTransactionSerializer, InventoryAdjustmentSerializer,
+    LowStockEventSerializer, StockAtSerializer, StockOnSerializer,
+    BatchAllocationSerializer, NearExpirySerializer, ProductExpirySerializer,
+    DemandForecastSerializer, ForecastFilterSerializer, ReorderRecommendationSerializer
+)
+from . import snapshots
+from .batches import near_expiry
+from apps.base.dates import date_range_q
+from apps.base.exports import ExportMixin
 from apps.products.models import Product
-from django.db.models import F
+from django.utils import timezone
 
 class InventoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Inventory.objects.all()
@@ -14,7 +26,7 @@ class InventoryViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        queryset = Inventory.objects.all()
+        queryset = Inventory.objects.select_related('product__category', 'product__supplier')
         
         # Filter by product
         product_id = self.request.query_params.get('product_id')
@@ -26,19 +38,94 @@ class InventoryViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def low_stock(self, request):
         """Get products with stock below reorder level."""
-        low_stock_items = Inventory.objects.filter(
-            current_stock__lte=F('product__reorder_level')
+        # Served by the partial low-stock index, most urgent first
+        low_stock_items = (
+            Inventory.objects
+            .filter(is_low_stock=True)
+            .select_related('product__category', 'product__supplier')
+            .order_by('quantity', 'product_id')
         )
         serializer = self.get_serializer(low_stock_items, many=True)
         return Response(serializer.data)
+    
+    @action(detail=False, methods=['get'], url_path='stock-at')
+    def stock_at(self, request):
+        """Ledger stock of product_id at the datetime at, defaulting to now."""
+        params = StockAtSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        product = params.validated_data['product_id']
+        at = params.validated_data.get('at') or timezone.now()
+        return Response({'product_id': product.pk, 'at': at, 'quantity': snapshots.stock_at(product, at)})
+    
+    @action(detail=False, methods=['get'], url_path='stock-on')
+    def stock_on(self, request):
+        """Closing ledger stock of every product at the end of date."""
+        params = StockOnSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        balances = snapshots.stock_on(params.validated_data['date'])
+        products = Product.objects.order_by('product_id').values('id', 'product_id', 'name')
+        return Response([{**product, 'quantity': balances.get(product['id'], 0)} for product in products])
+    
+    @action(detail=False, methods=['get'])
+    def forecasts(self, request):
+        """Demand forecasts over all stores, or for store_id's orders, by product."""
+        params = ForecastFilterSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        store = params.validated_data.get('store_id')
+        # store is nullable, so page on the product and the primary key
+        forecasts = (
+            DemandForecast.objects
+            .filter(store=store)
+            .select_related('product', 'store')
+            .order_by('product_id', 'pk')
+        )
+        product = params.validated_data.get('product_id')
+        if product:
+            forecasts = forecasts.filter(product=product)
+        
+        page = self.paginate_queryset(forecasts)
+        if page is not None:
+            return self.get_paginated_response(DemandForecastSerializer(page, many=True).data)
+        return Response(DemandForecastSerializer(forecasts, many=True).data)
+    
+    @action(detail=False, methods=['get'], url_path='reorder-recommendations')
+    def reorder_recommendations(self, request):
+        """
+        Products at or below their forecast reorder point, with the quantity
+        that brings them back up to one reorder cycle above it, most urgent first.
+        """
+        quantity = F('product__inventory__quantity')
+        recommendations = (
+            DemandForecast.objects
+            .filter(store__isnull=True, product__inventory__quantity__lte=F('reorder_point'))
+            .annotate(quantity=quantity, order_quantity=F('reorder_point') + F('reorder_quantity') - quantity)
+            .select_related('product')
+            .order_by(quantity - F('reorder_point'), 'product_id')
+        )
+        return Response(ReorderRecommendationSerializer(recommendations, many=True).data)
 
-class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
+class InventoryTransactionViewSet(ExportMixin, viewsets.ReadOnlyModelViewSet):
     queryset = InventoryTransaction.objects.all()
     serializer_class = InventoryTransactionSerializer
     permission_classes = [IsAuthenticated]
+    export_filename = 'inventory-transactions'
+    export_fields = [
+        ('id', 'id'),
+        ('product_id', 'product__product_id'),
+        ('product_name', 'product__name'),
+        ('transaction_type', 'transaction_type'),
+        ('quantity', 'quantity'),
+        ('reference', 'reference'),
+        ('reason', 'reason'),
+        ('user', 'user__username'),
+        ('created_at', 'created_at'),
+    ]
     
     def get_queryset(self):
-        queryset = InventoryTransaction.objects.all()
+        # The nested product serializer reads its category, supplier and inventory
+        queryset = InventoryTransaction.objects.select_related(
+            'product__category', 'product__supplier', 'product__inventory', 'user'
+        )
         
         # Filter by product
         product_id = self.request.query_params.get('product_id')
@@ -50,18 +137,83 @@ class InventoryTransactionViewSet(viewsets.ReadOnlyModelViewSet):
         if transaction_type:
             queryset = queryset.filter(transaction_type=transaction_type)
         
-        # Filter by date range
+        # Filter by date range as a half-open datetime range so the
+        # created_at index can be used
         start_date = self.request.query_params.get('start_date')
         end_date = self.request.query_params.get('end_date')
-        if start_date and end_date:
-            queryset = queryset.filter(created_at__date__range=[start_date, end_date])
-        elif start_date:
-            queryset = queryset.filter(created_at__date__gte=start_date)
-        elif end_date:
-            queryset = queryset.filter(created_at__date__lte=end_date)
+        if start_date or end_date:
+            queryset = queryset.filter(date_range_q('created_at', start_date, end_date))
         
         return queryset
 
+class LowStockEventViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Low-stock transitions, oldest first. Alerting polls with after set to
+    the last id it has seen.
+    """
+    queryset = LowStockEvent.objects.all()
+    serializer_class = LowStockEventSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = LowStockEvent.objects.select_related('product')
+        
+        after = self.request.query_params.get('after')
+        if after:
+            try:
+                queryset = queryset.filter(pk__gt=int(after))
+            except ValueError:
+                raise ValidationError({'after': 'Expected an event id.'})
+        
+        # Filter by product
+        product_id = self.request.query_params.get('product_id')
+        if product_id:
+            queryset = queryset.filter(product_id=product_id)
+        
+        kind = self.request.query_params.get('kind')
+        if kind:
+            queryset = queryset.filter(kind=kind)
+        
+        return queryset
+
+class ProductExpiryViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = ProductExpiry.objects.all()
+    serializer_class = ProductExpirySerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = ProductExpiry.objects.select_related('product')
+        
+        # Filter by product
+        product_id = self.request.query_params.get('product_id')
+        if product_id:
+            queryset = queryset.filter(product_id=product_id)
+        
+        return queryset
+    
+    @action(detail=False, methods=['get'], url_path='near-expiry')
+    def near_expiry(self, request):
+        """Batches with stock left expiring within days (expired ones included), soonest first."""
+        params = NearExpirySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        days = params.validated_data.get('days', settings.INVENTORY_NEAR_EXPIRY_DAYS)
+        
+        batches = near_expiry(days).select_related('product')
+        product = params.validated_data.get('product_id')
+        if product:
+            batches = batches.filter(product=product)
+        
+        page = self.paginate_queryset(batches)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(batches, many=True).data)
+    
+    @action(detail=True, methods=['get'])
+    def allocations(self, request, pk=None):
+        """Stock-outs taken from this batch, newest first."""
+        allocations = BatchAllocation.objects.filter(batch=self.get_object()).select_related('batch').order_by('-pk')
+        return Response(BatchAllocationSerializer(allocations, many=True).data)
+
 class InventoryAdjustmentView(viewsets.GenericViewSet):
     serializer_class = InventoryAdjustmentSerializer
     permission_classes = [IsAuthenticated]
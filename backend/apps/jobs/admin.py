@@ -0,0 +1,10 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'job_type', 'status', 'attempts', 'locked_by', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'job_type', 'created_at')
+    search_fields = ('id', 'job_type', 'locked_by')
+    readonly_fields = ('created_at', 'updated_at', 'started_at', 'finished_at')
@@ -0,0 +1,12 @@
+from django.apps import AppConfig
+
+
+class JobsConfig(AppConfig):
+    name = 'apps.jobs'
+    verbose_name = 'Jobs'
+
+    def ready(self):
+        from django.utils.module_loading import autodiscover_modules
+
+        # Job handlers live in each app's jobs.py
+        autodiscover_modules('jobs')
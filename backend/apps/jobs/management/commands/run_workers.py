@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.jobs.queue import run_pending_jobs
+from apps.jobs.worker import DEFAULT_POLL_INTERVAL, Supervisor
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=getattr(settings, 'JOB_WORKERS', 2),
+            help='Number of worker processes'
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=DEFAULT_POLL_INTERVAL,
+            help='Seconds between checks for new jobs and timeouts'
+        )
+        parser.add_argument(
+            '--burst',
+            action='store_true',
+            help='Run every due job in this process, then exit (no pool, no timeouts)'
+        )
+
+    def handle(self, *args, **options):
+        if options['burst']:
+            count = run_pending_jobs()
+            self.stdout.write(self.style.SUCCESS(f'Ran {count} jobs'))
+            return
+
+        supervisor = Supervisor(options['workers'], options['poll_interval'])
+        self.stdout.write(f"Running {options['workers']} job workers, press Ctrl+C to stop")
+        try:
+            supervisor.run()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping job workers')
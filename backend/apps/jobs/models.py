@@ -0,0 +1,67 @@
+import uuid
+from django.db import models
+from django.conf import settings
+from apps.base.models import TimeStampedModel
+
+
+class Job(TimeStampedModel):
+    """
+    Background job run by the ``run_workers`` command
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    job_type = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    timeout = models.PositiveIntegerField(default=300, help_text='Seconds a single attempt may run')
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    result_file = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='jobs'
+    )
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        ordering = ['-created_at']
+        indexes = [
+            # Workers pick the oldest due job of the queue
+            models.Index(
+                fields=['run_after', 'created_at'],
+                condition=models.Q(status='queued'),
+                name='job_queued_due_idx'
+            ),
+            models.Index(
+                fields=['started_at'],
+                condition=models.Q(status='running'),
+                name='job_running_started_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.job_type} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_SUCCEEDED, self.STATUS_FAILED)
@@ -0,0 +1,213 @@
+"""
+Database-backed job queue.
+
+Jobs are rows in the Job table, so the queue needs no broker. A worker
+claims the oldest due job with a conditional UPDATE (or SELECT ... FOR
+UPDATE SKIP LOCKED where supported), so two workers never run the same
+attempt. Failed attempts are retried with exponential backoff until
+``max_attempts``; attempts that run longer than their ``timeout`` are
+expired by the supervisor in worker.py and retried the same way.
+
+Handlers are registered per job type in each app's ``jobs.py``::
+
+    @register('orders.receipt_pdf', timeout=60)
+    def render_receipt(job):
+        ...
+        return {'pages': 1}
+
+A handler returns a JSON-serialisable result and may attach one file with
+``save_result_file``. Raise PermanentJobError to fail without retrying.
+"""
+import logging
+import os
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_ATTEMPTS = 3
+# Seconds before the first retry; doubled for every further attempt
+DEFAULT_RETRY_DELAY = 10
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot succeed"""
+
+
+@dataclass
+class JobHandler:
+    func: Callable
+    timeout: Optional[int] = None
+    max_attempts: Optional[int] = None
+
+
+_handlers = {}
+
+
+def register(job_type, timeout=None, max_attempts=None):
+    """Register the decorated function as the handler of ``job_type``"""
+    def decorator(func):
+        _handlers[job_type] = JobHandler(func, timeout, max_attempts)
+        return func
+    return decorator
+
+
+def get_handler(job_type):
+    try:
+        return _handlers[job_type]
+    except KeyError:
+        raise ValueError(f"No handler registered for job type '{job_type}'")
+
+
+def enqueue(job_type, payload=None, user=None, delay=0, timeout=None, max_attempts=None):
+    """Queue a job and return it"""
+    handler = get_handler(job_type)
+    return Job.objects.create(
+        job_type=job_type,
+        payload=payload or {},
+        created_by=user,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        timeout=timeout or handler.timeout or getattr(settings, 'JOB_DEFAULT_TIMEOUT', DEFAULT_TIMEOUT),
+        max_attempts=max_attempts or handler.max_attempts or DEFAULT_MAX_ATTEMPTS,
+    )
+
+
+def _due_jobs(now):
+    return Job.objects.filter(status=Job.STATUS_QUEUED, run_after__lte=now).order_by('run_after', 'created_at')
+
+
+def claim_job(worker_name):
+    """Mark the oldest due job as running for ``worker_name`` and return it, or None"""
+    now = timezone.now()
+    claim = {
+        'status': Job.STATUS_RUNNING,
+        'locked_by': worker_name,
+        'started_at': now,
+        'finished_at': None,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = _due_jobs(now).select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+            if pk is None:
+                return None
+            Job.objects.filter(pk=pk).update(**claim)
+        return Job.objects.get(pk=pk)
+
+    # Without row locks, claim optimistically: the UPDATE only matches while
+    # the job is still queued, so a job lost to another worker is skipped
+    for pk in _due_jobs(now).values_list('pk', flat=True)[:10]:
+        if Job.objects.filter(pk=pk, status=Job.STATUS_QUEUED).update(**claim):
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def _finish(job, **fields):
+    """Update a running attempt unless it was expired or claimed again meanwhile"""
+    return Job.objects.filter(
+        pk=job.pk,
+        status=Job.STATUS_RUNNING,
+        locked_by=job.locked_by,
+        attempts=job.attempts,
+    ).update(**fields)
+
+
+def fail_job(job, error, retry=True):
+    """Record a failed attempt and queue a retry while attempts remain"""
+    now = timezone.now()
+    if retry and job.attempts < job.max_attempts:
+        delay = getattr(settings, 'JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY) * 2 ** (job.attempts - 1)
+        fields = {
+            'status': Job.STATUS_QUEUED,
+            'run_after': now + timedelta(seconds=delay),
+            'locked_by': '',
+            'error': error,
+        }
+    else:
+        fields = {'status': Job.STATUS_FAILED, 'finished_at': now, 'error': error}
+    return _finish(job, **fields)
+
+
+def run_job(job):
+    """Run a claimed job in this process and record the outcome"""
+    try:
+        handler = get_handler(job.job_type)
+    except ValueError as e:
+        fail_job(job, str(e), retry=False)
+        job.refresh_from_db()
+        return job
+
+    try:
+        result = handler.func(job)
+    except PermanentJobError as e:
+        logger.warning('Job %s failed permanently: %s', job.pk, e)
+        fail_job(job, str(e), retry=False)
+    except Exception:
+        logger.exception('Job %s failed', job.pk)
+        fail_job(job, traceback.format_exc())
+    else:
+        _finish(
+            job,
+            status=Job.STATUS_SUCCEEDED,
+            finished_at=timezone.now(),
+            result=result,
+            result_file=job.result_file,
+            error='',
+        )
+    job.refresh_from_db()
+    return job
+
+
+def run_pending_jobs(worker_name='inline', limit=None):
+    """Run due jobs one after another in this process; returns how many ran"""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_job(worker_name)
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+def expire_timed_out_jobs(now=None):
+    """Fail or retry running attempts that exceeded their timeout; returns them"""
+    now = now or timezone.now()
+    expired = []
+    for job in Job.objects.filter(status=Job.STATUS_RUNNING):
+        if job.started_at + timedelta(seconds=job.timeout) < now:
+            if fail_job(job, f"Timed out after {job.timeout} seconds"):
+                expired.append(job)
+    return expired
+
+
+def get_result_dir():
+    return getattr(settings, 'JOB_RESULT_DIR', os.path.join(settings.BASE_DIR, 'job_results'))
+
+
+def save_result_file(job, filename, content):
+    """Store ``content`` as the job's downloadable result file"""
+    relative_path = os.path.join(str(job.pk), os.path.basename(filename))
+    path = os.path.join(get_result_dir(), relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    job.result_file = relative_path
+    return path
+
+
+def result_file_path(job):
+    if not job.result_file:
+        return None
+    return os.path.join(get_result_dir(), job.result_file)
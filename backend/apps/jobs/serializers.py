@@ -0,0 +1,21 @@
+from rest_framework import serializers
+from rest_framework.reverse import reverse
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    created_by = serializers.StringRelatedField(read_only=True)
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'job_type', 'status', 'attempts', 'max_attempts', 'result',
+            'error', 'download_url', 'created_by', 'created_at', 'started_at', 'finished_at'
+        ]
+        read_only_fields = fields
+
+    def get_download_url(self, obj):
+        if obj.status != Job.STATUS_SUCCEEDED or not obj.result_file:
+            return None
+        return reverse('job-download', args=[obj.pk], request=self.context.get('request'))
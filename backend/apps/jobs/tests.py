@@ -0,0 +1,221 @@
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.orders.ingest import ingest_order
+from apps.products.models import Category, Product
+from apps.stores.models import Store
+from .models import Job
+from .queue import (
+    PermanentJobError, claim_job, enqueue, expire_timed_out_jobs, register,
+    run_job, run_pending_jobs, save_result_file
+)
+from .worker import Supervisor
+
+User = get_user_model()
+
+calls = []
+
+
+@register('tests.echo')
+def echo_job(job):
+    save_result_file(job, 'echo.txt', job.payload['text'].encode())
+    return {'length': len(job.payload['text'])}
+
+
+@register('tests.flaky', max_attempts=2)
+def flaky_job(job):
+    calls.append(job.attempts)
+    raise RuntimeError('temporary failure')
+
+
+@register('tests.broken')
+def broken_job(job):
+    raise PermanentJobError('bad payload')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        self.result_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.result_dir, ignore_errors=True)
+        settings_override = override_settings(JOB_RESULT_DIR=self.result_dir, JOB_RETRY_DELAY=10)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        calls.clear()
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+
+    def test_job_runs_and_serves_its_file(self):
+        """Test that a finished job reports its result and serves the file it wrote"""
+        job = enqueue('tests.echo', {'text': 'hello'}, user=self.user)
+        response = self.client.get(f'/api/jobs/jobs/{job.pk}/download/')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_SUCCEEDED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.result, {'length': 5})
+
+        response = self.client.get(f'/api/jobs/jobs/{job.pk}/')
+        self.assertEqual(response.data['status'], Job.STATUS_SUCCEEDED)
+        self.assertTrue(response.data['download_url'].endswith(f'/api/jobs/jobs/{job.pk}/download/'))
+
+        response = self.client.get(f'/api/jobs/jobs/{job.pk}/download/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'hello')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Test that a failing job is retried later and fails after max_attempts"""
+        job = enqueue('tests.flaky')
+        self.assertEqual(job.max_attempts, 2)
+
+        before = timezone.now()
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIn('temporary failure', job.error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=10))
+
+        # Not due yet
+        self.assertEqual(run_pending_jobs(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        with self.assertLogs('apps.jobs.queue', 'ERROR'):
+            run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(calls, [1, 2])
+
+    def test_permanent_error_is_not_retried(self):
+        """Test that PermanentJobError fails the job on its first attempt"""
+        job = enqueue('tests.broken')
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
+        self.assertEqual(job.error, 'bad payload')
+
+    def test_unknown_job_type(self):
+        """Test that unknown job types are rejected when queued and fail when run"""
+        with self.assertRaises(ValueError):
+            enqueue('tests.missing')
+
+        job = Job.objects.create(job_type='tests.missing', run_after=timezone.now())
+        run_pending_jobs()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+
+    def test_job_is_claimed_once(self):
+        """Test that a claimed job is not handed to a second worker"""
+        job = enqueue('tests.echo', {'text': 'x'})
+        claimed = claim_job('worker-1')
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual(claimed.locked_by, 'worker-1')
+        self.assertEqual(claimed.status, Job.STATUS_RUNNING)
+        self.assertIsNone(claim_job('worker-2'))
+
+    def test_timed_out_job_is_retried(self):
+        """Test that an attempt running past its timeout is expired and requeued"""
+        job = enqueue('tests.echo', {'text': 'x'}, timeout=30)
+        claimed = claim_job('worker-1')
+
+        self.assertEqual(expire_timed_out_jobs(), [])
+        expired = expire_timed_out_jobs(now=timezone.now() + timedelta(seconds=31))
+        self.assertEqual([j.pk for j in expired], [job.pk])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIn('Timed out', job.error)
+
+        # The expired attempt can no longer record a result
+        run_job(claimed)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+
+    def test_supervisor_requeues_jobs_of_dead_workers(self):
+        """Test that the supervisor retries the job of a worker that died and replaces it"""
+        job = enqueue('tests.echo', {'text': 'x'})
+        claim_job('host:1:0')
+        dead = mock.Mock(exitcode=-9)
+        dead.is_alive.return_value = False
+
+        supervisor = Supervisor(1)
+        supervisor.processes = {'host:1:0': (0, dead)}
+        # close_old_connections would close the test database connection
+        with mock.patch.object(supervisor, 'start_worker') as start_worker, \
+                mock.patch('apps.jobs.worker.close_old_connections'):
+            supervisor.check()
+
+        start_worker.assert_called_once_with(0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.STATUS_QUEUED)
+        self.assertIn('-9', job.error)
+
+    def test_burst_command(self):
+        """Test that run_workers --burst runs the due jobs and exits"""
+        enqueue('tests.echo', {'text': 'a'})
+        enqueue('tests.echo', {'text': 'b'})
+        out = StringIO()
+        call_command('run_workers', '--burst', stdout=out)
+        self.assertIn('Ran 2 jobs', out.getvalue())
+        self.assertEqual(Job.objects.filter(status=Job.STATUS_SUCCEEDED).count(), 2)
+
+    def test_jobs_are_scoped_to_their_creator(self):
+        """Test that users only see their own jobs unless they are staff"""
+        own = enqueue('tests.echo', {'text': 'a'}, user=self.user)
+        other = User.objects.create_user(username='other', password='testpassword123')
+        enqueue('tests.echo', {'text': 'b'}, user=other)
+
+        response = self.client.get('/api/jobs/jobs/')
+        self.assertEqual([job['id'] for job in response.data], [str(own.pk)])
+
+        staff = User.objects.create_user(username='staff', password='testpassword123', is_staff=True)
+        self.client.force_authenticate(user=staff)
+        response = self.client.get('/api/jobs/jobs/')
+        self.assertEqual(len(response.data), 2)
+
+    def test_order_pdf_job(self):
+        """Test that the orders pdf-job endpoint queues a receipt the worker renders"""
+        store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        product = Product.objects.create(
+            product_id='P-001',
+            name='Product 1',
+            category=Category.objects.create(name='Soft Drinks'),
+            price=Decimal('10.00'),
+            size='1L',
+            stock_quantity=100
+        )
+        order = ingest_order(store, [{'product': product, 'quantity': 2}], user=self.user)
+
+        with override_settings(RECEIPT_CACHE_DIR=self.result_dir):
+            response = self.client.post(f'/api/orders/orders/{order.pk}/pdf-job/')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data['status'], Job.STATUS_QUEUED)
+            run_pending_jobs()
+
+        response = self.client.get(f"/api/jobs/jobs/{response.data['id']}/download/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
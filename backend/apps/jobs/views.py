@@ -0,0 +1,44 @@
+# apps/jobs/views.py
+import os
+from django.http import FileResponse
+from rest_framework import viewsets, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.permissions import IsAuthenticated
+from .models import Job
+from .queue import result_file_path
+from .serializers import JobSerializer
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = Job.objects.select_related('created_by')
+        
+        # Staff see every job, everyone else only their own
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        
+        # Filter by status
+        job_status = self.request.query_params.get('status')
+        if job_status:
+            queryset = queryset.filter(status=job_status)
+        
+        return queryset
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Download the file produced by a finished job."""
+        job = self.get_object()
+        
+        if not job.is_finished:
+            return Response(JobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+        
+        path = result_file_path(job)
+        if job.status != Job.STATUS_SUCCEEDED or not path or not os.path.exists(path):
+            return Response({'detail': 'This job has no file to download.'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return FileResponse(open(path, 'rb'), as_attachment=True, filename=os.path.basename(path))
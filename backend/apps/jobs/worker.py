@@ -0,0 +1,123 @@
+"""
+Process pool that runs queued jobs.
+
+The supervisor starts ``workers`` processes, each of which claims and runs
+jobs one at a time. Every poll interval the supervisor expires attempts
+that exceeded their timeout, terminating and replacing the process that
+was running one, and replaces processes that died mid-job so their work
+is retried.
+"""
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+def worker_main(name, poll_interval, stop_event):
+    """Entry point of a worker process"""
+    # Ctrl+C reaches the whole process group; let the supervisor stop us
+    # through stop_event so a running job is not cut short
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    import django
+    django.setup()
+
+    from .queue import claim_job, run_job
+
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = claim_job(name)
+        except Exception:
+            logger.exception('Worker %s failed to claim a job', name)
+            job = None
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+        run_job(job)
+
+
+class Supervisor:
+    """
+    Runs and watches a pool of worker processes
+    """
+
+    def __init__(self, workers, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        # Workers set up Django themselves; spawn keeps them from sharing
+        # the supervisor's database connections
+        self.context = multiprocessing.get_context('spawn')
+        self.stop_event = self.context.Event()
+        self.processes = {}
+        self.prefix = f"{socket.gethostname()}:{os.getpid()}"
+
+    def start_worker(self, index):
+        name = f"{self.prefix}:{index}"
+        process = self.context.Process(
+            target=worker_main,
+            args=(name, self.poll_interval, self.stop_event),
+            name=f"job-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        self.processes[name] = (index, process)
+        return process
+
+    def start(self):
+        for index in range(self.workers):
+            self.start_worker(index)
+
+    def restart(self, name):
+        index, process = self.processes.pop(name)
+        if process.is_alive():
+            process.terminate()
+        process.join(5)
+        return self.start_worker(index)
+
+    def check(self):
+        """Expire timed out attempts and replace stuck or dead workers"""
+        from .models import Job
+        from .queue import expire_timed_out_jobs, fail_job
+
+        close_old_connections()
+        for job in expire_timed_out_jobs():
+            logger.warning('Job %s timed out on %s', job.pk, job.locked_by)
+            if job.locked_by in self.processes:
+                self.restart(job.locked_by)
+
+        for name, (_, process) in list(self.processes.items()):
+            if process.is_alive():
+                continue
+            logger.warning('Worker %s exited with code %s', name, process.exitcode)
+            for job in Job.objects.filter(status=Job.STATUS_RUNNING, locked_by=name):
+                fail_job(job, f"Worker exited with code {process.exitcode}")
+            self.restart(name)
+
+    def run(self, duration=None):
+        """Supervise until interrupted, or for ``duration`` seconds"""
+        self.start()
+        deadline = None if duration is None else time.monotonic() + duration
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                time.sleep(self.poll_interval)
+                self.check()
+        finally:
+            self.stop()
+
+    def stop(self, timeout=10):
+        self.stop_event.set()
+        for _, process in self.processes.values():
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes.clear()
@@ -0,0 +1,81 @@
+"""
+Batch order ingest.
+
+Creating an order item by item costs a totals recalculation, an inventory
+transaction and several signal-driven writes per item. This path inserts
+all items and their stock-out transactions with one bulk insert each,
+applies the summed stock deltas in one statement per counter table,
+allocates the stock-outs to product batches in one pass and writes the
+order totals once.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+
+from apps.inventory.batches import allocate_batches
+from apps.inventory.models import InventoryTransaction
+from apps.inventory.stock import record_transactions
+from .models import Order, OrderItem
+from .signals import order_items_bulk_created
+
+
+def ingest_order(store, items, user=None, **order_fields):
+    """
+    Create an order and all of its items in a constant number of queries.
+
+    ``items`` is a list of dicts with ``product`` (a loaded Product),
+    ``quantity`` and an optional ``unit_price`` defaulting to the product
+    price. Extra keyword arguments are passed to the Order.
+    """
+    order_items = []
+    subtotal = Decimal('0')
+    for item in items:
+        product = item['product']
+        # A unit price of 0 is a free item, not a missing price
+        unit_price = product.price if item.get('unit_price') is None else item['unit_price']
+        total = item['quantity'] * unit_price
+        subtotal += total
+        order_items.append(OrderItem(
+            product=product,
+            quantity=item['quantity'],
+            unit_price=unit_price,
+            total=total,
+        ))
+
+    tax = (subtotal * Order.TAX_RATE).quantize(Decimal('0.01'))
+    order_fields.setdefault('delivery_day', store.day)
+
+    with transaction.atomic():
+        order = Order.objects.create(
+            store=store,
+            user=user,
+            subtotal=subtotal,
+            tax=tax,
+            total=subtotal + tax,
+            **order_fields
+        )
+
+        for order_item in order_items:
+            order_item.order = order
+        OrderItem.objects.bulk_create(order_items)
+
+        inventory_transactions = record_transactions([
+            InventoryTransaction(
+                product=order_item.product,
+                quantity=order_item.quantity,
+                transaction_type='out',
+                reference=order.order_id,
+                reason=f"Order: {order.order_id}",
+                user=user,
+            )
+            for order_item in order_items
+        ])
+        allocate_batches(inventory_transactions)
+
+        order_items_bulk_created.send(
+            sender=Order,
+            order=order,
+            items=order_items,
+            inventory_transactions=inventory_transactions,
+        )
+    return order
@@ -0,0 +1,34 @@
+"""
+Background jobs of the orders app, run by ``manage.py run_workers``.
+"""
+from apps.jobs.queue import PermanentJobError, register, save_result_file
+from .receipts import BATCH_FORMATS, get_receipt_pdf, receipt_queryset, render_batch
+
+
+@register('orders.receipt_pdf', timeout=60)
+def render_receipt_pdf(job):
+    """Render the receipt of ``payload['order']`` into the job's result file"""
+    order = receipt_queryset().filter(pk=job.payload.get('order')).first()
+    if order is None:
+        raise PermanentJobError(f"Order {job.payload.get('order')} does not exist")
+
+    save_result_file(job, f"order_{order.order_id}.pdf", get_receipt_pdf(order))
+    return {'order': order.pk, 'order_id': order.order_id}
+
+
+@register('orders.receipt_batch', timeout=600)
+def render_receipt_batch(job):
+    """Render the receipts of ``payload['orders']`` into one PDF or ZIP result file"""
+    order_pks = job.payload.get('orders') or []
+    export_format = job.payload.get('export_format', 'pdf')
+    if export_format not in BATCH_FORMATS:
+        raise PermanentJobError(f"Unknown receipt batch format: {export_format}")
+
+    orders = receipt_queryset().in_bulk(order_pks)
+    missing = [pk for pk in order_pks if pk not in orders]
+    if missing:
+        raise PermanentJobError(f"Orders {missing} do not exist")
+
+    content = render_batch([orders[pk] for pk in order_pks], export_format)
+    save_result_file(job, f"receipts_{job.pk}.{export_format}", content)
+    return {'orders': len(order_pks), 'export_format': export_format}
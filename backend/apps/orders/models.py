@@ -1,9 +1,19 @@
-from django.db import models
+from contextlib import contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from django.db import models, transaction
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 from apps.base.models import TimeStampedModel
 from apps.stores.models import Store
 from apps.products.models import Product
 
+# Primary keys of orders whose totals are recalculated once at the end of a
+# ``Order.deferred_totals()`` block instead of on every item save
+_deferred_totals = ContextVar('deferred_order_totals', default=frozenset())
+
 
 class Order(TimeStampedModel):
     """
@@ -15,6 +25,7 @@ class Order(TimeStampedModel):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     )
+    TAX_RATE = Decimal('0.02')
 
     order_id = models.CharField(max_length=50, unique=True)
     store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name='orders')
@@ -30,16 +41,62 @@ class Order(TimeStampedModel):
         verbose_name = 'Order'
         verbose_name_plural = 'Orders'
         ordering = ['-created_at']
+        indexes = [
+            # Date ranges and the default -created_at listing with its pk tie-breaker
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            # Per-store history and the rollup refresh of one store's day
+            models.Index(fields=['store', 'created_at'], name='order_store_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='order_status_created_idx'),
+        ]
 
     def __str__(self):
         return self.order_id
 
     def calculate_totals(self):
-        """Calculate order totals"""
-        self.subtotal = sum(item.total for item in self.items.all())
-        self.tax = self.subtotal * 0.02  # 2% tax
+        """Calculate order totals, unless they are deferred for this order"""
+        if self.pk in _deferred_totals.get():
+            return
+        self.update_totals()
+
+    def update_totals(self):
+        """Recalculate order totals with one aggregate and store them with one UPDATE"""
+        from .signals import order_totals_updated
+
+        self.subtotal = OrderItem.objects.filter(order_id=self.pk).aggregate(
+            subtotal=Coalesce(Sum('total'), Decimal('0'))
+        )['subtotal']
+        self.tax = (self.subtotal * self.TAX_RATE).quantize(Decimal('0.01'))  # 2% tax
         self.total = self.subtotal + self.tax
-        self.save()
+        # A queryset update skips auto_now, so bump updated_at explicitly
+        self.updated_at = timezone.now()
+        Order.objects.filter(pk=self.pk).update(
+            subtotal=self.subtotal, tax=self.tax, total=self.total, updated_at=self.updated_at
+        )
+        order_totals_updated.send(sender=Order, order=self)
+
+    @contextmanager
+    def deferred_totals(self):
+        """
+        Suppress per-item totals recalculation inside the block.
+
+        Totals are recalculated once when the outermost block for this order
+        exits without an error. The block runs inside a transaction.
+        """
+        deferred = _deferred_totals.get()
+        if self.pk in deferred:
+            yield self
+            return
+
+        token = _deferred_totals.set(deferred | {self.pk})
+        try:
+            with transaction.atomic():
+                yield self
+                _deferred_totals.reset(token)
+                token = None
+                self.update_totals()
+        finally:
+            if token is not None:
+                _deferred_totals.reset(token)
 
 
 class OrderItem(TimeStampedModel):
@@ -0,0 +1,110 @@
+"""
+ReportLab rendering of order receipts.
+
+Everything here works on the plain receipt dicts built by
+``receipts.receipt_data`` and does not touch the database, so it can run
+in a separate worker process.
+"""
+import io
+import zipfile
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -4), colors.white),
+    ('BACKGROUND', (0, -3), (-1, -1), colors.lightgrey),
+    ('FONTNAME', (3, -3), (-1, -1), 'Helvetica-Bold'),
+    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+    ('GRID', (0, 0), (-1, -4), 1, colors.black),
+    ('LINEBELOW', (3, -3), (-1, -1), 1, colors.black),
+])
+
+
+def draw_receipt(p, receipt):
+    """Draw one receipt on the current page of canvas ``p``"""
+    # Add company header
+    p.setFont("Helvetica-Bold", 16)
+    p.drawString(1 * inch, 10 * inch, "K-TO-DRINKS TRADING")
+
+    p.setFont("Helvetica", 12)
+    p.drawString(1 * inch, 9.7 * inch, "Order Receipt")
+
+    # Add order details
+    p.setFont("Helvetica-Bold", 12)
+    p.drawString(1 * inch, 9.3 * inch, f"Order ID: {receipt['order_id']}")
+    p.setFont("Helvetica", 10)
+    p.drawString(1 * inch, 9.0 * inch, f"Date: {receipt['date']}")
+
+    # Add store details
+    store = receipt['store']
+    p.drawString(1 * inch, 8.6 * inch, f"Store: {store['name']}")
+    p.drawString(1 * inch, 8.3 * inch, f"Location: {store['location']}")
+    p.drawString(1 * inch, 8.0 * inch, f"Contact: {store['contact']}")
+
+    # Add items table
+    data = [["Product", "Size", "Quantity", "Unit Price", "Total"]]
+    for item in receipt['items']:
+        data.append([
+            item['product'],
+            item['size'],
+            str(item['quantity']),
+            f"₱{item['unit_price']:.2f}",
+            f"₱{item['total']:.2f}"
+        ])
+
+    # Add totals rows
+    data.append(["", "", "", "Subtotal:", f"₱{receipt['subtotal']:.2f}"])
+    data.append(["", "", "", "Tax (2%):", f"₱{receipt['tax']:.2f}"])
+    data.append(["", "", "", "Total:", f"₱{receipt['total']:.2f}"])
+
+    table = Table(data, colWidths=[2*inch, 1*inch, 1*inch, 1*inch, 1*inch])
+    table.setStyle(TABLE_STYLE)
+    table.wrapOn(p, letter[0] - 2*inch, letter[1])
+    table.drawOn(p, 1*inch, 7*inch - len(data)*15)
+
+    # Add footer
+    p.setFont("Helvetica-Oblique", 8)
+    p.drawString(1*inch, 1*inch, "Thank you for your business!")
+    p.drawString(1*inch, 0.8*inch, "K-TO-DRINKS TRADING")
+
+
+def render_pdf(receipts, title=None):
+    """Render ``receipts`` into one PDF with a page per receipt and return its bytes"""
+    buffer = io.BytesIO()
+    p = canvas.Canvas(buffer, pagesize=letter)
+    if title:
+        p.setTitle(title)
+    for receipt in receipts:
+        draw_receipt(p, receipt)
+        p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def render_receipt(receipt):
+    """Render a single receipt and return the PDF bytes"""
+    return render_pdf([receipt], title=f"Order Receipt - {receipt['order_id']}")
+
+
+def render_receipts(receipts):
+    """Render each receipt separately; returns [(order pk, PDF bytes)]"""
+    return [(receipt['id'], render_receipt(receipt)) for receipt in receipts]
+
+
+def build_zip(files):
+    """Pack ``[(name, bytes)]`` into a ZIP archive and return its bytes"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+    return buffer.getvalue()
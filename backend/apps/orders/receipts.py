@@ -0,0 +1,156 @@
+"""
+Order receipts: data, the on-disk PDF cache and batch rendering.
+
+Rendered receipts are cached under RECEIPT_CACHE_DIR in files keyed by the
+order's primary key and ``updated_at``. Any change to an order (including
+its totals, which change whenever its items do) bumps ``updated_at``, so a
+stale file is never served; older versions are removed when the new one is
+written and when the order is deleted.
+
+Batches of receipts are rendered by the job queue (see jobs.py) so the
+CPU-heavy ReportLab work runs in a ``run_workers`` process rather than the
+web worker. The request only queues the job; the finished PDF or ZIP is
+the job's result file, downloaded through the jobs API.
+"""
+import glob
+import os
+import uuid
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from apps.jobs.queue import enqueue
+from . import pdf
+from .models import Order, OrderItem
+
+BATCH_FORMATS = ('pdf', 'zip')
+
+
+def receipt_queryset():
+    """Orders with everything a receipt needs loaded in two queries"""
+    return Order.objects.select_related('store').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+    )
+
+
+def receipt_data(order):
+    """Return the receipt of ``order`` as a plain, picklable dict"""
+    return {
+        'id': order.pk,
+        'order_id': order.order_id,
+        'date': order.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        'store': {
+            'name': order.store.name,
+            'location': order.store.location,
+            'contact': order.store.number
+        },
+        'items': [
+            {
+                'product': item.product.name,
+                'size': item.product.size,
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+                'total': item.total
+            }
+            for item in order.items.all()
+        ],
+        'subtotal': order.subtotal,
+        'tax': order.tax,
+        'total': order.total
+    }
+
+
+def get_cache_dir():
+    return getattr(settings, 'RECEIPT_CACHE_DIR', os.path.join(settings.BASE_DIR, 'receipt_cache'))
+
+
+def cache_path(order):
+    version = int(order.updated_at.timestamp() * 1000000)
+    return os.path.join(get_cache_dir(), f"order-{order.pk}-{version}.pdf")
+
+
+def _write_atomic(path, content):
+    """Write ``content`` to ``path`` so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def delete_cached_receipts(order_pk, keep=None):
+    """Remove cached receipt files of an order, except ``keep``"""
+    for path in glob.glob(os.path.join(get_cache_dir(), f"order-{order_pk}-*.pdf")):
+        if path != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _store(order_pk, path, content):
+    _write_atomic(path, content)
+    delete_cached_receipts(order_pk, keep=path)
+
+
+def get_receipt_pdf(order):
+    """Return the PDF bytes of an order's receipt, rendering it on a cache miss"""
+    path = cache_path(order)
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        pass
+
+    content = pdf.render_receipt(receipt_data(order))
+    _store(order.pk, path, content)
+    return content
+
+
+def render_batch(orders, export_format='pdf'):
+    """
+    Render the receipts of ``orders`` into one file and return its bytes.
+
+    ``export_format`` is ``pdf`` for one multi-page PDF or ``zip`` for a
+    ZIP of single receipts. Receipts already in the cache are reused for
+    ZIP batches and newly rendered ones are added to it.
+    """
+    if export_format not in BATCH_FORMATS:
+        raise ValueError(f"Unknown receipt batch format: {export_format}")
+
+    receipts = [receipt_data(order) for order in orders]
+    if export_format == 'pdf':
+        return pdf.render_pdf(receipts, f"Order Receipts - {len(receipts)} orders")
+
+    paths = {order.pk: cache_path(order) for order in orders}
+    rendered = {}
+    missing = []
+    for receipt in receipts:
+        try:
+            with open(paths[receipt['id']], 'rb') as f:
+                rendered[receipt['id']] = f.read()
+        except FileNotFoundError:
+            missing.append(receipt)
+
+    for order_pk, receipt_pdf in pdf.render_receipts(missing):
+        rendered[order_pk] = receipt_pdf
+        _store(order_pk, paths[order_pk], receipt_pdf)
+
+    return pdf.build_zip([
+        (f"order_{receipt['order_id']}.pdf", rendered[receipt['id']])
+        for receipt in receipts
+    ])
+
+
+def start_batch(order_pks, export_format='pdf', user=None):
+    """
+    Queue rendering the receipts of ``order_pks``, in that order, and
+    return the job; its result file is the batch once a worker ran it.
+    """
+    if export_format not in BATCH_FORMATS:
+        raise ValueError(f"Unknown receipt batch format: {export_format}")
+    return enqueue(
+        'orders.receipt_batch',
+        {'orders': list(order_pks), 'export_format': export_format},
+        user=user
+    )
@@ -1,4 +1,5 @@
 # apps/orders/serializers.py
+from django.conf import settings
 from rest_framework import serializers
 from .models import Order, OrderItem
 from apps.stores.models import Store
@@ -17,7 +18,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
         max_digits=10,
         decimal_places=2,
         read_only=True,
-        source='total_price'
+        source='total'
     )
     
     class Meta:
@@ -42,9 +43,9 @@ class OrderSerializer(serializers.ModelSerializer):
         max_digits=10,
         decimal_places=2,
         read_only=True,
-        source='total_amount'
+        source='total'
     )
-    created_by = serializers.StringRelatedField(read_only=True)
+    created_by = serializers.StringRelatedField(read_only=True, source='user')
     
     class Meta:
         model = Order
@@ -58,7 +59,7 @@ class OrderSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Get the current user from the request
         user = self.context['request'].user
-        validated_data['created_by'] = user
+        validated_data['user'] = user
         
         # Generate order ID
         import uuid
@@ -70,7 +71,31 @@ class OrderSerializer(serializers.ModelSerializer):
         # Create order
         order = super().create(validated_data)
         
-        # Create order items
+        # Create order items, recalculating the totals once at the end
+        with order.deferred_totals():
+            self._create_items(order, order_items_data)
+        
+        return order
+    
+    def update(self, instance, validated_data):
+        # Extract and remove order items data
+        order_items_data = validated_data.pop('order_items', [])
+        
+        with instance.deferred_totals():
+            # Update order
+            instance = super().update(instance, validated_data)
+            
+            # If order items are provided, replace existing items
+            if order_items_data:
+                # Delete existing items
+                instance.items.all().delete()
+                
+                # Create new items
+                self._create_items(instance, order_items_data)
+        
+        return instance
+    
+    def _create_items(self, order, order_items_data):
         for item_data in order_items_data:
             product_id = item_data.get('product_id')
             quantity = item_data.get('quantity', 1)
@@ -79,9 +104,9 @@ class OrderSerializer(serializers.ModelSerializer):
             try:
                 product = Product.objects.get(id=product_id)
                 
-                # If unit_price is not provided, use product's unit_price
+                # If unit_price is not provided, use product's price
                 if not unit_price:
-                    unit_price = product.unit_price
+                    unit_price = product.price
                 
                 OrderItem.objects.create(
                     order=order,
@@ -91,41 +116,53 @@ class OrderSerializer(serializers.ModelSerializer):
                 )
             except Product.DoesNotExist:
                 pass
-        
-        return order
+
+
+class OrderBatchItemSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+    unit_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False, allow_null=True)
+
+
+class OrderBatchSerializer(serializers.Serializer):
+    """
+    Validates an order and all of its items for the batch ingest path
+    """
+    store_id = serializers.PrimaryKeyRelatedField(
+        queryset=Store.objects.all(),
+        source='store'
+    )
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES, default='pending')
+    delivery_day = serializers.ChoiceField(choices=Order._meta.get_field('delivery_day').choices, required=False)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    items = OrderBatchItemSerializer(many=True, allow_empty=False)
     
-    def update(self, instance, validated_data):
-        # Extract and remove order items data
-        order_items_data = validated_data.pop('order_items', [])
+    def validate_items(self, items):
+        # Resolve every product with a single query
+        product_ids = {item['product_id'] for item in items}
+        products = Product.objects.filter(is_active=True).in_bulk(product_ids)
         
-        # Update order
-        instance = super().update(instance, validated_data)
+        missing = sorted(product_ids - set(products))
+        if missing:
+            raise serializers.ValidationError(f"Unknown or inactive products: {missing}")
         
-        # If order items are provided, replace existing items
-        if order_items_data:
-            # Delete existing items
-            instance.items.all().delete()
-            
-            # Create new items
-            for item_data in order_items_data:
-                product_id = item_data.get('product_id')
-                quantity = item_data.get('quantity', 1)
-                unit_price = item_data.get('unit_price')
-                
-                try:
-                    product = Product.objects.get(id=product_id)
-                    
-                    # If unit_price is not provided, use product's unit_price
-                    if not unit_price:
-                        unit_price = product.unit_price
-                    
-                    OrderItem.objects.create(
-                        order=instance,
-                        product=product,
-                        quantity=quantity,
-                        unit_price=unit_price
-                    )
-                except Product.DoesNotExist:
-                    pass
+        for item in items:
+            item['product'] = products[item.pop('product_id')]
+        return items
+    
+    def create(self, validated_data):
+        from .ingest import ingest_order
         
-        return instance
\ No newline at end of file
+        user = self.context['request'].user
+        store = validated_data.pop('store')
+        items = validated_data.pop('items')
+        return ingest_order(store, items, user=user, **validated_data)
+
+
+class ReceiptBatchSerializer(serializers.Serializer):
+    order_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=getattr(settings, 'RECEIPT_BATCH_MAX_ORDERS', 1000)
+    )
+    export_format = serializers.ChoiceField(choices=['pdf', 'zip'], default='pdf')
@@ -1,9 +1,23 @@
 import uuid
-from django.db.models.signals import pre_save, post_save
-from django.dispatch import receiver
+from django.db import transaction
+from django.db.models.signals import post_delete, pre_save, post_save
+from django.dispatch import Signal, receiver
 from .models import Order, OrderItem
+from apps.inventory.batches import allocate_batches
 from apps.inventory.models import InventoryTransaction
 
+# Sent with ``order``, ``items`` and ``inventory_transactions`` after order
+# items were inserted in bulk, which bypasses the per-row post_save signals
+order_items_bulk_created = Signal()
+
+# Sent with ``order`` after its totals were written with a queryset update,
+# which bypasses post_save
+order_totals_updated = Signal()
+
+# Sent with ``orders`` after orders were inserted in bulk, which bypasses
+# the per-row post_save signals
+orders_bulk_created = Signal()
+
 
 @receiver(pre_save, sender=Order)
 def set_order_id(sender, instance, **kwargs):
@@ -17,13 +31,24 @@ def set_order_id(sender, instance, **kwargs):
 def update_inventory(sender, instance, created, **kwargs):
     """Update inventory when order item is created"""
     if created:
-        # Create inventory transaction for stock out
-        InventoryTransaction.objects.create(
-            product=instance.product,
-            quantity=instance.quantity,
-            transaction_type='out',
-            reference=instance.order.order_id,
-            reason=f"Order: {instance.order.order_id}",
-            user=instance.order.user
-        )
+        # Create inventory transaction for stock out and take it from the
+        # product's batches while the stock-out still holds the product lock
+        with transaction.atomic():
+            stock_out = InventoryTransaction.objects.create(
+                product=instance.product,
+                quantity=instance.quantity,
+                transaction_type='out',
+                reference=instance.order.order_id,
+                reason=f"Order: {instance.order.order_id}",
+                user=instance.order.user
+            )
+            allocate_batches([stock_out])
+
+
+
+@receiver(post_delete, sender=Order)
+def delete_order_receipts(sender, instance, **kwargs):
+    """Remove the cached receipts of a deleted order"""
+    from .receipts import delete_cached_receipts
 
+    delete_cached_receipts(instance.pk)
@@ -1,3 +1,538 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.dashboard.models import DailyStoreSalesRollup, RecentActivity
+from apps.inventory.models import BatchAllocation, Inventory, InventoryTransaction, ProductExpiry
+from apps.jobs.models import Job
+from apps.jobs.queue import run_pending_jobs
+from apps.base.dates import date_range_q
+from apps.base.testing import QueryCountTestMixin, QueryPlanTestMixin
+from apps.products.models import Category, Product, Supplier
+from apps.stores.models import Store
+from . import pdf
+from .ingest import ingest_order
+from .models import Order, OrderItem
+from .receipts import cache_path, get_receipt_pdf
+
+User = get_user_model()
+
+
+class OrderIngestTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        self.category = Category.objects.create(name='Soft Drinks')
+        self.products = [
+            Product.objects.create(
+                product_id=f'P-{i:03d}',
+                name=f'Product {i}',
+                category=self.category,
+                price=Decimal('10.00'),
+                stock_quantity=100
+            )
+            for i in range(50)
+        ]
+
+    def items(self, count):
+        return [{'product': product, 'quantity': 2} for product in self.products[:count]]
+
+    def test_ingest_computes_totals_once(self):
+        """Test that the order totals match the sum of its items"""
+        order = ingest_order(self.store, self.items(3), user=self.user)
+
+        self.assertEqual(order.subtotal, Decimal('60.00'))
+        self.assertEqual(order.tax, Decimal('1.20'))
+        self.assertEqual(order.total, Decimal('61.20'))
+        self.assertEqual(order.delivery_day, 'Monday')
+        self.assertEqual(OrderItem.objects.filter(order=order).count(), 3)
+
+    def test_zero_unit_price_is_kept(self):
+        """Test that an explicit unit price of 0 is not replaced by the product price"""
+        items = self.items(2)
+        items[0]['unit_price'] = Decimal('0.00')
+        order = ingest_order(self.store, items, user=self.user)
+
+        self.assertEqual(
+            list(OrderItem.objects.filter(order=order).order_by('product__product_id').values_list('unit_price', 'total')),
+            [(Decimal('0.00'), Decimal('0.00')), (Decimal('10.00'), Decimal('20.00'))]
+        )
+        self.assertEqual(order.subtotal, Decimal('20.00'))
+
+    def test_ingest_moves_stock_and_updates_dashboard(self):
+        """Test that stock, rollups and activities are updated for bulk items"""
+        with self.captureOnCommitCallbacks(execute=True):
+            order = ingest_order(self.store, self.items(3), user=self.user)
+
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock_quantity, 98)
+        self.assertEqual(Inventory.objects.get(product=self.products[0]).quantity, -2)
+        self.assertEqual(InventoryTransaction.objects.filter(reference=order.order_id).count(), 3)
+        self.assertEqual(RecentActivity.objects.filter(activity_type='inventory').count(), 3)
+
+        rollup = DailyStoreSalesRollup.objects.get(store=self.store, date=timezone.localdate())
+        self.assertEqual(rollup.order_count, 1)
+        self.assertEqual(rollup.item_count, 6)
+        self.assertEqual(rollup.total, Decimal('61.20'))
+
+    def test_order_items_are_taken_from_batches(self):
+        """Test that ingested and individually created items consume the soonest expiring batches"""
+        expiry = timezone.localdate() + timedelta(days=30)
+        batches = [
+            ProductExpiry.objects.create(product=self.products[0], batch_number=f'B-{i}', quantity=3, expiry_date=expiry + timedelta(days=i))
+            for i in range(2)
+        ]
+
+        order = ingest_order(self.store, self.items(3), user=self.user)
+        OrderItem.objects.create(order=order, product=self.products[0], quantity=2, unit_price=Decimal('10.00'))
+
+        self.assertEqual(
+            [(batch.quantity, batch.is_active) for batch in ProductExpiry.objects.filter(pk__in=[b.pk for b in batches])],
+            [(0, False), (2, True)]
+        )
+        self.assertEqual(
+            list(BatchAllocation.objects.order_by('pk').values_list('batch__batch_number', 'quantity')),
+            [('B-0', 2), ('B-0', 1), ('B-1', 1)]
+        )
+
+    def test_query_count_does_not_grow_with_items(self):
+        """Test that ingesting 50 items costs the same queries as 5"""
+        with CaptureQueriesContext(connection) as small:
+            ingest_order(self.store, self.items(5), user=self.user)
+        with CaptureQueriesContext(connection) as large:
+            ingest_order(self.store, self.items(50), user=self.user)
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_bulk_endpoint_creates_order(self):
+        """Test that the bulk endpoint creates the order and all items"""
+        response = self.client.post('/api/orders/orders/bulk/', {
+            'store_id': self.store.pk,
+            'items': [{'product_id': product.pk, 'quantity': 1} for product in self.products[:10]]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['items'], 10)
+        self.assertEqual(Decimal(response.data['total']), Decimal('102.00'))
+        order = Order.objects.get(pk=response.data['id'])
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.items.count(), 10)
+
+    def test_bulk_endpoint_rejects_unknown_products(self):
+        """Test that unknown products fail validation without writing anything"""
+        response = self.client.post('/api/orders/orders/bulk/', {
+            'store_id': self.store.pk,
+            'items': [
+                {'product_id': self.products[0].pk, 'quantity': 1},
+                {'product_id': 99999, 'quantity': 1}
+            ]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('items', response.data)
+        self.assertFalse(Order.objects.exists())
+
+
+class DeferredTotalsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        category = Category.objects.create(name='Soft Drinks')
+        self.products = [
+            Product.objects.create(
+                product_id=f'P-{i:03d}',
+                name=f'Product {i}',
+                category=category,
+                price=Decimal('10.00'),
+                stock_quantity=100
+            )
+            for i in range(5)
+        ]
+        self.order = Order.objects.create(store=self.store, user=self.user, delivery_day='Monday')
+
+    def order_updates(self, queries):
+        return [q['sql'] for q in queries if q['sql'].startswith('UPDATE "orders_order"')]
+
+    def test_item_saves_update_totals_once(self):
+        """Test that totals are written once for a deferred batch of items"""
+        with CaptureQueriesContext(connection) as ctx:
+            with self.order.deferred_totals():
+                for product in self.products:
+                    OrderItem.objects.create(order=self.order, product=product, quantity=3, unit_price=product.price)
+
+        self.assertEqual(len(self.order_updates(ctx.captured_queries)), 1)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('150.00'))
+        self.assertEqual(self.order.tax, Decimal('3.00'))
+        self.assertEqual(self.order.total, Decimal('153.00'))
+
+    def test_nested_blocks_update_totals_once(self):
+        """Test that only the outermost block recalculates the totals"""
+        with CaptureQueriesContext(connection) as ctx:
+            with self.order.deferred_totals():
+                with self.order.deferred_totals():
+                    OrderItem.objects.create(order=self.order, product=self.products[0], quantity=1, unit_price=Decimal('10.00'))
+                OrderItem.objects.create(order=self.order, product=self.products[1], quantity=1, unit_price=Decimal('10.00'))
+
+        self.assertEqual(len(self.order_updates(ctx.captured_queries)), 1)
+        self.assertEqual(self.order.subtotal, Decimal('20.00'))
+
+    def test_failed_block_rolls_back(self):
+        """Test that an error inside the block leaves the order untouched"""
+        with self.assertRaises(RuntimeError):
+            with self.order.deferred_totals():
+                OrderItem.objects.create(order=self.order, product=self.products[0], quantity=1, unit_price=Decimal('10.00'))
+                raise RuntimeError('boom')
+
+        self.assertFalse(self.order.items.exists())
+        OrderItem.objects.create(order=self.order, product=self.products[0], quantity=2, unit_price=Decimal('10.00'))
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('20.00'))
+
+    def test_update_replaces_items_with_one_totals_write(self):
+        """Test that editing an order's items recalculates its totals once"""
+        OrderItem.objects.create(order=self.order, product=self.products[0], quantity=1, unit_price=Decimal('10.00'))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.patch(f'/api/orders/orders/{self.order.pk}/', {
+                'order_items': [
+                    {'product_id': product.pk, 'quantity': 2} for product in self.products
+                ]
+            }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.order_updates(ctx.captured_queries)), 2)
+        self.assertEqual(Decimal(response.data['total_amount']), Decimal('102.00'))
+        self.assertEqual(self.order.items.count(), 5)
+
+
+class OrderQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        category = Category.objects.create(name='Soft Drinks')
+        supplier = Supplier.objects.create(name='Supplier')
+        self.products = [
+            Product.objects.create(
+                product_id=f'P-{i:03d}',
+                name=f'Product {i}',
+                category=category,
+                supplier=supplier,
+                price=Decimal('10.00'),
+                stock_quantity=100
+            )
+            for i in range(10)
+        ]
+
+    def create_orders(self, count):
+        items = [{'product': product, 'quantity': 1} for product in self.products]
+        return [ingest_order(self.store, items, user=self.user) for _ in range(count)]
+
+    def test_list_queries_do_not_grow_with_orders(self):
+        """Test that listing orders with nested items costs constant queries"""
+        response = self.assertConstantQueries(
+            lambda: self.client.get('/api/orders/orders/'),
+            self.create_orders,
+            sizes=(1, 10),
+            max_queries=4
+        )
+
+        self.assertEqual(len(response.data), 10)
+        item = response.data[0]['items'][0]
+        self.assertEqual(item['product']['category_name'], 'Soft Drinks')
+        self.assertEqual(item['product']['supplier_name'], 'Supplier')
+        self.assertEqual(item['product']['inventory']['quantity'], -10)
+
+    def test_retrieve_queries_do_not_grow_with_items(self):
+        """Test that retrieving an order costs constant queries"""
+        order = self.create_orders(1)[0]
+
+        def add_items(count):
+            with order.deferred_totals():
+                for product in self.products[:count]:
+                    OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=product.price)
+
+        self.assertConstantQueries(
+            lambda: self.client.get(f'/api/orders/orders/{order.pk}/'),
+            add_items,
+            sizes=(1, 10),
+            max_queries=4
+        )
+
+
+class OrderQueryPlanTests(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        self.in_april = date_range_q('created_at', '2025-04-01', '2025-04-30')
+
+    def test_date_range_listing_uses_index(self):
+        """Test that the date filtered order listing does not scan the table"""
+        self.assertNoFullScan(Order.objects.filter(self.in_april).order_by('-created_at', '-id'))
+
+    def test_store_and_status_filters_use_index(self):
+        """Test that the store and status filters do not scan the table"""
+        self.assertNoFullScan(Order.objects.filter(self.in_april, store=self.store))
+        self.assertNoFullScan(Order.objects.filter(self.in_april, status='pending'))
+
+    def test_rollup_refresh_uses_index(self):
+        """Test that refreshing one store's day reads orders and items by index"""
+        orders = Order.objects.filter(self.in_april, store=self.store)
+        rows = orders.values('store_id').annotate(total=Sum('total')).order_by()
+        self.assertNoFullScan(rows)
+        # The item count subquery must look items up by order
+        self.assertNoFullScan(
+            OrderItem.objects.filter(order__in=orders).values('order').annotate(quantity=Sum('quantity')),
+            tables=['orders_orderitem']
+        )
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        for i, order_status in enumerate(['pending', 'pending', 'completed']):
+            Order.objects.create(
+                order_id=f'ORD-{i:03d}',
+                store=self.store,
+                user=self.user,
+                status=order_status,
+                delivery_day='Monday',
+                total=Decimal('10.50')
+            )
+
+    def read(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_honours_filters(self):
+        """Test that the CSV export streams the filtered orders"""
+        response = self.client.get('/api/orders/orders/export/?status=pending')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(self.read(response))))
+        self.assertEqual(sorted(row['order_id'] for row in rows), ['ORD-000', 'ORD-001'])
+        self.assertEqual(rows[0]['store_name'], 'Test Store')
+        self.assertEqual(rows[0]['total'], '10.50')
+        self.assertEqual(rows[0]['user'], 'testuser')
+
+    def test_ndjson_export(self):
+        """Test that the NDJSON export writes one JSON object per order"""
+        response = self.client.get('/api/orders/orders/export/?export_format=ndjson')
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]['total'], '10.50')
+
+    def test_export_reads_rows_in_one_query(self):
+        """Test that the export reads related columns without extra queries"""
+        with CaptureQueriesContext(connection) as ctx:
+            self.read(self.client.get('/api/orders/orders/export/'))
+
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_unknown_format_is_rejected(self):
+        """Test that an unsupported export format returns 400"""
+        response = self.client.get('/api/orders/orders/export/?export_format=xlsx')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReceiptTests(TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        settings_override = override_settings(RECEIPT_CACHE_DIR=self.cache_dir, JOB_RESULT_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.store = Store.objects.create(
+            name='Test Store',
+            location='Test Location',
+            lat=14.5995,
+            lng=120.9842,
+            owner_name='Owner',
+            number='09123456789',
+            day='Monday'
+        )
+        category = Category.objects.create(name='Soft Drinks')
+        self.products = [
+            Product.objects.create(
+                product_id=f'P-{i:03d}',
+                name=f'Product {i}',
+                category=category,
+                price=Decimal('10.00'),
+                size='1L',
+                stock_quantity=100
+            )
+            for i in range(3)
+        ]
+        items = [{'product': product, 'quantity': 1} for product in self.products]
+        self.orders = [ingest_order(self.store, items, user=self.user) for _ in range(3)]
+
+    def cached_files(self):
+        return sorted(name for name in os.listdir(self.cache_dir) if name.endswith('.pdf'))
+
+    def test_pdf_is_rendered_once_per_version(self):
+        """Test that the receipt PDF is served from the cache until the order changes"""
+        order = self.orders[0]
+        with mock.patch.object(pdf, 'render_receipt', wraps=pdf.render_receipt) as render:
+            first = self.client.get(f'/api/orders/orders/{order.pk}/pdf/')
+            second = self.client.get(f'/api/orders/orders/{order.pk}/pdf/')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first['Content-Type'], 'application/pdf')
+        self.assertTrue(first.content.startswith(b'%PDF'))
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(render.call_count, 1)
+
+    def test_changing_the_order_invalidates_the_receipt(self):
+        """Test that editing an order's items renders a new receipt and drops the old one"""
+        order = Order.objects.get(pk=self.orders[0].pk)
+        get_receipt_pdf(order)
+        old_path = cache_path(order)
+
+        OrderItem.objects.create(order=order, product=self.products[0], quantity=5, unit_price=Decimal('10.00'))
+        order.refresh_from_db()
+        get_receipt_pdf(order)
+
+        self.assertNotEqual(cache_path(order), old_path)
+        self.assertEqual(self.cached_files(), [os.path.basename(cache_path(order))])
+
+    def test_deleting_the_order_removes_its_receipts(self):
+        """Test that cached receipts are removed with their order"""
+        order = self.orders[0]
+        get_receipt_pdf(order)
+
+        order.delete()
+
+        self.assertEqual(self.cached_files(), [])
+
+    def test_zip_batch(self):
+        """Test that a ZIP batch contains one receipt per order and fills the cache"""
+        get_receipt_pdf(self.orders[0])
+
+        response = self.client.post('/api/orders/orders/receipts/', {
+            'order_ids': [order.pk for order in self.orders],
+            'export_format': 'zip'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        run_pending_jobs()
+
+        download = self.client.get(f"/api/jobs/jobs/{response.data['id']}/download/")
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(download.streaming_content)))
+        self.assertEqual(
+            archive.namelist(),
+            [f'order_{order.order_id}.pdf' for order in self.orders]
+        )
+        self.assertEqual(len(self.cached_files()), 3)
+
+    def test_unknown_orders_are_rejected(self):
+        """Test that a batch naming unknown orders returns 400"""
+        response = self.client.post('/api/orders/orders/receipts/', {
+            'order_ids': [self.orders[0].pk, 99999]
+        }, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('order_ids', response.data)
+
+    def test_pdf_batch_is_rendered_by_a_job(self):
+        """Test that a multi-page PDF batch is queued as a job instead of rendered in the request"""
+        with mock.patch.object(pdf, 'render_pdf', wraps=pdf.render_pdf) as render:
+            response = self.client.post('/api/orders/orders/receipts/', {
+                'order_ids': [order.pk for order in self.orders]
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.data['status'], Job.STATUS_QUEUED)
+            self.assertEqual(render.call_count, 0)
+
+            run_pending_jobs()
+            self.assertEqual(render.call_count, 1)
+
+        download = self.client.get(f"/api/jobs/jobs/{response.data['id']}/download/")
+        self.assertEqual(download.status_code, status.HTTP_200_OK)
+        content = b''.join(download.streaming_content)
+        self.assertEqual(content.count(b'/Type /Page\n'), 3)
+
+    def test_batch_of_deleted_order_fails(self):
+        """Test that a batch whose order was deleted before it ran fails without retrying"""
+        response = self.client.post('/api/orders/orders/receipts/', {
+            'order_ids': [order.pk for order in self.orders]
+        }, format='json')
+        self.orders[1].delete()
+
+        run_pending_jobs()
+
+        job = Job.objects.get(pk=response.data['id'])
+        self.assertEqual(job.status, Job.STATUS_FAILED)
+        self.assertEqual(job.attempts, 1)
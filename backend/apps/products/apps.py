@@ -5,3 +5,5 @@ class ProductsConfig(AppConfig):
     name = 'apps.products'
     verbose_name = 'Products'
 
+    def ready(self):
+        import apps.products.signals  # noqa
@@ -0,0 +1,158 @@
+"""
+Barcode lookups for scanners.
+
+Serialized products are kept in a process-local LRU keyed by barcode, so
+repeated scans of the same items during a receiving session are answered
+from memory. Misses are read with one query on the unique barcode index.
+
+A product save or delete, or a stock movement, evicts that product here
+once the transaction commits and bumps a version in the default cache;
+renaming a category or supplier drops everything.
+Other processes see the new version on their next lookup and drop their
+whole LRU when the default cache is shared between them; with a
+process-local cache they only serve an entry for
+``PRODUCT_BARCODE_CACHE_MAX_AGE`` seconds before reading it again.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.base.versions import bump_version, get_version
+from .models import Product
+
+VERSION_KEY = 'products:barcode_version'
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_MAX_AGE = 60
+
+
+def normalize_barcode(code):
+    return str(code).strip()
+
+
+class BarcodeCache:
+    """
+    LRU of barcode to serialized product, dropped when the shared version
+    moves; entries older than ``max_age`` seconds are read again.
+    """
+
+    def __init__(self, maxsize, max_age=DEFAULT_MAX_AGE):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self.entries = OrderedDict()
+        self.barcodes = {}
+        self.version = None
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def check_version(self, version):
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.barcodes.clear()
+                self.version = version
+
+    def get(self, code):
+        with self.lock:
+            entry = self.entries.get(code)
+            if entry is None:
+                return None
+            stored_at, payload = entry
+            if time.monotonic() - stored_at > self.max_age:
+                del self.entries[code]
+                return None
+            self.entries.move_to_end(code)
+            return payload
+
+    def put(self, code, product_pk, payload):
+        with self.lock:
+            self.entries[code] = (time.monotonic(), payload)
+            self.entries.move_to_end(code)
+            self.barcodes.setdefault(product_pk, set()).add(code)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def advance(self, version, product_pks):
+        """Move to ``version`` after evicting ``product_pks``, or drop everything if versions were missed"""
+        with self.lock:
+            if self.version is not None and version == self.version + 1:
+                for pk in product_pks:
+                    for code in self.barcodes.pop(pk, ()):
+                        self.entries.pop(code, None)
+                self.version = version
+            else:
+                self.entries.clear()
+                self.barcodes.clear()
+                self.version = None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.barcodes.clear()
+            self.version = None
+
+
+_cache = BarcodeCache(
+    getattr(settings, 'PRODUCT_BARCODE_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    getattr(settings, 'PRODUCT_BARCODE_CACHE_MAX_AGE', DEFAULT_MAX_AGE)
+)
+
+
+def lookup_barcodes(codes):
+    """
+    Serialized products for the given barcodes.
+
+    Returns ``{barcode: payload}``; codes without a product are left out.
+    """
+    from .serializers import ProductSerializer
+
+    codes = list(dict.fromkeys(normalize_barcode(code) for code in codes if normalize_barcode(code)))
+    _cache.check_version(get_version(VERSION_KEY))
+
+    found = {}
+    missing = []
+    for code in codes:
+        payload = _cache.get(code)
+        if payload is None:
+            missing.append(code)
+        else:
+            found[code] = payload
+
+    if missing:
+        products = (
+            Product.objects
+            .filter(barcode__in=missing)
+            .select_related('category', 'supplier', 'inventory')
+        )
+        for product in products:
+            payload = dict(ProductSerializer(product).data)
+            _cache.put(product.barcode, product.pk, payload)
+            found[product.barcode] = payload
+    return found
+
+
+def lookup_barcode(code):
+    """Serialized product for one barcode, or None"""
+    return lookup_barcodes([code]).get(normalize_barcode(code))
+
+
+def _bump_version(product_pks):
+    version = bump_version(VERSION_KEY)
+    if version is None or product_pks is None:
+        _cache.clear()
+    else:
+        _cache.advance(version, product_pks)
+
+
+def invalidate_barcodes(product_pks=None):
+    """
+    Drop cached lookups of the given products, or of every product, once
+    the current transaction commits
+    """
+    product_pks = None if product_pks is None else list(product_pks)
+    transaction.on_commit(lambda: _bump_version(product_pks))
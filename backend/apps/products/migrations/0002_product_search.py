@@ -0,0 +1,38 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:40
+
+from django.db import migrations
+
+from apps.base.search import SearchIndex
+
+# The fields indexed as of this migration, not the live products/search.py
+FIELDS = {
+    'name': 10,
+    'brand': 5,
+    'product_id': 3,
+    'barcode': 3,
+}
+
+
+def search_index(apps):
+    return SearchIndex('products', apps.get_model('products', 'Product'), FIELDS, register=False)
+
+
+def create_search_index(apps, schema_editor):
+    index = search_index(apps)
+    index.create(schema_editor.connection)
+    index.rebuild(connection=schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    search_index(apps).drop(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 14:20
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def blank_barcodes_to_null(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Product.objects.filter(barcode='').update(barcode=None)
+    duplicates = list(
+        Product.objects
+        .exclude(barcode=None)
+        .values('barcode')
+        .annotate(count=Count('id'))
+        .filter(count__gt=1)
+        .values_list('barcode', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            f"Products share barcodes, fix them before migrating: {', '.join(duplicates)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_search'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_barcodes_to_null, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='product',
+            name='barcode',
+            field=models.CharField(blank=True, max_length=100, null=True, unique=True),
+        ),
+    ]
@@ -50,7 +50,7 @@ class Product(TimeStampedModel):
     price = models.DecimalField(max_digits=10, decimal_places=2)
     cost_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True)
     size = models.CharField(max_length=50, blank=True, null=True)
-    barcode = models.CharField(max_length=100, blank=True, null=True)
+    barcode = models.CharField(max_length=100, blank=True, null=True, unique=True)
     stock_quantity = models.IntegerField(default=0)
     reorder_level = models.IntegerField(default=10)
     is_active = models.BooleanField(default=True)
@@ -63,3 +63,9 @@ class Product(TimeStampedModel):
     def __str__(self):
         return f"{self.name} ({self.size})"
 
+    def save(self, *args, **kwargs):
+        # Blank barcodes are stored as NULL so the unique index allows many
+        if self.barcode is not None:
+            self.barcode = self.barcode.strip() or None
+        super().save(*args, **kwargs)
+
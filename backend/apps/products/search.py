@@ -0,0 +1,9 @@
+from apps.base.search import SearchIndex
+from .models import Product
+
+product_index = SearchIndex('products', Product, {
+    'name': 10,
+    'brand': 5,
+    'product_id': 3,
+    'barcode': 3,
+})
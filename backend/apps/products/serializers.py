@@ -1,3 +1,4 @@
+from django.db import transaction
 from rest_framework import serializers
 from .models import Category, Product, Supplier
 from apps.inventory.models import Inventory
@@ -35,4 +36,24 @@ class ProductSerializer(serializers.ModelSerializer):
             'stock_quantity', 'reorder_level', 'is_active',
             'inventory', 'created_at', 'updated_at'
         ]
-
+    
+    def create(self, validated_data):
+        # Start the inventory row from the product's counters, so a product
+        # that has never been stocked still shows up as low stock
+        with transaction.atomic():
+            product = super().create(validated_data)
+            Inventory.objects.create(
+                product=product,
+                quantity=product.stock_quantity,
+                reorder_level=product.reorder_level
+            )
+        return product
+
+
+
+class BarcodeBatchSerializer(serializers.Serializer):
+    barcodes = serializers.ListField(
+        child=serializers.CharField(max_length=100),
+        min_length=1,
+        max_length=500
+    )
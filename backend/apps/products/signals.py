@@ -0,0 +1,38 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .barcodes import invalidate_barcodes
+from .models import Category, Product, Supplier
+from .search import product_index
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Keep the product search index in step with the product"""
+    product_index.update([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    product_index.remove([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, instance, **kwargs):
+    """Drop the cached barcode lookup of a changed product"""
+    invalidate_barcodes([instance.pk])
+
+
+@receiver(post_save, sender='inventory.Inventory')
+@receiver(post_delete, sender='inventory.Inventory')
+def inventory_changed(sender, instance, **kwargs):
+    """Barcode lookups embed the inventory row, drop them when it changes"""
+    invalidate_barcodes([instance.product_id])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Supplier)
+def product_names_changed(sender, instance, created, **kwargs):
+    """Barcode lookups embed category and supplier names"""
+    if not created:
+        invalidate_barcodes()
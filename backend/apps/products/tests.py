@@ -1,3 +1,253 @@
-from django.test import TestCase
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.base.search import edit_distance, tokenize
+from apps.base.testing import QueryCountTestMixin
+from apps.inventory.models import InventoryTransaction
+from . import barcodes
+from .models import Category, Product, Supplier
+from .search import product_index
+
+User = get_user_model()
+
+
+class SearchHelperTests(SimpleTestCase):
+    def test_tokenize(self):
+        """Test that queries are split into lower-cased words without accents"""
+        self.assertEqual(tokenize('Café  Ñoño-Cola_500ml'), ['cafe', 'nono', 'cola', '500ml'])
+
+    def test_edit_distance(self):
+        """Test edit distances, counting a swap of neighbouring letters as one edit"""
+        self.assertEqual(edit_distance('cola', 'cola', 2), 0)
+        self.assertEqual(edit_distance('cola', 'coal', 2), 1)
+        self.assertEqual(edit_distance('sprite', 'spirte', 2), 1)
+        self.assertEqual(edit_distance('pepsi', 'peps', 2), 1)
+        self.assertEqual(edit_distance('pepsi', 'fanta', 1), 2)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+
+        category = Category.objects.create(name='Softdrinks')
+        for product_id, name, brand, barcode in (
+            ('PRD-001', 'Coca-Cola Original', 'Coca-Cola', '4801981116072'),
+            ('PRD-002', 'Coke Zero', 'Coca-Cola', '4801981118489'),
+            ('PRD-003', 'Sprite Lemon Lime', 'Coca-Cola', '4801981107285'),
+            ('PRD-004', 'Royal Tru-Orange', 'Royal', '4801981107421'),
+            ('PRD-005', 'Pepsi Cola', 'Pepsi', '4800049720114'),
+        ):
+            Product.objects.create(
+                product_id=product_id,
+                name=name,
+                brand=brand,
+                barcode=barcode,
+                category=category,
+                price=20
+            )
+
+    def search(self, query, **params):
+        response = self.client.get('/api/products/products/', {'search': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [product['name'] for product in response.data]
+
+    def test_ranked_prefix_search(self):
+        """Test that words match as prefixes and name matches rank above brand matches"""
+        self.assertEqual(self.search('coke'), ['Coke Zero'])
+        self.assertEqual(self.search('co ze'), ['Coke Zero'])
+        # Name matches first, then brand matches, newest first within each
+        self.assertEqual(
+            self.search('cola'),
+            ['Pepsi Cola', 'Coca-Cola Original', 'Sprite Lemon Lime', 'Coke Zero']
+        )
+
+        # Whole words before prefixes, even in newer products
+        Product.objects.create(product_id='PRD-006', name='Lemonade', category=Category.objects.get(), price=20)
+        self.assertEqual(self.search('lemon'), ['Sprite Lemon Lime', 'Lemonade'])
+        self.assertEqual(self.search('4800049'), ['Pepsi Cola'])
+        self.assertEqual(self.search('prd 004'), ['Royal Tru-Orange'])
+        self.assertEqual(self.search('"lemon" OR'), [])
+
+    def test_typo_tolerance(self):
+        """Test that misspelt words still find the product"""
+        self.assertEqual(self.search('sprtie'), ['Sprite Lemon Lime'])
+        self.assertEqual(self.search('royal ornage'), ['Royal Tru-Orange'])
+        self.assertEqual(self.search('pepsu'), ['Pepsi Cola'])
+        self.assertEqual(self.search('xyzzy'), [])
+
+    def test_index_follows_changes(self):
+        """Test that renamed and deleted products are reflected in search"""
+        product = Product.objects.get(product_id='PRD-002')
+        product.name = 'Coke Light'
+        product.save()
+        self.assertEqual(self.search('zero'), [])
+        self.assertEqual(self.search('light'), ['Coke Light'])
+
+        product.delete()
+        self.assertEqual(self.search('coke'), [])
+
+    def test_search_combines_with_filters(self):
+        """Test that search results still honour the other filters"""
+        Product.objects.filter(product_id='PRD-005').update(is_active=False)
+        self.assertEqual(self.search('cola', is_active='true'), ['Coca-Cola Original', 'Sprite Lemon Lime', 'Coke Zero'])
+
+    def test_rebuild_command(self):
+        """Test that the rebuild command indexes rows inserted without signals"""
+        Product.objects.bulk_create([
+            Product(product_id='PRD-007', name='Mountain Dew', category=Category.objects.get(), price=20)
+        ])
+        self.assertEqual(self.search('mountain'), [])
+
+        out = StringIO()
+        call_command('rebuild_search_index', 'products', stdout=out)
+        self.assertIn('Indexed 6 rows into products', out.getvalue())
+        self.assertEqual(self.search('mountain'), ['Mountain Dew'])
+
+    def test_fallback_without_full_text_backend(self):
+        """Test that search falls back to matching every word in the fields"""
+        with mock.patch.object(product_index, 'backend', return_value=None):
+            self.assertEqual(sorted(self.search('cola pepsi')), ['Pepsi Cola'])
+            self.assertEqual(len(self.search('cola')), 4)
+
+
+class BarcodeLookupTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        cache.delete(barcodes.VERSION_KEY)
+        barcodes._cache.clear()
+
+        self.category = Category.objects.create(name='Softdrinks')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cola = Product.objects.create(
+                product_id='PRD-001', name='Coca-Cola', barcode='4801981116072', category=self.category, price=20
+            )
+            self.sprite = Product.objects.create(
+                product_id='PRD-002', name='Sprite', barcode='4801981107285', category=self.category, price=20
+            )
+
+    def test_lookup_is_cached(self):
+        """Test that a repeated scan is answered without queries"""
+        response = self.client.get('/api/products/products/by-barcode/4801981116072/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['product_id'], 'PRD-001')
+        with self.assertNumQueries(0):
+            self.assertEqual(barcodes.lookup_barcode(' 4801981116072 ')['name'], 'Coca-Cola')
+
+        response = self.client.get('/api/products/products/by-barcode/0000000000000/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_changes_invalidate_the_cache(self):
+        """Test that product saves and stock movements are reflected in cached scans"""
+        barcodes.lookup_barcodes(['4801981116072', '4801981107285'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cola.price = 25
+            self.cola.save()
+        # Only the changed product is dropped
+        with self.assertNumQueries(0):
+            barcodes.lookup_barcode('4801981107285')
+        self.assertEqual(barcodes.lookup_barcode('4801981116072')['price'], '25.00')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            InventoryTransaction.objects.create(product=self.cola, quantity=12, transaction_type='in')
+        self.assertEqual(barcodes.lookup_barcode('4801981116072')['stock_quantity'], 12)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cola.barcode = '4801981116089'
+            self.cola.save()
+        self.assertIsNone(barcodes.lookup_barcode('4801981116072'))
+
+    def test_change_in_another_process(self):
+        """Test that a version bumped elsewhere drops the whole local cache"""
+        barcodes.lookup_barcode('4801981107285')
+        Product.objects.filter(pk=self.sprite.pk).update(name='Sprite Zero')
+        cache.incr(barcodes.VERSION_KEY)
+
+        self.assertEqual(barcodes.lookup_barcode('4801981107285')['name'], 'Sprite Zero')
+
+    def test_entries_expire_without_a_shared_version(self):
+        """Test that a process whose version never moves stops serving an entry after the max age"""
+        # Two processes with process-local version counters
+        here, elsewhere = barcodes.BarcodeCache(10, max_age=60), barcodes.BarcodeCache(10, max_age=60)
+        for process in (here, elsewhere):
+            process.check_version(1)
+            process.put('4801981116072', self.cola.pk, {'stock_quantity': 0})
+
+        # Stock moved in the first process, which bumps only its own counter
+        here.advance(2, [self.cola.pk])
+        self.assertIsNone(here.get('4801981116072'))
+        self.assertEqual(elsewhere.get('4801981116072'), {'stock_quantity': 0})
+
+        now = barcodes.time.monotonic()
+        with mock.patch.object(barcodes.time, 'monotonic', return_value=now + 61):
+            self.assertIsNone(elsewhere.get('4801981116072'))
+        self.assertEqual(len(elsewhere), 0)
+
+    def test_batch_lookup(self):
+        """Test looking up several barcodes in one request"""
+        response = self.client.post(
+            '/api/products/products/by-barcode/',
+            {'barcodes': ['4801981116072', '4801981107285', '4801981116072', 'unknown']},
+            format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(response.data['results']), ['4801981107285', '4801981116072'])
+        self.assertEqual(response.data['missing'], ['unknown'])
+
+        response = self.client.post('/api/products/products/by-barcode/', {'barcodes': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_barcodes_are_unique(self):
+        """Test that barcodes must be unique while products without one are allowed"""
+        data = {'product_id': 'PRD-003', 'name': 'Royal', 'category': self.category.pk, 'price': '20.00'}
+        response = self.client.post('/api/products/products/', {**data, 'barcode': '4801981116072'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('barcode', response.data)
+
+        for product_id in ('PRD-003', 'PRD-004'):
+            response = self.client.post(
+                '/api/products/products/', {**data, 'product_id': product_id, 'barcode': ''}, format='json'
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Product.objects.filter(barcode=None).count(), 2)
+
+
+class ProductQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.products = []
+
+    def create_products(self, count):
+        for _ in range(count):
+            product = Product.objects.create(
+                product_id=f'PRD-{len(self.products):03d}', name='Cola',
+                category=Category.objects.create(name=f'Category {len(self.products)}'),
+                supplier=Supplier.objects.create(name=f'Supplier {len(self.products)}'),
+                price=20
+            )
+            InventoryTransaction.objects.create(product=product, quantity=5, transaction_type='in')
+            self.products.append(product)
+
+    def test_list_queries_do_not_grow_with_products(self):
+        """Test that listing products with their category, supplier and inventory costs constant queries"""
+        response = self.assertConstantQueries(
+            lambda: self.client.get('/api/products/products/'), self.create_products, max_queries=2
+        )
+
+        self.assertEqual(response.data[0]['inventory']['quantity'], 5)
+        self.assertTrue(response.data[0]['supplier_name'].startswith('Supplier'))
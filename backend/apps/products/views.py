@@ -1,8 +1,13 @@
-from rest_framework import viewsets, filters
+from rest_framework import viewsets, filters, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from apps.base.search import FullTextSearchFilter
+from .barcodes import lookup_barcode, lookup_barcodes, normalize_barcode
 from .models import Category, Product, Supplier
-from .serializers import CategorySerializer, ProductSerializer, SupplierSerializer
+from .search import product_index
+from .serializers import BarcodeBatchSerializer, CategorySerializer, ProductSerializer, SupplierSerializer
 
 
 class CategoryViewSet(viewsets.ModelViewSet):
@@ -14,12 +19,36 @@ class CategoryViewSet(viewsets.ModelViewSet):
 
 
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    # The serializer reads the category, supplier and inventory of each product
+    queryset = Product.objects.select_related('category', 'supplier', 'inventory')
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend]
+    filter_backends = [FullTextSearchFilter, DjangoFilterBackend]
+    # Ranked prefix and typo tolerant search; search_fields is the fallback
+    search_index = product_index
     search_fields = ['name', 'brand', 'product_id', 'barcode']
     filterset_fields = ['category', 'supplier', 'is_active']
+    
+    @action(detail=False, methods=['get'], url_path=r'by-barcode/(?P<code>[^/]+)')
+    def by_barcode(self, request, code=None):
+        """Exact barcode lookup for scanners, served from a process-local cache."""
+        payload = lookup_barcode(code)
+        if payload is None:
+            return Response({'detail': 'No product with this barcode.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(payload)
+    
+    @action(detail=False, methods=['post'], url_path='by-barcode')
+    def by_barcodes(self, request):
+        """Look up many scanned barcodes at once."""
+        serializer = BarcodeBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        
+        codes = serializer.validated_data['barcodes']
+        found = lookup_barcodes(codes)
+        return Response({
+            'results': found,
+            'missing': [code for code in dict.fromkeys(map(normalize_barcode, codes)) if code not in found],
+        })
 
 
 class SupplierViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:15
+
+from django.db import migrations, models
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_encode(lat, lng, precision=9):
+    # Frozen copy of apps.base.geo.geohash_encode as of this migration
+    lat_range, lng_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        span, coordinate = (lng_range, lng) if even else (lat_range, lat)
+        middle = (span[0] + span[1]) / 2
+        if coordinate >= middle:
+            value = value * 2 + 1
+            span[0] = middle
+        else:
+            value = value * 2
+            span[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(BASE32[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def fill_geohash(apps, schema_editor):
+    Store = apps.get_model('stores', 'Store')
+    stores = list(Store.objects.only('id', 'lat', 'lng'))
+    for store in stores:
+        store.geohash = geohash_encode(store.lat, store.lng)
+    Store.objects.bulk_update(stores, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='geohash',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(fill_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.7 on 2026-10-18 13:40
+
+from django.db import migrations
+
+from apps.base.search import SearchIndex
+
+# The fields indexed as of this migration, not the live stores/search.py
+FIELDS = {
+    'name': 10,
+    'owner_name': 6,
+    'location': 4,
+}
+
+
+def search_index(apps):
+    return SearchIndex('stores', apps.get_model('stores', 'Store'), FIELDS, register=False)
+
+
+def create_search_index(apps, schema_editor):
+    index = search_index(apps)
+    index.create(schema_editor.connection)
+    index.rebuild(connection=schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    search_index(apps).drop(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0002_store_geohash'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
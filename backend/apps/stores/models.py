@@ -1,7 +1,30 @@
 from django.db import models
+from apps.base.geo import bounding_box, geohash_cover, geohash_encode, haversine
 from apps.base.models import TimeStampedModel
 
 
+class StoreQuerySet(models.QuerySet):
+    def in_bbox(self, min_lat, min_lng, max_lat, max_lng):
+        """Stores inside a bounding box, narrowed through the geohash index"""
+        cells = models.Q()
+        for prefix in geohash_cover(min_lat, min_lng, max_lat, max_lng):
+            # A range instead of startswith so SQLite can use the index
+            cells |= models.Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+        return self.filter(
+            cells,
+            lat__gte=min_lat, lat__lte=max_lat,
+            lng__gte=min_lng, lng__lte=max_lng
+        )
+
+    def within(self, lat, lng, radius_km):
+        """Stores within ``radius_km`` of a point, as a list sorted by ``distance_km``"""
+        stores = list(self.in_bbox(*bounding_box(lat, lng, radius_km)))
+        distances = haversine(lat, lng, [store.lat for store in stores], [store.lng for store in stores])
+        for store, distance in zip(stores, distances):
+            store.distance_km = float(distance)
+        return sorted((store for store in stores if store.distance_km <= radius_km), key=lambda store: store.distance_km)
+
+
 class Store(TimeStampedModel):
     """
     Store model for managing local stores
@@ -23,6 +46,9 @@ class Store(TimeStampedModel):
         ('Sunday', 'Sunday'),
     ))
     is_archived = models.BooleanField(default=False)
+    geohash = models.CharField(max_length=12, editable=False, db_index=True, default='')
+
+    objects = StoreQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Store'
@@ -32,3 +58,10 @@ class Store(TimeStampedModel):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.geohash = geohash_encode(self.lat, self.lng)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'lat', 'lng'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
@@ -0,0 +1,8 @@
+from apps.base.search import SearchIndex
+from .models import Store
+
+store_index = SearchIndex('stores', Store, {
+    'name': 10,
+    'owner_name': 6,
+    'location': 4,
+})
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from .models import Store
+from .search import store_index
+from .spatial import invalidate_store_index
+
+
+@receiver(post_save, sender=Store)
+@receiver(post_delete, sender=Store)
+def store_changed(sender, instance, **kwargs):
+    """Rebuild the spatial index after a store is added, moved, archived or removed"""
+    invalidate_store_index()
+
+
+@receiver(post_save, sender=Store)
+def index_store(sender, instance, **kwargs):
+    """Keep the store search index in step with the store"""
+    store_index.update([instance])
+
+
+@receiver(post_delete, sender=Store)
+def unindex_store(sender, instance, **kwargs):
+    store_index.remove([instance.pk])
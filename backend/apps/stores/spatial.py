@@ -0,0 +1,143 @@
+"""
+In-memory spatial index of store locations.
+
+Stores are bucketed into a grid of ``STORE_GRID_CELL_DEG`` degree cells
+and kept in NumPy arrays sorted by cell, row by row. Every cell row of a
+query box is then one contiguous slice found with ``searchsorted``, so a
+lookup touches only the stores in the cells it overlaps, and the exact
+distances are computed for those candidates in one vectorised pass.
+
+The index is built from a single ``values_list`` query the first time
+it is needed. Saving or deleting a store bumps a version in the default
+cache after commit. Each process rebuilds its copy when it sees a new
+version, or after ``STORE_INDEX_MAX_AGE`` seconds when the cache is not
+shared between processes.
+"""
+import math
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from apps.base.geo import EARTH_RADIUS_KM, bounding_box, haversine
+from apps.base.versions import bump_version, get_version
+from .models import Store
+
+VERSION_KEY = 'stores:spatial_index_version'
+
+DEFAULT_CELL_DEG = 0.01
+DEFAULT_MAX_AGE = 300
+
+# Cell keys are row * ROW_STRIDE + column, with rows and columns offset to be positive
+ROW_STRIDE = 1 << 32
+
+
+class StoreGrid:
+    """
+    Grid index over store ids, coordinates and archived flags
+
+    Serves the radius and nearest lookups; box lookups go to the geohash
+    column through ``Store.objects.in_bbox``.
+    """
+
+    def __init__(self, ids, lats, lngs, archived, cell_deg=DEFAULT_CELL_DEG):
+        self.cell_deg = cell_deg
+        self.col_offset = math.ceil(180 / cell_deg) + 1
+        self.row_offset = math.ceil(90 / cell_deg) + 1
+
+        lats = np.asarray(lats, dtype=float)
+        lngs = np.asarray(lngs, dtype=float)
+        keys = self._keys(self._row(lats), self._col(lngs))
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        self.ids = np.asarray(ids, dtype=np.int64)[order]
+        self.lats = lats[order]
+        self.lngs = lngs[order]
+        self.archived = np.asarray(archived, dtype=bool)[order]
+
+    @classmethod
+    def build(cls, queryset=None, cell_deg=None):
+        queryset = Store.objects.all() if queryset is None else queryset
+        rows = list(queryset.order_by().values_list('id', 'lat', 'lng', 'is_archived'))
+        columns = list(zip(*rows)) or [(), (), (), ()]
+        return cls(*columns, cell_deg=cell_deg or getattr(settings, 'STORE_GRID_CELL_DEG', DEFAULT_CELL_DEG))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _row(self, lats):
+        return np.floor(np.asarray(lats) / self.cell_deg).astype(np.int64) + self.row_offset
+
+    def _col(self, lngs):
+        return np.floor(np.asarray(lngs) / self.cell_deg).astype(np.int64) + self.col_offset
+
+    def _keys(self, rows, cols):
+        return rows * ROW_STRIDE + cols
+
+    def _candidates(self, min_lat, min_lng, max_lat, max_lng):
+        """Positions of the stores in the cells overlapping a box"""
+        rows = np.arange(self._row(min_lat), self._row(max_lat) + 1)
+        col_min, col_max = self._col(min_lng), self._col(max_lng)
+        starts = np.searchsorted(self.keys, self._keys(rows, col_min), side='left')
+        ends = np.searchsorted(self.keys, self._keys(rows, col_max), side='right')
+        spans = [np.arange(start, end) for start, end in zip(starts, ends) if end > start]
+        return np.concatenate(spans) if spans else np.empty(0, dtype=np.int64)
+
+    def _filter(self, positions, archived):
+        if archived is None:
+            return positions
+        return positions[self.archived[positions] == archived]
+
+    def nearby(self, lat, lng, radius_km, archived=None, limit=None):
+        """``[(id, distance_km)]`` of stores within ``radius_km``, nearest first"""
+        positions = self._filter(self._candidates(*bounding_box(lat, lng, radius_km)), archived)
+        distances = haversine(lat, lng, self.lats[positions], self.lngs[positions])
+        inside = distances <= radius_km
+        positions, distances = positions[inside], distances[inside]
+        if limit is not None and limit < len(distances):
+            nearest = np.argpartition(distances, limit)[:limit]
+            positions, distances = positions[nearest], distances[nearest]
+        order = np.argsort(distances, kind='stable')
+        return list(zip(self.ids[positions[order]].tolist(), distances[order].tolist()))
+
+    def nearest(self, lat, lng, count, archived=None):
+        """``[(id, distance_km)]`` of the ``count`` nearest stores"""
+        radius = self.cell_deg * math.pi / 180 * EARTH_RADIUS_KM
+        while True:
+            found = self.nearby(lat, lng, radius, archived, limit=count)
+            # Everything closer than ``radius`` was considered, so a full page is exact
+            if len(found) >= count or radius >= math.pi * EARTH_RADIUS_KM:
+                return found
+            radius *= 4
+
+
+_index = None
+_index_version = None
+_index_built_at = 0.0
+_lock = threading.Lock()
+
+
+def get_index():
+    """Return this process's store index, rebuilding it when stale"""
+    global _index, _index_version, _index_built_at
+    version = get_version(VERSION_KEY)
+    max_age = getattr(settings, 'STORE_INDEX_MAX_AGE', DEFAULT_MAX_AGE)
+    with _lock:
+        if _index is None or _index_version != version or time.monotonic() - _index_built_at > max_age:
+            _index = StoreGrid.build()
+            _index_version = version
+            _index_built_at = time.monotonic()
+        return _index
+
+
+def _bump_version():
+    global _index
+    bump_version(VERSION_KEY)
+    _index = None
+
+
+def invalidate_store_index():
+    """Rebuild the store index everywhere once the current transaction commits"""
+    transaction.on_commit(_bump_version)
@@ -1,3 +1,213 @@
-from django.test import TestCase
+import random
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from apps.base.geo import geohash_cover, geohash_encode, haversine
+from apps.base.testing import QueryCountTestMixin, QueryPlanTestMixin
+from .models import Store
+from .spatial import StoreGrid, get_index
+
+User = get_user_model()
+
+
+class GeohashTests(SimpleTestCase):
+    def test_encode(self):
+        """Test geohash encoding against a published value"""
+        self.assertEqual(geohash_encode(57.64911, 10.40744, 11), 'u4pruydqqvj')
+
+    def test_cover_contains_every_point_of_the_box(self):
+        """Test that the geohash cover of a box includes the hash of any point inside it"""
+        rng = random.Random(0)
+        for _ in range(200):
+            min_lat, min_lng = rng.uniform(-60, 60), rng.uniform(-170, 170)
+            box = (min_lat, min_lng, min_lat + rng.choice([0.001, 0.05, 2]), min_lng + rng.choice([0.001, 0.05, 2]))
+            cover = geohash_cover(*box)
+            self.assertLessEqual(len(cover), 16)
+            for _ in range(10):
+                point = geohash_encode(rng.uniform(box[0], box[2]), rng.uniform(box[1], box[3]))
+                self.assertTrue(any(point.startswith(prefix) for prefix in cover))
+
+
+class StoreGridTests(SimpleTestCase):
+    def setUp(self):
+        rng = random.Random(1)
+        self.points = [(14.5 + rng.random() * 0.3, 120.9 + rng.random() * 0.3) for _ in range(2000)]
+        self.archived = [i % 5 == 0 for i in range(len(self.points))]
+        lats, lngs = zip(*self.points)
+        self.grid = StoreGrid(range(len(self.points)), lats, lngs, self.archived, cell_deg=0.01)
+        self.lats, self.lngs = lats, lngs
+
+    def brute_force(self, lat, lng, radius_km, archived=None):
+        distances = haversine(lat, lng, self.lats, self.lngs)
+        return sorted(
+            (distance, i) for i, distance in enumerate(distances)
+            if distance <= radius_km and (archived is None or self.archived[i] == archived)
+        )
+
+    def test_nearby_matches_brute_force(self):
+        """Test that radius lookups return exactly the stores a full scan finds"""
+        for lat, lng, radius in ((14.65, 121.05, 2), (14.5, 120.9, 5), (14.7, 121.1, 0.3), (14.6, 121.0, 50)):
+            expected = self.brute_force(lat, lng, radius)
+            found = self.grid.nearby(lat, lng, radius)
+            self.assertEqual([i for i, _ in found], [i for _, i in expected])
+            for (_, distance), (expected_distance, _) in zip(found, expected):
+                self.assertAlmostEqual(distance, expected_distance)
+
+        expected = self.brute_force(14.65, 121.05, 3, archived=False)
+        self.assertEqual([i for i, _ in self.grid.nearby(14.65, 121.05, 3, archived=False)], [i for _, i in expected])
+
+    def test_nearest(self):
+        """Test that the nearest N stores match a full scan, including far from any store"""
+        for lat, lng in ((14.65, 121.05), (10.0, 123.0)):
+            expected = [i for _, i in self.brute_force(lat, lng, 20000)[:7]]
+            self.assertEqual([i for i, _ in self.grid.nearest(lat, lng, 7)], expected)
+
+
+class StoreSpatialQueryTests(QueryPlanTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+
+        # Stores 0.01 degrees (about 1.1 km) apart going north
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stores = [
+                Store.objects.create(
+                    name=f'Store {i}',
+                    location=f'Location {i}',
+                    lat=14.6 + i * 0.01,
+                    lng=121.0,
+                    owner_name='Owner',
+                    number='09123456789',
+                    day='Monday'
+                )
+                for i in range(5)
+            ]
+
+    def test_geohash_is_kept_up_to_date(self):
+        """Test that saving a store stores the geohash of its location"""
+        store = self.stores[0]
+        self.assertEqual(store.geohash, geohash_encode(store.lat, store.lng))
+        store.lat = 10.0
+        store.save(update_fields=['lat'])
+        store.refresh_from_db()
+        self.assertEqual(store.geohash, geohash_encode(10.0, 121.0))
+
+    def test_queryset_lookups_use_geohash_index(self):
+        """Test the database fallback lookups and that they do not scan the table"""
+        found = Store.objects.within(14.6, 121.0, 2.5)
+        self.assertEqual([store.name for store in found], ['Store 0', 'Store 1', 'Store 2'])
+        self.assertAlmostEqual(found[1].distance_km, 1.112, places=3)
+        self.assertNoFullScan(Store.objects.in_bbox(14.6, 120.99, 14.62, 121.01))
+
+    def test_nearby(self):
+        """Test that nearby returns stores in the radius, nearest first, with their distance"""
+        response = self.client.get('/api/stores/stores/nearby/', {'lat': 14.621, 'lng': 121.0, 'radius_km': 1.5})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([store['name'] for store in response.data], ['Store 2', 'Store 3', 'Store 1'])
+        self.assertAlmostEqual(response.data[0]['distance_km'], 0.111, places=3)
+
+        response = self.client.get('/api/stores/stores/nearby/', {'lat': 14.0, 'lng': 121.0, 'limit': 2})
+        self.assertEqual([store['name'] for store in response.data], ['Store 0', 'Store 1'])
+
+    def test_index_follows_store_changes(self):
+        """Test that archiving and deleting stores is reflected in the index"""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stores[1].is_archived = True
+            self.stores[1].save()
+            self.stores[2].delete()
+
+        self.assertEqual(len(get_index()), 4)
+        response = self.client.get(
+            '/api/stores/stores/nearby/', {'lat': 14.6, 'lng': 121.0, 'radius_km': 3.5, 'archived': 'false'}
+        )
+        self.assertEqual([store['name'] for store in response.data], ['Store 0', 'Store 3'])
+
+    def test_bbox(self):
+        """Test that bbox returns the stores inside the box"""
+        response = self.client.get(
+            '/api/stores/stores/bbox/',
+            {'min_lat': 14.605, 'min_lng': 120.9, 'max_lat': 14.625, 'max_lng': 121.1}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([store['name'] for store in response.data], ['Store 1', 'Store 2'])
+
+        # Read straight from the geohash column, so writes show without an index rebuild
+        self.stores[1].is_archived = True
+        self.stores[1].save()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/api/stores/stores/bbox/',
+                {'min_lat': 14.605, 'min_lng': 120.9, 'max_lat': 14.625, 'max_lng': 121.1, 'archived': 'false'}
+            )
+        self.assertEqual([store['name'] for store in response.data], ['Store 2'])
+
+    def test_invalid_parameters(self):
+        """Test that missing or out of range coordinates are rejected"""
+        for params in ({'lng': 121.0}, {'lat': 91, 'lng': 121.0}, {'lat': 'x', 'lng': 121.0},
+                       {'lat': 14.6, 'lng': 121.0, 'limit': 0}):
+            response = self.client.get('/api/stores/stores/nearby/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(
+            '/api/stores/stores/bbox/', {'min_lat': 14.7, 'min_lng': 120.9, 'max_lat': 14.6, 'max_lng': 121.1}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StoreSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+
+        for name, location, owner in (
+            ('Aling Nena Sari-Sari', 'Quezon City', 'Nena Cruz'),
+            ('Mang Tomas Store', 'Marikina', 'Tomas Reyes'),
+            ('Quezon Mini Mart', 'Pasig', 'Liza Santos'),
+        ):
+            Store.objects.create(
+                name=name,
+                location=location,
+                lat=14.6,
+                lng=121.0,
+                owner_name=owner,
+                number='09123456789',
+                day='Monday'
+            )
+
+    def test_search(self):
+        """Test that stores are searched by name, owner and location, name matches first"""
+        response = self.client.get('/api/stores/stores/', {'search': 'quezon'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([store['name'] for store in response.data], ['Quezon Mini Mart', 'Aling Nena Sari-Sari'])
+
+        response = self.client.get('/api/stores/stores/', {'search': 'tomas marikna'})
+        self.assertEqual([store['name'] for store in response.data], ['Mang Tomas Store'])
+
+        response = self.client.get('/api/stores/stores/', {'search': 'santos', 'archived': 'true'})
+        self.assertEqual(response.data, [])
+
+
+class StoreQueryCountTests(QueryCountTestMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+
+    def create_stores(self, count):
+        for _ in range(count):
+            Store.objects.create(
+                name='Store', location='Location', lat=14.6, lng=121.0,
+                owner_name='Owner', number='09123456789', day='Monday'
+            )
+
+    def test_list_queries_do_not_grow_with_stores(self):
+        """Test that listing stores costs constant queries"""
+        self.assertConstantQueries(lambda: self.client.get('/api/stores/stores/'), self.create_stores, max_queries=2)
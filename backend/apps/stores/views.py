@@ -4,7 +4,45 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from .models import Store
+from .search import store_index
 from .serializers import StoreSerializer
+from .spatial import get_index
+
+DEFAULT_NEARBY_LIMIT = 20
+MAX_NEARBY_LIMIT = 500
+MAX_RADIUS_KM = 500
+DEFAULT_BBOX_LIMIT = 500
+MAX_BBOX_LIMIT = 5000
+
+
+def _float_param(params, name, low, high, default=None):
+    value = params.get(name)
+    if value is None or value == '':
+        if default is None:
+            raise ValueError(f"{name} is required.")
+        return default
+    try:
+        value = float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number.")
+    if not low <= value <= high:
+        raise ValueError(f"{name} must be between {low} and {high}.")
+    return value
+
+
+def _limit_param(params, default, maximum):
+    try:
+        limit = int(params.get('limit', default))
+    except ValueError:
+        raise ValueError('limit must be an integer.')
+    if not 1 <= limit <= maximum:
+        raise ValueError(f"limit must be between 1 and {maximum}.")
+    return limit
+
+
+def _archived_param(params):
+    archived = params.get('archived')
+    return None if archived is None else archived.lower() == 'true'
 
 class StoreViewSet(viewsets.ModelViewSet):
     queryset = Store.objects.all()
@@ -25,14 +63,10 @@ class StoreViewSet(viewsets.ModelViewSet):
         if day:
             queryset = queryset.filter(day=day)
         
-        # Search by name or location
+        # Search by name, owner or location, best match first
         search = self.request.query_params.get('search')
         if search:
-            queryset = queryset.filter(
-                models.Q(name__icontains=search) |
-                models.Q(location__icontains=search) |
-                models.Q(owner_name__icontains=search)
-            )
+            queryset = store_index.filter(queryset, search)
         
         return queryset
     
@@ -45,4 +79,58 @@ class StoreViewSet(viewsets.ModelViewSet):
         store.save()
         
         serializer = self.get_serializer(store)
-        return Response(serializer.data)
\ No newline at end of file
+        return Response(serializer.data)
+    
+    def _stores_response(self, matches):
+        """Serialize ``[(id, distance_km or None)]`` in the given order"""
+        stores = Store.objects.in_bulk([store_id for store_id, _ in matches])
+        data = []
+        for store_id, distance in matches:
+            if store_id in stores:
+                store_data = self.get_serializer(stores[store_id]).data
+                if distance is not None:
+                    store_data['distance_km'] = round(distance, 3)
+                data.append(store_data)
+        return Response(data)
+    
+    @action(detail=False, methods=['get'])
+    def nearby(self, request):
+        """Stores within radius_km of lat/lng, or the nearest ones without a radius, nearest first."""
+        params = request.query_params
+        try:
+            lat = _float_param(params, 'lat', -90, 90)
+            lng = _float_param(params, 'lng', -180, 180)
+            radius = _float_param(params, 'radius_km', 0, MAX_RADIUS_KM) if params.get('radius_km') else None
+            limit = _limit_param(params, DEFAULT_NEARBY_LIMIT, MAX_NEARBY_LIMIT)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        index = get_index()
+        archived = _archived_param(params)
+        if radius is not None:
+            matches = index.nearby(lat, lng, radius, archived=archived, limit=limit)
+        else:
+            matches = index.nearest(lat, lng, limit, archived=archived)
+        return self._stores_response(matches)
+    
+    @action(detail=False, methods=['get'])
+    def bbox(self, request):
+        """Stores inside the box min_lat/min_lng to max_lat/max_lng."""
+        params = request.query_params
+        try:
+            min_lat = _float_param(params, 'min_lat', -90, 90)
+            min_lng = _float_param(params, 'min_lng', -180, 180)
+            max_lat = _float_param(params, 'max_lat', min_lat, 90)
+            max_lng = _float_param(params, 'max_lng', min_lng, 180)
+            limit = _limit_param(params, DEFAULT_BBOX_LIMIT, MAX_BBOX_LIMIT)
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Served by the geohash index in one query, so it never lags behind writes
+        stores = Store.objects.in_bbox(min_lat, min_lng, max_lat, max_lng)
+        archived = _archived_param(params)
+        if archived is not None:
+            stores = stores.filter(is_archived=archived)
+        
+        serializer = self.get_serializer(stores.order_by('id')[:limit], many=True)
+        return Response(serializer.data)
@@ -0,0 +1,58 @@
+"""
+Benchmark automatic driver assignment for a busy delivery day.
+
+Usage: python -m benchmarks.auto_assign --stops 1000 --drivers 30
+"""
+import argparse
+from datetime import date, time
+
+from benchmarks.common import measure, report, seed_stores, setup_django
+
+DELIVERY_DATE = date(2025, 4, 7)
+
+
+def seed(stops, drivers):
+    from django.contrib.auth import get_user_model
+    from apps.deliveries.models import Delivery
+    from apps.orders.models import Order
+
+    User = get_user_model()
+    User.objects.bulk_create([
+        User(username=f"bench-driver-{i}", role='delivery_driver')
+        for i in range(drivers)
+    ])
+    orders = Order.objects.bulk_create([
+        Order(order_id=f"ASSIGN-{i:06d}", store_id=store_id, delivery_day='Monday')
+        for i, store_id in enumerate(seed_stores(stops))
+    ])
+    Delivery.objects.bulk_create([
+        Delivery(id=f"DEL-{i:06d}", order=order, delivery_date=DELIVERY_DATE, delivery_time=time(8, 0))
+        for i, order in enumerate(orders)
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stops', type=int, default=1000)
+    parser.add_argument('--drivers', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    seed(args.stops, args.drivers)
+
+    from apps.deliveries.assignment import apply_assignment, plan_assignment
+
+    # Enough room per driver that every stop can be placed
+    max_stops = -(-args.stops // args.drivers) + 5
+    queries, seconds, plan = measure(lambda: plan_assignment(DELIVERY_DATE, max_stops=max_stops), args.repeat)
+    report(f"plan {args.stops} stops x {args.drivers} drivers", queries, seconds)
+    distance = sum(route['total_distance_km'] for route in plan['routes'])
+    print(f"{'':<40} {len(plan['assignments'])} assigned, {len(plan['unassigned'])} left, {distance:.1f} km")
+
+    queries, seconds, updated = measure(lambda: apply_assignment(plan), 1)
+    report(f"apply ({updated} changed)", queries, seconds)
+
+
+if __name__ == '__main__':
+    main()
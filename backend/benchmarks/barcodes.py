@@ -0,0 +1,82 @@
+"""
+Benchmark scanner barcode lookups: the list endpoint's icontains search vs
+the unique barcode index vs the process-local cache.
+
+Usage: python -m benchmarks.barcodes --products 100000
+"""
+import argparse
+import random
+import time
+from functools import reduce
+from operator import or_
+
+from benchmarks.common import setup_django
+
+
+def seed_products(count, batch_size=5000):
+    from apps.products.models import Category, Product
+
+    category = Category.objects.create(name='Beverages')
+    for offset in range(0, count, batch_size):
+        Product.objects.bulk_create([
+            Product(
+                product_id=f"PRD-{i:07d}",
+                name=f"Product {i}",
+                barcode=f"480{i:010d}",
+                category=category,
+                price=20,
+            )
+            for i in range(offset, min(offset + batch_size, count))
+        ])
+
+
+def icontains_scan(code):
+    """The previous scan: ?search=<code> over four columns"""
+    from django.db.models import Q
+    from apps.products.models import Product
+    from apps.products.serializers import ProductSerializer
+
+    fields = ['name', 'brand', 'product_id', 'barcode']
+    products = Product.objects.filter(reduce(or_, (Q(**{f"{field}__icontains": code}) for field in fields)))
+    return ProductSerializer(products.select_related('category', 'supplier', 'inventory'), many=True).data
+
+
+def per_scan(fn, codes):
+    started = time.perf_counter()
+    for code in codes:
+        fn(code)
+    return (time.perf_counter() - started) / len(codes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--scans', type=int, default=2000)
+    args = parser.parse_args()
+
+    setup_django()
+    seed_products(args.products)
+
+    from apps.products import barcodes
+
+    rng = random.Random(5)
+    # A receiving session scans the same few hundred items over and over
+    session = [f"480{rng.randrange(args.products):010d}" for _ in range(300)]
+    codes = [rng.choice(session) for _ in range(args.scans)]
+
+    def uncached(code):
+        barcodes._cache.clear()
+        return barcodes.lookup_barcode(code)
+
+    rows = [
+        ('icontains search', per_scan(icontains_scan, codes[:20])),
+        ('unique index, no cache', per_scan(uncached, codes)),
+        ('unique index + LRU, session', per_scan(barcodes.lookup_barcode, codes)),
+        ('LRU hits only', per_scan(barcodes.lookup_barcode, codes)),
+    ]
+    for label, seconds in rows:
+        print(f"{label:<32} {seconds * 1000:>10.3f} ms per scan")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark FEFO batch allocation with thousands of batches per product:
+loading a product's batches and walking them in Python vs the running
+total query over the (product, is_active, expiry_date) index.
+
+Usage: python -m benchmarks.batches --products 100 --batches 5000
+"""
+import argparse
+import random
+from datetime import timedelta
+
+from benchmarks.common import measure, report, setup_django
+
+
+def seed_batches(products, batches, batch_size=10000):
+    from django.utils import timezone
+    from apps.inventory.models import ProductExpiry
+    from apps.products.models import Category, Product
+
+    category = Category.objects.create(name='Beverages')
+    Product.objects.bulk_create([
+        Product(product_id=f"PRD-{i:07d}", name=f"Product {i}", category=category, price=20)
+        for i in range(products)
+    ])
+    rng = random.Random(7)
+    today = timezone.localdate()
+    rows = [
+        ProductExpiry(
+            product_id=product_id,
+            batch_number=f"B-{product_id}-{i}",
+            quantity=rng.randint(1, 48),
+            expiry_date=today + timedelta(days=rng.randint(-60, 720)),
+            is_active=rng.random() < 0.9,
+        )
+        for product_id in Product.objects.values_list('pk', flat=True)
+        for i in range(batches)
+    ]
+    ProductExpiry.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def python_walk(txn):
+    """Load every sellable batch of the product and walk them in order"""
+    from django.utils import timezone
+    from apps.inventory.models import ProductExpiry
+
+    remaining = txn.quantity
+    taken = []
+    batches = ProductExpiry.objects.filter(
+        product_id=txn.product_id, is_active=True, quantity__gt=0, expiry_date__gte=timezone.localdate()
+    ).order_by('expiry_date', 'pk')
+    for batch in batches:
+        if not remaining:
+            break
+        quantity = min(remaining, batch.quantity)
+        taken.append((batch.pk, quantity))
+        remaining -= quantity
+    return taken
+
+
+def rolled_back(fn):
+    from django.db import transaction
+
+    def run():
+        with transaction.atomic():
+            result = fn()
+            transaction.set_rollback(True)
+        return result
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100)
+    parser.add_argument('--batches', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    seed_batches(args.products, args.batches)
+
+    from apps.inventory.batches import allocate_batches
+    from apps.inventory.models import InventoryTransaction
+    from apps.products.models import Product
+
+    product_ids = list(Product.objects.values_list('pk', flat=True))
+    one = [InventoryTransaction(product_id=product_ids[0], quantity=120, transaction_type='out')]
+    many = [InventoryTransaction(product_id=pk, quantity=120, transaction_type='out') for pk in product_ids[:50]]
+    InventoryTransaction.objects.bulk_create(one + many)
+
+    report('python walk, 1 product', *measure(lambda: python_walk(one[0]))[:2])
+    report('python walk, 50 products', *measure(lambda: [python_walk(txn) for txn in many])[:2])
+    report('allocate, 1 product', *measure(rolled_back(lambda: allocate_batches(one)))[:2])
+    report('allocate, 50 products', *measure(rolled_back(lambda: allocate_batches(many)))[:2])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throwaway SQLite database in a temporary
+directory so they never touch ``db.sqlite3``. Run them from the backend
+directory, e.g. ``python -m benchmarks.sales_series --orders 1000000``.
+"""
+import os
+import random
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+import django
+
+
+def setup_django(db_path=None):
+    """Configure Django against a fresh benchmark database and migrate it"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'k_to_drinks.settings')
+    from django.conf import settings
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix='k_to_drinks_bench_'), 'bench.sqlite3')
+    settings.DATABASES['default']['NAME'] = db_path
+    settings.DEBUG = False
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', run_syncdb=True, verbosity=0)
+    return db_path
+
+
+def measure(fn, repeat=5):
+    """Run ``fn`` ``repeat`` times and return (query count, best seconds, result)"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    best = None
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            result = fn()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return len(ctx.captured_queries), best, result
+
+
+def report(label, queries, seconds):
+    print(f"{label:<40} {queries:>8} queries {seconds * 1000:>12.2f} ms")
+
+
+@contextmanager
+def backdated(model):
+    """Allow explicit ``created_at`` values while bulk inserting ``model`` rows"""
+    field = model._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def seed_stores(count, spread=0.2):
+    """Bulk insert ``count`` stores spread over ``spread`` degrees around Manila"""
+    from apps.base.geo import geohash_encode
+    from apps.stores.models import Store
+
+    days = [choice[0] for choice in Store._meta.get_field('day').choices]
+    rng = random.Random(1)
+    stores = []
+    for i in range(count):
+        lat = 14.5 + rng.random() * spread
+        lng = 120.9 + rng.random() * spread
+        stores.append(Store(
+            name=f"Store {i}",
+            location=f"Location {i}",
+            lat=lat,
+            lng=lng,
+            geohash=geohash_encode(lat, lng),
+            owner_name=f"Owner {i}",
+            number='09000000000',
+            day=days[i % len(days)],
+        ))
+    Store.objects.bulk_create(stores, batch_size=1000)
+    return list(Store.objects.values_list('id', flat=True))
+
+
+def seed_orders(count, days=365, stores=100, batch_size=10000):
+    """Bulk insert ``count`` orders spread uniformly over the last ``days`` days"""
+    from django.utils import timezone
+    from apps.orders.models import Order
+
+    store_ids = seed_stores(stores)
+    rng = random.Random(2)
+    now = timezone.now()
+    span = days * 24 * 3600
+    statuses = [choice[0] for choice in Order.STATUS_CHOICES]
+
+    with backdated(Order):
+        for offset in range(0, count, batch_size):
+            batch = []
+            for i in range(offset, min(offset + batch_size, count)):
+                subtotal = Decimal(rng.randint(100, 100000)) / 100
+                tax = (subtotal * Decimal('0.02')).quantize(Decimal('0.01'))
+                batch.append(Order(
+                    order_id=f"BENCH-{i:08d}",
+                    store_id=rng.choice(store_ids),
+                    status=rng.choice(statuses),
+                    delivery_day='Monday',
+                    subtotal=subtotal,
+                    tax=tax,
+                    total=subtotal + tax,
+                    created_at=now - timedelta(seconds=rng.randrange(span)),
+                    updated_at=now,
+                ))
+            Order.objects.bulk_create(batch)
+    return store_ids
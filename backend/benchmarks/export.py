@@ -0,0 +1,74 @@
+"""
+Benchmark order exports: serializing the whole list vs streaming rows.
+
+Usage: python -m benchmarks.export --orders 100000
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import seed_orders, setup_django
+
+
+def list_export():
+    """The previous path: the client pulls the full JSON list"""
+    from django.db.models import Prefetch
+    from rest_framework.renderers import JSONRenderer
+    from apps.orders.models import Order, OrderItem
+    from apps.orders.serializers import OrderSerializer
+
+    queryset = Order.objects.select_related('store', 'user').prefetch_related(
+        Prefetch('items', queryset=OrderItem.objects.select_related('product__category'))
+    )
+    data = OrderSerializer(queryset, many=True).data
+    return JSONRenderer().render(data)
+
+
+def streamed_export(export_format):
+    from apps.base.exports import stream_csv, stream_ndjson
+    from apps.orders.models import Order
+    from apps.orders.views import OrderViewSet
+
+    headers = [column for column, _ in OrderViewSet.export_fields]
+    lookups = [lookup for _, lookup in OrderViewSet.export_fields]
+    rows = Order.objects.values_list(*lookups).iterator(chunk_size=2000)
+    stream = stream_csv if export_format == 'csv' else stream_ndjson
+
+    first_row = None
+    size = 0
+    started = time.perf_counter()
+    for i, chunk in enumerate(stream(headers, rows)):
+        # The CSV stream starts with its header line
+        if first_row is None and (export_format == 'ndjson' or i == 1):
+            first_row = time.perf_counter() - started
+        size += len(chunk)
+    return first_row, size
+
+
+def run(label, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<24} {elapsed:>8.2f} s  peak {peak / 2 ** 20:>8.1f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=100000)
+    args = parser.parse_args()
+
+    setup_django()
+    seed_orders(args.orders)
+
+    run('full JSON list', list_export)
+    for export_format in ('csv', 'ndjson'):
+        first_row, _ = run(f'streamed {export_format}', lambda: streamed_export(export_format))
+        print(f"{'':<24} first row after {first_row * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark demand forecasting over the whole catalogue: a query and a
+pure-Python smoothing loop per product vs the streamed grouped query and
+the vectorised NumPy forecast.
+
+Usage: python -m benchmarks.forecast --products 5000 --stores 1000 --items 40
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from benchmarks.common import backdated, seed_stores, setup_django
+
+
+def seed_weekly_orders(products, stores, items, weeks, batch_size=10000):
+    """
+    Every store has an assortment of ``items`` products and orders most of
+    them once a week, a few days before its delivery day.
+    """
+    from django.utils import timezone
+    from apps.orders.models import Order, OrderItem
+    from apps.products.models import Category, Product
+    from apps.stores.models import Store
+
+    category = Category.objects.create(name='Beverages')
+    Product.objects.bulk_create([
+        Product(product_id=f"PRD-{i:07d}", name=f"Product {i}", category=category, price=20)
+        for i in range(products)
+    ], batch_size=batch_size)
+    product_ids = list(Product.objects.values_list('pk', flat=True))
+    seed_stores(stores)
+    weekdays = {day: index for index, (day, _) in enumerate(Store._meta.get_field('day').choices)}
+
+    rng = random.Random(8)
+    today = timezone.localdate()
+    orders = []
+    for store_id, day in Store.objects.values_list('pk', 'day'):
+        # The store's delivery dates in the history, and the week after it
+        first = today - timedelta(weeks=weeks) + timedelta(days=(weekdays[day] - today.weekday()) % 7)
+        for week in range(weeks + 1):
+            placed = first + timedelta(weeks=week, days=-rng.randint(0, 3))
+            created = timezone.make_aware(datetime(placed.year, placed.month, placed.day, rng.randint(8, 17)))
+            orders.append(Order(
+                order_id=f"BENCH-{len(orders):08d}", store_id=store_id, status='completed',
+                delivery_day=day, created_at=created, updated_at=created
+            ))
+    with backdated(Order):
+        Order.objects.bulk_create(orders, batch_size=batch_size)
+
+    assortments = {}
+    order_items = []
+    for order_id, store_id in Order.objects.values_list('pk', 'store_id'):
+        if store_id not in assortments:
+            assortments[store_id] = rng.sample(product_ids, items)
+        for product_id in assortments[store_id]:
+            if rng.random() < 0.1:
+                continue
+            quantity = rng.randint(1, 24)
+            order_items.append(OrderItem(
+                order_id=order_id, product_id=product_id, quantity=quantity,
+                unit_price=Decimal('20.00'), total=Decimal('20.00') * quantity
+            ))
+        if len(order_items) >= batch_size:
+            OrderItem.objects.bulk_create(order_items)
+            order_items = []
+    OrderItem.objects.bulk_create(order_items)
+    return product_ids
+
+
+def per_product(product_ids, weeks, alpha=0.3):
+    """A grouped query per product and a plain Python smoothing loop over its days"""
+    from django.db.models import Sum
+    from django.db.models.functions import TruncDate
+    from django.utils import timezone
+    from apps.base.dates import day_bounds
+    from apps.orders.models import OrderItem
+
+    today = timezone.localdate()
+    start = today - timedelta(weeks=weeks)
+    placed_from, _ = day_bounds(start)
+    placed_to, _ = day_bounds(today)
+    levels = {}
+    for product_id in product_ids:
+        by_day = dict(
+            OrderItem.objects
+            .filter(product_id=product_id, order__created_at__gte=placed_from, order__created_at__lt=placed_to)
+            .exclude(order__status='cancelled')
+            .annotate(day=TruncDate('order__created_at'))
+            .order_by()
+            .values_list('day')
+            .annotate(quantity=Sum('quantity'))
+        )
+        daily = [by_day.get(start + timedelta(days=offset), 0) for offset in range(weeks * 7)]
+        level = sum(daily[:7]) / 7
+        for quantity in daily[7:]:
+            level = alpha * quantity + (1 - alpha) * level
+        levels[product_id] = level
+    return levels
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {time.perf_counter() - started:>10.2f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--stores', type=int, default=1000)
+    parser.add_argument('--items', type=int, default=40, help="Products in each store's assortment")
+    parser.add_argument('--weeks', type=int, default=12)
+    args = parser.parse_args()
+
+    setup_django()
+    product_ids = seed_weekly_orders(args.products, args.stores, args.items, args.weeks)
+
+    from apps.inventory.forecasting import forecast_demand
+    from apps.orders.models import OrderItem
+
+    print(f"{OrderItem.objects.count()} order items")
+    sample = 200
+    seconds = time.perf_counter()
+    timed(f'query per product, first {sample}', lambda: per_product(product_ids[:sample], args.weeks))
+    seconds = time.perf_counter() - seconds
+    print(f"{'  extrapolated to the catalogue':<40} {seconds * len(product_ids) / sample:>10.2f} s")
+    run = timed('streamed + vectorised, whole catalogue', lambda: forecast_demand(weeks=args.weeks))
+    print(f"{run.products} products, {run.store_series} product-store series")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark low-stock lookups: comparing quantity with the reorder level on
+every row vs the stored flag and its partial index, and the cost the flag
+adds to a stock movement.
+
+Usage: python -m benchmarks.low_stock --products 100000
+"""
+import argparse
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+
+def seed_inventory(count, low_share, batch_size=5000):
+    from apps.inventory.models import Inventory
+    from apps.products.models import Category, Product
+
+    category = Category.objects.create(name='Beverages')
+    rng = random.Random(6)
+    for offset in range(0, count, batch_size):
+        Product.objects.bulk_create([
+            Product(product_id=f"PRD-{i:07d}", name=f"Product {i}", category=category, price=20)
+            for i in range(offset, min(offset + batch_size, count))
+        ])
+    inventory = []
+    for pk in Product.objects.values_list('pk', flat=True):
+        quantity = rng.randint(0, 10) if rng.random() < low_share else rng.randint(11, 500)
+        inventory.append(Inventory(product_id=pk, quantity=quantity, reorder_level=10, is_low_stock=quantity <= 10))
+    Inventory.objects.bulk_create(inventory, batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--low-share', type=float, default=0.02)
+    args = parser.parse_args()
+
+    setup_django()
+    seed_inventory(args.products, args.low_share)
+
+    from django.db.models import F
+    from apps.inventory.alerts import refresh_low_stock
+    from apps.inventory.models import Inventory, InventoryTransaction
+    from apps.products.models import Product
+
+    computed = Inventory.objects.filter(quantity__lte=F('reorder_level'))
+    flagged = Inventory.objects.filter(is_low_stock=True)
+    report('computed, count', *measure(computed.count)[:2])
+    report('flag + partial index, count', *measure(flagged.count)[:2])
+    report('computed, list by quantity', *measure(lambda: list(computed.order_by('quantity', 'product_id')))[:2])
+    report('flag + partial index, list', *measure(lambda: list(flagged.order_by('quantity', 'product_id')))[:2])
+
+    pk = Product.objects.values_list('pk', flat=True).first()
+    report('flag check after a stock move', *measure(lambda: refresh_low_stock([pk]), repeat=50)[:2])
+    report('stock move', *measure(
+        lambda: InventoryTransaction.objects.create(product_id=pk, quantity=1, transaction_type='in'), repeat=50
+    )[:2])
+
+
+if __name__ == '__main__':
+    main()
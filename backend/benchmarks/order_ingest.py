@@ -0,0 +1,70 @@
+"""
+Benchmark order creation: per-item saves vs the batch ingest path.
+
+Usage: python -m benchmarks.order_ingest --items 50
+"""
+import argparse
+from decimal import Decimal
+
+from benchmarks.common import measure, report, seed_stores, setup_django
+
+
+def seed_products(count):
+    from apps.products.models import Category, Product
+
+    category = Category.objects.create(name='Benchmark')
+    Product.objects.bulk_create([
+        Product(
+            product_id=f"BENCH-P{i:05d}",
+            name=f"Product {i}",
+            category=category,
+            price=Decimal('25.00'),
+            stock_quantity=1000000,
+        )
+        for i in range(count)
+    ])
+    return list(Product.objects.filter(category=category))
+
+
+def legacy_order(store, products):
+    """The previous path: every item saved on its own, recalculating totals each time"""
+    from django.db import transaction
+    from apps.orders.models import Order, OrderItem
+
+    with transaction.atomic():
+        order = Order.objects.create(store=store, delivery_day=store.day)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=product.price)
+    return order
+
+
+def batch_order(store, products):
+    from apps.orders.ingest import ingest_order
+
+    return ingest_order(store, [{'product': product, 'quantity': 2} for product in products])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_django()
+    from apps.stores.models import Store
+
+    store = Store.objects.get(pk=seed_stores(1)[0])
+    products = seed_products(args.items)
+    # Warm the inventory rows so both paths update existing counters
+    batch_order(store, products)
+
+    for label, fn in [
+        (f'per-item saves ({args.items} items)', lambda: legacy_order(store, products)),
+        (f'batch ingest ({args.items} items)', lambda: batch_order(store, products)),
+    ]:
+        queries, seconds, _ = measure(fn, repeat=args.repeat)
+        report(label, queries, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Benchmark deep list pages: OFFSET pagination vs keyset cursors.
+
+Usage: python -m benchmarks.pagination --orders 200000
+"""
+import argparse
+import time
+
+from benchmarks.common import measure, report, seed_orders, setup_django
+
+
+def offset_page(offset, page_size):
+    from apps.orders.models import Order
+
+    return list(Order.objects.order_by('-created_at', '-pk')[offset:offset + page_size])
+
+
+def keyset_page(position, page_size):
+    from django.db.models import Q
+    from apps.orders.models import Order
+
+    created_at, pk = position
+    return list(
+        Order.objects
+        .filter(Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)))
+        .order_by('-created_at', '-pk')[:page_size]
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    setup_django()
+    started = time.perf_counter()
+    seed_orders(args.orders)
+    print(f"Seeded {args.orders} orders in {time.perf_counter() - started:.1f}s\n")
+
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE INDEX bench_order_created ON orders_order (created_at, id)')
+
+    from apps.orders.models import Order
+
+    for fraction in (0, 0.5, 0.99):
+        offset = int(args.orders * fraction)
+        anchor = Order.objects.order_by('-created_at', '-pk').values_list('created_at', 'pk')[max(offset - 1, 0)]
+        queries, seconds, _ = measure(lambda: offset_page(offset, args.page_size), repeat=args.repeat)
+        report(f'offset page at row {offset}', queries, seconds)
+        queries, seconds, _ = measure(lambda: keyset_page(anchor, args.page_size), repeat=args.repeat)
+        report(f'keyset page at row {offset}', queries, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Benchmark receipt rendering: cold renders, cache hits and batches, which
+the request only queues and a job worker renders.
+
+Usage: python -m benchmarks.receipts --orders 200
+"""
+import argparse
+import tempfile
+from decimal import Decimal
+
+from benchmarks.common import measure, report, seed_stores, setup_django
+
+
+def seed_receipt_orders(count, items_per_order=10):
+    from apps.orders.ingest import ingest_order
+    from apps.products.models import Category, Product
+    from apps.stores.models import Store
+
+    store = Store.objects.get(pk=seed_stores(1)[0])
+    category = Category.objects.create(name='Benchmark')
+    products = [
+        Product.objects.create(
+            product_id=f"BENCH-P{i:03d}",
+            name=f"Product {i}",
+            category=category,
+            price=Decimal('25.00'),
+            size='1L',
+            stock_quantity=1000000,
+        )
+        for i in range(items_per_order)
+    ]
+    items = [{'product': product, 'quantity': 2} for product in products]
+    return [ingest_order(store, items).pk for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    settings.RECEIPT_CACHE_DIR = tempfile.mkdtemp(prefix='k_to_drinks_receipts_')
+    settings.JOB_RESULT_DIR = tempfile.mkdtemp(prefix='k_to_drinks_jobs_')
+
+    from apps.jobs.queue import claim_job, run_job
+    from apps.orders import pdf, receipts
+
+    order_ids = seed_receipt_orders(args.orders)
+    orders = list(receipts.receipt_queryset().filter(pk__in=order_ids))
+
+    queries, seconds, _ = measure(lambda: pdf.render_receipt(receipts.receipt_data(orders[0])))
+    report('single receipt, cold render', queries, seconds)
+    receipts.get_receipt_pdf(orders[0])
+    queries, seconds, _ = measure(lambda: receipts.get_receipt_pdf(orders[0]))
+    report('single receipt, cache hit', queries, seconds)
+
+    for export_format in ('pdf', 'zip'):
+        for path in receipts.glob.glob(f"{settings.RECEIPT_CACHE_DIR}/order-*.pdf"):
+            receipts.os.remove(path)
+        queries, seconds, _ = measure(lambda: receipts.start_batch(order_ids, export_format), repeat=1)
+        report(f"{args.orders} receipts {export_format}, request", queries, seconds)
+        queries, seconds, _ = measure(lambda: run_job(claim_job('benchmark')), repeat=1)
+        report(f"{args.orders} receipts {export_format}, job", queries, seconds)
+
+
+if __name__ == '__main__':
+    main()
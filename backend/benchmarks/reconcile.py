@@ -0,0 +1,77 @@
+"""
+Benchmark stock reconciliation: one ledger query per product vs the
+streamed grouped sums, from the whole ledger and from the snapshots.
+
+Usage: python -m benchmarks.reconcile --products 100000 --transactions 2000000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.common import setup_django
+from benchmarks.stock_snapshots import seed_ledger
+
+
+def per_product(sample):
+    """A query per product, the straightforward loop over the catalogue"""
+    from apps.inventory.models import InventoryTransaction
+    from apps.inventory.stock import sum_stock_deltas
+    from apps.products.models import Product
+
+    drifted = []
+    for pk, stock_quantity in Product.objects.order_by('pk').values_list('pk', 'stock_quantity')[:sample]:
+        balance = InventoryTransaction.objects.filter(product_id=pk).aggregate(delta=sum_stock_deltas())['delta'] or 0
+        if balance != stock_quantity:
+            drifted.append(pk)
+    return drifted
+
+
+def fix_in_batches(product_ids, from_snapshots=False, batch_size=1000):
+    from apps.inventory.reconcile import fix_drift
+
+    for offset in range(0, len(product_ids), batch_size):
+        fix_drift(product_ids[offset:offset + batch_size], from_snapshots=from_snapshots)
+
+
+def timed(label, fn):
+    started = time.perf_counter()
+    result = fn()
+    print(f"{label:<40} {time.perf_counter() - started:>10.2f} s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=100000)
+    parser.add_argument('--transactions', type=int, default=2000000)
+    parser.add_argument('--drift', type=float, default=0.1, help='Share of products whose counters are corrupted')
+    args = parser.parse_args()
+
+    setup_django()
+    product_ids = seed_ledger(args.products, args.transactions, days=365)
+
+    from django.db.models import F
+    from apps.inventory.reconcile import find_drift
+    from apps.inventory.snapshots import take_snapshots
+    from apps.products.models import Product
+
+    # bulk_create skips the counters, so every product with transactions drifts;
+    # repair them, then corrupt a share again
+    fix_in_batches([drift.product_id for drift in find_drift()])
+    rng = random.Random(5)
+    corrupted = rng.sample(product_ids, int(len(product_ids) * args.drift))
+    Product.objects.filter(pk__in=corrupted).update(stock_quantity=F('stock_quantity') + 1)
+    take_snapshots()
+
+    sample = 2000
+    timed(f'query per product, first {sample}', lambda: per_product(sample))
+    found = timed('streamed, whole ledger', lambda: [drift.product_id for drift in find_drift()])
+    assert sorted(found) == sorted(corrupted)
+    found = timed('streamed, from snapshots', lambda: [drift.product_id for drift in find_drift(from_snapshots=True)])
+    assert sorted(found) == sorted(corrupted)
+    timed(f'fix {len(found)} products', lambda: fix_in_batches(found, from_snapshots=True))
+    assert not list(find_drift())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark delivery route planning: the previous unordered stop list vs
+optimised routes, for one driver with many stops.
+
+Usage: python -m benchmarks.routes --stops 200 500
+"""
+import argparse
+from datetime import date, time
+
+from benchmarks.common import measure, report, seed_stores, setup_django
+
+DELIVERY_DATE = date(2025, 4, 7)
+
+
+def seed_deliveries(count):
+    from django.contrib.auth import get_user_model
+    from apps.deliveries.models import Delivery
+    from apps.orders.models import Order
+
+    Delivery.objects.all().delete()
+    Order.objects.all().delete()
+    driver, _ = get_user_model().objects.get_or_create(username='bench-driver', defaults={'role': 'delivery_driver'})
+    store_ids = seed_stores(count)[-count:]
+    orders = Order.objects.bulk_create([
+        Order(order_id=f"ROUTE-{i:06d}", store_id=store_id, delivery_day='Monday')
+        for i, store_id in enumerate(store_ids)
+    ])
+    Delivery.objects.bulk_create([
+        Delivery(
+            id=f"DEL-{i:06d}",
+            order=order,
+            employee=driver,
+            delivery_date=DELIVERY_DATE,
+            delivery_time=time(8, 0)
+        )
+        for i, order in enumerate(orders)
+    ])
+    return driver
+
+
+def unordered_stops():
+    """The previous routes action: stops in database order, two queries each"""
+    from apps.deliveries.models import Delivery
+    from apps.deliveries.routing import haversine_matrix
+
+    stops = []
+    for delivery in Delivery.objects.filter(delivery_date=DELIVERY_DATE):
+        store = delivery.order.store
+        stops.append((store.lat, store.lng))
+    legs = haversine_matrix(stops)
+    return sum(legs[i, i + 1] for i in range(len(stops) - 1))
+
+
+def optimised_routes():
+    from apps.deliveries.models import Delivery
+    from apps.deliveries.planning import plan_delivery_routes
+
+    deliveries = Delivery.objects.filter(delivery_date=DELIVERY_DATE).select_related('order__store', 'employee')
+    route, = plan_delivery_routes(deliveries)
+    return route['total_distance_km']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stops', type=int, nargs='+', default=[200, 500])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    for count in args.stops:
+        seed_deliveries(count)
+        print(f"{count} stops")
+        queries, seconds, distance = measure(unordered_stops, args.repeat)
+        report(f"  database order ({distance:.1f} km)", queries, seconds)
+        queries, seconds, distance = measure(optimised_routes, args.repeat)
+        report(f"  optimised ({distance:.1f} km)", queries, seconds)
+
+
+if __name__ == '__main__':
+    main()
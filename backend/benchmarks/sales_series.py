@@ -0,0 +1,89 @@
+"""
+Benchmark the dashboard sales series: per-bucket queries vs one grouped query.
+
+Usage: python -m benchmarks.sales_series --orders 1000000
+"""
+import argparse
+import time
+from datetime import timedelta
+
+from benchmarks.common import measure, report, seed_orders, setup_django
+
+
+def legacy_daily(days):
+    """The previous SalesDataView implementation: one aggregate per day"""
+    from django.db.models import Sum
+    from django.utils import timezone
+    from apps.orders.models import Order
+
+    start_date = timezone.now() - timedelta(days=days)
+    data = []
+    for i in range(days):
+        date = start_date + timedelta(days=i)
+        sales = Order.objects.filter(created_at__date=date.date()).aggregate(total=Sum('total'))['total'] or 0
+        data.append({'date': date.date().strftime('%Y-%m-%d'), 'sales': sales})
+    return data
+
+
+def legacy_yearly():
+    """The previous SalesDataView implementation: one aggregate per month"""
+    from django.db.models import Sum
+    from django.utils import timezone
+    from apps.orders.models import Order
+
+    now = timezone.now()
+    data = []
+    for i in range(12):
+        month = now.month - i
+        year = now.year
+        if month <= 0:
+            month += 12
+            year -= 1
+        start_date = timezone.datetime(year, month, 1)
+        if month == 12:
+            end_date = timezone.datetime(year + 1, 1, 1) - timedelta(days=1)
+        else:
+            end_date = timezone.datetime(year, month + 1, 1) - timedelta(days=1)
+        sales = Order.objects.filter(
+            created_at__date__gte=start_date.date(),
+            created_at__date__lte=end_date.date()
+        ).aggregate(total=Sum('total'))['total'] or 0
+        data.append({'month': start_date.strftime('%Y-%m'), 'sales': sales})
+    return data
+
+
+def bucketed(days, granularity):
+    from django.utils import timezone
+    from apps.dashboard.timeseries import bucket_start, next_bucket, sales_series
+
+    end = next_bucket(bucket_start(timezone.now(), 'day'), 'day')
+    return sales_series(end - timedelta(days=days), end, granularity)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--orders', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    setup_django()
+    started = time.perf_counter()
+    seed_orders(args.orders)
+    print(f"Seeded {args.orders} orders in {time.perf_counter() - started:.1f}s\n")
+
+    cases = [
+        ('legacy week (7 x aggregate)', lambda: legacy_daily(7)),
+        ('bucketed week (day)', lambda: bucketed(7, 'day')),
+        ('legacy month (30 x aggregate)', lambda: legacy_daily(30)),
+        ('bucketed month (day)', lambda: bucketed(30, 'day')),
+        ('legacy year (12 x aggregate)', legacy_yearly),
+        ('bucketed year (month)', lambda: bucketed(365, 'month')),
+        ('bucketed month (hour)', lambda: bucketed(30, 'hour')),
+    ]
+    for label, fn in cases:
+        queries, seconds, _ = measure(fn, repeat=args.repeat)
+        report(label, queries, seconds)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Benchmark generating a day's scheduled deliveries: one order and delivery
+at a time through the ORM (as the API does) vs ``schedule_day``.
+
+Usage: python -m benchmarks.schedule --stores 35000
+"""
+import argparse
+from datetime import date, time as time_of_day
+
+from benchmarks.common import measure, report, seed_stores, setup_django
+
+MONDAY = date(2025, 4, 7)
+
+
+def per_row(store_ids, delivery_date):
+    """One ``create`` per order and delivery, with all their signals"""
+    from django.db import transaction
+    from apps.deliveries.models import Delivery
+    from apps.orders.models import Order
+
+    with transaction.atomic():
+        for store_id in store_ids:
+            order = Order.objects.create(
+                order_id=f"ROW-{delivery_date:%Y%m%d}-{store_id}", store_id=store_id, delivery_day='Monday'
+            )
+            Delivery.objects.create(order=order, delivery_date=delivery_date, delivery_time=time_of_day(8, 0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stores', type=int, default=35000, help='stores in total, a seventh are due each day')
+    parser.add_argument('--sample', type=int, default=500, help='stores to schedule one at a time')
+    args = parser.parse_args()
+
+    setup_django()
+    seed_stores(args.stores)
+
+    from apps.deliveries.scheduling import due_stores, schedule_day
+
+    due = due_stores(MONDAY)
+    print(f"{len(due)} stores due on {MONDAY:%A %Y-%m-%d}\n")
+
+    queries, seconds, _ = measure(lambda: per_row(due[:args.sample], date(2025, 3, 31)), repeat=1)
+    per_store = seconds / args.sample
+    report(f"per row, {args.sample} stores", queries, seconds)
+    print(f"{'  extrapolated to every due store':<40} {'':>16} {per_store * len(due) * 1000:>12.2f} ms")
+
+    queries, seconds, result = measure(lambda: schedule_day(MONDAY), repeat=1)
+    report(f"schedule_day, {result['deliveries']} stores", queries, seconds)
+    queries, seconds, result = measure(lambda: schedule_day(MONDAY), repeat=3)
+    report(f"schedule_day again ({result['deliveries']} new)", queries, seconds)
+
+
+if __name__ == '__main__':
+    main()
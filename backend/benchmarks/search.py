@@ -0,0 +1,107 @@
+"""
+Benchmark product and store search: the previous icontains OR-chains vs
+the full-text search index.
+
+Usage: python -m benchmarks.search --products 1000000 --stores 100000
+"""
+import argparse
+import random
+import time
+from functools import reduce
+from operator import or_
+
+from benchmarks.common import seed_stores, setup_django
+
+BRANDS = ['Coca-Cola', 'Pepsi', 'Royal', 'Sprite', 'Mountain Dew', 'Zesto', 'C2', 'Minute Maid', 'Kopiko', 'Nestle']
+FLAVOURS = ['Original', 'Zero', 'Lemon', 'Orange', 'Apple', 'Mango', 'Grape', 'Pineapple', 'Lychee', 'Calamansi',
+            'Strawberry', 'Melon', 'Guava', 'Iced Tea', 'Cappuccino', 'Chocolate', 'Vanilla', 'Green Tea']
+PACKS = ['Can', 'Bottle', 'Pouch', 'Tetra', 'Sakto', 'Litro', 'Case', 'Twin Pack']
+SIZES = ['190ml', '237ml', '250ml', '290ml', '330ml', '500ml', '1L', '1.5L', '2L']
+
+QUERIES = [
+    ('word', 'calamansi'),
+    ('prefix while typing', 'calam'),
+    ('two words', 'mango pouch'),
+    ('product code', 'PRD-0004242'),
+    ('barcode prefix', '48012345'),
+    ('typo', 'calamnsi bottel'),
+]
+
+
+def seed_products(count, batch_size=5000):
+    from apps.products.models import Category, Product
+
+    category = Category.objects.create(name='Beverages')
+    rng = random.Random(4)
+    for offset in range(0, count, batch_size):
+        Product.objects.bulk_create([
+            Product(
+                product_id=f"PRD-{i:07d}",
+                name=f"{rng.choice(BRANDS)} {rng.choice(FLAVOURS)} {rng.choice(PACKS)} {i % 997}",
+                brand=rng.choice(BRANDS),
+                barcode=f"480{rng.randrange(10 ** 10):010d}",
+                size=rng.choice(SIZES),
+                category=category,
+                price=20,
+            )
+            for i in range(offset, min(offset + batch_size, count))
+        ])
+
+
+def icontains(queryset, fields, query, limit=50):
+    """The previous search: every word in one of the fields, as SearchFilter does"""
+    from django.db.models import Q
+
+    for word in query.split():
+        queryset = queryset.filter(reduce(or_, (Q(**{f"{field}__icontains": word}) for field in fields)))
+    return list(queryset.values_list('pk', flat=True)[:limit])
+
+
+def timed(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=1000000)
+    parser.add_argument('--stores', type=int, default=100000)
+    args = parser.parse_args()
+
+    setup_django()
+    started = time.perf_counter()
+    seed_products(args.products)
+    seed_stores(args.stores)
+    print(f"Seeded {args.products} products and {args.stores} stores in {time.perf_counter() - started:.0f} s")
+
+    from apps.products.models import Product
+    from apps.products.search import product_index
+    from apps.stores.models import Store
+    from apps.stores.search import store_index
+
+    for index in (product_index, store_index):
+        started = time.perf_counter()
+        count = index.rebuild()
+        print(f"Indexed {count} {index.name} in {time.perf_counter() - started:.1f} s")
+    print()
+
+    product_fields = ['name', 'brand', 'product_id', 'barcode']
+    for label, query in QUERIES:
+        before, _ = timed(lambda: icontains(Product.objects.all(), product_fields, query), repeat=1)
+        after, found = timed(lambda: product_index.search(query, limit=50))
+        print(f"{'products, ' + label:<34} icontains {before * 1000:>9.1f} ms   index {after * 1000:>7.2f} ms  ({len(found)} hits)")
+
+    store_fields = ['name', 'location', 'owner_name']
+    for label, query in (('store name', 'store 4242'), ('owner prefix', 'owner 999'), ('typo', 'stroe 4242')):
+        before, _ = timed(lambda: icontains(Store.objects.all(), store_fields, query), repeat=1)
+        after, found = timed(lambda: store_index.search(query, limit=50))
+        print(f"{'stores, ' + label:<34} icontains {before * 1000:>9.1f} ms   index {after * 1000:>7.2f} ms  ({len(found)} hits)")
+
+
+if __name__ == '__main__':
+    main()
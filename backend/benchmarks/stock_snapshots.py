@@ -0,0 +1,107 @@
+"""
+Benchmark point-in-time stock: summing the whole ledger vs one daily
+snapshot plus the transactions recorded after it.
+
+Usage: python -m benchmarks.stock_snapshots --products 2000 --transactions 1000000
+"""
+import argparse
+import random
+import time
+from datetime import timedelta
+
+from benchmarks.common import backdated, measure, report, setup_django
+
+
+def seed_ledger(products, count, days, batch_size=10000):
+    """Bulk insert ``count`` transactions over ``products`` products in the last ``days`` days"""
+    from django.utils import timezone
+    from apps.inventory.models import InventoryTransaction
+    from apps.products.models import Category, Product
+
+    category = Category.objects.create(name='Beverages')
+    Product.objects.bulk_create([
+        Product(product_id=f"PRD-{i:07d}", name=f"Product {i}", category=category, price=20)
+        for i in range(products)
+    ], batch_size=batch_size)
+    product_ids = list(Product.objects.values_list('pk', flat=True))
+
+    rng = random.Random(4)
+    now = timezone.now()
+    span = days * 24 * 3600
+    with backdated(InventoryTransaction):
+        for offset in range(0, count, batch_size):
+            InventoryTransaction.objects.bulk_create([
+                InventoryTransaction(
+                    product_id=rng.choice(product_ids),
+                    quantity=rng.randint(1, 50),
+                    transaction_type=rng.choice(('in', 'out', 'out', 'adjustment')),
+                    created_at=now - timedelta(seconds=rng.randrange(span)),
+                    updated_at=now,
+                )
+                for _ in range(offset, min(offset + batch_size, count))
+            ])
+    return product_ids
+
+
+def ledger_stock_at(product_id, at):
+    """The only option before: sum every transaction of the product up to ``at``"""
+    from apps.inventory.models import InventoryTransaction
+    from apps.inventory.stock import sum_stock_deltas
+
+    return InventoryTransaction.objects.filter(product_id=product_id, created_at__lt=at).aggregate(
+        delta=sum_stock_deltas()
+    )['delta'] or 0
+
+
+def ledger_stock_on(day):
+    from apps.base.dates import day_bounds
+    from apps.inventory.models import InventoryTransaction
+    from apps.inventory.stock import sum_stock_deltas
+
+    return dict(
+        InventoryTransaction.objects.filter(created_at__lt=day_bounds(day)[1])
+        .order_by().values('product_id').annotate(delta=sum_stock_deltas())
+        .values_list('product_id', 'delta')
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--transactions', type=int, default=1000000)
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    setup_django()
+    product_ids = seed_ledger(args.products, args.transactions, args.days)
+
+    from django.utils import timezone
+    from apps.inventory.snapshots import stock_at, stock_on, take_snapshots, verify_snapshots
+
+    today = timezone.localdate()
+    at = timezone.now() - timedelta(days=30, hours=5)
+    day = today - timedelta(days=30)
+    product_id = product_ids[len(product_ids) // 2]
+
+    report('ledger sum, one product at T', *measure(lambda: ledger_stock_at(product_id, at))[:2])
+    report('ledger sum, every product on D', *measure(lambda: ledger_stock_on(day), repeat=2)[:2])
+
+    started = time.perf_counter()
+    result = take_snapshots()
+    print(f"\nWrote {result['snapshots']} snapshots in {time.perf_counter() - started:.1f} s\n")
+
+    queries, seconds, quantity = measure(lambda: stock_at(product_id, at))
+    assert quantity == ledger_stock_at(product_id, at)
+    report('snapshot, one product at T', queries, seconds)
+    queries, seconds, balances = measure(lambda: stock_on(day), repeat=2)
+    assert {pk: q for pk, q in balances.items() if q} == {pk: q for pk, q in ledger_stock_on(day).items() if q}
+    report('snapshot, every product on D', queries, seconds)
+    report('snapshot, every product today', *measure(lambda: stock_on(today), repeat=2)[:2])
+
+    started = time.perf_counter()
+    issues = verify_snapshots()
+    print(f"\nVerified every snapshot in {time.perf_counter() - started:.1f} s, {len(issues)} problems")
+
+
+if __name__ == '__main__':
+    main()
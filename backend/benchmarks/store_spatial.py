@@ -0,0 +1,81 @@
+"""
+Benchmark store proximity lookups: scanning every store vs the geohash
+column vs the in-memory grid index.
+
+Usage: python -m benchmarks.store_spatial --stores 100000
+"""
+import argparse
+import math
+import random
+import time
+
+from benchmarks.common import seed_stores, setup_django
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def full_scan(lat, lng, radius_km):
+    """The only option before: load every store and compute distances in Python"""
+    from apps.stores.models import Store
+
+    found = []
+    for store_id, store_lat, store_lng in Store.objects.values_list('id', 'lat', 'lng'):
+        dlat = math.radians(store_lat - lat)
+        dlng = math.radians(store_lng - lng)
+        h = math.sin(dlat / 2) ** 2 + math.cos(math.radians(lat)) * math.cos(math.radians(store_lat)) * math.sin(dlng / 2) ** 2
+        distance = 2 * 6371.0088 * math.asin(math.sqrt(h))
+        if distance <= radius_km:
+            found.append((distance, store_id))
+    return sorted(found)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--stores', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    # Roughly Metro Manila and its surroundings
+    seed_stores(args.stores, spread=1.0)
+
+    from apps.stores.models import Store
+    from apps.stores.spatial import StoreGrid
+
+    started = time.perf_counter()
+    grid = StoreGrid.build()
+    print(f"Built index over {len(grid)} stores in {(time.perf_counter() - started) * 1000:.0f} ms\n")
+
+    rng = random.Random(3)
+    points = [(14.5 + rng.random(), 120.9 + rng.random()) for _ in range(args.queries)]
+
+    seconds, found = timed(lambda: full_scan(*points[0], 1), 1)
+    print(f"{'full scan, 1 km':<32} {seconds * 1000:>10.3f} ms  ({len(found)} stores)")
+    seconds, found = timed(lambda: Store.objects.within(*points[0], 1), 5)
+    print(f"{'geohash column, 1 km':<32} {seconds * 1000:>10.3f} ms  ({len(found)} stores)")
+
+    lookups = [
+        ('grid nearby, 1 km', lambda lat, lng: grid.nearby(lat, lng, 1)),
+        ('grid nearby, 5 km, limit 50', lambda lat, lng: grid.nearby(lat, lng, 5, limit=50)),
+        ('grid nearest 20', lambda lat, lng: grid.nearest(lat, lng, 20)),
+        ('geohash bbox 0.02 deg', lambda lat, lng: list(
+            Store.objects.in_bbox(lat, lng, lat + 0.02, lng + 0.02).values_list('id', flat=True)
+        )),
+    ]
+    for label, lookup in lookups:
+        started = time.perf_counter()
+        total = sum(len(lookup(lat, lng)) for lat, lng in points)
+        per_query = (time.perf_counter() - started) / len(points)
+        print(f"{label:<32} {per_query * 1000:>10.3f} ms  ({total / len(points):.0f} stores avg)")
+
+
+if __name__ == '__main__':
+    main()
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
    'apps.orders',
    'apps.deliveries',
    'apps.dashboard',
+   'apps.jobs',
 ]
 
 MIDDLEWARE = [
@@ -81,6 +82,15 @@ DATABASES = {
    'default': {
        'ENGINE': 'django.db.backends.sqlite3',
        'NAME': BASE_DIR / 'db.sqlite3',
+       'OPTIONS': {
+           # Wait for concurrent writers instead of failing with "database is locked"
+           'timeout': 20,
+       },
+       'TEST': {
+           # File-backed so concurrency tests get real, independent connections;
+           # removed after the run and ignored by git
+           'NAME': BASE_DIR / 'test_db.sqlite3',
+       },
    }
 }
 
@@ -130,8 +140,77 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend'
     ],
+   # Opt-in per request with ?cursor= or ?page_size=, see apps/base/pagination.py
+   'DEFAULT_PAGINATION_CLASS': 'apps.base.pagination.KeysetPagination',
 }
 
+# Pagination settings
+# Page size used when a paginated request does not send page_size
+PAGINATION_PAGE_SIZE = int(os.getenv('PAGINATION_PAGE_SIZE', '50'))
+# Upper bound for the page_size a client can ask for
+PAGINATION_MAX_PAGE_SIZE = int(os.getenv('PAGINATION_MAX_PAGE_SIZE', '500'))
+
+# Export settings
+# Rows fetched per database round trip by the streaming export actions
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
+# Receipt settings
+# Rendered receipt PDFs are kept here
+RECEIPT_CACHE_DIR = os.getenv('RECEIPT_CACHE_DIR', os.path.join(BASE_DIR, 'receipt_cache'))
+# Largest number of orders accepted in one receipt batch, rendered as a background job
+RECEIPT_BATCH_MAX_ORDERS = int(os.getenv('RECEIPT_BATCH_MAX_ORDERS', '1000'))
+
+# Store spatial index settings
+# Size in degrees of the grid cells of the in-memory store index (0.01 is about 1.1 km)
+STORE_GRID_CELL_DEG = float(os.getenv('STORE_GRID_CELL_DEG', '0.01'))
+# Seconds before a process rebuilds its store index even without a change signal
+STORE_INDEX_MAX_AGE = int(os.getenv('STORE_INDEX_MAX_AGE', '300'))
+
+# Full-text search settings, see apps/base/search.py
+# Most results a product or store search returns
+SEARCH_MAX_RESULTS = int(os.getenv('SEARCH_MAX_RESULTS', '200'))
+
+# Barcodes whose product payload each process keeps for scanner lookups
+PRODUCT_BARCODE_CACHE_SIZE = int(os.getenv('PRODUCT_BARCODE_CACHE_SIZE', '10000'))
+# Seconds a process serves a cached barcode lookup; bounds staleness when the
+# default cache is process-local and other processes' changes go unseen
+PRODUCT_BARCODE_CACHE_MAX_AGE = int(os.getenv('PRODUCT_BARCODE_CACHE_MAX_AGE', '60'))
+
+# Days ahead the near-expiry batch report looks when no days are given
+INVENTORY_NEAR_EXPIRY_DAYS = int(os.getenv('INVENTORY_NEAR_EXPIRY_DAYS', '30'))
+
+# Demand forecasting settings, see apps/inventory/forecasting.py
+# Weeks of order history the forecast is fitted on
+INVENTORY_FORECAST_WEEKS = int(os.getenv('INVENTORY_FORECAST_WEEKS', '12'))
+# Exponential smoothing weight of the latest day, between 0 and 1
+INVENTORY_FORECAST_ALPHA = float(os.getenv('INVENTORY_FORECAST_ALPHA', '0.3'))
+# Days between placing a reorder and the stock arriving
+INVENTORY_LEAD_TIME_DAYS = int(os.getenv('INVENTORY_LEAD_TIME_DAYS', '7'))
+# Days of demand a reorder should cover, one weekly delivery cycle by default
+INVENTORY_REORDER_CYCLE_DAYS = int(os.getenv('INVENTORY_REORDER_CYCLE_DAYS', '7'))
+# Chance of not running out during the lead time the safety stock is sized for
+INVENTORY_SERVICE_LEVEL = float(os.getenv('INVENTORY_SERVICE_LEVEL', '0.95'))
+
+# Delivery route planning settings
+# Average driving speed used for arrival estimates
+DELIVERY_ROUTE_SPEED_KMH = float(os.getenv('DELIVERY_ROUTE_SPEED_KMH', '30'))
+# Minutes spent at each stop
+DELIVERY_STOP_MINUTES = float(os.getenv('DELIVERY_STOP_MINUTES', '10'))
+# Most stops the auto-assignment gives one driver in a day
+DELIVERY_DRIVER_MAX_STOPS = int(os.getenv('DELIVERY_DRIVER_MAX_STOPS', '40'))
+# Length of a driver's shift; stops that cannot be finished in it stay unassigned
+DELIVERY_SHIFT_MINUTES = int(os.getenv('DELIVERY_SHIFT_MINUTES', '480'))
+
+# Background job settings
+# Files produced by jobs are kept here for download
+JOB_RESULT_DIR = os.getenv('JOB_RESULT_DIR', os.path.join(BASE_DIR, 'job_results'))
+# Worker processes started by run_workers
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Seconds a job attempt may run unless its handler sets a timeout
+JOB_DEFAULT_TIMEOUT = int(os.getenv('JOB_DEFAULT_TIMEOUT', '300'))
+# Seconds before the first retry of a failed job, doubled for every further attempt
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', '10'))
+
 # CORS settings - Updated for proper configuration
 CORS_ALLOW_ALL_ORIGINS = False  # Changed to False for more specific control
 CORS_ALLOW_CREDENTIALS = True
@@ -169,6 +248,7 @@ CORS_ALLOW_HEADERS = [
    'x-requested-with',
    'x-csrf-token',
    'access-control-allow-origin',
+   'if-none-match',
 ]
 
 # Expose headers that frontend might need
@@ -177,6 +257,7 @@ CORS_EXPOSE_HEADERS = [
    'content-length',
    'access-control-allow-origin',
    'access-control-allow-headers',
+   'etag',
 ]
 
 # JWT settings
@@ -184,4 +265,26 @@ from datetime import timedelta
 SIMPLE_JWT = {
    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
-}
\ No newline at end of file
+}
+
+# Cache settings
+# Local memory by default; point DASHBOARD_CACHE_BACKEND at a shared backend
+# (e.g. django.core.cache.backends.redis.RedisCache) when running several workers
+CACHES = {
+   'default': {
+       'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+   },
+   'dashboard': {
+       'BACKEND': os.getenv('DASHBOARD_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+       'LOCATION': os.getenv('DASHBOARD_CACHE_LOCATION', 'dashboard'),
+   },
+}
+DASHBOARD_CACHE_ALIAS = 'dashboard'
+# Seconds a cached dashboard response is kept
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv('DASHBOARD_CACHE_TIMEOUT', '60'))
+
+# Dashboard stats settings
+# Precomputed DashboardStat rows older than this many seconds are recomputed live
+DASHBOARD_STATS_MAX_AGE = int(os.getenv('DASHBOARD_STATS_MAX_AGE', '300'))
+# Refresh the DashboardStat rows in-process every N seconds (0 disables)
+DASHBOARD_STATS_REFRESH_INTERVAL = int(os.getenv('DASHBOARD_STATS_REFRESH_INTERVAL', '0'))
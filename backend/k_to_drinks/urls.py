@@ -38,6 +38,7 @@ urlpatterns = [
   path('api/orders/', include('apps.orders.urls')),
   path('api/deliveries/', include('apps.deliveries.urls')),
   path('api/dashboard/', include('apps.dashboard.urls')),
+  path('api/jobs/', include('apps.jobs.urls')),
   
   # Authentication
   path('api/token/', include('apps.users.auth_urls')),